@@ -12,7 +12,10 @@
                 Statistics are automatically computed and displayed.
  * Usage:       Run this program in a Python 3.12.x or higher environment.
                 A valid model must be present in the models/ directory in
-                order for model testing to function.
+                order for model testing to function. Pass the screen mode
+                and the action mode the model was trained with if they were
+                not full and box.
+                python Enjoy.py [screen_mode] [action_mode]
  ******************************************************************************
  '''
 
@@ -20,7 +23,9 @@
 from stable_baselines3 import A2C
 from GameWrapper.wrappers.SNES9x import SNES9x
 from smw_environment import SmwEnvironment
+from GameWrapper.wrappers.Log import configure_logging
 import numpy as np
+import sys
 
 '''
 ------------------------------------------------------------------------------
@@ -33,9 +38,12 @@ import numpy as np
 * Returns:     none
 '''
 if "__main__" in __name__:
+    configure_logging()
 
     # Initialize the SNES9x game environment
-    smw_env = SmwEnvironment(SNES9x())
+    # The screen and action modes must match the ones the model was trained with
+    smw_env = SmwEnvironment(SNES9x(), screen_mode=sys.argv[1] if len(sys.argv) >= 2 else "full",
+                             action_mode=sys.argv[2] if len(sys.argv) >= 3 else "box")
 
     # Load the trained A2C model in the models/ directory
     model = A2C.load("models/rl_smw_A2c__2000_steps_best.zip", smw_env)
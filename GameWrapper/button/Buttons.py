@@ -6,10 +6,52 @@
  * Assignment:  Semester Project
  * Due Date:    04-23-2025
  * Description: This program defines the range of possible SNES inputs to
-                be used by the GameWrapper class during model training/testing
+                be used by the GameWrapper class during model training/testing.
+                A set of held buttons is packed into a button mask, one bit
+                per button in BUTTONS order, so it fits in one byte. The
+                button strings of all 256 masks and the masks of the discrete
+                actions are built once here, so turning an action into the
+                buttons to hold is a table lookup.
  * Usage:       This program is automatically used by the GameWrapper class
                 and is not intended for use on its own.
  ******************************************************************************
  '''
 BUTTONS = ( 'A', 'B', 'X', 'Y', 'u', 'd', 'l', 'r') # 'START', 'SELECT')
-DIR_COMBOS = ("ul", "ur", "dl", "dr")
\ No newline at end of file
+DIR_COMBOS = ("ul", "ur", "dl", "dr")
+
+# Bit of each button in a button mask
+BUTTON_BITS = {button: 1 << bit for bit, button in enumerate(BUTTONS)}
+
+# Held buttons of every mask as a string of button characters (e.g. mask 0x81 is "Ar"),
+# and the mask of every such string
+MASK_KEYS = tuple("".join(button for button in BUTTONS if mask & BUTTON_BITS[button])
+                  for mask in range(1 << len(BUTTONS)))
+KEY_MASKS = {keys: mask for mask, keys in enumerate(MASK_KEYS)}
+
+# Discrete actions: no direction, one direction, or a diagonal, with any of the face buttons;
+# opposite directions are never held together
+DIRECTIONS = ("", "u", "d", "l", "r") + DIR_COMBOS
+FACE_BUTTONS = ('A', 'B', 'X', 'Y')
+DISCRETE_ACTIONS = tuple(KEY_MASKS[direction_keys] | face_mask
+                         for direction_keys in DIRECTIONS for face_mask in range(1 << len(FACE_BUTTONS)))
+
+'''
+------------------------------------------------------------------------------
+* Function: encode_buttons / decode_buttons
+* --------------------
+* Description:
+*	Packs a list of buttons into a button mask, or unpacks one. Characters
+    that are not in BUTTONS (e.g. start) are left out of the mask.
+*
+* Arguments:   The list (or string) of buttons, or the button mask
+* Returns:     The button mask, or the list of buttons
+'''
+def encode_buttons(key_list:list[str] | str) -> int:
+    keys = "".join(key_list)
+    mask = KEY_MASKS.get(keys)
+    if mask is None:
+        mask = sum(bit for button, bit in BUTTON_BITS.items() if button in keys)
+    return mask
+
+def decode_buttons(mask:int) -> list[str]:
+    return list(MASK_KEYS[mask])
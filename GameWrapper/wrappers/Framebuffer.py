@@ -0,0 +1,251 @@
+'''
+******************************************************************************
+ * File:        Framebuffer.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program decodes raw emulator framebuffers into the
+                grayscale observation arrays used by the SB3 environment.
+                SNES9x-rr's gui.gdscreenshot() returns the frame as a GD
+                truecolor image, which is converted straight into a
+                preallocated NumPy array without going through PIL, cropped
+                and scaled to the selected screen mode (ScreenMode.py). It
+                also stacks the last few frames into the observation in place.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and is not intended for use on its own.
+ ******************************************************************************
+ '''
+
+# Imports
+import struct
+import numpy as np
+from GameWrapper.wrappers.WrapperInterface import GAME_RESOLUTION
+from GameWrapper.wrappers.ScreenMode import SCREEN_MODES, ScreenMode
+
+# GD truecolor header: signature (0xFFFE), width, height, truecolor flag, transparent color
+# The header is big endian and is followed by 4 bytes (alpha, red, green, blue) per pixel
+GD_HEADER = struct.Struct(">HHHBI")
+GD_TRUECOLOR_SIGNATURE = 0xFFFE
+
+# Fixed-point ITU-R 601-2 luma weights; these match PIL's "L" conversion exactly
+LUMA_R = np.uint32(19595)
+LUMA_G = np.uint32(38470)
+LUMA_B = np.uint32(7471)
+LUMA_ROUND = np.uint32(0x8000)
+
+'''
+------------------------------------------------------------------------------
+ * Class: GrayscaleConverter
+ * --------------------
+ * Description:
+ *	Converts RGB frames to grayscale into a preallocated (1, height, width)
+    array of the screen mode's size. The output array and the integer
+    scratch buffers are reused for every frame, so the array returned by a
+    call is overwritten by the next one.
+ '''
+class GrayscaleConverter():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: GrayscaleConverter constructor
+    * --------------------
+    * Description:
+    *	Allocates the output frame, the scratch buffers for the luma sum, and
+        the block sums used to scale the frame down. The luma and row sum
+        buffers end in a zero row and column that short blocks gather as
+        padding.
+    *
+    * Arguments:   The screen mode to crop and scale to
+    * Returns:     none
+    '''
+    def __init__(self, mode:ScreenMode = SCREEN_MODES["full"]):
+        self.mode = mode
+        height, width = mode.crop_size
+        self.padded = np.zeros((height + 1, width), dtype=np.uint32)
+        self.luma = self.padded[:height]
+        self.channel = np.zeros(mode.crop_size, dtype=np.uint32)
+        if mode.scaled:
+            self.padded_row_sums = np.zeros((mode.size[0], width + 1), dtype=np.uint32)
+            self.row_sums = self.padded_row_sums[:, :width]
+            self.row_tap = np.zeros((mode.size[0], width), dtype=np.uint32)
+            self.block_sums = np.zeros(mode.size, dtype=np.uint32)
+            self.block_tap = np.zeros_like(self.block_sums)
+            self.divisor = mode.area << np.uint32(16)
+            self.rounding = mode.area << np.uint32(15)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: GrayscaleConverter convert
+    * --------------------
+    * Description:
+    *	Converts separate red, green, and blue channel views to grayscale. The
+        channels are cropped to the screen mode's crop; any area they do not
+        cover is left black. Scaled modes then average the luma over each
+        output pixel's block before rounding back to 8 bits. If out is given
+        the frame is written there, e.g. a row of a batch array; otherwise a
+        new array is returned, so callers may keep the frame across calls.
+    *
+    * Arguments:   The red, green, and blue (height, width) uint8 channel views,
+                   and an optional (1, height, width) uint8 output array
+    * Returns:     The (1, height, width) uint8 grayscale frame
+    '''
+    def convert(self, red:np.ndarray, green:np.ndarray, blue:np.ndarray, out:np.ndarray | None = None) -> np.ndarray:
+        top, bottom, left, right = self.mode.crop
+        red, green, blue = red[top:bottom, left:right], green[top:bottom, left:right], blue[top:bottom, left:right]
+        height = min(red.shape[0], self.luma.shape[0])
+        width = min(red.shape[1], self.luma.shape[1])
+        if height < self.luma.shape[0] or width < self.luma.shape[1]:
+            self.luma.fill(0)
+        luma = self.luma[:height, :width]
+        channel = self.channel[:height, :width]
+
+        # Weighted sum of the channels in 16.16 fixed point
+        np.multiply(red[:height, :width], LUMA_R, out=luma)
+        np.multiply(green[:height, :width], LUMA_G, out=channel)
+        luma += channel
+        np.multiply(blue[:height, :width], LUMA_B, out=channel)
+        luma += channel
+
+        # Sum each output pixel's block of rows, then of columns, one gathered row (column) at a time
+        # Divide by the block area, round and shift back to 8 bits, then write into the output frame
+        frame = np.empty((1, *self.mode.size), dtype=np.uint8) if out is None else out
+        if self.mode.scaled:
+            np.take(self.padded, self.mode.row_taps[0], axis=0, out=self.row_tap)
+            np.copyto(self.row_sums, self.row_tap)
+            for taps in self.mode.row_taps[1:]:
+                np.take(self.padded, taps, axis=0, out=self.row_tap)
+                self.row_sums += self.row_tap
+            np.take(self.padded_row_sums, self.mode.col_taps[0], axis=1, out=self.block_sums)
+            for taps in self.mode.col_taps[1:]:
+                np.take(self.padded_row_sums, taps, axis=1, out=self.block_tap)
+                self.block_sums += self.block_tap
+            self.block_sums += self.rounding
+            self.block_sums //= self.divisor
+            np.copyto(frame[0], self.block_sums, casting="unsafe")
+        else:
+            self.luma += LUMA_ROUND
+            self.luma >>= 16
+            np.copyto(frame[0], self.luma, casting="unsafe")
+        return frame
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: GrayscaleConverter convert_gd
+    * --------------------
+    * Description:
+    *	Decodes a GD truecolor image, as returned by gui.gdscreenshot(), into
+        the grayscale frame
+    *
+    * Arguments:   The raw GD image bytes and an optional output array
+    * Returns:     The (1, height, width) uint8 grayscale frame
+    '''
+    def convert_gd(self, data:bytes, out:np.ndarray | None = None) -> np.ndarray:
+        signature, width, height, _, _ = GD_HEADER.unpack_from(data)
+        if signature != GD_TRUECOLOR_SIGNATURE:
+            raise ValueError(f"Not a GD truecolor image (signature {signature:#06x})")
+        pixels = np.frombuffer(data, dtype=np.uint8, count=width * height * 4, offset=GD_HEADER.size)
+        pixels = pixels.reshape(height, width, 4)
+        return self.convert(pixels[..., 1], pixels[..., 2], pixels[..., 3], out)
+
+'''
+------------------------------------------------------------------------------
+ * Class: FrameStack
+ * --------------------
+ * Description:
+ *	Assembles the stacked screen observation from the last size captured
+    frames, oldest first. Frames live in one preallocated circular buffer
+    and every frame is stored twice, at slot i and i + size, so the newest
+    size frames are always a single contiguous view of the buffer and no
+    observation array is built per step. With max_pool each stacked frame
+    is the pixelwise maximum of its capture and the capture before it,
+    which removes the flicker of sprites drawn on alternate frames.
+ '''
+class FrameStack():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameStack constructor
+    * --------------------
+    * Description:
+    *	Allocates the circular frame buffer, and the two capture buffers used
+        for max pooling
+    *
+    * Arguments:   The number of stacked frames, whether to max pool the last
+                   two captures, and the (height, width) of a frame
+    * Returns:     none
+    '''
+    def __init__(self, size:int = 4, max_pool:bool = False, resolution:tuple[int, int] = GAME_RESOLUTION):
+        if size < 1:
+            raise ValueError(f"Cannot stack {size} frames")
+        self.size = size
+        self.max_pool = max_pool
+        self.shape = (size, *resolution)
+        self.frames = np.zeros((2 * size, *resolution), dtype=np.uint8)
+        self.slots = [self.frames[i:i + 1] for i in range(size)]
+        self.captures = [np.zeros((1, *resolution), dtype=np.uint8) for _ in range(2)] if max_pool else None
+        self.head = size - 1 # Slot of the newest frame
+        self.capture = 0 # Capture buffer of the newest capture
+        self.filled = False
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameStack next_slot
+    * --------------------
+    * Description:
+    *	Returns the (1, height, width) array the next captured frame should be
+        written into, so the capture lands in the stack without a copy
+    *
+    * Arguments:   none
+    * Returns:     The capture array for the next push
+    '''
+    def next_slot(self) -> np.ndarray:
+        if self.max_pool:
+            return self.captures[self.capture ^ 1]
+        return self.slots[(self.head + 1) % self.size]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameStack push
+    * --------------------
+    * Description:
+    *	Adds a captured frame to the stack. A frame already written into
+        next_slot() is not copied again. The first frame after a reset fills
+        the whole stack.
+    *
+    * Arguments:   The (1, height, width) uint8 captured frame
+    * Returns:     The (size, height, width) stacked observation; it is a view
+                   of the buffer and is overwritten by later pushes
+    '''
+    def push(self, frame:np.ndarray) -> np.ndarray:
+        slot = self.next_slot()
+        if frame is not slot:
+            np.copyto(slot, frame)
+        head = (self.head + 1) % self.size
+
+        # Max pool the new capture with the previous one straight into the stack slot
+        if self.max_pool:
+            previous = self.captures[self.capture] if self.filled else slot
+            np.maximum(slot, previous, out=self.slots[head])
+            self.capture ^= 1
+
+        # Mirror the slot so the newest frames stay contiguous
+        self.frames[head + self.size] = self.frames[head]
+        if not self.filled:
+            self.frames[:] = self.frames[head]
+            self.filled = True
+        self.head = head
+        return self.frames[head + 1:head + 1 + self.size]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameStack reset
+    * --------------------
+    * Description:
+    *	Starts a new episode; the next push fills the stack with its frame
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def reset(self):
+        self.filled = False
@@ -0,0 +1,195 @@
+'''
+******************************************************************************
+ * File:        Launcher.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program plans multiple emulator instances so that more
+                than one SNES9x wrapper can run at the same time. Each
+                instance gets its own TCP port, its own copy of the emulator
+                directory (config, saves, and screenshots), and its own
+                savestate slot. A file lock serializes the part of startup
+                that relies on window focus and simulated key presses.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and smw_vec_env.py and is not intended for use on its own.
+ ******************************************************************************
+ '''
+
+# Imports
+import os
+import shutil
+import socket
+import time
+from contextlib import contextmanager
+
+# Set the current directory as the script execution directory
+SCRIPT_DIR = os.path.curdir
+
+# Define the default emulator directory, the directory for per-instance copies, and the lock file
+EMULATOR_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "snes9x"))
+INSTANCES_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "instances"))
+STARTUP_LOCK_PATH = os.path.abspath(os.path.join(SCRIPT_DIR, "instances/startup.lock"))
+STARTUP_LOCK_TIMEOUT = 300
+
+# Environment variables read by lua_server.lua to select its port and savestate slot
+PORT_ENV = "SMW_LUA_PORT"
+SAVE_SLOT_ENV = "SMW_SAVE_SLOT"
+
+# SNES9x-rr has ten savestate slots; instances sharing a directory need one each
+SAVE_SLOTS = 10
+
+# Emulator sub-directories that are not copied into instance directories
+SKIPPED_DIRS = ("Screenshots", "Movies")
+
+'''
+------------------------------------------------------------------------------
+ * Class: EmulatorInstance
+ * --------------------
+ * Description:
+ *	Represents the resources assigned to one emulator instance
+ '''
+class EmulatorInstance():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: EmulatorInstance constructor
+    * --------------------
+    * Description:
+    *	Stores the instance index, TCP port, emulator directory, and savestate slot
+    *
+    * Arguments:   The index, port, emulator directory, and savestate slot
+    * Returns:     none
+    '''
+    def __init__(self, index:int, port:int, emulator_dir:str, save_slot:int = 1):
+        self.index = index
+        self.port = port
+        self.emulator_dir = emulator_dir
+        self.save_slot = save_slot
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: EmulatorInstance wrapper_kwargs
+    * --------------------
+    * Description:
+    *	Returns the SNES9x constructor arguments for this instance
+    *
+    * Arguments:   none
+    * Returns:     A dictionary of keyword arguments
+    '''
+    def wrapper_kwargs(self) -> dict:
+        return {"port": self.port, "emulator_dir": self.emulator_dir, "save_slot": self.save_slot}
+
+'''
+------------------------------------------------------------------------------
+* Function: allocate_ports
+* --------------------
+* Description:
+*	Finds n free TCP ports. If a base port is given, ports are searched upward
+    from it so instances get predictable numbers; otherwise the operating
+    system picks them.
+*
+* Arguments:   The number of ports, the host to bind, and an optional base port
+* Returns:     A list of free port numbers
+'''
+def allocate_ports(n:int, host:str = '127.0.0.1', base_port:int | None = None) -> list[int]:
+    ports = []
+    sockets = []
+    candidate = base_port
+    try:
+        while len(ports) < n:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                sock.bind((host, candidate if base_port is not None else 0))
+            except OSError:
+                sock.close()
+                if base_port is None:
+                    raise
+                candidate += 1
+                continue
+            sockets.append(sock)
+            ports.append(sock.getsockname()[1])
+            if base_port is not None:
+                candidate += 1
+    finally:
+        for sock in sockets:
+            sock.close()
+    return ports
+
+'''
+------------------------------------------------------------------------------
+* Function: prepare_instance_dir
+* --------------------
+* Description:
+*	Copies the emulator directory for an instance so that each instance has
+    its own configuration, saves, and screenshots. An existing copy is reused.
+*
+* Arguments:   The instance index, the emulator directory to copy, and the
+               directory that holds the instance copies
+* Returns:     The path of the instance's emulator directory
+'''
+def prepare_instance_dir(index:int, source_dir:str = EMULATOR_DIR, instances_dir:str = INSTANCES_DIR) -> str:
+    target = os.path.join(instances_dir, str(index), "snes9x")
+    if not os.path.exists(target):
+        shutil.copytree(source_dir, target, ignore=shutil.ignore_patterns(*SKIPPED_DIRS))
+    for directory in SKIPPED_DIRS:
+        os.makedirs(os.path.join(target, directory), exist_ok=True)
+    return target
+
+'''
+------------------------------------------------------------------------------
+* Function: plan_instances
+* --------------------
+* Description:
+*	Allocates a port, an emulator directory, and a savestate slot for each of
+    n instances. A single instance uses the shared emulator directory so
+    existing setups keep working. More instances each get their own copy of
+    the directory, or, with shared_dir, share it and use separate savestate
+    slots (at most SAVE_SLOTS instances).
+*
+* Arguments:   The number of instances, an optional base port, the emulator
+               directory to copy, and whether instances share that directory
+* Returns:     A list of EmulatorInstance objects
+'''
+def plan_instances(n:int, base_port:int | None = None, source_dir:str = EMULATOR_DIR,
+                   shared_dir:bool = False) -> list[EmulatorInstance]:
+    ports = allocate_ports(n, base_port=base_port)
+    if n == 1:
+        return [EmulatorInstance(0, ports[0], source_dir)]
+    if shared_dir:
+        if n > SAVE_SLOTS:
+            raise ValueError(f"At most {SAVE_SLOTS} instances can share an emulator directory")
+        return [EmulatorInstance(i, ports[i], source_dir, save_slot=i + 1) for i in range(n)]
+    return [EmulatorInstance(i, ports[i], prepare_instance_dir(i, source_dir)) for i in range(n)]
+
+'''
+------------------------------------------------------------------------------
+* Function: startup_lock
+* --------------------
+* Description:
+*	Cross-process lock around emulator startup. Startup relies on window
+    focus and simulated key presses, so only one instance may do it at a
+    time. A lock file older than the timeout is treated as stale.
+*
+* Arguments:   The lock file path and the stale lock timeout in seconds
+* Returns:     A context manager that holds the lock
+'''
+@contextmanager
+def startup_lock(path:str = STARTUP_LOCK_PATH, timeout:float = STARTUP_LOCK_TIMEOUT):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > timeout:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+            time.sleep(0.2)
+    try:
+        os.close(fd)
+        yield
+    finally:
+        os.remove(path)
@@ -0,0 +1,600 @@
+'''
+******************************************************************************
+ * File:        LibretroSnes.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program is a headless WrapperInterface backend that runs
+                a libretro SNES core (e.g. snes9x_libretro) inside the Python
+                process through ctypes. There is no emulator window, no Lua
+                server, and no simulated key presses: buttons are answered
+                from the input callback, the RAM is read straight from the
+                core's system RAM, and frames come from the video callback.
+                Stepping therefore runs at emulation speed on any platform.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and is not intended for use on its own. Place the core in
+                libretro/ (or set SMW_LIBRETRO_CORE to its path) and create
+                the starting savestate once with saveState("state").
+ ******************************************************************************
+ '''
+
+# Imports
+import ctypes
+import os
+import sys
+import numpy as np
+from GameWrapper.wrappers.WrapperInterface import *
+from GameWrapper.wrappers.Framebuffer import GrayscaleConverter
+from GameWrapper.wrappers.Protocol import split_ranges
+from GameWrapper.wrappers.RamSnapshot import RamSnapshot
+from GameWrapper.wrappers.RamSchema import RAM_SCHEMA, RamSchema
+from GameWrapper.wrappers.StepWatch import StepTracker
+from GameWrapper.wrappers.Log import get_logger
+
+# Set the current directory as the script execution directory
+SCRIPT_DIR = os.path.curdir
+
+# Define the core, ROM, and savestate locations; the core path can be overridden by environment variable
+LIBRETRO_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "libretro"))
+CORE_ENV = "SMW_LIBRETRO_CORE"
+CORE_NAMES = {"win32": "snes9x_libretro.dll", "darwin": "snes9x_libretro.dylib"}
+CORE_PATH = os.path.join(LIBRETRO_DIR, CORE_NAMES.get(sys.platform, "snes9x_libretro.so"))
+ROM_PATH = os.path.abspath(os.path.join(SCRIPT_DIR, "snes9x/Roms/smw_patched.sfc"))
+STATES_DIR = os.path.join(LIBRETRO_DIR, "States")
+
+logger = get_logger("libretro")
+
+# libretro API constants (libretro.h)
+RETRO_API_VERSION = 1
+RETRO_DEVICE_JOYPAD = 1
+RETRO_MEMORY_SYSTEM_RAM = 2
+RETRO_ENVIRONMENT_GET_CAN_DUPE = 3
+RETRO_ENVIRONMENT_GET_SYSTEM_DIRECTORY = 9
+RETRO_ENVIRONMENT_SET_PIXEL_FORMAT = 10
+RETRO_ENVIRONMENT_GET_SAVE_DIRECTORY = 31
+RETRO_PIXEL_FORMAT_0RGB1555 = 0
+RETRO_PIXEL_FORMAT_XRGB8888 = 1
+RETRO_PIXEL_FORMAT_RGB565 = 2
+
+# libretro joypad ids for the button letters used by sendButtons (same letters as lua_server.lua)
+JOYPAD_IDS = {'B': 0, 'Y': 1, 's': 2, 'S': 3, 'u': 4, 'd': 5, 'l': 6, 'r': 7, 'A': 8, 'X': 9, 'L': 10, 'R': 11}
+
+# The system RAM exposed by SNES cores is the 128 KiB work RAM mapped at 0x7E0000
+WRAM_BASE = 0x7E0000
+
+# libretro structures and callback signatures
+class RetroGameInfo(ctypes.Structure):
+    _fields_ = [("path", ctypes.c_char_p), ("data", ctypes.c_void_p),
+                ("size", ctypes.c_size_t), ("meta", ctypes.c_char_p)]
+
+class RetroSystemInfo(ctypes.Structure):
+    _fields_ = [("library_name", ctypes.c_char_p), ("library_version", ctypes.c_char_p),
+                ("valid_extensions", ctypes.c_char_p), ("need_fullpath", ctypes.c_bool),
+                ("block_extract", ctypes.c_bool)]
+
+ENVIRONMENT_CB = ctypes.CFUNCTYPE(ctypes.c_bool, ctypes.c_uint, ctypes.c_void_p)
+VIDEO_REFRESH_CB = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_uint, ctypes.c_uint, ctypes.c_size_t)
+AUDIO_SAMPLE_CB = ctypes.CFUNCTYPE(None, ctypes.c_int16, ctypes.c_int16)
+AUDIO_SAMPLE_BATCH_CB = ctypes.CFUNCTYPE(ctypes.c_size_t, ctypes.c_void_p, ctypes.c_size_t)
+INPUT_POLL_CB = ctypes.CFUNCTYPE(None)
+INPUT_STATE_CB = ctypes.CFUNCTYPE(ctypes.c_int16, ctypes.c_uint, ctypes.c_uint, ctypes.c_uint, ctypes.c_uint)
+
+'''
+------------------------------------------------------------------------------
+* Function: expand_bits
+* --------------------
+* Description:
+*	Scales a 5 or 6 bit color channel up to 8 bits
+*
+* Arguments:   The channel values and their bit width
+* Returns:     The uint8 channel values
+'''
+def expand_bits(channel:np.ndarray, bits:int) -> np.ndarray:
+    channel = channel.astype(np.uint8)
+    return (channel << (8 - bits)) | (channel >> (2 * bits - 8))
+
+'''
+------------------------------------------------------------------------------
+ * Class: LibretroSnes
+ * --------------------
+ * Description:
+ *	Represents a libretro SNES core loaded in-process. A libretro core keeps
+    global state, so only one LibretroSnes may be running per process; run
+    several in separate processes (e.g. SubprocVecEnv) to train in parallel.
+ '''
+class LibretroSnes(WrapperInterface):
+
+    # The instance that currently owns the loaded core in this process
+    active = None
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes constructor
+    * --------------------
+    * Description:
+    *	Stores the core, ROM, and savestate paths. The core is loaded by
+        startGame.
+    *
+    * Arguments:   The core path, ROM path, savestate directory, and RAM schema
+    * Returns:     none
+    '''
+    def __init__(self, core_path:str | None = None, rom_path:str = ROM_PATH, states_dir:str = STATES_DIR,
+                 ram_schema:RamSchema = RAM_SCHEMA):
+        super().__init__(ram_schema)
+        self.core_path = os.path.abspath(core_path or os.environ.get(CORE_ENV, CORE_PATH))
+        self.rom_path = os.path.abspath(rom_path)
+        self.states_dir = os.path.abspath(states_dir)
+        self.core = None
+        self.rom = None
+        self.directory = ctypes.create_string_buffer(os.path.dirname(self.core_path).encode())
+        self.pixel_format = RETRO_PIXEL_FORMAT_0RGB1555
+        self.held_buttons = np.zeros(len(JOYPAD_IDS), dtype=np.int16)
+        self.grayscale = GrayscaleConverter()
+        self.video = np.zeros(0, dtype=np.uint8)
+        self.video_size = (0, 0, 0)
+        self.wram = None
+        self.schema_indices = None
+        self.frame_count = 0
+        self.video_frame = None
+
+        # Keep references to the callbacks so they are not garbage collected while the core holds them
+        self.callbacks = (ENVIRONMENT_CB(self.environment), VIDEO_REFRESH_CB(self.video_refresh),
+                          AUDIO_SAMPLE_CB(self.audio_sample), AUDIO_SAMPLE_BATCH_CB(self.audio_sample_batch),
+                          INPUT_POLL_CB(self.input_poll), INPUT_STATE_CB(self.input_state))
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes load_core
+    * --------------------
+    * Description:
+    *	Loads the core library, declares the signatures of the functions that
+        are used, and checks its libretro API version
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def load_core(self):
+        core = ctypes.CDLL(self.core_path)
+        core.retro_api_version.restype = ctypes.c_uint
+        core.retro_get_system_info.argtypes = [ctypes.POINTER(RetroSystemInfo)]
+        core.retro_load_game.argtypes = [ctypes.POINTER(RetroGameInfo)]
+        core.retro_load_game.restype = ctypes.c_bool
+        core.retro_set_controller_port_device.argtypes = [ctypes.c_uint, ctypes.c_uint]
+        core.retro_get_memory_data.argtypes = [ctypes.c_uint]
+        core.retro_get_memory_data.restype = ctypes.c_void_p
+        core.retro_get_memory_size.argtypes = [ctypes.c_uint]
+        core.retro_get_memory_size.restype = ctypes.c_size_t
+        core.retro_serialize_size.restype = ctypes.c_size_t
+        core.retro_serialize.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        core.retro_serialize.restype = ctypes.c_bool
+        core.retro_unserialize.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        core.retro_unserialize.restype = ctypes.c_bool
+        if core.retro_api_version() != RETRO_API_VERSION:
+            raise RuntimeError(f"{self.core_path} does not implement libretro API version {RETRO_API_VERSION}")
+        self.core = core
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes startGame
+    * --------------------
+    * Description:
+    *	Loads the core and the ROM, plugs a joypad into port 1, maps the work
+        RAM, and runs one frame so a framebuffer is available
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def startGame(self):
+        if LibretroSnes.active is not None and LibretroSnes.active is not self:
+            raise RuntimeError("Only one libretro core can run per process")
+        logger.info("Starting Game!")
+        self.load_core()
+        LibretroSnes.active = self
+        environment, video_refresh, audio_sample, audio_sample_batch, input_poll, input_state = self.callbacks
+        self.core.retro_set_environment(environment)
+        self.core.retro_set_video_refresh(video_refresh)
+        self.core.retro_set_audio_sample(audio_sample)
+        self.core.retro_set_audio_sample_batch(audio_sample_batch)
+        self.core.retro_set_input_poll(input_poll)
+        self.core.retro_set_input_state(input_state)
+        self.core.retro_init()
+
+        # Pass the ROM both by path and in memory so cores with and without need_fullpath can load it
+        with open(self.rom_path, "rb") as f:
+            self.rom = ctypes.create_string_buffer(f.read())
+        info = RetroGameInfo(self.rom_path.encode(), ctypes.cast(self.rom, ctypes.c_void_p),
+                             len(self.rom.raw) - 1, None)
+        if not self.core.retro_load_game(ctypes.byref(info)):
+            raise RuntimeError(f"The libretro core could not load {self.rom_path}")
+        self.core.retro_set_controller_port_device(0, RETRO_DEVICE_JOYPAD)
+
+        # View the core's work RAM in place; populate_mem gathers the schema bytes once per step
+        address = self.core.retro_get_memory_data(RETRO_MEMORY_SYSTEM_RAM)
+        size = self.core.retro_get_memory_size(RETRO_MEMORY_SYSTEM_RAM)
+        if not address or not size:
+            raise RuntimeError("The libretro core does not expose its system RAM")
+        self.wram = np.ctypeslib.as_array((ctypes.c_uint8 * size).from_address(address))
+        self.set_ram_schema(self.ram_schema)
+        self.populate_mem()
+        self.run_frame()
+        self.is_ready = True
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes close
+    * --------------------
+    * Description:
+    *	Unloads the game and shuts the core down
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def close(self):
+        if self.core is None:
+            return
+        self.core.retro_unload_game()
+        self.core.retro_deinit()
+        self.core = None
+        self.wram = None
+        self.is_ready = False
+        LibretroSnes.active = None
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes environment
+    * --------------------
+    * Description:
+    *	libretro environment callback. Accepts frame duping and the pixel
+        formats screenshot can convert, and points the system and save
+        directories at the core's directory. Other requests are declined so
+        the core uses its defaults.
+    *
+    * Arguments:   The environment command and its data pointer
+    * Returns:     True if the command was handled
+    '''
+    def environment(self, cmd:int, data:int) -> bool:
+        if cmd == RETRO_ENVIRONMENT_GET_CAN_DUPE:
+            ctypes.cast(data, ctypes.POINTER(ctypes.c_bool))[0] = True
+            return True
+        if cmd == RETRO_ENVIRONMENT_SET_PIXEL_FORMAT:
+            pixel_format = ctypes.cast(data, ctypes.POINTER(ctypes.c_int))[0]
+            if pixel_format not in (RETRO_PIXEL_FORMAT_0RGB1555, RETRO_PIXEL_FORMAT_XRGB8888,
+                                    RETRO_PIXEL_FORMAT_RGB565):
+                return False
+            self.pixel_format = pixel_format
+            return True
+        if cmd in (RETRO_ENVIRONMENT_GET_SYSTEM_DIRECTORY, RETRO_ENVIRONMENT_GET_SAVE_DIRECTORY):
+            ctypes.cast(data, ctypes.POINTER(ctypes.c_void_p))[0] = ctypes.addressof(self.directory)
+            return True
+        return False
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes video_refresh
+    * --------------------
+    * Description:
+    *	libretro video callback. The frame is only valid during the call, so
+        the raw pixels are copied into a reusable buffer; a NULL frame is a
+        dupe of the previous one, so only its frame number is recorded.
+    *
+    * Arguments:   The frame pointer, width, height, and pitch in bytes
+    * Returns:     none
+    '''
+    def video_refresh(self, data:int, width:int, height:int, pitch:int):
+        self.video_frame = self.frame_count
+        if not data:
+            return
+        size = height * pitch
+        if self.video.size < size:
+            self.video = np.zeros(size, dtype=np.uint8)
+        ctypes.memmove(self.video.ctypes.data, data, size)
+        self.video_size = (width, height, pitch)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes audio_sample / audio_sample_batch / input_poll
+    * --------------------
+    * Description:
+    *	libretro callbacks for audio and input polling. Audio is discarded and
+        the held buttons are already known, so nothing is done.
+    *
+    * Arguments:   The callback arguments
+    * Returns:     The number of audio frames consumed for audio_sample_batch
+    '''
+    def audio_sample(self, left:int, right:int):
+        pass
+
+    def audio_sample_batch(self, data:int, frames:int) -> int:
+        return frames
+
+    def input_poll(self):
+        pass
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes input_state
+    * --------------------
+    * Description:
+    *	libretro input callback. Reports the held buttons for the joypad on
+        port 1 and nothing for any other device.
+    *
+    * Arguments:   The port, device, index, and button id
+    * Returns:     1 if the button is held, otherwise 0
+    '''
+    def input_state(self, port:int, device:int, index:int, button_id:int) -> int:
+        if port != 0 or device != RETRO_DEVICE_JOYPAD or button_id >= len(self.held_buttons):
+            return 0
+        return int(self.held_buttons[button_id])
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes sendButtons
+    * --------------------
+    * Description:
+    *	Sets the buttons held during the next advance. Any button not pushed is
+        released.
+    *
+    * Arguments:   The list of buttons to push
+    * Returns:     none
+    '''
+    def sendButtons(self, key_list:list[str]):
+        self.held_buttons.fill(0)
+        for key in "".join(key_list):
+            if key in JOYPAD_IDS:
+                self.held_buttons[JOYPAD_IDS[key]] = 1
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes advance
+    * --------------------
+    * Description:
+    *	Runs n frames holding the buttons, then releases them, like
+        advance_frames in lua_server.lua
+    *
+    * Arguments:   The number of frames to advance
+    * Returns:     none
+    '''
+    def advance(self, n:int):
+        for _ in range(n):
+            self.run_frame()
+        self.held_buttons.fill(0)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes step_frames
+    * --------------------
+    * Description:
+    *	Runs up to n frames holding the buttons, checking the step watches
+        after every frame and stopping early if one fires, then refreshes the
+        memory values
+    *
+    * Arguments:   The list of buttons to push, the number of frames to advance
+    * Returns:     none
+    '''
+    def step_frames(self, key_list:list[str], n:int) -> None:
+        self.sendButtons(key_list)
+        tracker = StepTracker(self.step_watches)
+        wram = self.wram
+        for _ in range(n):
+            self.run_frame()
+            if tracker.update(lambda address: wram[address - WRAM_BASE]):
+                break
+        self.held_buttons.fill(0)
+        self.step_result = tracker.result()
+        self.populate_mem()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes run_frame
+    * --------------------
+    * Description:
+    *	Runs the core for one frame and counts it; the count is the frame
+        number stamped on RAM snapshots and screenshots
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def run_frame(self):
+        self.frame_count += 1
+        self.core.retro_run()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes state_path
+    * --------------------
+    * Description:
+    *	Builds the file path of a named savestate
+    *
+    * Arguments:   The save state name
+    * Returns:     The savestate file path
+    '''
+    def state_path(self, state_name:str) -> str:
+        return os.path.join(self.states_dir, f"{state_name}.state")
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes loadState
+    * --------------------
+    * Description:
+    *	Restores a savestate written by saveState and runs one frame so it
+        takes effect, like load_save in lua_server.lua. libretro savestates
+        are core specific, so SNES9x-rr's Saves/ files cannot be used.
+    *
+    * Arguments:   The save state name
+    * Returns:     none
+    '''
+    def loadState(self, state_name:str):
+        logger.debug("Loading save state %s...", state_name)
+        path = self.state_path(state_name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No libretro savestate at {path}; create it with saveState(\"{state_name}\")")
+        with open(path, "rb") as f:
+            self.restore(f.read())
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes saveState
+    * --------------------
+    * Description:
+    *	Serializes the core state to a named savestate file
+    *
+    * Arguments:   The save state name
+    * Returns:     none
+    '''
+    def saveState(self, state_name:str):
+        state = self.snapshot()
+        os.makedirs(self.states_dir, exist_ok=True)
+        with open(self.state_path(state_name), "wb") as f:
+            f.write(state)
+        logger.info("Saving state to %s...", state_name)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes snapshot
+    * --------------------
+    * Description:
+    *	Serializes the core state into memory
+    *
+    * Arguments:   none
+    * Returns:     The serialized state bytes
+    '''
+    def snapshot(self) -> bytes:
+        size = self.core.retro_serialize_size()
+        state = ctypes.create_string_buffer(size)
+        if not self.core.retro_serialize(state, size):
+            raise RuntimeError("The libretro core could not serialize its state")
+        return state.raw
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes restore
+    * --------------------
+    * Description:
+    *	Restores serialized state bytes and runs one frame so the state takes
+        effect, like load_save in lua_server.lua
+    *
+    * Arguments:   The serialized state bytes
+    * Returns:     none
+    '''
+    def restore(self, state:bytes):
+        if not self.core.retro_unserialize(state, len(state)):
+            raise RuntimeError("The libretro core rejected the savestate")
+        self.held_buttons.fill(0)
+        self.run_frame()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes set_screen_mode
+    * --------------------
+    * Description:
+    *	Stores the screen mode and rebuilds the grayscale converter for it
+    *
+    * Arguments:   The screen mode, or None if no screenshots are taken
+    * Returns:     none
+    '''
+    def set_screen_mode(self, mode:ScreenMode | None):
+        super().set_screen_mode(mode)
+        if mode is not None:
+            self.grayscale = GrayscaleConverter(mode)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes set_ram_schema
+    * --------------------
+    * Description:
+    *	Stores the RAM schema and, once the core is loaded, the work RAM
+        offsets of its bytes
+    *
+    * Arguments:   The RAM schema
+    * Returns:     none
+    '''
+    def set_ram_schema(self, ram_schema:RamSchema):
+        super().set_ram_schema(ram_schema)
+        if self.wram is None:
+            return
+        self.schema_indices = np.array(ram_schema.byte_addresses, dtype=np.intp) - WRAM_BASE
+        if ((self.schema_indices < 0) | (self.schema_indices >= len(self.wram))).any():
+            raise ValueError("The RAM schema watches addresses outside the core's work RAM")
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes screenshot
+    * --------------------
+    * Description:
+    *	Converts the last frame from the video callback to grayscale, cropped
+        and scaled to the screen mode. High resolution frames are halved to
+        the game resolution first.
+    *
+    * Arguments:   An optional (1, height, width) uint8 array to write the frame into
+    * Returns:     A (1, height, width) np array of grayscale image data
+    '''
+    def screenshot(self, out:np.ndarray | None = None) -> np.ndarray:
+        self.screen_frame = self.video_frame
+        width, height, pitch = self.video_size
+        rows = self.video[:height * pitch].reshape(height, pitch)
+        if self.pixel_format == RETRO_PIXEL_FORMAT_XRGB8888:
+            pixels = rows[:, :width * 4].reshape(height, width, 4)
+        else:
+            pixels = rows.view(np.uint16)[:, :width]
+        if width >= 2 * GAME_RESOLUTION[1]:
+            pixels = pixels[:, ::2]
+        if height >= 2 * GAME_RESOLUTION[0]:
+            pixels = pixels[::2]
+
+        # XRGB8888 is stored little endian as blue, green, red, unused
+        if self.pixel_format == RETRO_PIXEL_FORMAT_XRGB8888:
+            return self.grayscale.convert(pixels[..., 2], pixels[..., 1], pixels[..., 0], out)
+        if self.pixel_format == RETRO_PIXEL_FORMAT_RGB565:
+            return self.grayscale.convert(expand_bits(pixels >> 11, 5), expand_bits((pixels >> 5) & 0x3F, 6),
+                                          expand_bits(pixels & 0x1F, 5), out)
+        return self.grayscale.convert(expand_bits((pixels >> 10) & 0x1F, 5), expand_bits((pixels >> 5) & 0x1F, 5),
+                                      expand_bits(pixels & 0x1F, 5), out)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes populate_mem
+    * --------------------
+    * Description:
+    *	Gathers the schema bytes from the work RAM into a snapshot so every
+        read in a step sees the same frame
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def populate_mem(self) -> None:
+        self.ram = RamSnapshot(self.ram_schema.layout, self.wram[self.schema_indices], self.frame_count)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes read_ranges
+    * --------------------
+    * Description:
+    *	Copies whole work RAM regions in one gather from the core's memory
+    *
+    * Arguments:   The regions as (address, length) pairs
+    * Returns:     One read-only uint8 array per region, sliced from a single buffer
+    '''
+    def read_ranges(self, ranges:list[tuple[int, int]]) -> list[np.ndarray]:
+        indices = np.concatenate([np.arange(address - WRAM_BASE, address - WRAM_BASE + length)
+                                  for address, length in ranges])
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(self.wram)):
+            raise ValueError("RAM range is outside the core's work RAM")
+        return split_ranges(self.wram[indices].tobytes(), ranges)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LibretroSnes readu16 / readu8
+    * --------------------
+    * Description:
+    *	Reads a little endian 16-bit or an 8-bit value from the RAM copied by
+        populate_mem
+    *
+    * Arguments:   The SNES address in the 0x7E0000 - 0x7FFFFF work RAM
+    * Returns:     The value read
+    '''
+    def readu16(self, address:int) -> np.uint16:
+        return self.ram.u16(address)
+
+    def readu8(self, address:int) -> np.uint8:
+        return self.ram.u8(address)
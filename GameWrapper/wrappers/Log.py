@@ -0,0 +1,130 @@
+'''
+******************************************************************************
+ * File:        Log.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program sets up logging for the SB3 environment and the
+                game wrappers. Messages go through the standard logging
+                module with lazy %-style arguments, so a disabled message
+                costs one level check and is never formatted. Per-step
+                messages go through a LogSampler that lets only every Nth
+                call through. The level and the sampling interval are shared
+                with the Lua servers through the SMW_LOG_LEVEL and
+                SMW_LOG_EVERY environment variables.
+ * Usage:       Call configure_logging() once at program start, e.g. in
+                Train.py. Modules get their logger from get_logger.
+ ******************************************************************************
+ '''
+
+# Imports
+import logging
+import os
+
+# Environment variables read here and by lua_server.lua and memory_server.lua
+LOG_LEVEL_ENV = "SMW_LOG_LEVEL"
+LOG_EVERY_ENV = "SMW_LOG_EVERY"
+
+# Defaults: step details are debug messages, so a default run only logs summaries
+DEFAULT_LEVEL = "INFO"
+DEFAULT_EVERY = 100
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Level names accepted in SMW_LOG_LEVEL; off disables logging
+LOG_LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING,
+              "ERROR": logging.ERROR, "OFF": logging.CRITICAL + 1}
+
+# Parent logger of every module logger
+logger = logging.getLogger("smw")
+
+# Sampling interval used by samplers that do not set their own
+log_every = max(int(os.getenv(LOG_EVERY_ENV, DEFAULT_EVERY)), 1)
+
+'''
+------------------------------------------------------------------------------
+* Function: get_logger
+* --------------------
+* Description:
+*	Returns the logger of one module, a child of the "smw" logger
+*
+* Arguments:   The module's short name, e.g. "env"
+* Returns:     The logger
+'''
+def get_logger(name:str) -> logging.Logger:
+    return logger.getChild(name)
+
+'''
+------------------------------------------------------------------------------
+* Function: configure_logging
+* --------------------
+* Description:
+*	Sets the log level and the sampling interval, from the arguments or
+    else from the environment, and attaches a console handler once. The
+    settings are written back to the environment so emulators launched
+    afterwards log at the same level.
+*
+* Arguments:   The level name (DEBUG, INFO, WARNING, ERROR, OFF) and the
+               sampling interval in calls
+* Returns:     none
+'''
+def configure_logging(level:str | None = None, every:int | None = None):
+    global log_every
+    level = (level or os.getenv(LOG_LEVEL_ENV, DEFAULT_LEVEL)).upper()
+    if level not in LOG_LEVELS:
+        raise ValueError(f"Unknown log level {level}; expected one of {', '.join(LOG_LEVELS)}")
+    log_every = max(every or int(os.getenv(LOG_EVERY_ENV, DEFAULT_EVERY)), 1)
+    os.environ[LOG_LEVEL_ENV] = level
+    os.environ[LOG_EVERY_ENV] = str(log_every)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(LOG_LEVELS[level])
+
+'''
+------------------------------------------------------------------------------
+ * Class: LogSampler
+ * --------------------
+ * Description:
+ *	Represents one sampled log message site. Only every Nth call is logged,
+    starting with the first, and nothing is formatted for the others or
+    while the level is disabled.
+ '''
+class LogSampler():
+    def __init__(self, logger:logging.Logger, level:int = logging.DEBUG, every:int | None = None):
+        self.logger = logger
+        self.level = level
+        self.every = every
+        self.count = 0
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LogSampler sample
+    * --------------------
+    * Description:
+    *	Counts a call and decides whether it is logged. Use it to guard work
+        that is only needed to build the message.
+    *
+    * Arguments:   none
+    * Returns:     True if this call should be logged
+    '''
+    def sample(self) -> bool:
+        self.count += 1
+        every = self.every if self.every is not None else log_every
+        return (self.count - 1) % every == 0 and self.logger.isEnabledFor(self.level)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LogSampler log
+    * --------------------
+    * Description:
+    *	Logs the message if this call is sampled
+    *
+    * Arguments:   The %-style message and its arguments
+    * Returns:     none
+    '''
+    def log(self, msg:str, *args):
+        if self.sample():
+            self.logger.log(self.level, msg, *args)
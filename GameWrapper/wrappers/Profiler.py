@@ -0,0 +1,257 @@
+'''
+******************************************************************************
+ * File:        Profiler.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program times the hot-path calls of the game wrappers and
+                SmwEnvironment when profiling is turned on. Each call is timed
+                with perf_counter_ns into a preallocated log-scale histogram,
+                so percentiles can be read without keeping every sample.
+                Profiling is added by replacing the methods of one object
+                with timed versions, so an object that is not profiled runs
+                its original methods and pays nothing. The Lua server's own
+                time per opcode (OP_PROFILE) is kept next to the histograms,
+                so the network time can be told apart from the emulator time.
+ * Usage:       This program is automatically used by the SmwEnvironment
+                class when it is created with profile=True, and is not
+                intended for use on its own.
+ ******************************************************************************
+ '''
+
+# Imports
+from time import perf_counter_ns
+from typing import Any
+import numpy as np
+
+# Wrapper and environment calls that are timed; calls an object does not have are skipped
+WRAPPER_CALLS = ("send_command", "step_frames", "populate_mem", "screenshot", "read_ranges", "loadState", "restore")
+ENV_CALLS = ("_get_obs", "finish_step")
+
+# The Lua server opcode that covers the same work as each timed call, by the opcode's name
+SERVER_CALLS = {"step_frames": "step", "populate_mem": "read_mem", "screenshot": "frame",
+                "read_ranges": "read_range", "loadState": "load_state", "restore": "restore"}
+
+# Histogram buckets: one per nanosecond up to 4 ns, then 4 per doubling up to 2^42 ns (over an hour)
+SUB_BUCKETS = 4
+OCTAVES = 40
+HISTOGRAM_SIZE = SUB_BUCKETS + SUB_BUCKETS * OCTAVES
+
+# Lower bound of every bucket in nanoseconds, and the value reported for a bucket (its midpoint)
+BUCKET_FLOORS = np.array([bucket if bucket < SUB_BUCKETS else
+                          (SUB_BUCKETS + (bucket - SUB_BUCKETS) % SUB_BUCKETS) << ((bucket - SUB_BUCKETS) // SUB_BUCKETS)
+                          for bucket in range(HISTOGRAM_SIZE + 1)], dtype=np.float64)
+BUCKET_VALUES = (BUCKET_FLOORS[:-1] + BUCKET_FLOORS[1:]) / 2
+
+'''
+------------------------------------------------------------------------------
+* Function: bucket_index
+* --------------------
+* Description:
+*	Finds the histogram bucket of a duration from its top three bits
+*
+* Arguments:   The duration in nanoseconds
+* Returns:     The bucket index
+'''
+def bucket_index(ns:int) -> int:
+    if ns < SUB_BUCKETS:
+        return max(ns, 0)
+    shift = ns.bit_length() - 3
+    return min(SUB_BUCKETS + shift * SUB_BUCKETS + ((ns >> shift) & (SUB_BUCKETS - 1)), HISTOGRAM_SIZE - 1)
+
+'''
+------------------------------------------------------------------------------
+ * Class: Profiler
+ * --------------------
+ * Description:
+ *	Represents the timings of one environment: per timed call, a histogram of
+    durations, the call count, the total and the largest duration, and the
+    time spent in the current step. Times are inclusive, so a call made by
+    another timed call is counted in both. server holds the Lua server's
+    (count, total ns) per opcode name.
+ '''
+class Profiler():
+    def __init__(self, names:tuple[str, ...] = WRAPPER_CALLS + ENV_CALLS):
+        self.names = list(names)
+        self.histograms = np.zeros((len(self.names), HISTOGRAM_SIZE), dtype=np.int64)
+        self.calls = np.zeros(len(self.names), dtype=np.int64)
+        self.total_ns = np.zeros(len(self.names), dtype=np.int64)
+        self.max_ns = np.zeros(len(self.names), dtype=np.int64)
+        self.step_ns = np.zeros(len(self.names), dtype=np.int64)
+        self.server:dict[str, list[int]] = {}
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: Profiler add
+    * --------------------
+    * Description:
+    *	Records one call's duration
+    *
+    * Arguments:   The index of the timed call and its duration in nanoseconds
+    * Returns:     none
+    '''
+    def add(self, index:int, ns:int):
+        self.histograms[index, bucket_index(ns)] += 1
+        self.calls[index] += 1
+        self.total_ns[index] += ns
+        self.step_ns[index] += ns
+        if ns > self.max_ns[index]:
+            self.max_ns[index] = ns
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: Profiler record
+    * --------------------
+    * Description:
+    *	Records the duration of a call timed by the caller rather than by an
+        instrumented method, e.g. a request of the batched vector
+        environment. Calls that are not profiled are ignored.
+    *
+    * Arguments:   The call name and its duration in nanoseconds
+    * Returns:     none
+    '''
+    def record(self, name:str, ns:int):
+        if name in self.names:
+            self.add(self.names.index(name), ns)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: Profiler instrument
+    * --------------------
+    * Description:
+    *	Replaces methods of an object with versions that time every call.
+        Only this object is changed; its class and other instances are not.
+    *
+    * Arguments:   The object and the names of the methods to time
+    * Returns:     none
+    '''
+    def instrument(self, target:Any, names:tuple[str, ...]):
+        for name in names:
+            method = getattr(target, name, None)
+            if method is not None and name in self.names:
+                setattr(target, name, self.timed(self.names.index(name), method))
+
+    def timed(self, index:int, method):
+        add = self.add
+        def timed_call(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                add(index, perf_counter_ns() - start)
+        return timed_call
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: Profiler end_step
+    * --------------------
+    * Description:
+    *	Returns the time spent in each call during the step that just ended,
+        and starts the next step
+    *
+    * Arguments:   none
+    * Returns:     A dictionary of nanoseconds per call made this step
+    '''
+    def end_step(self) -> dict[str, int]:
+        step = {self.names[i]: int(self.step_ns[i]) for i in np.flatnonzero(self.step_ns)}
+        self.step_ns.fill(0)
+        return step
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: Profiler add_server
+    * --------------------
+    * Description:
+    *	Adds the Lua server's timings since its last report
+    *
+    * Arguments:   A dictionary of (count, total ns) per opcode name
+    * Returns:     none
+    '''
+    def add_server(self, timings:dict[str, tuple[int, int]]):
+        for name, (count, total_ns) in timings.items():
+            entry = self.server.setdefault(name, [0, 0])
+            entry[0] += count
+            entry[1] += total_ns
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: Profiler merge / copy / reset
+    * --------------------
+    * Description:
+    *	Adds another profiler's timings to this one (e.g. to combine vector
+        environments), copies the timings, or clears them
+    *
+    * Arguments:   The other profiler for merge
+    * Returns:     The copy for copy; none otherwise
+    '''
+    def merge(self, other:"Profiler"):
+        for i, name in enumerate(other.names):
+            if name not in self.names:
+                continue
+            j = self.names.index(name)
+            self.histograms[j] += other.histograms[i]
+            self.calls[j] += other.calls[i]
+            self.total_ns[j] += other.total_ns[i]
+            self.max_ns[j] = max(self.max_ns[j], other.max_ns[i])
+        self.add_server(other.server)
+
+    def copy(self) -> "Profiler":
+        profiler = Profiler(tuple(self.names))
+        profiler.merge(self)
+        return profiler
+
+    def reset(self):
+        for array in (self.histograms, self.calls, self.total_ns, self.max_ns, self.step_ns):
+            array.fill(0)
+        self.server = {}
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: Profiler percentile
+    * --------------------
+    * Description:
+    *	Estimates a percentile of a call's durations from its histogram. The
+        estimate is within the width of one bucket (under 25%).
+    *
+    * Arguments:   The call name and the percentile (0 - 100)
+    * Returns:     The duration in nanoseconds, or 0 if there were no calls
+    '''
+    def percentile(self, name:str, q:float) -> float:
+        index = self.names.index(name)
+        if self.calls[index] == 0:
+            return 0.0
+        counts = np.cumsum(self.histograms[index])
+        bucket = int(np.searchsorted(counts, q / 100 * counts[-1]))
+        return float(min(BUCKET_VALUES[min(bucket, HISTOGRAM_SIZE - 1)], self.max_ns[index]))
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: Profiler summary
+    * --------------------
+    * Description:
+    *	Reduces the timings to microsecond statistics. Server times are listed
+        as "lua/<opcode>", and for a timed call with a matching opcode the
+        mean time outside the server (network and decoding) as
+        "network/<call>".
+    *
+    * Arguments:   none
+    * Returns:     A dictionary of statistic dictionaries per call
+    '''
+    def summary(self) -> dict[str, dict[str, float]]:
+        summary = {}
+        for i, name in enumerate(self.names):
+            if self.calls[i] == 0:
+                continue
+            summary[name] = {"calls": int(self.calls[i]),
+                             "mean_us": float(self.total_ns[i] / self.calls[i] / 1000),
+                             "p50_us": self.percentile(name, 50) / 1000,
+                             "p99_us": self.percentile(name, 99) / 1000,
+                             "max_us": float(self.max_ns[i] / 1000)}
+        for opcode, (count, total_ns) in self.server.items():
+            if count:
+                summary[f"lua/{opcode}"] = {"calls": count, "mean_us": total_ns / count / 1000}
+        for name, opcode in SERVER_CALLS.items():
+            if name in summary and f"lua/{opcode}" in summary:
+                summary[f"network/{name}"] = {"mean_us": summary[name]["mean_us"] - summary[f"lua/{opcode}"]["mean_us"]}
+        return summary
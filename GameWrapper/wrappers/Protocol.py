@@ -0,0 +1,556 @@
+'''
+******************************************************************************
+ * File:        Protocol.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program defines the binary wire protocol spoken between
+                the SNES9x wrapper and lua_server.lua. Every message is a
+                fixed-size header (version, opcode, sequence number, payload
+                length) followed by a raw byte payload, so no text has to be
+                formatted or parsed per step. The original line-based text
+                protocol is kept as a fallback and is selected automatically
+                when the Lua server does not acknowledge the binary handshake.
+                Binary requests can optionally be pipelined: several requests
+                are kept in flight and a background thread matches replies to
+                their futures by sequence number.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and is not intended for use on its own.
+ ******************************************************************************
+ '''
+
+# Imports
+import socket
+import struct
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+# Protocol version; bump this whenever the header layout or an opcode payload changes
+PROTOCOL_VERSION = 6
+
+# Default number of pipelined requests allowed in flight on one connection
+MAX_IN_FLIGHT = 8
+
+# Message header: version (u8), opcode (u8), sequence number (u16), payload length (u32)
+# All multi-byte values on the wire are little endian
+HEADER = struct.Struct("<BBHI")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+
+# Request opcodes
+OP_PRESS = 0x01
+OP_ADVANCE = 0x02
+OP_LOAD_STATE = 0x03
+OP_READ_MEM = 0x04
+OP_WAIT = 0x05
+OP_STEP = 0x06
+OP_FRAME = 0x07
+OP_RING_OPEN = 0x08
+OP_SNAPSHOT = 0x09
+OP_RESTORE = 0x0A
+OP_RELEASE = 0x0B
+OP_SCHEMA = 0x0C
+OP_READ_RANGE = 0x0D
+
+# Push stream opcodes, used between memory_server.lua and RamStream.py
+# OP_SUBSCRIBE (u16 interval) starts the stream; OP_PUSH messages then arrive unrequested
+OP_SUBSCRIBE = 0x0E
+OP_PUSH = 0x0F
+OP_STEP_WATCH = 0x10
+OP_PROFILE = 0x11
+
+# Request opcode names, used to label the Lua server's timings (see SERVER_CALLS in Profiler.py)
+# The names are profile keys, so they are listed here rather than derived from the constants
+OPCODE_NAMES = {
+    OP_PRESS: "press",
+    OP_ADVANCE: "advance",
+    OP_LOAD_STATE: "load_state",
+    OP_READ_MEM: "read_mem",
+    OP_WAIT: "wait",
+    OP_STEP: "step",
+    OP_FRAME: "frame",
+    OP_RING_OPEN: "ring_open",
+    OP_SNAPSHOT: "snapshot",
+    OP_RESTORE: "restore",
+    OP_RELEASE: "release",
+    OP_SCHEMA: "schema",
+    OP_READ_RANGE: "read_range",
+    OP_SUBSCRIBE: "subscribe",
+    OP_PUSH: "push",
+    OP_STEP_WATCH: "step_watch",
+    OP_PROFILE: "profile",
+}
+
+# Reply opcodes
+OP_OK = 0x80
+OP_ERROR = 0xFF
+
+# Text handshake used to switch lua_server.lua from the text protocol to the binary protocol
+# An older server answers the handshake with a plain "Ok", which keeps the connection in text mode
+HANDSHAKE = f"binary; {PROTOCOL_VERSION}"
+HANDSHAKE_ACK = f"Ok binary {PROTOCOL_VERSION}"
+
+# Once OP_RING_OPEN attaches a ring buffer file, OP_STEP, OP_READ_MEM, and OP_FRAME write the RAM
+# values and the frame into the next ring slot and reply with the new write count (u32) instead
+# OP_STEP and OP_READ_MEM only capture the frame if their flags (u8) hold RING_FRAME; OP_FRAME always does
+# Requests without the flags byte capture the frame, as before the flags were added
+RING_FRAME = 0x01
+
+# OP_SNAPSHOT keeps an in-memory savestate in the Lua server and replies with its id (u32)
+# OP_RESTORE and OP_RELEASE take that id; the wrapper hands it out as a tagged snapshot token
+SNAPSHOT_TOKEN = struct.Struct("<4sI")
+SNAPSHOT_MAGIC = b"S9XS"
+
+# OP_SCHEMA sets the watched RAM (see RamSchema.py): one (address u32, size u16) entry per field
+# OP_READ_MEM and OP_STEP then reply with the packed record: size bytes per field, in schema order
+SCHEMA_ENTRY = struct.Struct("<IH")
+
+# OP_READ_RANGE reads whole RAM regions once: one (address u32, length u16) entry per region
+# The reply holds the raw bytes of every region back to back, in request order
+RANGE_ENTRY = struct.Struct("<IH")
+
+# OP_STEP takes the number of frames to advance (u16), the buttons to hold as a button mask
+# (u8, one bit per button in BUTTONS order; see Buttons.py), and the ring flags (u8);
+# OP_PRESS takes a string of button characters
+STEP_REQUEST = struct.Struct("<HBB")
+
+# OP_STEP_WATCH sets the memory values checked after every frame of OP_STEP (see StepWatch.py):
+# one (address u32, width u8, kind u8, value u16) entry per watch, at most 16
+# OP_STEP replies then start with (frames run u16, fired stop watch mask u16) and one u16 per max watch
+STEP_WATCH = struct.Struct("<IBBH")
+STEP_SUMMARY = struct.Struct("<HH")
+MAX_STEP_WATCHES = 16
+
+# OP_READ_MEM, OP_STEP, and OP_FRAME replies start with the emulator frame counter (u32)
+# so the RAM values and the screen can be matched to the frame they were read on
+FRAME_STAMP = U32
+
+# OP_PROFILE (u8 enable) turns the Lua server's per-opcode timing on or off and replies with one
+# (opcode u8, count u32, total microseconds u32) entry per opcode handled since the last OP_PROFILE
+PROFILE_ENTRY = struct.Struct("<BII")
+
+'''
+------------------------------------------------------------------------------
+ * Class: ProtocolError
+ * --------------------
+ * Description:
+ *	Raised when the Lua server sends a malformed message, a message with a
+    different protocol version, or an error reply.
+ '''
+class ProtocolError(Exception):
+    pass
+
+'''
+------------------------------------------------------------------------------
+* Function: encode_message
+* --------------------
+* Description:
+*	Packs an opcode and its payload into a single binary message
+*
+* Arguments:   The opcode, the raw payload bytes, and the sequence number
+* Returns:     The encoded message bytes
+'''
+def encode_message(opcode:int, payload:bytes = b"", seq:int = 0) -> bytes:
+    return HEADER.pack(PROTOCOL_VERSION, opcode, seq & 0xFFFF, len(payload)) + payload
+
+'''
+------------------------------------------------------------------------------
+* Function: decode_header
+* --------------------
+* Description:
+*	Unpacks a message header and checks that it was written with the same
+    protocol version as this module
+*
+* Arguments:   The raw header bytes
+* Returns:     A tuple of the opcode, sequence number, and payload length
+'''
+def decode_header(header:bytes) -> tuple[int, int, int]:
+    version, opcode, seq, length = HEADER.unpack(header)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Protocol version mismatch: expected {PROTOCOL_VERSION}, got {version}")
+    return opcode, seq, length
+
+'''
+------------------------------------------------------------------------------
+* Function: check_reply
+* --------------------
+* Description:
+*	Checks a reply opcode and raises the error message sent by the Lua server
+*
+* Arguments:   The reply opcode and payload bytes
+* Returns:     The payload bytes of a successful reply
+'''
+def check_reply(opcode:int, payload:bytes) -> bytes:
+    if opcode == OP_ERROR:
+        raise ProtocolError(f"Lua server error: {payload.decode(errors='replace')}")
+    if opcode != OP_OK:
+        raise ProtocolError(f"Unexpected reply opcode {opcode:#04x}")
+    return payload
+
+'''
+------------------------------------------------------------------------------
+* Function: split_frame_stamp
+* --------------------
+* Description:
+*	Splits the frame counter off a RAM or screen reply without copying the rest
+*
+* Arguments:   The reply payload bytes
+* Returns:     A tuple of the frame number and a view of the remaining payload
+'''
+def split_frame_stamp(payload:bytes) -> tuple[int, memoryview]:
+    if len(payload) < FRAME_STAMP.size:
+        raise ProtocolError("Reply is missing its frame stamp")
+    return FRAME_STAMP.unpack_from(payload)[0], memoryview(payload)[FRAME_STAMP.size:]
+
+'''
+------------------------------------------------------------------------------
+* Function: encode_ranges / split_ranges
+* --------------------
+* Description:
+*	Packs (address, length) RAM regions into an OP_READ_RANGE payload, and
+    splits the reply into one read-only NumPy view per region
+*
+* Arguments:   The regions (and the reply payload bytes for split_ranges)
+* Returns:     The payload bytes, or the list of region arrays
+'''
+def encode_ranges(ranges:list[tuple[int, int]]) -> bytes:
+    return b"".join(RANGE_ENTRY.pack(address, length) for address, length in ranges)
+
+def split_ranges(payload:bytes, ranges:list[tuple[int, int]]) -> list[np.ndarray]:
+    data = np.frombuffer(payload, dtype=np.uint8)
+    if len(data) != sum(length for _, length in ranges):
+        raise ProtocolError(f"Expected {sum(length for _, length in ranges)} RAM range bytes, got {len(data)}")
+    ends = np.cumsum([length for _, length in ranges])
+    return [data[end - length:end] for end, (_, length) in zip(ends, ranges)]
+
+'''
+------------------------------------------------------------------------------
+ * Class: LuaConnection
+ * --------------------
+ * Description:
+ *	Represents the TCP connection to a Lua server. Handles the binary
+    handshake, framing of binary requests and replies, and the legacy text
+    commands used when the server only understands the text protocol.
+ '''
+class LuaConnection():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection constructor
+    * --------------------
+    * Description:
+    *	Creates the TCP socket, the receive buffer used for text replies, and
+        the bookkeeping used by the request pipeline
+    *
+    * Arguments:   The socket timeout in seconds
+    * Returns:     none
+    '''
+    def __init__(self, timeout:float = 100):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.binary = False
+        self.seq = 0
+        self.buffer = bytearray()
+        self.pipelined = False
+        self.pending:dict[int, Future] = {}
+        self.send_lock = threading.Lock()
+        self.in_flight = None
+        self.reader = None
+        self.reader_error = None
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection connect
+    * --------------------
+    * Description:
+    *	Connects to the Lua server and, if requested, negotiates the binary
+        protocol. Falls back to the text protocol if the server does not
+        acknowledge the handshake.
+    *
+    * Arguments:   The host and port of the Lua server; whether to use the binary protocol
+    * Returns:     none
+    '''
+    def connect(self, host:str, port:int, binary:bool = True):
+        self.socket.connect((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if binary:
+            self.binary = self.send_text(HANDSHAKE) == HANDSHAKE_ACK
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection close
+    * --------------------
+    * Description:
+    *	Stops the pipeline, if running, and closes the TCP connection
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def close(self):
+        self.pipelined = False
+        self.socket.close()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection recv_exact
+    * --------------------
+    * Description:
+    *	Receives exactly n bytes from the socket, draining any bytes that were
+        already buffered first
+    *
+    * Arguments:   The number of bytes to receive
+    * Returns:     The received bytes
+    '''
+    def recv_exact(self, n:int) -> bytes:
+        while len(self.buffer) < n:
+            chunk = self.socket.recv(max(n - len(self.buffer), 4096))
+            if not chunk:
+                raise ConnectionError("Lua server closed the connection")
+            self.buffer += chunk
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection recv_line
+    * --------------------
+    * Description:
+    *	Receives a single newline terminated text reply
+    *
+    * Arguments:   none
+    * Returns:     The decoded line without the trailing newline
+    '''
+    def recv_line(self) -> str:
+        while (end := self.buffer.find(b"\n")) < 0:
+            chunk = self.socket.recv(4096)
+            if not chunk:
+                raise ConnectionError("Lua server closed the connection")
+            self.buffer += chunk
+        line = bytes(self.buffer[:end])
+        del self.buffer[:end + 1]
+        return line.decode().strip()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection send_text
+    * --------------------
+    * Description:
+    *	Sends a text protocol command and waits for its single line reply
+    *
+    * Arguments:   The string command to send
+    * Returns:     The reply line
+    '''
+    def send_text(self, command:str) -> str:
+        self.socket.sendall(f"{command}\n".encode())
+        return self.recv_line()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection request
+    * --------------------
+    * Description:
+    *	Sends a binary request and waits for the matching reply. When the
+        pipeline is running the request is queued behind any requests that
+        are already in flight.
+    *
+    * Arguments:   The opcode and the raw payload bytes
+    * Returns:     The reply payload bytes
+    '''
+    def request(self, opcode:int, payload:bytes = b"") -> bytes:
+        if self.pipelined:
+            return self.request_async(opcode, payload).result()
+        seq = self.send_request(opcode, payload)
+        reply_opcode, reply_seq, reply = self.recv_reply()
+        if reply_seq != seq:
+            raise ProtocolError(f"Reply for sequence {reply_seq} received while waiting on {seq}")
+        return check_reply(reply_opcode, reply)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection send_request
+    * --------------------
+    * Description:
+    *	Assigns the next sequence number to a binary request and sends it
+        without waiting for the reply
+    *
+    * Arguments:   The opcode and the raw payload bytes
+    * Returns:     The sequence number of the request
+    '''
+    def send_request(self, opcode:int, payload:bytes = b"") -> int:
+        with self.send_lock:
+            self.seq = (self.seq + 1) & 0xFFFF
+            self.socket.sendall(encode_message(opcode, payload, self.seq))
+            return self.seq
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection recv_reply
+    * --------------------
+    * Description:
+    *	Receives one complete binary message
+    *
+    * Arguments:   none
+    * Returns:     A tuple of the reply opcode, sequence number, and payload bytes
+    '''
+    def recv_reply(self) -> tuple[int, int, bytes]:
+        reply_opcode, reply_seq, length = decode_header(self.recv_exact(HEADER.size))
+        return reply_opcode, reply_seq, self.recv_exact(length)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection read_available
+    * --------------------
+    * Description:
+    *	Receives whatever bytes are ready on the socket into the receive
+        buffer. Used by callers that poll many connections with selectors, so
+        it is only called once the socket is readable and does not block.
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def read_available(self):
+        chunk = self.socket.recv(65536)
+        if not chunk:
+            raise ConnectionError("Lua server closed the connection")
+        self.buffer += chunk
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection parse_reply
+    * --------------------
+    * Description:
+    *	Removes one complete binary message from the receive buffer without
+        reading from the socket
+    *
+    * Arguments:   none
+    * Returns:     A tuple of the reply opcode, sequence number, and payload
+                   bytes, or None if no complete message is buffered yet
+    '''
+    def parse_reply(self) -> tuple[int, int, bytes] | None:
+        if len(self.buffer) < HEADER.size:
+            return None
+        reply_opcode, reply_seq, length = decode_header(bytes(self.buffer[:HEADER.size]))
+        if len(self.buffer) < HEADER.size + length:
+            return None
+        reply = bytes(self.buffer[HEADER.size:HEADER.size + length])
+        del self.buffer[:HEADER.size + length]
+        return reply_opcode, reply_seq, reply
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection start_pipeline
+    * --------------------
+    * Description:
+    *	Starts the background reply reader so that binary requests can be sent
+        without waiting for the previous reply. At most max_in_flight requests
+        are outstanding at once; further requests block until a reply arrives.
+    *
+    * Arguments:   The maximum number of requests in flight
+    * Returns:     none
+    '''
+    def start_pipeline(self, max_in_flight:int = MAX_IN_FLIGHT):
+        if not self.binary:
+            raise ProtocolError("Pipelining requires the binary protocol")
+        if self.pipelined:
+            return
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.pipelined = True
+        self.reader = threading.Thread(target=self.read_replies, daemon=True)
+        self.reader.start()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection request_async
+    * --------------------
+    * Description:
+    *	Sends a binary request on the pipeline and returns immediately. Raises
+        ConnectionError once the reply reader has stopped, since nothing
+        would resolve the future.
+    *
+    * Arguments:   The opcode and the raw payload bytes
+    * Returns:     A future that resolves to the reply payload bytes
+    '''
+    def request_async(self, opcode:int, payload:bytes = b"") -> Future:
+        if not self.pipeline_alive():
+            raise ConnectionError("Lua server pipeline is not running") from self.reader_error
+        future = Future()
+        self.in_flight.acquire()
+        with self.send_lock:
+
+            # The reader may have failed while this request waited for a slot
+            if not self.pipeline_alive():
+                self.in_flight.release()
+                raise ConnectionError("Lua server pipeline is not running") from self.reader_error
+            self.seq = (self.seq + 1) & 0xFFFF
+            self.pending[self.seq] = future
+            self.socket.sendall(encode_message(opcode, payload, self.seq))
+        return future
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection pipeline_alive
+    * --------------------
+    * Description:
+    *	Checks that the pipeline is started and its reply reader is running
+    *
+    * Arguments:   none
+    * Returns:     True if pipelined replies will be read
+    '''
+    def pipeline_alive(self) -> bool:
+        return self.pipelined and self.reader is not None and self.reader.is_alive()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection read_replies
+    * --------------------
+    * Description:
+    *	Runs on the pipeline thread. Resolves the pending future for each reply
+        by its sequence number. If the connection fails, every pending future
+        receives the exception.
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def read_replies(self):
+        while self.pipelined:
+            try:
+                reply_opcode, reply_seq, reply = self.recv_reply()
+            except socket.timeout:
+                if self.pending:
+                    self.fail_pending(TimeoutError("Timed out waiting for the Lua server"))
+                continue
+            except (OSError, ProtocolError) as error:
+                self.pipelined = False
+                self.reader_error = error
+                self.fail_pending(error)
+                return
+            future = self.pending.pop(reply_seq, None)
+            if future is None:
+                continue
+            self.in_flight.release()
+            try:
+                future.set_result(check_reply(reply_opcode, reply))
+            except ProtocolError as error:
+                future.set_exception(error)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: LuaConnection fail_pending
+    * --------------------
+    * Description:
+    *	Fails every request that is still waiting on a reply
+    *
+    * Arguments:   The exception to set on the pending futures
+    * Returns:     none
+    '''
+    def fail_pending(self, error:Exception):
+        with self.send_lock:
+            pending = list(self.pending.values())
+            self.pending.clear()
+        for future in pending:
+            self.in_flight.release()
+            future.set_exception(error)
+
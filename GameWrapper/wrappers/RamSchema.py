@@ -0,0 +1,178 @@
+'''
+******************************************************************************
+ * File:        RamSchema.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program loads the RAM watch schema, the single list of
+                watched memory values (name, address, width, signedness)
+                kept in ram_schema.json. Python sends the schema to the Lua
+                server when it connects, the server replies with exactly
+                those bytes in schema order, and the packed record is
+                decoded in one step through a NumPy structured dtype. The
+                level number and sprite tables used by the tile-map
+                observation are kept in tile_map_schema.json and are only
+                added to the schema of environments that use the tile map.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and is not intended for use on its own. Edit ram_schema.json
+                to watch different memory values.
+ ******************************************************************************
+ '''
+
+# Imports
+import json
+import os
+import numpy as np
+from GameWrapper.wrappers.Protocol import SCHEMA_ENTRY
+from GameWrapper.wrappers.RamSnapshot import RamLayout
+
+# The schema file lives next to this module so it is found from any working directory
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ram_schema.json")
+TILE_MAP_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tile_map_schema.json")
+
+# Supported field widths in bytes; values are little endian like the SNES
+FIELD_WIDTHS = (1, 2, 4)
+
+'''
+------------------------------------------------------------------------------
+ * Class: RamField
+ * --------------------
+ * Description:
+ *	Represents one watched memory value, or a table of length consecutive
+    values (e.g. one byte per sprite slot) read as a NumPy array
+ '''
+class RamField():
+    def __init__(self, name:str, address:int, width:int = 1, signed:bool = False, description:str = "",
+                 length:int = 1):
+        if width not in FIELD_WIDTHS:
+            raise ValueError(f"RAM field {name} has unsupported width {width}")
+        if length < 1:
+            raise ValueError(f"RAM field {name} has invalid length {length}")
+        self.name = name
+        self.address = address
+        self.width = width
+        self.signed = signed
+        self.description = description
+        self.length = length
+        self.size = width * length
+
+'''
+------------------------------------------------------------------------------
+ * Class: RamSchema
+ * --------------------
+ * Description:
+ *	Represents the ordered list of watched fields, with the structured dtype
+    of the packed record and the RamLayout of its bytes
+ '''
+class RamSchema():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSchema constructor
+    * --------------------
+    * Description:
+    *	Builds the packed structured dtype and the byte layout of the record
+    *
+    * Arguments:   The fields in record order
+    * Returns:     none
+    '''
+    def __init__(self, fields:list[RamField]):
+        self.fields = list(fields)
+        self.by_name = {field.name: field for field in self.fields}
+        if len(self.by_name) != len(self.fields):
+            raise ValueError("RAM schema field names must be unique")
+        self.dtype = np.dtype([(field.name, f"<{'i' if field.signed else 'u'}{field.width}",
+                                (field.length,) if field.length > 1 else ())
+                               for field in self.fields])
+        self.size = self.dtype.itemsize
+        self.byte_addresses = tuple(field.address + i for field in self.fields for i in range(field.size))
+        self.layout = RamLayout(self.byte_addresses, self.dtype)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSchema load
+    * --------------------
+    * Description:
+    *	Reads a schema from a JSON list of {name, address, width, signed,
+        description, length} objects. Addresses may be numbers or hex strings.
+        Only name and address are required.
+    *
+    * Arguments:   The schema file path
+    * Returns:     The RAM schema
+    '''
+    @staticmethod
+    def load(path:str = SCHEMA_PATH) -> "RamSchema":
+        with open(path) as f:
+            entries = json.load(f)
+        return RamSchema([RamField(entry["name"],
+                                   int(entry["address"], 0) if isinstance(entry["address"], str) else entry["address"],
+                                   entry.get("width", 1),
+                                   entry.get("signed", False),
+                                   entry.get("description", ""),
+                                   entry.get("length", 1)) for entry in entries])
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSchema __getitem__
+    * --------------------
+    * Description:
+    *	Looks up a field by name
+    *
+    * Arguments:   The field name
+    * Returns:     The RamField
+    '''
+    def __getitem__(self, name:str) -> RamField:
+        return self.by_name[name]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSchema extend
+    * --------------------
+    * Description:
+    *	Appends the fields of another schema that this one does not watch yet.
+        The record keeps this schema's fields first and in the same order.
+    *
+    * Arguments:   The schema whose fields are added
+    * Returns:     The combined schema, or this schema if nothing was added
+    '''
+    def extend(self, other:"RamSchema") -> "RamSchema":
+        added = [field for field in other.fields if field.name not in self.by_name]
+        return RamSchema(self.fields + added) if added else self
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSchema encode / text
+    * --------------------
+    * Description:
+    *	Serializes the schema for the Lua server: an OP_SCHEMA payload of
+        (address u32, size u16) entries, or the argument of the text
+        protocol "schema;" command
+    *
+    * Arguments:   none
+    * Returns:     The payload bytes, or the command argument string
+    '''
+    def encode(self) -> bytes:
+        return b"".join(SCHEMA_ENTRY.pack(field.address, field.size) for field in self.fields)
+
+    def text(self) -> str:
+        return ",".join(f"{field.address:06X}:{field.size}" for field in self.fields)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSchema decode
+    * --------------------
+    * Description:
+    *	Decodes a packed record into a structured NumPy record
+    *
+    * Arguments:   The packed record bytes
+    * Returns:     The record; fields are read by name, e.g. record["x_pos"]
+    '''
+    def decode(self, payload:bytes) -> np.void:
+        return np.frombuffer(payload, dtype=self.dtype, count=1)[0]
+
+# The default schema loaded from ram_schema.json
+RAM_SCHEMA = RamSchema.load()
+
+# The fields only the tile-map observation reads (see TileMap.py)
+TILE_MAP_SCHEMA = RamSchema.load(TILE_MAP_SCHEMA_PATH)
@@ -0,0 +1,216 @@
+'''
+******************************************************************************
+ * File:        RamSnapshot.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program defines the RAM snapshot handed from a game
+                wrapper to the SB3 environment each step. The watched
+                addresses are resolved to fixed byte offsets once by a
+                RamLayout, and each step's values live in one read-only
+                NumPy buffer, so reads are plain array indexing and a
+                snapshot can be shared between threads without a lock.
+                Layouts built from the RAM schema (RamSchema.py) also carry
+                the structured dtype of the record. Only schema addresses can
+                be read; any other address raises a KeyError, where the old
+                ram_map returned 0.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and is not intended for use on its own.
+ ******************************************************************************
+ '''
+
+# Imports
+from typing import Sequence
+import numpy as np
+
+'''
+------------------------------------------------------------------------------
+ * Class: RamLayout
+ * --------------------
+ * Description:
+ *	Represents the byte offset of every watched address in a snapshot
+    buffer: one byte per address, in order. Reading an address that is not
+    watched raises a KeyError instead of silently returning 0.
+ '''
+class RamLayout():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamLayout constructor
+    * --------------------
+    * Description:
+    *	Maps each address to its position in the list
+    *
+    * Arguments:   The watched addresses, in buffer order, and the optional
+                   structured dtype of the whole buffer
+    * Returns:     none
+    '''
+    def __init__(self, addresses:Sequence[int] = (), dtype:np.dtype | None = None):
+        self.addresses = tuple(addresses)
+        self.offsets = {address: offset for offset, address in enumerate(self.addresses)}
+        self.size = len(self.addresses)
+        self.dtype = dtype
+        self.index_cache:dict[tuple[int, ...], np.ndarray] = {}
+        self.span_cache:dict[tuple[int, int], slice] = {}
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamLayout offset
+    * --------------------
+    * Description:
+    *	Resolves an address to its byte offset in the snapshot buffer
+    *
+    * Arguments:   The SNES address
+    * Returns:     The byte offset; raises KeyError if the address is not
+                   in the schema
+    '''
+    def offset(self, address:int) -> int:
+        offset = self.offsets.get(address)
+        if offset is None:
+            raise KeyError(f"Address {address:#08x} is not in the RAM schema")
+        return offset
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamLayout indices
+    * --------------------
+    * Description:
+    *	Resolves a group of addresses, each shifted by delta bytes, to an index
+        array. The array is cached so repeated reads of the same group do no
+        per-address work.
+    *
+    * Arguments:   The SNES addresses and the byte delta (1 for the upper byte of a 16-bit value)
+    * Returns:     The byte offsets as an index array
+    '''
+    def indices(self, addresses:Sequence[int], delta:int = 0) -> np.ndarray:
+        key = (*addresses, delta)
+        indices = self.index_cache.get(key)
+        if indices is None:
+            indices = np.array([self.offset(address + delta) for address in addresses], dtype=np.intp)
+            self.index_cache[key] = indices
+        return indices
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamLayout span
+    * --------------------
+    * Description:
+    *	Resolves a contiguous address range to a slice of the snapshot buffer.
+        The range must be stored contiguously, which holds for any range
+        inside a single schema field.
+    *
+    * Arguments:   The first SNES address and the number of bytes
+    * Returns:     The slice of the snapshot buffer
+    '''
+    def span(self, address:int, length:int) -> slice:
+        key = (address, length)
+        span = self.span_cache.get(key)
+        if span is None:
+            start = self.offset(address)
+            if self.addresses[start:start + length] != tuple(range(address, address + length)):
+                raise KeyError(f"Addresses {address:#08x} - {address + length - 1:#08x} are not contiguous in the RAM schema")
+            span = slice(start, start + length)
+            self.span_cache[key] = span
+        return span
+
+'''
+------------------------------------------------------------------------------
+ * Class: RamSnapshot
+ * --------------------
+ * Description:
+ *	Represents the watched RAM values of one step. The values are copied into
+    a read-only buffer when the snapshot is created, so a snapshot never
+    changes after it is handed out. 16-bit values are little endian. If the
+    layout has a structured dtype, record views the buffer as one record.
+    frame is the emulator frame the values were read on, if the wrapper
+    knows it.
+ '''
+class RamSnapshot():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSnapshot constructor
+    * --------------------
+    * Description:
+    *	Copies the values into a read-only buffer. Without values every byte
+        reads as 0, which is used before the first read of the RAM.
+    *
+    * Arguments:   The RAM layout, the raw values in layout order, and the frame number
+    * Returns:     none
+    '''
+    def __init__(self, layout:RamLayout, values:bytes | np.ndarray | None = None, frame:int | None = None):
+        self.layout = layout
+        self.frame = frame
+        if values is None:
+            self.data = np.zeros(layout.size, dtype=np.uint8)
+        else:
+            if len(values) != layout.size:
+                raise ValueError(f"Expected {layout.size} RAM bytes, got {len(values)}")
+            self.data = np.frombuffer(values, dtype=np.uint8).copy()
+        self.data.flags.writeable = False
+        self.record = self.data.view(layout.dtype)[0] if layout.dtype is not None else None
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSnapshot u8 / s8 / u16 / s16
+    * --------------------
+    * Description:
+    *	Reads a single unsigned or signed 8-bit or 16-bit value. Both bytes
+        of a 16-bit value must be in the schema.
+    *
+    * Arguments:   The SNES address
+    * Returns:     The value as a NumPy scalar of the matching type; raises
+                   KeyError for an address outside the schema
+    '''
+    def u8(self, address:int) -> np.uint8:
+        return self.data[self.layout.offset(address)]
+
+    def s8(self, address:int) -> np.int8:
+        return self.data[self.layout.offset(address)].view(np.int8)
+
+    def u16(self, address:int) -> np.uint16:
+        lower = np.uint16(self.data[self.layout.offset(address)])
+        upper = np.uint16(self.data[self.layout.offset(address + 1)])
+        return (upper << np.uint16(8)) | lower
+
+    def s16(self, address:int) -> np.int16:
+        return self.u16(address).view(np.int16)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSnapshot u8s / s8s / u16s / s16s
+    * --------------------
+    * Description:
+    *	Reads a group of unsigned or signed 8-bit or 16-bit values in one
+        vectorized gather
+    *
+    * Arguments:   The SNES addresses
+    * Returns:     A NumPy array of the values in address order
+    '''
+    def u8s(self, addresses:Sequence[int]) -> np.ndarray:
+        return self.data[self.layout.indices(addresses)]
+
+    def s8s(self, addresses:Sequence[int]) -> np.ndarray:
+        return self.u8s(addresses).view(np.int8)
+
+    def u16s(self, addresses:Sequence[int]) -> np.ndarray:
+        lower = self.data[self.layout.indices(addresses)].astype(np.uint16)
+        upper = self.data[self.layout.indices(addresses, 1)].astype(np.uint16)
+        return (upper << np.uint16(8)) | lower
+
+    def s16s(self, addresses:Sequence[int]) -> np.ndarray:
+        return self.u16s(addresses).view(np.int16)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamSnapshot range
+    * --------------------
+    * Description:
+    *	Reads a contiguous block of bytes without copying
+    *
+    * Arguments:   The first SNES address and the number of bytes
+    * Returns:     A read-only NumPy view of the bytes
+    '''
+    def range(self, address:int, length:int) -> np.ndarray:
+        return self.data[self.layout.span(address, length)]
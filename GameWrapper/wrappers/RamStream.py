@@ -0,0 +1,165 @@
+'''
+******************************************************************************
+ * File:        RamStream.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program receives the RAM records pushed by
+                memory_server.lua. The emulator pushes a frame-stamped
+                record every k frames from its per-frame hook; a background
+                thread decodes each one into a RamSnapshot and swaps it into
+                the latest slot. Reading the newest RAM is then a plain
+                attribute read with no request round trip and no lock, which
+                suits monitoring and evaluation runs.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and is not intended for use on its own. Start the stream,
+                then load memory_server.lua in the emulator.
+ ******************************************************************************
+ '''
+
+# Imports
+import socket
+import threading
+from GameWrapper.wrappers.Protocol import *
+from GameWrapper.wrappers.RamSchema import RAM_SCHEMA, RamSchema
+from GameWrapper.wrappers.RamSnapshot import RamSnapshot
+
+# Default port memory_server.lua connects to; it reads SMW_PUSH_PORT if set
+PUSH_PORT = 12346
+PUSH_PORT_ENV = "SMW_PUSH_PORT"
+
+'''
+------------------------------------------------------------------------------
+ * Class: RamStream
+ * --------------------
+ * Description:
+ *	Represents the subscriber end of the RAM push stream. latest always holds
+    the newest RamSnapshot; replacing it is a single reference assignment, so
+    readers never lock and never see a partly written record. skipped counts
+    the pushes that were dropped, e.g. while the socket was full.
+ '''
+class RamStream():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamStream constructor
+    * --------------------
+    * Description:
+    *	Binds the listening socket. A port of 0 binds any free port.
+    *
+    * Arguments:   The RAM schema, the push interval in frames, and the host
+                   and port to listen on
+    * Returns:     none
+    '''
+    def __init__(self, ram_schema:RamSchema = RAM_SCHEMA, interval:int = 1,
+                 host:str = "127.0.0.1", port:int = PUSH_PORT):
+        self.ram_schema = ram_schema
+        self.interval = interval
+        self.latest = RamSnapshot(ram_schema.layout)
+        self.received = 0
+        self.skipped = 0
+        self.first = threading.Event()
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(1)
+        self.host, self.port = self.server.getsockname()
+        self.client = None
+        self.thread = None
+        self.running = False
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamStream start / stop
+    * --------------------
+    * Description:
+    *	Starts the background thread that accepts memory_server.lua and
+        receives its pushes, or closes the sockets and stops it
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.receive_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.client is not None:
+
+            # Closing alone does not wake the thread blocked reading the socket
+            try:
+                self.client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.client.close()
+        self.server.close()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamStream wait
+    * --------------------
+    * Description:
+    *	Blocks until the first record has arrived
+    *
+    * Arguments:   The timeout in seconds
+    * Returns:     none
+    '''
+    def wait(self, timeout:float | None = None):
+        if not self.first.wait(timeout):
+            raise TimeoutError("No RAM record was pushed by memory_server.lua")
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamStream receive_forever
+    * --------------------
+    * Description:
+    *	Accepts the emulator, sends the schema and the push interval, and then
+        decodes every pushed record into the latest slot until stopped
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def receive_forever(self):
+        try:
+            self.client, _ = self.server.accept()
+            self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.client.sendall(encode_message(OP_SCHEMA, self.ram_schema.encode()) +
+                                encode_message(OP_SUBSCRIBE, U16.pack(self.interval)))
+            reader = self.client.makefile("rb")
+            while self.running:
+                header = reader.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                opcode, _, length = decode_header(header)
+                payload = reader.read(length)
+                if opcode != OP_PUSH or len(payload) < length:
+                    raise ProtocolError(f"Unexpected stream message {opcode:#04x}")
+                self.push(payload)
+        except OSError:
+            if self.running:
+                raise
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RamStream push
+    * --------------------
+    * Description:
+    *	Decodes one pushed record and publishes it as the latest snapshot
+    *
+    * Arguments:   The frame-stamped record bytes
+    * Returns:     none
+    '''
+    def push(self, payload:bytes):
+        frame, values = split_frame_stamp(payload)
+        snapshot = RamSnapshot(self.ram_schema.layout, values, frame)
+        previous = self.latest.frame
+        if previous is not None and frame - previous > self.interval:
+            self.skipped += (frame - previous) // self.interval - 1
+        self.latest = snapshot
+        self.received += 1
+        self.first.set()
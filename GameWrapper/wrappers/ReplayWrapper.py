@@ -0,0 +1,519 @@
+'''
+******************************************************************************
+ * File:        ReplayWrapper.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program is an emulator-free WrapperInterface backend for
+                benchmarking. It either plays back a recorded trace of
+                (frame, buttons, RAM snapshot, optional screen) records, one
+                record per step, or runs simple random dynamics seeded for
+                determinism. A trace is a .npy file of a structured array
+                that is memory mapped, so long traces are paged in from disk
+                as they are played. An optional synthetic latency per request
+                and per frame stands in for the emulator's round trip, so the
+                overhead of SmwEnvironment, the protocol, and the vector
+                environments can be measured and compared on any machine.
+ * Usage:       Pass ReplayWrapper() (random dynamics) or
+                ReplayWrapper("trace.npy") to SmwEnvironment in place of
+                SNES9x(). Record a trace from any wrapper with record_trace.
+ ******************************************************************************
+ '''
+
+# Imports
+import os
+import time
+import numpy as np
+from GameWrapper.wrappers.WrapperInterface import *
+from GameWrapper.wrappers.Framebuffer import GrayscaleConverter
+from GameWrapper.wrappers.Protocol import U32, split_ranges
+from GameWrapper.wrappers.StepWatch import StepTracker
+from GameWrapper.button.Buttons import encode_buttons, decode_buttons
+from GameWrapper.wrappers.Log import get_logger
+
+# The simulated work RAM covers 0x7E0000 - 0x7FFFFF, like the libretro core's system RAM
+WRAM_BASE = 0x7E0000
+WRAM_SIZE = 0x20000
+
+# Random dynamics: pixels per frame (in 1/16ths) while holding left or right, the goal, and the start position
+# The goal matches SmwEnvironment's end_goal
+RUN_SPEED = 0x20
+GOAL_X = 718
+START_POS = (16, 350)
+DEAD_CHANCE = 0.002 # Chance per step that Mario dies
+END_LEVEL_TIME = 0x50
+
+# Rows of the synthetic frame Mario's block is drawn on, and its colors
+SKY_LUMA = 96
+MARIO_LUMA = 200
+MARIO_ROWS = (176, 192)
+
+logger = get_logger("replay")
+
+'''
+------------------------------------------------------------------------------
+* Function: trace_dtype
+* --------------------
+* Description:
+*	Builds the record type of a trace: the emulator frame, the buttons held
+    for the step as a bit mask over BUTTONS, the schema bytes in layout
+    order, and optionally the full resolution grayscale screen
+*
+* Arguments:   The RAM schema and whether screens are recorded
+* Returns:     The structured NumPy dtype
+'''
+def trace_dtype(ram_schema:RamSchema = RAM_SCHEMA, screens:bool = False) -> np.dtype:
+    fields = [("frame", "<u4"), ("buttons", "<u2"), ("ram", np.uint8, (ram_schema.size,))]
+    if screens:
+        fields.append(("screen", np.uint8, GAME_RESOLUTION))
+    return np.dtype(fields)
+
+'''
+------------------------------------------------------------------------------
+ * Class: TraceWriter
+ * --------------------
+ * Description:
+ *	Writes trace records straight into a memory-mapped .npy file. The file
+    is created with room for capacity records and cut down to the records
+    written when it is closed. ".npy" is added to a path without it, as
+    np.save does, so the trace always ends up in one file.
+ '''
+class TraceWriter():
+    def __init__(self, path:str, capacity:int, ram_schema:RamSchema = RAM_SCHEMA, screens:bool = False):
+        self.path = path if path.endswith(".npy") else path + ".npy"
+        self.ram_schema = ram_schema
+        self.screens = screens
+        self.records = np.lib.format.open_memmap(self.path, mode="w+", dtype=trace_dtype(ram_schema, screens),
+                                                 shape=(capacity,))
+        self.count = 0
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: TraceWriter append
+    * --------------------
+    * Description:
+    *	Writes the next record
+    *
+    * Arguments:   The buttons held for the step, the RAM snapshot after it,
+                   and the (1, 224, 256) full mode screenshot if screens are recorded
+    * Returns:     none
+    '''
+    def append(self, key_list:list[str], ram:RamSnapshot, screen:np.ndarray | None = None):
+        if self.count == len(self.records):
+            raise ValueError(f"Trace {self.path} is full ({self.count} records)")
+        record = self.records[self.count]
+        record["frame"] = ram.frame if ram.frame is not None else self.count
+        record["buttons"] = encode_buttons(key_list)
+        record["ram"] = ram.data
+        if self.screens:
+            record["screen"] = screen[0]
+        self.count += 1
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: TraceWriter close
+    * --------------------
+    * Description:
+    *	Flushes the records to disk, rewriting the file with only the
+        records written if it is not full
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def close(self):
+        self.records.flush()
+        if self.count < len(self.records):
+            records = np.array(self.records[:self.count])
+            del self.records
+            np.save(self.path, records)
+        else:
+            del self.records
+
+'''
+------------------------------------------------------------------------------
+* Function: record_trace
+* --------------------
+* Description:
+*	Records a trace by loading the starting save state of a wrapper and
+    stepping it through a list of actions. The first record is the state
+    after loading; every step adds one record.
+*
+* Arguments:   The wrapper to record (already started), the trace path, the
+               list of button lists to step with, the frames per step, and
+               whether to record full mode screens
+* Returns:     none
+'''
+def record_trace(wrapper:WrapperInterface, path:str, actions:list[list[str]], frame_skip:int = 4,
+                 screens:bool = False):
+    wrapper.loadState("state")
+    wrapper.populate_mem()
+    if screens:
+        wrapper.set_screen_mode(SCREEN_MODES["full"])
+    writer = TraceWriter(path, len(actions) + 1, wrapper.ram_schema, screens)
+    writer.append([], wrapper.ram_snapshot(), wrapper.screenshot() if screens else None)
+    for key_list in actions:
+        wrapper.step_frames(key_list, frame_skip)
+        writer.append(key_list, wrapper.ram_snapshot(), wrapper.screenshot() if screens else None)
+    writer.close()
+
+'''
+------------------------------------------------------------------------------
+ * Class: ReplayWrapper
+ * --------------------
+ * Description:
+ *	Represents an emulator-free game backend. With a trace, every step plays
+    the next record regardless of the buttons sent (steps whose buttons
+    differ from the recording are counted in divergent_steps) and the trace
+    loops back to its first step at the end. Without a trace, Mario runs
+    while left or right is held, dies at random, and beats the level at
+    GOAL_X. Either way the schema bytes are written into a simulated work
+    RAM, so range reads and the tile map work, and the same seed and
+    actions always give the same observations.
+ '''
+class ReplayWrapper(WrapperInterface):
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper constructor
+    * --------------------
+    * Description:
+    *	Opens the trace, if any, and sets up the simulated RAM and latency
+    *
+    * Arguments:   The trace path or None for random dynamics, the random
+                   seed, the synthetic latency in seconds per request and
+                   per emulated frame, and the RAM schema
+    * Returns:     none
+    '''
+    def __init__(self, trace_path:str | None = None, seed:int = 0, latency:float = 0.0, frame_time:float = 0.0,
+                 ram_schema:RamSchema = RAM_SCHEMA):
+        super().__init__(ram_schema)
+        self.trace = None
+        if trace_path is not None:
+            self.trace = np.load(os.path.abspath(trace_path), mmap_mode="r")
+            if self.trace.dtype.names[:3] != ("frame", "buttons", "ram") or self.trace["ram"].shape[1:] != (ram_schema.size,):
+                raise ValueError(f"{trace_path} is not a trace of the {ram_schema.size} byte RAM schema")
+            if len(self.trace) < 2:
+                raise ValueError(f"{trace_path} has no steps to replay")
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.latency = latency
+        self.frame_time = frame_time
+        self.wram = np.zeros(WRAM_SIZE, dtype=np.uint8)
+        self.schema_indices = np.array(ram_schema.byte_addresses, dtype=np.intp) - WRAM_BASE
+        self.held_buttons:list[str] = []
+        self.cursor = 0
+        self.frame_count = 0
+        self.divergent_steps = 0
+        self.states:dict[str, bytes] = {}
+        self.grayscale = GrayscaleConverter()
+        self.frame = np.full(GAME_RESOLUTION, SKY_LUMA, dtype=np.uint8)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper startGame
+    * --------------------
+    * Description:
+    *	Puts Mario at the start of the level (or the first trace record) and
+        keeps that as the "state" savestate
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def startGame(self):
+        if self.trace is not None:
+            self.play_record(0)
+        else:
+            self.write_field("x_pos", START_POS[0])
+            self.write_field("y_pos", START_POS[1])
+        self.populate_mem()
+        self.states["state"] = self.snapshot()
+        self.is_ready = True
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper wait
+    * --------------------
+    * Description:
+    *	Sleeps for the synthetic latency of one request that runs n frames
+    *
+    * Arguments:   The number of frames the request runs
+    * Returns:     none
+    '''
+    def wait(self, frames:int = 0):
+        delay = self.latency + self.frame_time * frames
+        if delay > 0:
+            time.sleep(delay)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper read_field / write_field
+    * --------------------
+    * Description:
+    *	Reads or writes a single valued schema field in the simulated RAM
+    *
+    * Arguments:   The field name (and the value to write)
+    * Returns:     The value read for read_field; none for write_field
+    '''
+    def read_field(self, name:str) -> int:
+        field = self.ram_schema[name]
+        offset = field.address - WRAM_BASE
+        return int(self.wram[offset:offset + field.width].view(f"<{'i' if field.signed else 'u'}{field.width}")[0])
+
+    def write_field(self, name:str, value:int):
+        field = self.ram_schema[name]
+        offset = field.address - WRAM_BASE
+        value = np.array(value, dtype=np.int64).astype(f"<{'i' if field.signed else 'u'}{field.width}")
+        self.wram[offset:offset + field.width] = value.reshape(1).view(np.uint8)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper play_record
+    * --------------------
+    * Description:
+    *	Writes a trace record's schema bytes into the simulated RAM
+    *
+    * Arguments:   The record index
+    * Returns:     none
+    '''
+    def play_record(self, index:int):
+        self.cursor = index
+        self.wram[self.schema_indices] = self.trace["ram"][index]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper simulate
+    * --------------------
+    * Description:
+    *	Runs the random dynamics for one frame. Holding right or left sets
+        the X speed, with a little random jitter; jumping while standing at
+        the start height launches Mario, and gravity brings him back.
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def simulate(self):
+        if self.read_field("anim_state") == PLAYER_DEAD_VAL or self.read_field("end_level_timer") != 0:
+            return
+        keys = "".join(self.held_buttons)
+        x_speed = RUN_SPEED if "r" in keys else -RUN_SPEED if "l" in keys else 0
+        x_speed += int(self.rng.integers(-4, 5))
+        y_pos, y_speed = self.read_field("y_pos"), self.read_field("y_speed")
+        if ("B" in keys or "A" in keys) and y_pos >= START_POS[1]:
+            y_speed = -0x50
+        y_speed = min(y_speed + 3, 0x40)
+        y_pos = min(y_pos + y_speed // 16, START_POS[1])
+        x_pos = min(max(self.read_field("x_pos") + x_speed // 16, 0), 0xFFFF)
+        self.write_field("x_speed", x_speed)
+        self.write_field("y_speed", y_speed if y_pos < START_POS[1] else 0)
+        self.write_field("x_pos", x_pos)
+        self.write_field("y_pos", y_pos)
+        if x_pos >= GOAL_X:
+            self.write_field("end_level_timer", END_LEVEL_TIME)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper sendButtons / advance
+    * --------------------
+    * Description:
+    *	Sets the buttons held during the next advance, and advances n frames
+        holding them
+    *
+    * Arguments:   The list of buttons to push, or the number of frames to advance
+    * Returns:     none
+    '''
+    def sendButtons(self, key_list:list[str]):
+        self.held_buttons = list(key_list)
+
+    def advance(self, n:int):
+        self.step_frames(self.held_buttons, n)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper step_frames
+    * --------------------
+    * Description:
+    *	Runs one step and refreshes the memory values. A replayed step takes
+        the frame count of its record; a simulated step runs up to n frames,
+        checking the step watches after every frame and dying at random at
+        the end.
+    *
+    * Arguments:   The list of buttons to push, the number of frames to advance
+    * Returns:     none
+    '''
+    def step_frames(self, key_list:list[str], n:int) -> None:
+        tracker = StepTracker(self.step_watches)
+        readbyte = lambda address: self.wram[address - WRAM_BASE]
+        if self.trace is not None:
+            index = self.cursor + 1 if self.cursor + 1 < len(self.trace) else 1
+            frames = int(self.trace["frame"][index]) - int(self.trace["frame"][index - 1])
+            frames = frames if frames > 0 else n
+            if int(self.trace["buttons"][index]) != encode_buttons(key_list):
+                self.divergent_steps += 1
+            self.play_record(index)
+            tracker.update(readbyte)
+            tracker.frames = frames
+        else:
+            self.held_buttons = list(key_list)
+            frames = 0
+            while frames < n:
+                frames += 1
+                self.simulate()
+                if tracker.update(readbyte):
+                    break
+            if self.rng.random() < DEAD_CHANCE:
+                self.write_field("anim_state", PLAYER_DEAD_VAL)
+        self.held_buttons = []
+        self.frame_count += frames
+        self.wait(frames)
+        self.step_result = tracker.result()
+        self.ram = RamSnapshot(self.ram_schema.layout, self.wram[self.schema_indices], self.frame_count)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper loadState / saveState
+    * --------------------
+    * Description:
+    *	Restores or keeps a named in-memory savestate; "state" is the start
+        of the level (or trace)
+    *
+    * Arguments:   The save state name
+    * Returns:     none
+    '''
+    def loadState(self, state_name:str):
+        logger.debug("Loading save state %s...", state_name)
+        if state_name not in self.states:
+            raise FileNotFoundError(f"No replay savestate named {state_name}")
+        self.restore(self.states[state_name])
+
+    def saveState(self, state_name:str):
+        logger.debug("Saving state to %s...", state_name)
+        self.states[state_name] = self.snapshot()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper snapshot / restore
+    * --------------------
+    * Description:
+    *	Captures the trace position and the simulated RAM, or restores them.
+        Restoring counts one frame, like load_save in lua_server.lua.
+    *
+    * Arguments:   The state bytes for restore
+    * Returns:     The state bytes for snapshot; none for restore
+    '''
+    def snapshot(self) -> bytes:
+        return U32.pack(self.cursor) + self.wram.tobytes()
+
+    def restore(self, state:bytes):
+        self.cursor = U32.unpack_from(state)[0]
+        self.wram[:] = np.frombuffer(state, dtype=np.uint8, offset=U32.size)
+        self.held_buttons = []
+        self.frame_count += 1
+        self.wait(1)
+        self.populate_mem()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper set_screen_mode
+    * --------------------
+    * Description:
+    *	Stores the screen mode and rebuilds the grayscale converter for it
+    *
+    * Arguments:   The screen mode, or None if no screenshots are taken
+    * Returns:     none
+    '''
+    def set_screen_mode(self, mode:ScreenMode | None):
+        super().set_screen_mode(mode)
+        if mode is not None:
+            self.grayscale = GrayscaleConverter(mode)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper set_ram_schema
+    * --------------------
+    * Description:
+    *	Stores the RAM schema and the simulated RAM offsets of its bytes. A
+        trace only holds the bytes of the schema it was recorded with.
+    *
+    * Arguments:   The RAM schema
+    * Returns:     none
+    '''
+    def set_ram_schema(self, ram_schema:RamSchema):
+        if self.trace is not None and self.trace["ram"].shape[1:] != (ram_schema.size,):
+            raise ValueError(f"The trace was not recorded with the {ram_schema.size} byte RAM schema")
+        super().set_ram_schema(ram_schema)
+        self.schema_indices = np.array(ram_schema.byte_addresses, dtype=np.intp) - WRAM_BASE
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper screenshot
+    * --------------------
+    * Description:
+    *	Converts the recorded screen of the current trace record, or a frame
+        with a block at Mario's position if there is none, to the screen
+        mode. The frame is already grayscale, so it is passed as all three
+        channels, which the luma weights leave unchanged.
+    *
+    * Arguments:   An optional (1, height, width) uint8 array to write the frame into
+    * Returns:     A (1, height, width) np array of grayscale image data
+    '''
+    def screenshot(self, out:np.ndarray | None = None) -> np.ndarray:
+        self.wait()
+        self.screen_frame = self.frame_count
+        if self.trace is not None and "screen" in self.trace.dtype.names:
+            frame = self.trace["screen"][self.cursor]
+        else:
+            frame = self.frame
+            frame.fill(SKY_LUMA)
+            x_pos = self.read_field("x_pos") % (GAME_RESOLUTION[1] - 16)
+            frame[MARIO_ROWS[0]:MARIO_ROWS[1], x_pos:x_pos + 16] = MARIO_LUMA
+        return self.grayscale.convert(frame, frame, frame, out)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper populate_mem
+    * --------------------
+    * Description:
+    *	Gathers the schema bytes from the simulated RAM into a snapshot
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def populate_mem(self) -> None:
+        self.wait()
+        self.ram = RamSnapshot(self.ram_schema.layout, self.wram[self.schema_indices], self.frame_count)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper read_ranges
+    * --------------------
+    * Description:
+    *	Copies whole regions of the simulated RAM in one gather. Regions need
+        not be in the schema, but must lie within the work RAM.
+    *
+    * Arguments:   The regions as (address, length) pairs
+    * Returns:     One read-only uint8 array per region, sliced from a single buffer
+    '''
+    def read_ranges(self, ranges:list[tuple[int, int]]) -> list[np.ndarray]:
+        self.wait()
+        indices = np.concatenate([np.arange(address - WRAM_BASE, address - WRAM_BASE + length)
+                                  for address, length in ranges])
+        if len(indices) and (indices.min() < 0 or indices.max() >= WRAM_SIZE):
+            raise ValueError("RAM range is outside the simulated work RAM")
+        return split_ranges(self.wram[indices].tobytes(), ranges)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ReplayWrapper readu16 / readu8
+    * --------------------
+    * Description:
+    *	Reads a little endian 16-bit or an 8-bit value from the RAM snapshot
+    *
+    * Arguments:   The SNES address
+    * Returns:     The value read
+    '''
+    def readu16(self, address:int) -> np.uint16:
+        return self.ram.u16(address)
+
+    def readu8(self, address:int) -> np.uint8:
+        return self.ram.u8(address)
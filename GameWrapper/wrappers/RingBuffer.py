@@ -0,0 +1,294 @@
+'''
+******************************************************************************
+ * File:        RingBuffer.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program defines a memory-mapped ring buffer used as an
+                optional observation channel between the emulator and
+                Python. The emulator writes the RAM block and the frame into
+                the next slot of a shared file and only sends the slot index
+                over the socket; Python reads both through NumPy views over
+                the mapping without copying them. A pure-Python producer is
+                included so the channel can be tested without the emulator.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and is not intended for use on its own.
+ ******************************************************************************
+ '''
+
+# Imports
+import mmap
+import os
+import struct
+import numpy as np
+from GameWrapper.wrappers.WrapperInterface import GAME_RESOLUTION
+from GameWrapper.wrappers.Framebuffer import GD_HEADER
+
+# File header: magic, version, slot count, RAM bytes per slot, frame format, width, height, write count
+# The header is little endian and padded to RING_HEADER_SIZE bytes
+RING_MAGIC = b"SMWRING1"
+RING_VERSION = 1
+RING_HEADER = struct.Struct("<8sIIIIIII")
+RING_HEADER_SIZE = 64
+WRITE_COUNT_OFFSET = 32
+
+# Slot header: sequence (odd while the slot is being written) and emulator frame number
+SLOT_HEADER = struct.Struct("<II")
+SLOT_HEADER_SIZE = 16
+
+# Frame formats: one grayscale byte per pixel, or a full GD truecolor image from gui.gdscreenshot()
+FORMAT_GRAY8 = 1
+FORMAT_GD = 4
+
+# Default number of slots in the ring
+RING_SLOTS = 4
+
+'''
+------------------------------------------------------------------------------
+* Function: align16
+* --------------------
+* Description:
+*	Rounds a byte count up to a multiple of 16 so every region starts aligned
+*
+* Arguments:   The byte count
+* Returns:     The aligned byte count
+'''
+def align16(n:int) -> int:
+    return (n + 15) & ~15
+
+'''
+------------------------------------------------------------------------------
+* Function: frame_size
+* --------------------
+* Description:
+*	Computes the number of bytes a frame occupies in a slot
+*
+* Arguments:   The frame format, width, and height
+* Returns:     The frame size in bytes
+'''
+def frame_size(frame_format:int, width:int, height:int) -> int:
+    if frame_format == FORMAT_GD:
+        return GD_HEADER.size + width * height * 4
+    return width * height
+
+'''
+------------------------------------------------------------------------------
+ * Class: RingLayout
+ * --------------------
+ * Description:
+ *	Represents the byte offsets of the regions in a ring file, computed from
+    the file header. The same formula is used by lua_server.lua.
+ '''
+class RingLayout():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RingLayout constructor
+    * --------------------
+    * Description:
+    *	Computes the slot and file sizes from the ring parameters
+    *
+    * Arguments:   The slot count, RAM bytes per slot, frame format, width, and height
+    * Returns:     none
+    '''
+    def __init__(self, slot_count:int, ram_size:int, frame_format:int, width:int, height:int):
+        self.slot_count = slot_count
+        self.ram_size = ram_size
+        self.frame_format = frame_format
+        self.width = width
+        self.height = height
+        self.frame_size = frame_size(frame_format, width, height)
+        self.slot_size = SLOT_HEADER_SIZE + align16(ram_size) + align16(self.frame_size)
+        self.file_size = RING_HEADER_SIZE + slot_count * self.slot_size
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RingLayout slot_offset
+    * --------------------
+    * Description:
+    *	Computes the offsets of a slot's header, RAM block, and frame
+    *
+    * Arguments:   The slot index
+    * Returns:     A tuple of the header, RAM, and frame offsets
+    '''
+    def slot_offset(self, slot:int) -> tuple[int, int, int]:
+        header = RING_HEADER_SIZE + slot * self.slot_size
+        ram = header + SLOT_HEADER_SIZE
+        return header, ram, ram + align16(self.ram_size)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: RingLayout read
+    * --------------------
+    * Description:
+    *	Reads and validates the layout from the header of a mapped ring file
+    *
+    * Arguments:   The mapped file
+    * Returns:     The ring layout
+    '''
+    @staticmethod
+    def read(buffer) -> "RingLayout":
+        magic, version, slot_count, ram_size, frame_format, width, height, _ = RING_HEADER.unpack_from(buffer)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            raise ValueError(f"Not a version {RING_VERSION} ring buffer file")
+        return RingLayout(slot_count, ram_size, frame_format, width, height)
+
+'''
+------------------------------------------------------------------------------
+ * Class: FrameRing
+ * --------------------
+ * Description:
+ *	Represents the Python (consumer) side of the ring. Creates the ring file
+    and exposes each slot's RAM block and frame as read-only NumPy views.
+ '''
+class FrameRing():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameRing constructor
+    * --------------------
+    * Description:
+    *	Creates (or truncates) the ring file, writes its header, maps it into
+        memory, and builds the per-slot views once
+    *
+    * Arguments:   The file path, slot count, RAM bytes per slot, frame format,
+                   and (height, width) of the frame
+    * Returns:     none
+    '''
+    def __init__(self, path:str, slot_count:int = RING_SLOTS, ram_size:int = 0,
+                 frame_format:int = FORMAT_GD, resolution:tuple[int, int] = GAME_RESOLUTION):
+        self.path = os.path.abspath(path)
+        self.layout = RingLayout(slot_count, ram_size, frame_format, resolution[1], resolution[0])
+        with open(self.path, "wb") as f:
+            f.truncate(self.layout.file_size)
+            f.write(RING_HEADER.pack(RING_MAGIC, RING_VERSION, slot_count, ram_size,
+                                     frame_format, resolution[1], resolution[0], 0))
+        self.file = open(self.path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), self.layout.file_size)
+        self.ram_views = []
+        self.frame_views = []
+        for slot in range(slot_count):
+            _, ram, frame = self.layout.slot_offset(slot)
+            self.ram_views.append(self.view(ram, ram_size))
+            self.frame_views.append(self.view(frame, self.layout.frame_size))
+        if frame_format == FORMAT_GRAY8:
+            self.frame_views = [view.reshape(1, *resolution) for view in self.frame_views]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameRing view
+    * --------------------
+    * Description:
+    *	Creates a read-only uint8 view over part of the mapping
+    *
+    * Arguments:   The byte offset and length
+    * Returns:     The NumPy view
+    '''
+    def view(self, offset:int, length:int) -> np.ndarray:
+        array = np.frombuffer(self.map, dtype=np.uint8, count=length, offset=offset)
+        array.flags.writeable = False
+        return array
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameRing slot
+    * --------------------
+    * Description:
+    *	Looks up the views for the slot written by a given write. The write
+        count is the value the emulator replies with after filling a slot.
+    *
+    * Arguments:   The write count returned by the emulator
+    * Returns:     A tuple of the RAM view, frame view, and emulator frame number
+    '''
+    def slot(self, write_count:int) -> tuple[np.ndarray, np.ndarray, int]:
+        slot = (write_count - 1) % self.layout.slot_count
+        header, _, _ = self.layout.slot_offset(slot)
+        sequence, frame_number = SLOT_HEADER.unpack_from(self.map, header)
+        if sequence & 1:
+            raise RuntimeError(f"Ring slot {slot} is still being written")
+        return self.ram_views[slot], self.frame_views[slot], frame_number
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameRing close
+    * --------------------
+    * Description:
+    *	Releases the views and unmaps the file. If the caller still holds a
+        view, the mapping is released once that view is garbage collected.
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def close(self):
+        self.ram_views = []
+        self.frame_views = []
+        try:
+            self.map.close()
+        except BufferError:
+            pass
+        self.file.close()
+
+'''
+------------------------------------------------------------------------------
+ * Class: FrameRingProducer
+ * --------------------
+ * Description:
+ *	Represents the emulator (producer) side of the ring in pure Python. It
+    writes slots exactly like lua_server.lua does and is used by the mock Lua
+    server and for testing without the emulator.
+ '''
+class FrameRingProducer():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameRingProducer constructor
+    * --------------------
+    * Description:
+    *	Opens and maps an existing ring file and reads its layout
+    *
+    * Arguments:   The file path
+    * Returns:     none
+    '''
+    def __init__(self, path:str):
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.layout = RingLayout.read(self.map)
+        self.write_count = struct.unpack_from("<I", self.map, WRITE_COUNT_OFFSET)[0]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameRingProducer write
+    * --------------------
+    * Description:
+    *	Writes the RAM block and frame into the next slot. The slot sequence is
+        odd while the slot is being written so a reader can detect a torn slot.
+    *
+    * Arguments:   The RAM bytes, the frame bytes, and the emulator frame number
+    * Returns:     The new write count
+    '''
+    def write(self, ram:bytes, frame:bytes, frame_number:int) -> int:
+        slot = self.write_count % self.layout.slot_count
+        header, ram_offset, frame_offset = self.layout.slot_offset(slot)
+        sequence = SLOT_HEADER.unpack_from(self.map, header)[0]
+        SLOT_HEADER.pack_into(self.map, header, (sequence + 1) & 0xFFFFFFFF, frame_number)
+        self.map[ram_offset:ram_offset + len(ram)] = ram
+        self.map[frame_offset:frame_offset + len(frame)] = frame
+        SLOT_HEADER.pack_into(self.map, header, (sequence + 2) & 0xFFFFFFFF, frame_number)
+        self.write_count += 1
+        struct.pack_into("<I", self.map, WRITE_COUNT_OFFSET, self.write_count)
+        return self.write_count
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: FrameRingProducer close
+    * --------------------
+    * Description:
+    *	Unmaps and closes the ring file
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def close(self):
+        self.map.close()
+        self.file.close()
@@ -18,23 +18,31 @@
 
 # Imports
 import os
-import socket
 import subprocess
 import sys
-import threading
 import time
+from concurrent.futures import Future
+from typing import Callable
 import numpy as np
-import pygetwindow as gw
-import win32con
-import win32gui
-from PIL import Image, ImageGrab
-from pynput.keyboard import Controller, Key
 from GameWrapper.wrappers.WrapperInterface import WrapperInterface
+from GameWrapper.wrappers.Protocol import *
+from GameWrapper.wrappers.Framebuffer import GrayscaleConverter
+from GameWrapper.wrappers.ScreenMode import ScreenMode
+from GameWrapper.wrappers.RamSnapshot import RamSnapshot
+from GameWrapper.wrappers.RamSchema import RAM_SCHEMA, RamSchema
+from GameWrapper.wrappers.RamStream import RamStream
+from GameWrapper.wrappers.StepWatch import StepWatch, decode_step_summary, encode_watches
+from GameWrapper.wrappers.RingBuffer import FrameRing, FORMAT_GD
+from GameWrapper.wrappers.Launcher import startup_lock, PORT_ENV, SAVE_SLOT_ENV
+from GameWrapper.wrappers.Log import get_logger
+from GameWrapper.button.Buttons import encode_buttons
 
 # Set the current directory as the script execution directory
 SCRIPT_DIR = os.path.curdir
 
 # Define the paths for the savestates, lua scripts, roms, emulator executables, and TCP ports
+# These are the defaults for a single instance; each SNES9x object derives its own from emulator_dir
+EMULATOR_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "snes9x"))
 SNES9X_EXE = os.path.abspath(os.path.join(SCRIPT_DIR, "snes9x/snes9x.exe"))
 ROM_PATH = os.path.abspath(os.path.join(SCRIPT_DIR, "snes9x/Roms/smw_patched.sfc"))
 SCREENSHOTS_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "snes9x/Screenshots"))
@@ -45,7 +53,13 @@ WINDOW_TITLE = "Snes9x rerecording 1.51 v7.1"
 HOST = '127.0.0.1'
 PORT = 12345
 
+# Seconds to wait for the emulator to exit after asking it to before killing it
+EXIT_TIMEOUT = 5
+
+logger = get_logger("snes9x")
+
 # Define the keymap conversion from pynput keyboard presses to SNES controller inputs
+# Single characters are typed as is; longer names are pynput Key names (see desktop_key)
 KEYMAP = {
     'A': 'v',
     'B': 'c',
@@ -53,14 +67,34 @@ KEYMAP = {
     'Y': 'x',
     'L': 'a',
     'R': 's',
-    'UP': Key.up,
-    'DOWN': Key.down,
-    'LEFT': Key.left,
-    'RIGHT': Key.right,
-    'START': Key.space,
-    'SELECT': Key.enter
+    'UP': 'up',
+    'DOWN': 'down',
+    'LEFT': 'left',
+    'RIGHT': 'right',
+    'START': 'space',
+    'SELECT': 'enter'
 }
 
+'''
+------------------------------------------------------------------------------
+* Function: desktop_key
+* --------------------
+* Description:
+*	Converts a key name into a pynput key. The Windows desktop modules
+    (pynput, pygetwindow, pywin32, PIL.ImageGrab) are only imported by the
+    code that launches and drives the emulator window, so the wrapper can be
+    imported and used over the socket on any platform, e.g. against
+    MockLuaServer.
+*
+* Arguments:   A single character, or a pynput Key name (e.g. "space")
+* Returns:     The character or the pynput Key
+'''
+def desktop_key(name:str):
+    if len(name) == 1:
+        return name
+    from pynput.keyboard import Key
+    return getattr(Key, name)
+
 '''
 ------------------------------------------------------------------------------
  * Class: SNES9x
@@ -79,38 +113,67 @@ class SNES9x(WrapperInterface):
     *	Initializes an instance of a SNES9x control interface by specifying
         the number of frames to advance, a simulated keyboard input controller
         the keys to hold, and whether the emulator is ready to advance.
+        The binary protocol is negotiated with the Lua server on connect;
+        set binary_protocol to False to force the legacy text protocol.
+        With pipeline set, binary requests are sent without waiting on the
+        previous reply so the *_async methods can overlap with other work.
+        capture selects how screenshots are taken: "socket" has the Lua
+        server send the framebuffer, "window" grabs the desktop window.
+        If shared_ring is a file path, the RAM values and frames are passed
+        through a memory-mapped ring buffer at that path instead of the socket.
+        port, emulator_dir, and save_slot select the instance when several
+        emulators run at once (see Launcher.py). ram_schema lists the watched
+        memory values and is sent to the Lua server on connect. If
+        ram_stream is given, populate_mem reads the newest record pushed by
+        memory_server.lua instead of asking the Lua server.
     *
-    * Arguments:   disable_keys, record_movie
+    * Arguments:   disable_keys, record_movie, binary_protocol, pipeline, capture, shared_ring,
+                   port, emulator_dir, save_slot, ram_schema, ram_stream
     * Returns:     none
     '''
-    def __init__(self, disable_keys:bool = False, record_movie:bool = False):
-        super().__init__()
+    def __init__(self, disable_keys:bool = False, record_movie:bool = False, binary_protocol:bool = True,
+                 pipeline:bool = False, capture:str = "socket", shared_ring:str | None = None,
+                 port:int = PORT, emulator_dir:str = EMULATOR_DIR, save_slot:int = 1,
+                 ram_schema:RamSchema = RAM_SCHEMA, ram_stream:RamStream | None = None):
+        super().__init__(ram_schema)
         self.disable_keys = disable_keys
         self.is_ready = False
-        self.keyboard = Controller()
+        self.keyboard = None # pynput keyboard controller, created on first key press
         self.process = None
         self.n = 5
         self.keymapping = KEYMAP
         self.held_keys = set()
-        self.ram_map:dict[int:int] = {}
-        self.ram_mutex = threading.Lock()
-        self.socket = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
-        self.socket.settimeout(100)
+        self.connection = LuaConnection(timeout=100)
+        self.binary_protocol = binary_protocol
+        self.pipeline = pipeline
+        self.capture = capture
+        self.grayscale = GrayscaleConverter()
+        self.shared_ring = shared_ring
+        self.ring = None
+        self.ram_view = None
+        self.ring_frame = None
+        self.ram_stream = ram_stream
         self.record_movie = record_movie
+        self.port = port
+        self.save_slot = save_slot
+        self.emulator_dir = os.path.abspath(emulator_dir)
+        self.snes9x_exe = os.path.join(self.emulator_dir, "snes9x.exe")
+        self.rom_path = os.path.join(self.emulator_dir, "Roms/smw_patched.sfc")
+        self.screenshots_dir = os.path.join(self.emulator_dir, "Screenshots")
+        self.savestate_path = os.path.join(self.emulator_dir, f"Saves/smw_patched.{save_slot - 1:03d}")
 
     '''
     ------------------------------------------------------------------------------
     * Function: SNES9x send_command
     * --------------------
     * Description:
-    *	Sends a command over the TCP socket and waits for a response
+    *	Sends a text protocol command over the TCP socket and waits for a response
     *
     * Arguments:   The string command to send
-    * Returns:     none
+    * Returns:     The response line
     '''
-    def send_command(self, command:str):
-        self.socket.send(f"{command}\n".encode())
-        self.socket.recv(1000)
+    def send_command(self, command:str) -> str:
+        return self.connection.send_text(command)
 
     '''
     ------------------------------------------------------------------------------
@@ -131,12 +194,29 @@ class SNES9x(WrapperInterface):
         if not self.disable_keys:
 
             # Convert the input to the keymap conversion
-            key = KEYMAP.get(button, button)
+            key = desktop_key(KEYMAP.get(button, button))
 
             # Press the button for 1 second and then release
-            self.keyboard.press(key)
+            keyboard = self.get_keyboard()
+            keyboard.press(key)
             time.sleep(1)
-            self.keyboard.release(key)
+            keyboard.release(key)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x get_keyboard
+    * --------------------
+    * Description:
+    *	Returns the simulated keyboard, creating it the first time
+    *
+    * Arguments:   none
+    * Returns:     The pynput keyboard controller
+    '''
+    def get_keyboard(self):
+        if self.keyboard is None:
+            from pynput.keyboard import Controller
+            self.keyboard = Controller()
+        return self.keyboard
     
     '''
     ------------------------------------------------------------------------------
@@ -144,15 +224,27 @@ class SNES9x(WrapperInterface):
     * --------------------
     * Description:
     *	Connects to the LuaSocket server over the TCP connection specified by the
-        HOST and PORT constants.
+        HOST and PORT constants. Negotiates the binary protocol unless it
+        was disabled; older Lua servers fall back to the text protocol.
+        The RAM schema is sent before anything else reads memory.
     *
-    * Arguments:   The host and port of the Lua server
+    * Arguments:   The host and port of the Lua server; the port defaults to this instance's port
     * Returns:     none
     '''
-    def connect_lua_socket(self, host=HOST, port=PORT):
-        print("Connecting to server...")
-        self.socket.connect((HOST, PORT))
-        print("Connected!")
+    def connect_lua_socket(self, host=HOST, port=None):
+        logger.info("Connecting to server on port %d...", port or self.port)
+        self.connection.connect(host, port or self.port, binary=self.binary_protocol)
+        if self.connection.binary:
+            self.connection.request(OP_SCHEMA, self.ram_schema.encode())
+            self.connection.request(OP_STEP_WATCH, encode_watches(self.step_watches))
+        else:
+            self.send_command(f"schema; {self.ram_schema.text()}")
+        if self.shared_ring and self.connection.binary:
+            self.ring = FrameRing(self.shared_ring, ram_size=self.ram_schema.size, frame_format=FORMAT_GD)
+            self.connection.request(OP_RING_OPEN, self.ring.path.encode())
+        if self.pipeline and self.connection.binary:
+            self.connection.start_pipeline()
+        logger.info("Connected! (%s protocol)", "binary" if self.connection.binary else "text")
 
     '''
     ------------------------------------------------------------------------------
@@ -167,13 +259,36 @@ class SNES9x(WrapperInterface):
     * Returns:     none
     '''
     def focus_snes9x(self):
-        for window in gw.getWindowsWithTitle("snes9x"):
+        import win32con
+        import win32gui
+        for window in self.find_windows("snes9x"):
             win32gui.ShowWindow(window._hWnd, win32con.SW_RESTORE)
             win32gui.SetForegroundWindow(window._hWnd)
-            print("SNES9x window focused.")
+            logger.debug("SNES9x window focused.")
             return
-        print("SNES9x window not found.")
+        logger.warning("SNES9x window not found.")
     
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x find_windows
+    * --------------------
+    * Description:
+    *	Finds the windows whose title contains the given text. Once this
+        instance has started its emulator, only windows owned by that process
+        are returned, so several emulators can run side by side.
+    *
+    * Arguments:   The text to search window titles for
+    * Returns:     A list of matching windows
+    '''
+    def find_windows(self, title:str) -> list:
+        import pygetwindow as gw
+        import win32process
+        windows = gw.getWindowsWithTitle(title)
+        if self.process is None:
+            return windows
+        return [window for window in windows
+                if win32process.GetWindowThreadProcessId(window._hWnd)[1] == self.process.pid]
+
     '''
     ------------------------------------------------------------------------------
     * Function: SNES9x launchEmulator
@@ -196,25 +311,48 @@ class SNES9x(WrapperInterface):
     * Description:
     *	Navigates the emulator to load the game and take the initial savestate. 
         Sets up the required lua scripts to be used after initialization. This
-        is required foro loading the lua script using emulator Hotkeys
+        is required foro loading the lua script using emulator Hotkeys.
+        Instances start one at a time because startup relies on window focus.
     *
     * Arguments:   none
     * Returns:     none
     '''
     def startGame(self):
+        with startup_lock():
+            self.start_instance()
+
+        # Set the emulator ready flag to true
+        self.is_ready = True
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x start_instance
+    * --------------------
+    * Description:
+    *	Opens this instance's emulator, loads the Lua server on this
+        instance's port, and loads or creates the starting savestate
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def start_instance(self):
 
         # Ensure the ROM file still exists in the Roms folder
-        if not os.path.exists(ROM_PATH):
-            raise FileNotFoundError(f"ROM not found at: {ROM_PATH}")
+        if not os.path.exists(self.rom_path):
+            raise FileNotFoundError(f"ROM not found at: {self.rom_path}")
 
         # Purge the screenshots folder if any screenshots exist
-        for filename in os.listdir(SCREENSHOTS_DIR):
-            file_path = os.path.join(SCREENSHOTS_DIR, filename)
+        for filename in os.listdir(self.screenshots_dir):
+            file_path = os.path.join(self.screenshots_dir, filename)
             if os.path.isfile(file_path):
                 os.remove(file_path)
 
         # Open the emulator with the SMW ROM
-        subprocess.Popen([SNES9X_EXE, ROM_PATH])
+        # The Lua server reads its port and savestate slot from the environment
+        env = dict(os.environ)
+        env[PORT_ENV] = str(self.port)
+        env[SAVE_SLOT_ENV] = str(self.save_slot)
+        self.process = subprocess.Popen([self.snes9x_exe, self.rom_path], cwd=self.emulator_dir, env=env)
         self.wait_for_windows("Snes9x rerecording")
         self.focus_snes9x()
 
@@ -222,7 +360,7 @@ class SNES9x(WrapperInterface):
         # This is required so that the model does not use emulator memory values to learn
         self.pressButton('2')
         self.pressButton('.')
-        self.pressButton(Key.backspace)
+        self.pressButton('backspace')
         self.wait_for_windows("Lua Script")
         self.focus_snes9x()
 
@@ -230,30 +368,54 @@ class SNES9x(WrapperInterface):
         self.connect_lua_socket()
 
         # Check if a savestate is found to revert to; if not, automate creating one
-        if not os.path.exists(SAVESTATE_PATH):
-            print("No savestate found! Creating new Level 1 savestate.")
+        if not os.path.exists(self.savestate_path):
+            logger.info("No savestate found! Creating new Level 1 savestate.")
             
             # Get the level 1 savestate (requires going through intro prompts)
             time.sleep(5)
             for _ in range(4):
-                self.pressButton(Key.space)
+                self.pressButton('space')
                 time.sleep(0.5)
             time.sleep(4)
             self.saveState("smw.000")
 
         # The savestate was found, so simply load it
         else:
-            print("Savestate found! Loading current savestate")
+            logger.info("Savestate found! Loading current savestate")
             self.loadState("smw.000")
 
         # Start a SNES9x movie recording
         if self.record_movie:
             self.pressButton("m")
             time.sleep(0.5)
-            self.pressButton(Key.enter)
+            self.pressButton('enter')
 
-        # Set the emulator ready flag to true
-        self.is_ready = True
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x close
+    * --------------------
+    * Description:
+    *	Closes the Lua connection and the shared ring, then stops the emulator
+        process this wrapper launched. The process is killed if it has not
+        exited EXIT_TIMEOUT seconds after being asked to.
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def close(self):
+        self.connection.close()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(EXIT_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        self.is_ready = False
 
     '''
     ------------------------------------------------------------------------------
@@ -266,8 +428,11 @@ class SNES9x(WrapperInterface):
     * Returns:     none
     '''
     def sendButtons(self, key_list:list[str]):
-        print(f"Sending {key_list}")
-        self.send_command("press;" + "".join(key_list))
+        logger.debug("Sending %s", key_list)
+        if self.connection.binary:
+            self.connection.request(OP_PRESS, "".join(key_list).encode())
+        else:
+            self.send_command("press;" + "".join(key_list))
 
     '''
     ------------------------------------------------------------------------------
@@ -294,7 +459,50 @@ class SNES9x(WrapperInterface):
     * Returns:     none
     '''
     def advance(self, n:int):
-        self.send_command(f"adv; {n}")
+        self.ring_frame = None
+        if self.connection.binary:
+            self.connection.request(OP_ADVANCE, U16.pack(n))
+        else:
+            self.send_command(f"adv; {n}")
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x step_frames
+    * --------------------
+    * Description:
+    *	Presses the buttons, advances n frames, and retrieves the memory values
+        in a single request/response. The Lua server checks the step watches
+        after every frame and stops early if one fires. The buttons are sent
+        as a one byte button mask, so only the buttons in BUTTONS can be held.
+        Falls back to separate press, advance, and memory commands on the
+        text protocol.
+    *
+    * Arguments:   The list of buttons to push, the number of frames to advance
+    * Returns:     none
+    '''
+    def step_frames(self, key_list:list[str], n:int) -> None:
+        if not self.connection.binary:
+            super().step_frames(key_list, n)
+            return
+        self.update_step(self.connection.request(OP_STEP, STEP_REQUEST.pack(n, encode_buttons(key_list), self.ring_flags())))
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x step_frames_async
+    * --------------------
+    * Description:
+    *	Queues a combined step request on the pipeline and returns immediately.
+        The memory values are updated when the reply arrives, which lets the
+        caller run policy inference while the emulator advances.
+    *
+    * Arguments:   The list of buttons to push, the number of frames to advance
+    * Returns:     A future that resolves once the memory values are updated
+    '''
+    def step_frames_async(self, key_list:list[str], n:int) -> Future:
+        if not self.connection.pipelined:
+            return super().step_frames_async(key_list, n)
+        reply = self.connection.request_async(OP_STEP, STEP_REQUEST.pack(n, encode_buttons(key_list), self.ring_flags()))
+        return self.chain_ram_update(reply, self.update_step)
 
     '''
     ------------------------------------------------------------------------------
@@ -307,8 +515,67 @@ class SNES9x(WrapperInterface):
     * Returns:     none
     '''
     def loadState(self, state_name:str):
-        print(f"Loading save state {state_name}...")
-        self.send_command("load_save;")
+        logger.debug("Loading save state %s...", state_name)
+        self.ring_frame = None
+        if self.connection.binary:
+            self.connection.request(OP_LOAD_STATE)
+        else:
+            self.send_command("load_save;")
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x snapshot
+    * --------------------
+    * Description:
+    *	Has the Lua server save the current state into an anonymous in-memory
+        savestate. SNES9x-rr's Lua cannot hand the state data itself to
+        Python, so the returned blob is a small token naming that savestate;
+        it is only valid for this emulator until released.
+    *
+    * Arguments:   none
+    * Returns:     The snapshot token bytes
+    '''
+    def snapshot(self) -> bytes:
+        if not self.connection.binary:
+            return super().snapshot()
+        snapshot_id = U32.unpack(self.connection.request(OP_SNAPSHOT))[0]
+        return SNAPSHOT_TOKEN.pack(SNAPSHOT_MAGIC, snapshot_id)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x restore / release
+    * --------------------
+    * Description:
+    *	Loads a snapshot token from snapshot (advancing one frame, like
+        loadState), or tells the Lua server to drop the savestate it refers to
+    *
+    * Arguments:   The snapshot token
+    * Returns:     none
+    '''
+    def restore(self, state:bytes):
+        if not self.connection.binary:
+            return super().restore(state)
+        self.ring_frame = None
+        self.connection.request(OP_RESTORE, U32.pack(self.snapshot_id(state)))
+
+    def release(self, state:bytes):
+        if self.connection.binary:
+            self.connection.request(OP_RELEASE, U32.pack(self.snapshot_id(state)))
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x snapshot_id
+    * --------------------
+    * Description:
+    *	Unpacks the Lua savestate id from a snapshot token
+    *
+    * Arguments:   The snapshot token
+    * Returns:     The savestate id
+    '''
+    def snapshot_id(self, state:bytes) -> int:
+        if len(state) != SNAPSHOT_TOKEN.size or state[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError("Not a SNES9x snapshot token")
+        return SNAPSHOT_TOKEN.unpack(state)[1]
 
     '''
     ------------------------------------------------------------------------------
@@ -321,12 +588,14 @@ class SNES9x(WrapperInterface):
     * Returns:     none
     '''
     def saveState(self, state_name:str):
-        self.keyboard.press(Key.shift)
-        self.keyboard.press(Key.f1)
+        keyboard = self.get_keyboard()
+        slot_key, shift = desktop_key(f"f{self.save_slot}"), desktop_key("shift")
+        keyboard.press(shift)
+        keyboard.press(slot_key)
         time.sleep(0.1)
-        self.keyboard.release(Key.f1)
-        self.keyboard.release(Key.shift)
-        print(f"Saving state to {state_name}...")
+        keyboard.release(slot_key)
+        keyboard.release(shift)
+        logger.info("Saving state to %s...", state_name)
 
 
     '''
@@ -334,19 +603,49 @@ class SNES9x(WrapperInterface):
     * Function: SNES9x screenshot
     * --------------------
     * Description:
+    *	Captures the current SNES frame as a grayscale NumPy array. In socket
+        capture mode the Lua server sends the raw framebuffer, which is decoded
+        into a preallocated array; the returned array is reused by the next
+        call. Otherwise the emulator window is captured from the desktop.
+        Either way the frame is cropped and scaled to the screen mode.
+        screen_frame is set to the frame the screen was captured on; it is
+        unknown (None) for window captures.
+    *
+    * Arguments:   An optional (1, height, width) uint8 array to write the frame into
+    * Returns:     A (1, height, width) np array of grayscale image data
+    '''
+    def screenshot(self, out:np.ndarray | None = None) -> np.ndarray:
+        if self.ring is not None:
+            if self.ring_frame is None:
+                self.update_ram(self.connection.request(OP_FRAME))
+            self.screen_frame = self.ram.frame
+            return self.grayscale.convert_gd(self.ring_frame, out)
+        if self.capture == "socket" and self.connection.binary:
+            self.screen_frame, data = split_frame_stamp(self.connection.request(OP_FRAME))
+            return self.grayscale.convert_gd(data, out)
+        self.screen_frame = None
+        gray = self.window_screenshot()[0]
+        return self.grayscale.convert(gray, gray, gray, out)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x window_screenshot
+    * --------------------
+    * Description:
     *	Captures a pixel-perfect SNES frame, saves it as a file, and return as a NumPy array.
         Captures a screenshot of the current game window and converts it to a numpy
         array of grayscale values representing the image. This is used to pass back
         to the SB3 environment.
     *
     * Arguments:   none
-    * Returns:     An np array of grayscale image data
+    * Returns:     A (1, 224, 256) np array of grayscale image data
     '''
-    def screenshot(self) -> np.ndarray:
+    def window_screenshot(self) -> np.ndarray:
+        from PIL import Image, ImageGrab
 
         # Focus the SNES9x instance window
         WINDOW_TITLE = "Snes9x"
-        windows = gw.getWindowsWithTitle(WINDOW_TITLE)
+        windows = self.find_windows(WINDOW_TITLE)
         if not windows:
             raise RuntimeError(f"No window found with title containing '{WINDOW_TITLE}'")
         self.refocus_game()
@@ -375,44 +674,248 @@ class SNES9x(WrapperInterface):
         # img_resized.save(f"screenshot_test.png")
 
         # Return the matrix of grayscale values representing the image
-        return np.array(img_resized)
+        return np.array(img_resized)[np.newaxis]
 
     '''
     ------------------------------------------------------------------------------
     * Function: SNES9x populate_mem
     * --------------------
     * Description:
-    *	Retrieves and updated memory values from the emulator RAM mapping
+    *	Retrieves and updated memory values from the emulator RAM mapping.
+        With the binary protocol the reply is the packed schema record;
+        otherwise the text reply is parsed. With a RAM stream attached no
+        request is made: the newest pushed record is used as is.
     *
     * Arguments:   none
     * Returns:     none
     '''
     def populate_mem(self) -> None:
 
+        # The push stream already holds the newest values
+        if self.ram_stream is not None:
+            self.ram = self.ram_stream.latest
+            return
+
+        # Obtain the raw memory values as bytes and map them to their addresses
+        if self.connection.binary:
+            self.update_ram(self.connection.request(OP_READ_MEM, bytes((self.ring_flags(),))), self.ring_flags() != 0)
+            return
+
         # Obtain the raw memory values
-        self.socket.send("send_mem;\n".encode())
-        ret_str = self.socket.recv(2048).decode().strip()
+        ret_str = self.send_command("send_mem;")
         parts = ret_str.split(',')
         frame = None
-        ram_parts = []
+        addresses = []
+        values = []
 
-        # Lock the ram mutex; this is used to prevent memory read/overwrite race conditions
+        # Split the frame number from the address=value pairs
         for part in parts:
             if part.startswith("Frame="):
                 frame = int(part.split("=")[1])
             else:
-                ram_parts.append(part)
-
-        # Clear the current ram values and replace them with the captured raw values
-        with self.ram_mutex:
-            self.ram_map.clear()
-            for rampart in ram_parts:
-                eq_sign = rampart.find("=")
-                addr = rampart[0:eq_sign]
-                val = rampart[eq_sign + 1:]
-                self.ram_map[int(addr, 16)] = int(val, 10)
+                eq_sign = part.find("=")
+                addresses.append(int(part[0:eq_sign], 16))
+                values.append(int(part[eq_sign + 1:], 10))
+
+        # The server must echo the schema back byte for byte
+        layout = self.ram_schema.layout
+        if tuple(addresses) != layout.addresses:
+            raise ProtocolError("Lua server RAM addresses do not match the RAM schema")
+        self.ram = RamSnapshot(layout, bytes(values), frame)
         return
 
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x populate_mem_async
+    * --------------------
+    * Description:
+    *	Queues a memory request on the pipeline and returns immediately
+    *
+    * Arguments:   none
+    * Returns:     A future that resolves once the memory values are updated
+    '''
+    def populate_mem_async(self) -> Future:
+        if not self.connection.pipelined or self.ram_stream is not None:
+            return super().populate_mem_async()
+        with_frame = self.ring_flags() != 0
+        return self.chain_ram_update(self.connection.request_async(OP_READ_MEM, bytes((self.ring_flags(),))),
+                                     lambda values: self.update_ram(values, with_frame))
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x update_ram
+    * --------------------
+    * Description:
+    *	Replaces the RAM snapshot with the frame-stamped schema record from the
+        binary protocol. In shared ring mode the reply is the
+        ring write count, and the values and frame number are read from that slot.
+        The slot's frame is only kept if the request asked for it.
+        Assigning the new snapshot is atomic, so readers need no lock.
+    *
+    * Arguments:   The frame-stamped memory value bytes, or the ring write count;
+                   whether the ring slot holds this frame
+    * Returns:     none
+    '''
+    def update_ram(self, values:bytes, with_frame:bool = True):
+        if self.ring is not None:
+            self.ram_view, ring_frame, frame = self.ring.slot(U32.unpack(values)[0])
+            self.ring_frame = ring_frame if with_frame else None
+            values = self.ram_view
+        else:
+            frame, values = split_frame_stamp(values)
+        self.ram = RamSnapshot(self.ram_schema.layout, values, frame)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x update_step
+    * --------------------
+    * Description:
+    *	Applies an OP_STEP reply: the step summary sets step_result and the
+        rest of the reply replaces the RAM snapshot
+    *
+    * Arguments:   The step reply bytes
+    * Returns:     none
+    '''
+    def update_step(self, reply:bytes):
+        self.step_result, values = decode_step_summary(reply, self.step_watches)
+        self.update_ram(values, self.ring_flags() != 0)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x set_step_watches
+    * --------------------
+    * Description:
+    *	Stores the step watches and sends them to the Lua server if it is
+        already connected; otherwise they are sent on connect
+    *
+    * Arguments:   The step watches
+    * Returns:     none
+    '''
+    def set_step_watches(self, watches:list[StepWatch]):
+        super().set_step_watches(watches)
+        if self.connection.binary:
+            self.connection.request(OP_STEP_WATCH, encode_watches(self.step_watches))
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x set_screen_mode
+    * --------------------
+    * Description:
+    *	Stores the screen mode and rebuilds the grayscale converter for it
+    *
+    * Arguments:   The screen mode, or None if no screenshots are taken
+    * Returns:     none
+    '''
+    def set_screen_mode(self, mode:ScreenMode | None):
+        super().set_screen_mode(mode)
+        if mode is not None:
+            self.grayscale = GrayscaleConverter(mode)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x ring_flags
+    * --------------------
+    * Description:
+    *	Builds the ring flags of a step or memory request. The frame is only
+        written into the shared ring slot while screenshots are taken, so
+        steps without a screen mode skip the emulator's screenshot.
+    *
+    * Arguments:   none
+    * Returns:     The flags byte
+    '''
+    def ring_flags(self) -> int:
+        return RING_FRAME if self.screen_mode is not None else 0
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x set_ram_schema
+    * --------------------
+    * Description:
+    *	Stores the RAM schema and sends it to the Lua server if it is already
+        connected; otherwise it is sent on connect. The shared ring slots
+        are sized for the schema, so an open ring is replaced. A push
+        stream keeps the schema it was created with and must already match.
+    *
+    * Arguments:   The RAM schema
+    * Returns:     none
+    '''
+    def set_ram_schema(self, ram_schema:RamSchema):
+        if self.ram_stream is not None and self.ram_stream.ram_schema.byte_addresses != ram_schema.byte_addresses:
+            raise ValueError("The RAM stream was created with a different RAM schema")
+        super().set_ram_schema(ram_schema)
+        if not self.is_ready:
+            return
+        if self.connection.binary:
+            self.connection.request(OP_SCHEMA, self.ram_schema.encode())
+        else:
+            self.send_command(f"schema; {self.ram_schema.text()}")
+        if self.ring is not None:
+            self.ram_view, self.ring_frame = None, None
+            self.ring.close()
+            self.ring = FrameRing(self.shared_ring, ram_size=self.ram_schema.size, frame_format=FORMAT_GD)
+            self.connection.request(OP_RING_OPEN, self.ring.path.encode())
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x chain_ram_update
+    * --------------------
+    * Description:
+    *	Wraps a pipelined reply future so that the RAM mapping is updated
+        before the returned future resolves
+    *
+    * Arguments:   The future of the raw memory value reply, and the function
+                   that applies it (update_ram by default)
+    * Returns:     A future that resolves to None once the RAM mapping is updated
+    '''
+    def chain_ram_update(self, reply:Future, update:Callable[[bytes], None] | None = None) -> Future:
+        update = update or self.update_ram
+        future = Future()
+        def on_reply(done:Future):
+            if done.exception() is not None:
+                future.set_exception(done.exception())
+                return
+            update(done.result())
+            future.set_result(None)
+        reply.add_done_callback(on_reply)
+        return future
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x read_ranges
+    * --------------------
+    * Description:
+    *	Reads whole RAM regions from the emulator in one request. The Lua
+        server reads each region with a single range read, so hundreds of
+        bytes (e.g. the sprite tables) cost one round trip. The text protocol
+        replies with the bytes as one hex string.
+    *
+    * Arguments:   The regions as (address, length) pairs
+    * Returns:     One read-only uint8 array per region, sliced from a single buffer
+    '''
+    def read_ranges(self, ranges:list[tuple[int, int]]) -> list[np.ndarray]:
+        if self.connection.binary:
+            return split_ranges(self.connection.request(OP_READ_RANGE, encode_ranges(ranges)), ranges)
+        reply = self.send_command("read_range; " + ",".join(f"{address:06X}:{length}" for address, length in ranges))
+        return split_ranges(bytes.fromhex(reply), ranges)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SNES9x server_profile
+    * --------------------
+    * Description:
+    *	Turns the Lua server's per-opcode timing on or off and collects the
+        timings since the last call. The text protocol has no timing.
+    *
+    * Arguments:   Whether the server should keep timing
+    * Returns:     A dictionary of (count, total ns) per opcode name
+    '''
+    def server_profile(self, enable:bool = True) -> dict[str, tuple[int, int]]:
+        if not self.connection.binary:
+            return {}
+        reply = self.connection.request(OP_PROFILE, bytes([int(enable)]))
+        return {OPCODE_NAMES.get(opcode, str(opcode)): (count, total_us * 1000)
+                for opcode, count, total_us in PROFILE_ENTRY.iter_unpack(reply)}
+
     '''
     ------------------------------------------------------------------------------
     * Function: SNES9x readu16
@@ -426,11 +929,7 @@ class SNES9x(WrapperInterface):
     * Returns:     none
     '''
     def readu16(self, address):
-        #Read the upper and lower bytes
-        lower = np.uint16(self.readu8(address))
-        upper = np.uint16(self.readu8(address + 1))
-        return (upper << 8) | lower
-        #Aquire the ram_map lock
+        return self.ram.u16(address)
 
     '''
     ------------------------------------------------------------------------------
@@ -445,11 +944,7 @@ class SNES9x(WrapperInterface):
     * Returns:     none
     '''
     def readu8(self, address: int) -> np.int8:
-        with self.ram_mutex:
-            if(address in self.ram_map.keys()):
-                return np.uint8(self.ram_map[address])
-            else:
-                return np.uint8(0)
+        return self.ram.u8(address)
 
     '''
     ------------------------------------------------------------------------------
@@ -466,7 +961,7 @@ class SNES9x(WrapperInterface):
     def refocus_game(self):
         if self.disable_keys:
             return
-        windows = gw.getWindowsWithTitle(WINDOW_TITLE)
+        windows = self.find_windows(WINDOW_TITLE)
         if not windows:
             raise RuntimeError(f"No window found with title containing '{WINDOW_TITLE}'")
         win = windows[0]
@@ -487,6 +982,6 @@ class SNES9x(WrapperInterface):
     * Returns:     none
     '''
     def wait_for_windows(self, name:str):
-        while len(gw.getWindowsWithTitle(name)) == 0:
+        while len(self.find_windows(name)) == 0:
             time.sleep(0.2)
-        print(f"Found {name}!")
\ No newline at end of file
+        logger.debug("Found %s!", name)
\ No newline at end of file
@@ -0,0 +1,82 @@
+'''
+******************************************************************************
+ * File:        ScreenMode.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program defines the screen observation modes: the part
+                of the SNES frame that is kept and the resolution it is
+                reduced to. Smaller observations shrink the rollout buffer
+                and the policy CNN. The mode is applied by the grayscale
+                converter while it decodes the raw framebuffer, by cropping
+                the channel views and averaging the luma over each output
+                pixel's area.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and is not intended for use on its own. Pass a mode name to
+                SmwEnvironment to select it.
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+
+# Size of the SNES frame every mode is cut from, as (height, width)
+FRAME_RESOLUTION = (224, 256)
+
+# Rows at the top of the frame taken by the status bar (lives, coins, time, score)
+STATUS_BAR_HEIGHT = 40
+
+# Crops of the whole frame, and of the playfield below the status bar
+FULL_CROP = (0, FRAME_RESOLUTION[0], 0, FRAME_RESOLUTION[1])
+PLAYFIELD_CROP = (STATUS_BAR_HEIGHT, FRAME_RESOLUTION[0], 0, FRAME_RESOLUTION[1])
+
+# The luma is summed in 16.16 fixed point in uint32, which bounds the pixels per output pixel
+MAX_AREA = 256
+
+'''
+------------------------------------------------------------------------------
+ * Class: ScreenMode
+ * --------------------
+ * Description:
+ *	Represents one observation mode: a (top, bottom, left, right) crop of the
+    frame and the (height, width) it is reduced to. Each output pixel is the
+    average of a block of cropped pixels. When the size does not divide the
+    crop evenly the blocks differ by at most one row or column. A mode whose
+    size equals its crop is not scaled.
+ '''
+class ScreenMode():
+    def __init__(self, name:str, size:tuple[int, int], crop:tuple[int, int, int, int] = FULL_CROP):
+        top, bottom, left, right = crop
+        crop_size = (bottom - top, right - left)
+        if not (0 < size[0] <= crop_size[0] and 0 < size[1] <= crop_size[1]):
+            raise ValueError(f"Screen mode {name} cannot reduce {crop_size} to {size}")
+        self.name = name
+        self.size = tuple(size)
+        self.crop = crop
+        self.crop_size = crop_size
+        self.scaled = self.size != crop_size
+
+        # First row and column of every output pixel's block, and the number of pixels in each block
+        self.row_edges = np.arange(size[0]) * crop_size[0] // size[0]
+        self.col_edges = np.arange(size[1]) * crop_size[1] // size[1]
+        rows = np.diff(self.row_edges, append=crop_size[0])
+        cols = np.diff(self.col_edges, append=crop_size[1])
+        self.area = np.outer(rows, cols).astype(np.uint32)
+        if self.area.max() > MAX_AREA:
+            raise ValueError(f"Screen mode {name} averages more than {MAX_AREA} pixels per output pixel")
+
+        # Index arrays that gather the k-th row (column) of every block; a block with
+        # fewer than k + 1 rows gathers the zero padding row just past the crop instead
+        self.row_taps = [np.where(k < rows, self.row_edges + k, crop_size[0]).astype(np.intp) for k in range(rows.max())]
+        self.col_taps = [np.where(k < cols, self.col_edges + k, crop_size[1]).astype(np.intp) for k in range(cols.max())]
+
+# The selectable modes; the playfield modes drop the status bar
+SCREEN_MODES = {mode.name: mode for mode in (
+    ScreenMode("full", FRAME_RESOLUTION),
+    ScreenMode("half", (112, 128)),
+    ScreenMode("84x84", (84, 84)),
+    ScreenMode("playfield", (FRAME_RESOLUTION[0] - STATUS_BAR_HEIGHT, FRAME_RESOLUTION[1]), PLAYFIELD_CROP),
+    ScreenMode("playfield_half", (92, 128), PLAYFIELD_CROP),
+    ScreenMode("playfield_84x84", (84, 84), PLAYFIELD_CROP),
+)}
@@ -0,0 +1,184 @@
+'''
+******************************************************************************
+ * File:        StepWatch.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program defines the step watches: memory values the
+                emulator checks after every frame of a step instead of only
+                after the last one. A stop watch ends the step early when
+                its condition holds (e.g. Mario died or reached the goal),
+                and a max watch keeps the largest value seen during the step
+                (e.g. Mario's X position). The emulator returns which
+                watches fired, the maxima, and the number of frames it ran
+                with the step reply, so a large frame skip does not miss
+                terminal events.
+ * Usage:       This program is automatically used by the GameWrapper class
+                and is not intended for use on its own.
+ ******************************************************************************
+ '''
+
+# Imports
+from typing import Callable
+from GameWrapper.wrappers.Protocol import MAX_STEP_WATCHES, STEP_WATCH, STEP_SUMMARY, U16, ProtocolError
+
+# Watch kinds; these must match lua_server.lua
+WATCH_EQUAL = 0
+WATCH_NOT_EQUAL = 1
+WATCH_MAX = 2
+
+'''
+------------------------------------------------------------------------------
+ * Class: StepWatch
+ * --------------------
+ * Description:
+ *	Represents one watched memory value: an unsigned 8 or 16-bit value at an
+    address, and either a stop condition (equal / not equal to value) or a
+    running maximum
+ '''
+class StepWatch():
+    def __init__(self, name:str, address:int, kind:int, value:int = 0, width:int = 1):
+        if width not in (1, 2):
+            raise ValueError(f"Step watch {name} has unsupported width {width}")
+        self.name = name
+        self.address = address
+        self.kind = kind
+        self.value = value
+        self.width = width
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: StepWatch fires
+    * --------------------
+    * Description:
+    *	Checks the stop condition against a value read from memory
+    *
+    * Arguments:   The current value
+    * Returns:     True if the step should stop
+    '''
+    def fires(self, value:int) -> bool:
+        if self.kind == WATCH_EQUAL:
+            return value == self.value
+        if self.kind == WATCH_NOT_EQUAL:
+            return value != self.value
+        return False
+
+'''
+------------------------------------------------------------------------------
+ * Class: StepResult
+ * --------------------
+ * Description:
+ *	Represents what the emulator saw during one step: the number of frames
+    it ran, the names of the stop watches that fired, and the maximum of
+    every max watch
+ '''
+class StepResult():
+    def __init__(self, frames:int, fired:set[str], maxima:dict[str, int]):
+        self.frames = frames
+        self.fired = fired
+        self.maxima = maxima
+
+'''
+------------------------------------------------------------------------------
+* Function: encode_watches / decode_watches
+* --------------------
+* Description:
+*	Packs the watches into an OP_STEP_WATCH payload, or unpacks one. Names
+    are not sent, so decoded watches are named by their index.
+*
+* Arguments:   The step watches, or the payload bytes
+* Returns:     The payload bytes, or the step watches
+'''
+def encode_watches(watches:list[StepWatch]) -> bytes:
+    if len(watches) > MAX_STEP_WATCHES:
+        raise ValueError(f"At most {MAX_STEP_WATCHES} step watches are supported")
+    return b"".join(STEP_WATCH.pack(watch.address, watch.width, watch.kind, watch.value) for watch in watches)
+
+def decode_watches(payload:bytes) -> list[StepWatch]:
+    return [StepWatch(str(i), address, kind, value, width)
+            for i, (address, width, kind, value) in enumerate(STEP_WATCH.iter_unpack(payload))]
+
+'''
+------------------------------------------------------------------------------
+* Function: decode_step_summary
+* --------------------
+* Description:
+*	Splits the step summary off the front of an OP_STEP reply. The summary
+    is the frame count and a bit mask of the stop watches that fired, then
+    one u16 per max watch in watch order.
+*
+* Arguments:   The step reply payload and the watches the emulator was given
+* Returns:     A tuple of the StepResult and the rest of the reply
+'''
+def decode_step_summary(payload:bytes, watches:list[StepWatch]) -> tuple[StepResult, memoryview]:
+    payload = memoryview(payload)
+    maxima_watches = [watch for watch in watches if watch.kind == WATCH_MAX]
+    size = STEP_SUMMARY.size + U16.size * len(maxima_watches)
+    if len(payload) < size:
+        raise ProtocolError("Step reply is missing its summary")
+    frames, mask = STEP_SUMMARY.unpack_from(payload)
+    fired = {watch.name for i, watch in enumerate(watches) if mask & (1 << i)}
+    maxima = {watch.name: U16.unpack_from(payload, STEP_SUMMARY.size + U16.size * i)[0]
+              for i, watch in enumerate(maxima_watches)}
+    return StepResult(frames, fired, maxima), payload[size:]
+
+'''
+------------------------------------------------------------------------------
+ * Class: StepTracker
+ * --------------------
+ * Description:
+ *	Evaluates the watches frame by frame for wrappers that run the frame
+    loop in Python (LibretroSnes, mock_lua_server.py), mirroring the loop in
+    lua_server.lua
+ '''
+class StepTracker():
+    def __init__(self, watches:list[StepWatch]):
+        self.watches = watches
+        self.frames = 0
+        self.mask = 0
+        self.maxima = [0] * len(watches)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: StepTracker update
+    * --------------------
+    * Description:
+    *	Records one completed frame and checks every watch
+    *
+    * Arguments:   A function that reads a byte of memory at an address
+    * Returns:     True if a stop watch fired and the step should end
+    '''
+    def update(self, readbyte:Callable[[int], int]) -> bool:
+        self.frames += 1
+        stop = False
+        for i, watch in enumerate(self.watches):
+            value = int(readbyte(watch.address))
+            if watch.width == 2:
+                value |= int(readbyte(watch.address + 1)) << 8
+            if watch.kind == WATCH_MAX:
+                self.maxima[i] = max(self.maxima[i], value)
+            elif watch.fires(value):
+                self.mask |= 1 << i
+                stop = True
+        return stop
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: StepTracker result / encode
+    * --------------------
+    * Description:
+    *	Returns the accumulated StepResult, or packs it as the step summary
+        sent in front of an OP_STEP reply
+    *
+    * Arguments:   none
+    * Returns:     The StepResult, or the summary bytes
+    '''
+    def result(self) -> StepResult:
+        fired = {watch.name for i, watch in enumerate(self.watches) if self.mask & (1 << i)}
+        maxima = {watch.name: self.maxima[i] for i, watch in enumerate(self.watches) if watch.kind == WATCH_MAX}
+        return StepResult(self.frames, fired, maxima)
+
+    def encode(self) -> bytes:
+        return STEP_SUMMARY.pack(self.frames, self.mask) + b"".join(
+            U16.pack(self.maxima[i]) for i, watch in enumerate(self.watches) if watch.kind == WATCH_MAX)
@@ -0,0 +1,153 @@
+'''
+******************************************************************************
+ * File:        TileMap.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program builds the tile-map observation: the Layer 1
+                Map16 tile numbers in a window of blocks around Mario, and
+                the position of every active sprite relative to Mario. The
+                level's tiles are cached per level in one NumPy grid. A
+                level screen is read, as one bulk range read of its low
+                bytes and one of its high bytes, only the first time the
+                window reaches it, so most steps read no level data at all.
+                Blocks the game changes inside a cached screen (e.g. a used
+                question block) keep their tile from when the screen was
+                read. The observation is a few hundred bytes instead of a
+                57 KB screenshot, which suits a small MLP policy. The level
+                number and sprite tables come from the RAM schema, which
+                must include TILE_MAP_SCHEMA (see RamSchema.py).
+ * Usage:       This program is automatically used by the SmwEnvironment
+                class and is not intended for use on its own. Only
+                horizontal levels are laid out this way.
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+from GameWrapper.wrappers.RamSnapshot import RamSnapshot
+
+# Map16 level data: the low and high byte of every Layer 1 block, one table each
+MAP16_LOW = 0x7EC800
+MAP16_HIGH = 0x7FC800
+
+# A horizontal level is a row of screens, each 16 blocks wide and 27 blocks tall, stored screen by screen and row by row
+SCREEN_COLUMNS = 16
+SCREEN_ROWS = 27
+SCREEN_SIZE = SCREEN_COLUMNS * SCREEN_ROWS
+LEVEL_SCREENS = 32
+BLOCK_SIZE = 16 # Pixels per block
+
+# Tile number used for blocks outside the level and blocks not read yet
+OUT_OF_LEVEL = 0xFFFF
+
+# Number of sprite slots, and the columns of the sprite observation
+SPRITE_SLOTS = 12
+SPRITE_COLUMNS = 4 # Status, sprite number, X and Y offset from Mario in pixels
+
+'''
+------------------------------------------------------------------------------
+ * Class: TileMap
+ * --------------------
+ * Description:
+ *	Represents the tile-map observation of one environment. tiles is the
+    cached Layer 1 tile grid of the current level (rows, columns) and
+    loaded flags the screens read into it; grid and sprites are the
+    preallocated observation arrays, overwritten by every update. changed
+    counts the cached tiles the last update read.
+ '''
+class TileMap():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: TileMap constructor
+    * --------------------
+    * Description:
+    *	Allocates the level cache and the observation arrays
+    *
+    * Arguments:   The game wrapper to read the level data through, and the
+                   (height, width) of the window in blocks
+    * Returns:     none
+    '''
+    def __init__(self, wrapper, size:tuple[int, int] = (14, 16)):
+        self.wrapper = wrapper
+        self.size = size
+        self.level = None
+        self.tiles = np.full((SCREEN_ROWS, LEVEL_SCREENS * SCREEN_COLUMNS), OUT_OF_LEVEL, dtype=np.uint16)
+        self.loaded = np.zeros(LEVEL_SCREENS, dtype=bool)
+        self.grid = np.full(size, OUT_OF_LEVEL, dtype=np.uint16)
+        self.sprites = np.zeros((SPRITE_SLOTS, SPRITE_COLUMNS), dtype=np.int16)
+        self.changed = 0
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: TileMap reset
+    * --------------------
+    * Description:
+    *	Drops the cached level so the next update starts from empty
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def reset(self):
+        self.level = None
+        self.tiles.fill(OUT_OF_LEVEL)
+        self.loaded.fill(False)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: TileMap update
+    * --------------------
+    * Description:
+    *	Reads the screens under the window around Mario that are not cached
+        yet and fills the observation arrays. Mario sits in the middle of
+        the window.
+    *
+    * Arguments:   This step's RAM snapshot
+    * Returns:     A tuple of the (height, width) uint16 tile grid and the
+                   (12, 4) int16 sprite table
+    '''
+    def update(self, ram:RamSnapshot) -> tuple[np.ndarray, np.ndarray]:
+        record = ram.record
+        if int(record["level"]) != self.level:
+            self.reset()
+            self.level = int(record["level"])
+
+        # Window of blocks around Mario, in level coordinates
+        mario_x, mario_y = int(record["x_pos"]), int(record["y_pos"])
+        height, width = self.size
+        top = (mario_y + BLOCK_SIZE) // BLOCK_SIZE - height // 2
+        left = mario_x // BLOCK_SIZE - width // 2
+        columns = self.tiles.shape[1]
+        first = min(max(left, 0), columns - 1) // SCREEN_COLUMNS
+        count = min(max(left + width - 1, 0), columns - 1) // SCREEN_COLUMNS - first + 1
+
+        # Read the screens under the window not cached yet, all in one round trip
+        missing = [screen for screen in range(first, first + count) if not self.loaded[screen]]
+        self.changed = len(missing) * SCREEN_SIZE
+        if missing:
+            ranges = [(table + screen * SCREEN_SIZE, SCREEN_SIZE) for screen in missing for table in (MAP16_LOW, MAP16_HIGH)]
+            data = self.wrapper.read_ranges(ranges)
+            for screen, low, high in zip(missing, data[0::2], data[1::2]):
+                tiles = (high.astype(np.uint16) << 8) | low
+                self.tiles[:, screen * SCREEN_COLUMNS:(screen + 1) * SCREEN_COLUMNS] = tiles.reshape(SCREEN_ROWS, SCREEN_COLUMNS)
+                self.loaded[screen] = True
+
+        # Copy the part of the window inside the level; the rest reads as OUT_OF_LEVEL
+        self.grid.fill(OUT_OF_LEVEL)
+        rows = slice(max(top, 0), min(top + height, SCREEN_ROWS))
+        cols = slice(max(left, 0), min(left + width, columns))
+        if rows.start < rows.stop and cols.start < cols.stop:
+            self.grid[rows.start - top:rows.stop - top, cols.start - left:cols.stop - left] = self.tiles[rows, cols]
+
+        # Sprite positions relative to Mario; empty slots are all zero
+        sprite_x = (record["sprite_x_high"].astype(np.int32) << 8) | record["sprite_x_low"]
+        sprite_y = (record["sprite_y_high"].astype(np.int32) << 8) | record["sprite_y_low"]
+        active = record["sprite_status"] != 0
+        self.sprites[:, 0] = record["sprite_status"]
+        self.sprites[:, 1] = record["sprite_number"]
+        self.sprites[:, 2] = np.clip(sprite_x - mario_x, -0x8000, 0x7FFF)
+        self.sprites[:, 3] = np.clip(sprite_y - mario_y, -0x8000, 0x7FFF)
+        self.sprites[~active] = 0
+        return self.grid, self.sprites
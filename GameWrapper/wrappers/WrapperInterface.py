@@ -14,21 +14,30 @@
  '''
 
 # Imports
+from concurrent.futures import Future
 import numpy as np
 from GameWrapper.button.Buttons import *
+from GameWrapper.wrappers.RamSnapshot import RamSnapshot
+from GameWrapper.wrappers.RamSchema import RAM_SCHEMA, RamSchema
+from GameWrapper.wrappers.StepWatch import StepResult, StepWatch
+from GameWrapper.wrappers.ScreenMode import SCREEN_MODES, ScreenMode
+from GameWrapper.wrappers.Log import get_logger
 
 # Constants
+# The RAM addresses come from the RAM schema (ram_schema.json)
 GAME_RESOLUTION = (224,256)
-X_ADDR = 0x7E00D1
-Y_ADDR = 0x7E00D3
-X_VEL = 0x7E007B
-Y_VEL = 0x7E007D
-ANIM_TRIGGER_STATE = 0x7E0071
-END_LVL_TIMER = 0x7E1493
+X_ADDR = RAM_SCHEMA["x_pos"].address
+Y_ADDR = RAM_SCHEMA["y_pos"].address
+X_VEL = RAM_SCHEMA["x_speed"].address
+Y_VEL = RAM_SCHEMA["y_speed"].address
+ANIM_TRIGGER_STATE = RAM_SCHEMA["anim_state"].address
+END_LVL_TIMER = RAM_SCHEMA["end_level_timer"].address
 PLAYER_PIECE = 28 # Will be 0 up until level is beat
 PLAYER_DEAD_VAL = 0x09
 PLAYER_HURT_VAL = 0x01
 
+logger = get_logger("wrapper")
+
 '''
 ------------------------------------------------------------------------------
  * Class: SNES9x
@@ -38,26 +47,32 @@ PLAYER_HURT_VAL = 0x01
     satisfied. Basic control functions are specified here.
  '''
 class WrapperInterface():
-    def __init__(self):
+    def __init__(self, ram_schema:RamSchema = RAM_SCHEMA):
         self.is_ready = False
+        self.ram_schema = ram_schema
+        self.ram = RamSnapshot(ram_schema.layout)
+        self.screen_frame = None
+        self.step_watches:list[StepWatch] = []
+        self.step_result:StepResult | None = None
+        self.screen_mode = SCREEN_MODES["full"]
 
     def launchEmulator(self):
         """
         Starts emulator (Does not launch the game)
         """
-        print("Launching Emulator!")
+        logger.debug("Launching Emulator!")
 
     def startGame(self):
         """
         Navigates the emulator to load the game and take the initial savestate. Sets up any lua scripts
         """
-        print("Starting Game!")
+        logger.debug("Starting Game!")
 
     def sendButtons(self, key_list:list[str]):
         """
         Sends the buttons to the emulator. Any button not pushed should be released
         """
-        print(f"Sending buttons {key_list}")
+        logger.debug("Sending buttons %s", key_list)
 
     def releaseAllButtons(self):
         self.sendButtons([])
@@ -66,35 +81,145 @@ class WrapperInterface():
         """
         Advances the emulator by n frames
         """
-        print(f"Advancing by 1 + {n-1} frames!")
+        logger.debug("Advancing by 1 + %s frames!", n-1)
+
+    def set_step_watches(self, watches:list[StepWatch]):
+        """
+        Sets the memory values checked after every frame of step_frames (see StepWatch.py)
+        """
+        self.step_watches = list(watches)
+
+    def set_screen_mode(self, mode:ScreenMode | None):
+        """
+        Sets the crop and resolution screenshot reduces the frame to (see ScreenMode.py).
+        None means no screenshots are taken, so wrappers may skip capturing frames
+        """
+        self.screen_mode = mode
+
+    def set_ram_schema(self, ram_schema:RamSchema):
+        """
+        Sets the memory values populate_mem reads (see RamSchema.py). The current snapshot is dropped
+        """
+        self.ram_schema = ram_schema
+        self.ram = RamSnapshot(ram_schema.layout)
+
+    def step_frames(self, key_list:list[str], n:int) -> None:
+        """
+        Holds the buttons for n frames and then refreshes the memory values.
+        Wrappers that can do this in a single emulator round trip should override it.
+        Wrappers that check the step watches every frame may stop early and set step_result;
+        otherwise step_result is None
+        """
+        self.step_result = None
+        self.sendButtons(key_list)
+        self.advance(n)
+        self.populate_mem()
+
+    def step_frames_async(self, key_list:list[str], n:int) -> Future:
+        """
+        Starts step_frames and returns a future that resolves once the memory values are updated.
+        Wrappers without a request pipeline complete the step before returning
+        """
+        future = Future()
+        self.step_frames(key_list, n)
+        future.set_result(None)
+        return future
 
     def loadState(self, state_name:str):
         """
         Make the emulator load some system state called state_name
         """
-        print(f"Loading save state {state_name}...")
+        logger.debug("Loading save state %s...", state_name)
 
     def saveState(self, state_name:str):
         """
         Make the emulator save the system state in a state called state_name
         """
-        print(f"Saving state to {state_name}...")
+        logger.debug("Saving state to %s...", state_name)
+
+    def snapshot(self) -> bytes:
+        """
+        Captures the current system state in memory and returns it as a bytes blob for restore.
+        Wrappers that cannot capture states this way raise NotImplementedError
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support in-memory snapshots")
+
+    def restore(self, state:bytes):
+        """
+        Restores a state returned by snapshot and advances one frame so it takes effect
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support in-memory snapshots")
 
-    def screenshot(self) -> np.array:
+    def release(self, state:bytes):
+        """
+        Frees anything the emulator holds for a snapshot that will not be restored again
+        """
+        return
+
+    def screenshot(self, out:np.ndarray | None = None) -> np.array:
         """
         Take a screenshot. (Convert to grayscale)
+        Returns a (1, height, width) uint8 array of the screen mode's size matching the screen observation.
+        If out is given the frame is written into it and out is returned.
+        Sets screen_frame to the emulator frame of the screenshot, or None if it is unknown
         """
-        print(f"Taking a screenshot!")
-        return np.zeros(shape=(*GAME_RESOLUTION,))
+        logger.debug("Taking a screenshot!")
+        if out is not None:
+            out.fill(0)
+            return out
+        return np.zeros(shape=(1, *self.screen_mode.size), dtype=np.uint8)
 
     def populate_mem(self) -> None:
-        print(f"Populating memory")
+        logger.debug("Populating memory")
         return
 
+    def populate_mem_async(self) -> Future:
+        """
+        Starts populate_mem and returns a future that resolves once the memory values are updated
+        """
+        future = Future()
+        self.populate_mem()
+        future.set_result(None)
+        return future
+
+    def ram_snapshot(self) -> RamSnapshot:
+        """
+        Returns the immutable RAM snapshot taken by the last populate_mem (or step).
+        Its record attribute holds the schema fields by name, and its frame attribute
+        the emulator frame the values were read on (None if unknown)
+        """
+        return self.ram
+
+    def read_ranges(self, ranges:list[tuple[int, int]]) -> list[np.ndarray]:
+        """
+        Reads whole RAM regions, given as (address, length) pairs, from the emulator in one transfer.
+        Returns one read-only uint8 array per region, sliced from a single buffer
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support RAM range reads")
+
+    def read_range(self, address:int, length:int) -> np.ndarray:
+        """
+        Reads a single RAM region from the emulator; see read_ranges
+        """
+        return self.read_ranges([(address, length)])[0]
+
+    def server_profile(self, enable:bool = True) -> dict[str, tuple[int, int]]:
+        """
+        Turns the emulator server's own timing on or off and returns its (count, total ns) per
+        opcode name since the last call. Wrappers without a server return an empty dictionary
+        """
+        return {}
+
+    def close(self):
+        """
+        Stops the emulator and frees its connection. The wrapper cannot be used afterwards
+        """
+        logger.debug("Closing the wrapper")
+
     def readu16(self, address:int) -> np.uint16:
-        print(f"Reading 16 bits from address {hex(address)}")
+        logger.debug("Reading 16 bits from address %#x", address)
         return np.uint16(0)
 
     def readu8(self, address:int) -> np.uint8:
-        print(f"Reading 8 bits from address {hex(address)}")
+        logger.debug("Reading 8 bits from address %#x", address)
         return np.uint8(0)
@@ -8,20 +8,38 @@
  * Description: Initializes the SmwEnvironment gymnasium game environment, SAC
                 algorithm, and performs training for 500 steps. Uses a 
                 multi-layer perceptron policy, logs outputs to log files, and 
-                performs training using the CPU.
+                performs training using the CPU. Passing a number of
+                environments trains on that many emulator instances at once.
+                Passing a screen mode (e.g. half, playfield_84x84) trains on
+                smaller screen observations. Passing an action mode (box,
+                multi_binary, discrete) selects the action space. The log
+                level and the step log sampling come from SMW_LOG_LEVEL and
+                SMW_LOG_EVERY. Setting SMW_PROFILE=1 times the emulator calls
+                and logs the timings with the training statistics. Setting
+                SMW_SAVESTATE_POOL=1 starts episodes from progress
+                checkpoints captured during training (savestate_pool.py).
  * Usage:       Run this program in a Python 3.12.x or higher environment.
+                python Train.py [checkpoint_name] [number_of_environments]
+                    [screen_mode] [action_mode]
  ******************************************************************************
  '''
 
 # Import Stable Baselines 3 (SB3) checkpoint callbacks and A2C algorithm
 # Import the Game Wrapper and gynasium environments
-from stable_baselines3.common.callbacks import CheckpointCallback
+from stable_baselines3.common.callbacks import CheckpointCallback, CallbackList
 from stable_baselines3 import A2C
 from smw_environment import SmwEnvironment
+from smw_vec_env import make_smw_batched_vec_env
 from GameWrapper.wrappers.SNES9x import SNES9x
+from GameWrapper.wrappers.Log import configure_logging
+from profiler_callback import ProfilerCallback
 import sys
+import os
 from datetime import datetime
 
+# Log episode summaries, or step details with SMW_LOG_LEVEL=DEBUG, before any emulator starts
+configure_logging()
+
 # Generate the name of the current model using the current date-time
 checkpoint_name = datetime.now().strftime("rl_smw_A2c_")
 
@@ -29,6 +47,21 @@ checkpoint_name = datetime.now().strftime("rl_smw_A2c_")
 if len(sys.argv) >= 2:
     checkpoint_name = sys.argv[1]
 
+# Number of emulator instances to train on in parallel
+n_envs = int(sys.argv[2]) if len(sys.argv) >= 3 else 1
+
+# Crop and resolution of the screen observation; see GameWrapper/wrappers/ScreenMode.py
+screen_mode = sys.argv[3] if len(sys.argv) >= 4 else "full"
+
+# Action space of the model; see ACTION_MODES in smw_environment.py
+action_mode = sys.argv[4] if len(sys.argv) >= 5 else "box"
+
+# Time the emulator calls and log the timings; off unless SMW_PROFILE=1
+profile = os.getenv("SMW_PROFILE", "0") == "1"
+
+# Start episodes from checkpoints captured during training; off unless SMW_SAVESTATE_POOL=1
+savestate_pool = os.getenv("SMW_SAVESTATE_POOL", "0") == "1"
+
 # Save the model for each 1000 training steps performed in the models/ directory
 # Save the replay buffer and vector statistics for normalization of observations and rewards
 checkpoint_callback = CheckpointCallback(
@@ -39,6 +72,7 @@ checkpoint_callback = CheckpointCallback(
     save_vecnormalize=True,
 )
 print(f"Saving models to models/{checkpoint_name}")
+callback = CallbackList([checkpoint_callback, ProfilerCallback()]) if profile else checkpoint_callback
 
 '''
 ------------------------------------------------------------------------------
@@ -50,13 +84,21 @@ print(f"Saving models to models/{checkpoint_name}")
     enables dictionary observations for the screenshot and positional values,
     verbose stores the log outputs in files, cuda enables GPU accelerated
     training, enables tensorboard log statistic visualization, and preserves
-    the screenshot as raw pixel inputs. Trains the agent for 15,000 steps
+    the screenshot as raw pixel inputs. Trains the agent for 15,000 steps.
+    With more than one environment, every emulator is stepped from this
+    process by a batched vector environment.
 *
 * Arguments:   none
 * Returns:     none
 '''
 if "__main__" in __name__:
-    env = SmwEnvironment(SNES9x())
+    if n_envs > 1:
+        env = make_smw_batched_vec_env(n_envs, env_kwargs={"screen_mode": screen_mode, "profile": profile,
+                                                             "action_mode": action_mode,
+                                                             "savestate_pool": savestate_pool})
+    else:
+        env = SmwEnvironment(SNES9x(), screen_mode=screen_mode, profile=profile, action_mode=action_mode,
+                             savestate_pool=savestate_pool)
     model = A2C("MultiInputPolicy", 
                 env, 
                 verbose=1, 
@@ -65,4 +107,8 @@ if "__main__" in __name__:
                 policy_kwargs=dict(normalize_images=False))
     
     # Start training for 15,000 steps, log every 4 steps, save checkpoints
-    model.learn(total_timesteps=int(15000), log_interval=4, callback=checkpoint_callback)
\ No newline at end of file
+    # The emulators are stopped even if training fails
+    try:
+        model.learn(total_timesteps=int(15000), log_interval=4, callback=callback)
+    finally:
+        env.close()
\ No newline at end of file
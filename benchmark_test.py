@@ -0,0 +1,76 @@
+'''
+******************************************************************************
+ * File:        benchmark_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Runs benchmarks/benchmark.py for a few steps on the replay
+                backend and checks the JSON results it writes, that a
+                backend without its core is skipped, and that an error
+                while benchmarking fails the run instead of being recorded
+                as a skipped backend. Note that no emulator is
+                needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest benchmark_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import json
+import pytest
+from benchmarks.benchmark import main, STAGES
+from GameWrapper.wrappers.ReplayWrapper import ReplayWrapper
+
+# Arguments that keep a benchmark run short
+SHORT_RUN = ["--steps", "5", "--warmup", "2", "--resets", "2"]
+
+'''
+------------------------------------------------------------------------------
+* Function: test_replay_results
+* --------------------
+* Description:
+*	Benchmarks the replay backend and checks the keys of the results file.
+    The libretro backend has no core here and is recorded as skipped.
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_replay_results(tmp_path):
+    output = tmp_path / "results.json"
+    main(["--backends", "replay", "libretro", "--output", str(output)] + SHORT_RUN)
+    with open(output) as f:
+        results = json.load(f)
+    assert {"commit", "date", "python", "numpy", "platform", "config", "results"} <= results.keys()
+    assert results["config"]["steps"] == 5
+    result, skipped = results["results"]
+    assert skipped["backend"] == "libretro" and "skipped" in skipped
+    assert result.keys() == {"backend", "memory_bytes", "steps", "episodes", "steps_per_sec",
+                             "step_us", "reset_us", "stages_us"}
+    assert result["backend"] == "replay" and result["steps"] == 5 and result["steps_per_sec"] > 0
+    assert result["step_us"].keys() == {"mean", "p50", "p99", "max"}
+    assert list(result["stages_us"]) == STAGES
+
+'''
+------------------------------------------------------------------------------
+* Function: test_errors_fail_the_run
+* --------------------
+* Description:
+*	Checks that a bad backend setting and an error while stepping propagate
+    out of main instead of being written as skipped results
+*
+* Arguments:   The pytest temporary directory and monkeypatch fixture
+* Returns:     none
+'''
+def test_errors_fail_the_run(tmp_path, monkeypatch):
+    output = tmp_path / "results.json"
+    with pytest.raises(ValueError, match="--trace"):
+        main(["--backends", "trace", "--output", str(output)] + SHORT_RUN)
+
+    def step_frames(self, key_list:list[str], n:int):
+        raise RuntimeError("step failed")
+    monkeypatch.setattr(ReplayWrapper, "step_frames", step_frames)
+    with pytest.raises(RuntimeError, match="step failed"):
+        main(["--backends", "replay", "--output", str(output)] + SHORT_RUN)
+    assert not output.exists()
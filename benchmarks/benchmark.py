@@ -0,0 +1,372 @@
+'''
+******************************************************************************
+ * File:        benchmark.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program measures how fast SmwEnvironment runs on each
+                wrapper backend. For every backend it reports the steps per
+                second and the p50/p99 latency of env.step, the latency of
+                env.reset, and the memory one environment holds. A second
+                pass runs the same step one stage at a time to break it down
+                into sendButtons, advance, populate_mem, screenshot,
+                observation (frame stacking and the tile map), and reward
+                (finish_step). The results are written as JSON, stamped with
+                the git commit, so protocol and backend changes can be
+                compared across commits.
+ * Usage:       Run this program from the project root in a Python 3.12.x or
+                higher environment. The replay backends need no emulator; the
+                mock backend runs mock_lua_server.py in-process and needs the
+                SNES9x wrapper's imports; libretro needs a core and its
+                savestate. Backends whose modules, core, or files are missing
+                are recorded as skipped; any other error stops the run.
+                python benchmarks/benchmark.py [--backends replay mock]
+                    [--trace trace.npy] [--steps 2000] [--screen-mode full]
+                    [--action-mode box]
+                    [--output results.json] [--compare old_results.json]
+ ******************************************************************************
+ '''
+
+# Imports
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from time import perf_counter_ns
+import numpy as np
+
+# Run from the project root whether started as a script or as a module
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from smw_environment import SmwEnvironment, ACTION_MODES
+from GameWrapper.wrappers.ReplayWrapper import ReplayWrapper
+
+# Backends measured when none are given
+DEFAULT_BACKENDS = ["replay", "mock"]
+
+# Stages of the staged step pass, in order
+STAGES = ["sendButtons", "advance", "populate_mem", "screenshot", "observation", "reward"]
+
+# Chance each button is held in the benchmark actions; mostly running right so episodes progress
+BUTTON_CHANCE = {"A": 0.3, "B": 0.3, "r": 0.9, "l": 0.1}
+
+'''
+------------------------------------------------------------------------------
+* Function: make_backend
+* --------------------
+* Description:
+*	Builds and starts a wrapper backend by name
+*
+* Arguments:   The backend name (replay, trace, mock, libretro, snes9x) and
+               the parsed arguments
+* Returns:     A tuple of the wrapper and a function that shuts it down
+'''
+def make_backend(name:str, args:argparse.Namespace):
+    if name == "replay":
+        wrapper = ReplayWrapper(seed=args.seed, latency=args.latency, frame_time=args.frame_time)
+        return wrapper, lambda: None
+    if name == "trace":
+        if args.trace is None:
+            raise ValueError("the trace backend needs --trace")
+        wrapper = ReplayWrapper(args.trace, latency=args.latency, frame_time=args.frame_time)
+        return wrapper, lambda: None
+    if name == "mock":
+        from mock_lua_server import MockLuaServer
+        from GameWrapper.wrappers.SNES9x import SNES9x
+        server = MockLuaServer(port=0)
+        server.start()
+        wrapper = SNES9x(port=server.port)
+        wrapper.connect_lua_socket()
+        wrapper.is_ready = True
+        return wrapper, server.stop
+    if name == "libretro":
+        from GameWrapper.wrappers.LibretroSnes import LibretroSnes
+        wrapper = LibretroSnes()
+        wrapper.startGame()
+        return wrapper, wrapper.close
+    if name == "snes9x":
+        from GameWrapper.wrappers.SNES9x import SNES9x
+        return SNES9x(), lambda: None
+    raise ValueError(f"Unknown backend {name}")
+
+'''
+------------------------------------------------------------------------------
+* Function: summarize
+* --------------------
+* Description:
+*	Reduces nanosecond timings to microsecond statistics
+*
+* Arguments:   The timings in nanoseconds
+* Returns:     A dictionary of the mean, p50, p99, and max in microseconds
+'''
+def summarize(timings:np.ndarray) -> dict[str, float]:
+    if len(timings) == 0:
+        return {}
+    p50, p99 = np.percentile(timings, (50, 99)) / 1000
+    return {"mean": round(float(timings.mean()) / 1000, 2), "p50": round(float(p50), 2),
+            "p99": round(float(p99), 2), "max": round(float(timings.max()) / 1000, 2)}
+
+'''
+------------------------------------------------------------------------------
+* Function: make_actions
+* --------------------
+* Description:
+*	Draws the benchmark actions up front so drawing them is not timed and
+    every backend gets the same sequence. Button actions press each button
+    with its BUTTON_CHANCE; discrete actions are drawn uniformly from the
+    action table.
+*
+* Arguments:   The environment, the number of actions, and the random seed
+* Returns:     An (n, buttons) uint8 array of button actions, or an (n,)
+               array of discrete action indices
+'''
+def make_actions(env:SmwEnvironment, n:int, seed:int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    if env.action_mode == "discrete":
+        return rng.integers(0, env.action_space.n, n)
+    from GameWrapper.button.Buttons import BUTTONS
+    chances = np.array([BUTTON_CHANCE.get(button, 0.0) for button in BUTTONS] +
+                       [0.0] * (env.action_space.shape[0] - len(BUTTONS)))
+    return (rng.random((n, len(chances))) < chances).astype(np.uint8)
+
+'''
+------------------------------------------------------------------------------
+* Function: run_steps
+* --------------------
+* Description:
+*	Times env.step end to end, resetting whenever an episode ends. The
+    steps per second include those resets.
+*
+* Arguments:   The environment and the actions
+* Returns:     A tuple of the step timings in nanoseconds, the number of
+               episodes that ended, and the total wall time in seconds
+'''
+def run_steps(env:SmwEnvironment, actions:np.ndarray) -> tuple[np.ndarray, int, float]:
+    steps = np.empty(len(actions), dtype=np.int64)
+    episodes = 0
+    start = time.perf_counter()
+    for i, action in enumerate(actions):
+        begin = perf_counter_ns()
+        terminated = env.step(action)[2]
+        steps[i] = perf_counter_ns() - begin
+        if terminated:
+            episodes += 1
+            env.reset()
+    return steps, episodes, time.perf_counter() - start
+
+'''
+------------------------------------------------------------------------------
+* Function: run_resets
+* --------------------
+* Description:
+*	Times env.reset, taking one step before each reset so every reset
+    restores the starting state
+*
+* Arguments:   The environment, the number of resets, and an action to step with
+* Returns:     The reset timings in nanoseconds
+'''
+def run_resets(env:SmwEnvironment, n:int, action:np.ndarray) -> np.ndarray:
+    resets = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        env.step(action)
+        begin = perf_counter_ns()
+        env.reset()
+        resets[i] = perf_counter_ns() - begin
+    return resets
+
+'''
+------------------------------------------------------------------------------
+* Function: run_stages
+* --------------------
+* Description:
+*	Runs the same work as env.step one stage at a time and times each stage.
+    The buttons and the advance are separate requests here, so the stage
+    sum is larger than a step on wrappers that combine them in one round
+    trip.
+*
+* Arguments:   The environment and the actions
+* Returns:     A dictionary of the timings in nanoseconds per stage
+'''
+def run_stages(env:SmwEnvironment, actions:np.ndarray) -> dict[str, np.ndarray]:
+    wrapper = env.game_wrapper
+    timings = {stage: np.zeros(len(actions), dtype=np.int64) for stage in STAGES}
+    for i, action in enumerate(actions):
+        env.action = action
+        keys = env.action_to_buttons(action)
+        t0 = perf_counter_ns()
+        wrapper.sendButtons(keys)
+        t1 = perf_counter_ns()
+        wrapper.advance(env.frame_skip)
+        t2 = perf_counter_ns()
+        wrapper.populate_mem()
+        wrapper.step_result = None
+        t3 = perf_counter_ns()
+        screen = wrapper.screenshot(env.capture_buffer()) if env.screen_mode is not None else None
+        t4 = perf_counter_ns()
+        obs = env._get_obs(screen)
+        t5 = perf_counter_ns()
+        terminated = env.finish_step(obs)[2]
+        t6 = perf_counter_ns()
+        for stage, begin, end in zip(STAGES, (t0, t1, t2, t3, t4, t5), (t1, t2, t3, t4, t5, t6)):
+            timings[stage][i] = end - begin
+        if terminated:
+            env.reset()
+    if env.screen_mode is None:
+        del timings["screenshot"]
+    return timings
+
+'''
+------------------------------------------------------------------------------
+* Function: benchmark_backend
+* --------------------
+* Description:
+*	Builds one environment on a backend, measures the memory it holds after
+    a reset and a few warm-up steps, then times the step and stage passes.
+    A backend that cannot be built because a module or file is missing is
+    skipped; errors while stepping are raised so they fail the run.
+*
+* Arguments:   The backend name and the parsed arguments
+* Returns:     The backend's result dictionary
+'''
+def benchmark_backend(name:str, args:argparse.Namespace) -> dict:
+    result = {"backend": name}
+    tracemalloc.start()
+    try:
+        wrapper, close = make_backend(name, args)
+    except (ImportError, OSError, FileNotFoundError) as e:
+        tracemalloc.stop()
+        result["skipped"] = f"{type(e).__name__}: {e}"
+        return result
+    try:
+        env = SmwEnvironment(wrapper, frame_skip=args.frame_skip, n_stack=args.n_stack,
+                             screen_mode=None if args.screen_mode == "none" else args.screen_mode,
+                             tile_map=args.tile_map, action_mode=args.action_mode)
+        actions = make_actions(env, args.warmup + 2 * args.steps, args.seed)
+        env.reset()
+        for action in actions[:args.warmup]:
+            if env.step(action)[2]:
+                env.reset()
+        result["memory_bytes"] = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        steps, episodes, seconds = run_steps(env, actions[args.warmup:args.warmup + args.steps])
+        resets = run_resets(env, args.resets, actions[0])
+        stages = run_stages(env, actions[args.warmup + args.steps:])
+        result.update({"steps": args.steps,
+                       "episodes": episodes,
+                       "steps_per_sec": round(args.steps / seconds, 1),
+                       "step_us": summarize(steps),
+                       "reset_us": summarize(resets),
+                       "stages_us": {stage: summarize(timings) for stage, timings in stages.items()}})
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        close()
+    return result
+
+'''
+------------------------------------------------------------------------------
+* Function: git_commit
+* --------------------
+* Description:
+*	Gets the current git commit of the project, if it is a git checkout
+*
+* Arguments:   none
+* Returns:     The commit hash, or None
+'''
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+'''
+------------------------------------------------------------------------------
+* Function: print_results
+* --------------------
+* Description:
+*	Prints one line per backend, with the change in steps per second
+    against an earlier result file for the same backend if one is given
+*
+* Arguments:   The results dictionary and the optional earlier results dictionary
+* Returns:     none
+'''
+def print_results(results:dict, baseline:dict | None = None):
+    previous = {result["backend"]: result for result in (baseline or {}).get("results", [])}
+    old_commit = ((baseline or {}).get("commit") or "?")[:8]
+    for result in results["results"]:
+        if "skipped" in result:
+            print(f"{result['backend']:>9}: skipped ({result['skipped']})")
+            continue
+        line = (f"{result['backend']:>9}: {result['steps_per_sec']:9.1f} steps/s, "
+                f"step p50 {result['step_us']['p50']:.0f} us p99 {result['step_us']['p99']:.0f} us, "
+                f"reset p50 {result['reset_us']['p50']:.0f} us, {result['memory_bytes'] / 1e6:.1f} MB")
+        old = previous.get(result["backend"])
+        if old is not None and "steps_per_sec" in old:
+            line += f" ({result['steps_per_sec'] / old['steps_per_sec'] - 1:+.1%} vs {old_commit})"
+        print(line)
+        print(" " * 11 + ", ".join(f"{stage} {timings['p50']:.0f}" for stage, timings in result["stages_us"].items())
+              + " (p50 us)")
+
+'''
+------------------------------------------------------------------------------
+* Function: main
+* --------------------
+* Description:
+*	Parses the arguments, benchmarks every backend, and writes the JSON results
+*
+* Arguments:   The command line arguments; sys.argv by default
+* Returns:     none
+'''
+def main(argv:list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Benchmark SmwEnvironment on each wrapper backend")
+    parser.add_argument("--backends", nargs="+", default=DEFAULT_BACKENDS,
+                        help="replay, trace, mock, libretro, snes9x")
+    parser.add_argument("--trace", help="trace file for the trace backend (see ReplayWrapper.record_trace)")
+    parser.add_argument("--steps", type=int, default=2000, help="timed steps per pass")
+    parser.add_argument("--warmup", type=int, default=100, help="untimed steps before timing")
+    parser.add_argument("--resets", type=int, default=50, help="timed resets")
+    parser.add_argument("--frame-skip", type=int, default=4)
+    parser.add_argument("--screen-mode", default="full", help="a ScreenMode name, or none")
+    parser.add_argument("--n-stack", type=int, default=1)
+    parser.add_argument("--tile-map", action="store_true")
+    parser.add_argument("--action-mode", default="box", choices=ACTION_MODES)
+    parser.add_argument("--latency", type=float, default=0.0, help="replay seconds per request")
+    parser.add_argument("--frame-time", type=float, default=0.0, help="replay seconds per frame")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file; benchmarks/results/<commit>.json by default")
+    parser.add_argument("--compare", help="earlier results file to compare steps per second with")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    commit = git_commit()
+    results = {"commit": commit,
+               "date": datetime.now().isoformat(timespec="seconds"),
+               "python": platform.python_version(),
+               "numpy": np.__version__,
+               "platform": platform.platform(),
+               "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+               "results": [benchmark_backend(name, args) for name in args.backends]}
+
+    output = args.output or os.path.join(ROOT_DIR, "benchmarks", "results", f"{(commit or 'results')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_results(results, baseline)
+    print(f"Results written to {output}")
+
+# Executes starting at main when the program is executed
+if __name__ == '__main__':
+    main()
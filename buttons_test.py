@@ -0,0 +1,91 @@
+'''
+******************************************************************************
+ * File:        buttons_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the button masks in Buttons.py: packing and unpacking
+                held buttons, the lookup tables of all 256 masks, the
+                discrete actions, and that actions_to_masks converts a batch
+                of actions of every action mode to the same masks as one
+                action at a time. Note that no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest buttons_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+import pytest
+from GameWrapper.button.Buttons import *
+from smw_environment import ACTION_MODES, actions_to_masks
+
+'''
+------------------------------------------------------------------------------
+* Function: test_encode_decode
+* --------------------
+* Description:
+*	Checks that every mask round trips through its buttons, that the order
+    of the buttons does not matter, and that unknown characters are left out
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_encode_decode():
+    for mask in range(1 << len(BUTTONS)):
+        assert encode_buttons(decode_buttons(mask)) == mask
+        assert KEY_MASKS[MASK_KEYS[mask]] == mask
+    assert MASK_KEYS[0x81] == "Ar" and decode_buttons(0x81) == ["A", "r"]
+    assert encode_buttons("rA") == encode_buttons(["A", "r"]) == 0x81
+    assert encode_buttons(["S", "B", "T"]) == BUTTON_BITS["B"]
+    assert encode_buttons("") == 0
+
+'''
+------------------------------------------------------------------------------
+* Function: test_discrete_actions
+* --------------------
+* Description:
+*	Checks that the discrete actions are distinct and never hold opposite
+    directions
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_discrete_actions():
+    assert len(DISCRETE_ACTIONS) == len(DIRECTIONS) * (1 << len(FACE_BUTTONS)) == 144
+    assert len(set(DISCRETE_ACTIONS)) == len(DISCRETE_ACTIONS)
+    for mask in DISCRETE_ACTIONS:
+        keys = MASK_KEYS[mask]
+        assert not ("u" in keys and "d" in keys) and not ("l" in keys and "r" in keys)
+    assert DISCRETE_ACTIONS[0] == 0
+
+'''
+------------------------------------------------------------------------------
+* Function: test_actions_to_masks
+* --------------------
+* Description:
+*	Checks that a batch of actions converts to the same masks as each action
+    on its own, and that Box and MultiBinary actions pack the buttons in
+    BUTTONS order
+*
+* Arguments:   The action mode
+* Returns:     none
+'''
+@pytest.mark.parametrize("action_mode", ACTION_MODES)
+def test_actions_to_masks(action_mode:str):
+    rng = np.random.default_rng(0)
+    if action_mode == "discrete":
+        actions = rng.integers(0, len(DISCRETE_ACTIONS), (4, 16))
+        expected = np.array(DISCRETE_ACTIONS)[actions]
+    else:
+        actions = rng.integers(0, 2, (4, 16, len(BUTTONS)), dtype=np.uint8)
+        expected = np.array([[encode_buttons([button for button, held in zip(BUTTONS, action) if held])
+                              for action in row] for row in actions])
+        if action_mode == "box":
+            actions = np.where(actions, 0.75, 0.25).astype(np.float32)
+    masks = actions_to_masks(actions, action_mode)
+    assert masks.shape == (4, 16) and masks.dtype == np.uint8
+    assert np.array_equal(masks, expected)
+    assert actions_to_masks(actions[1, 2], action_mode) == expected[1, 2]
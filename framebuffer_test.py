@@ -0,0 +1,243 @@
+'''
+******************************************************************************
+ * File:        framebuffer_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the screen capture classes in Framebuffer.py on
+                generated frames: the grayscale conversion, with Pillow's
+                grayscale as the reference, the decoding of GD images, and
+                the frame stack's order, in-place captures, and max pooling.
+                The screen modes are checked against a block average of the
+                fixed point luma. Note that no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest framebuffer_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+import pytest
+from PIL import Image
+from GameWrapper.wrappers.Framebuffer import *
+from GameWrapper.wrappers.ScreenMode import FRAME_RESOLUTION, STATUS_BAR_HEIGHT
+
+'''
+------------------------------------------------------------------------------
+* Function: gd_image
+* --------------------
+* Description:
+*	Packs an RGB frame as a GD truecolor image like gui.gdscreenshot()
+*
+* Arguments:   A (height, width, 3) uint8 RGB frame
+* Returns:     The raw GD image bytes
+'''
+def gd_image(rgb:np.ndarray) -> bytes:
+    height, width, _ = rgb.shape
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    pixels[..., 1:] = rgb
+    return GD_HEADER.pack(GD_TRUECOLOR_SIGNATURE, width, height, 1, 0xFFFFFFFF) + pixels.tobytes()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_grayscale_matches_pillow
+* --------------------
+* Description:
+*	Checks the fixed point luma against Pillow's RGB to L conversion
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_grayscale_matches_pillow():
+    rgb = np.random.default_rng(0).integers(0, 256, (224, 256, 3), dtype=np.uint8)
+    gray = GrayscaleConverter().convert(rgb[..., 0], rgb[..., 1], rgb[..., 2])
+    assert gray.shape == (1, 224, 256) and gray.dtype == np.uint8
+    assert np.array_equal(gray[0], np.asarray(Image.fromarray(rgb).convert("L")))
+
+'''
+------------------------------------------------------------------------------
+* Function: test_convert_gd
+* --------------------
+* Description:
+*	Checks that a GD image decodes to the same frame as its channels, that
+    the frame can be written into a given array, and that a frame smaller
+    than the screen leaves the rest black
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_convert_gd():
+    rgb = np.random.default_rng(1).integers(0, 256, (224, 256, 3), dtype=np.uint8)
+    converter = GrayscaleConverter()
+    expected = converter.convert(rgb[..., 0], rgb[..., 1], rgb[..., 2]).copy()
+    out = np.empty((1, 224, 256), dtype=np.uint8)
+    assert converter.convert_gd(gd_image(rgb), out) is out
+    assert np.array_equal(out, expected)
+
+    small = converter.convert_gd(gd_image(rgb[:50, :100]))
+    assert np.array_equal(small[0, :50, :100], expected[0, :50, :100])
+    assert not small[0, 50:].any() and not small[0, :, 100:].any()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_convert_gd_rejects_palette_images
+* --------------------
+* Description:
+*	Checks that an image without the truecolor signature is rejected
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_convert_gd_rejects_palette_images():
+    with pytest.raises(ValueError):
+        GrayscaleConverter().convert_gd(GD_HEADER.pack(0xFFFF, 1, 1, 1, 0) + bytes(4))
+
+'''
+------------------------------------------------------------------------------
+* Function: test_frame_stack_order
+* --------------------
+* Description:
+*	Checks that the first push fills the stack, that frames are stacked
+    oldest first as the buffer wraps around, and that a reset refills it
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_frame_stack_order():
+    stack = FrameStack(3, resolution=(2, 2))
+    frames = [np.full((1, 2, 2), value, dtype=np.uint8) for value in range(1, 8)]
+    assert stack.push(frames[0])[:, 0, 0].tolist() == [1, 1, 1]
+    for count, frame in enumerate(frames[1:], 2):
+        obs = stack.push(frame)
+        assert obs.shape == (3, 2, 2)
+        assert obs[:, 0, 0].tolist() == [max(count - 2, 1), max(count - 1, 1), count]
+    stack.reset()
+    assert stack.push(frames[0])[:, 0, 0].tolist() == [1, 1, 1]
+    with pytest.raises(ValueError):
+        FrameStack(0)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_frame_stack_next_slot
+* --------------------
+* Description:
+*	Checks that a frame written into next_slot() is pushed without a copy
+    and that the observation is a view of the stack's buffer
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_frame_stack_next_slot():
+    stack = FrameStack(2, resolution=(2, 2))
+    for value in (5, 6):
+        slot = stack.next_slot()
+        slot.fill(value)
+        obs = stack.push(slot)
+    assert obs[:, 0, 0].tolist() == [5, 6]
+    assert np.shares_memory(obs, stack.frames) and np.shares_memory(slot, stack.frames)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_frame_stack_max_pool
+* --------------------
+* Description:
+*	Checks that each stacked frame is the pixelwise maximum of its capture
+    and the one before it, and that the first capture after a reset is not
+    pooled with the last episode's
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_frame_stack_max_pool():
+    stack = FrameStack(2, max_pool=True, resolution=(1, 2))
+    captures = [[9, 0], [0, 5], [1, 1], [0, 0]]
+    expected = [[[9, 0], [9, 0]], [[9, 0], [9, 5]], [[9, 5], [1, 5]], [[1, 5], [1, 1]]]
+    for capture, stacked in zip(captures, expected):
+        slot = stack.next_slot()
+        slot[0, 0] = capture
+        assert stack.push(slot)[:, 0].tolist() == stacked
+    stack.reset()
+    assert stack.push(np.array([[[2, 3]]], dtype=np.uint8))[:, 0].tolist() == [[2, 3], [2, 3]]
+
+'''
+------------------------------------------------------------------------------
+* Function: block_average
+* --------------------
+* Description:
+*	Crops an RGB frame to a screen mode and averages its 16.16 fixed point
+    luma over each output pixel's block, rounding half up
+*
+* Arguments:   A (height, width, 3) uint8 RGB frame and the screen mode
+* Returns:     The (height, width) uint8 reference frame
+'''
+def block_average(rgb:np.ndarray, mode:ScreenMode) -> np.ndarray:
+    top, bottom, left, right = mode.crop
+    rgb = rgb[top:bottom, left:right].astype(np.int64)
+    luma = rgb[..., 0] * int(LUMA_R) + rgb[..., 1] * int(LUMA_G) + rgb[..., 2] * int(LUMA_B)
+    sums = np.add.reduceat(np.add.reduceat(luma, mode.row_edges, axis=0), mode.col_edges, axis=1)
+    area = mode.area.astype(np.int64) << 16
+    return ((sums + area // 2) // area).astype(np.uint8)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_screen_modes
+* --------------------
+* Description:
+*	Checks every screen mode against the block average, and the unscaled
+    modes against Pillow's grayscale of the cropped frame
+*
+* Arguments:   The screen mode name
+* Returns:     none
+'''
+@pytest.mark.parametrize("name", list(SCREEN_MODES))
+def test_screen_modes(name:str):
+    mode = SCREEN_MODES[name]
+    rgb = np.random.default_rng(2).integers(0, 256, (*FRAME_RESOLUTION, 3), dtype=np.uint8)
+    gray = GrayscaleConverter(mode).convert(rgb[..., 0], rgb[..., 1], rgb[..., 2])
+    assert gray.shape == (1, *mode.size)
+    assert np.array_equal(gray[0], block_average(rgb, mode))
+    if not mode.scaled:
+        top, bottom, left, right = mode.crop
+        assert np.array_equal(gray[0], np.asarray(Image.fromarray(rgb[top:bottom, left:right]).convert("L")))
+
+'''
+------------------------------------------------------------------------------
+* Function: test_half_mode_averages_pairs
+* --------------------
+* Description:
+*	Checks the half modes against a plain 2x2 reshape mean of the full
+    grayscale, which can differ from it by one from rounding twice, and
+    that the playfield drops the status bar rows
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_half_mode_averages_pairs():
+    rgb = np.random.default_rng(3).integers(0, 256, (*FRAME_RESOLUTION, 3), dtype=np.uint8)
+    full = GrayscaleConverter().convert(rgb[..., 0], rgb[..., 1], rgb[..., 2])[0].astype(np.float64)
+    for name, rows in (("half", full), ("playfield_half", full[STATUS_BAR_HEIGHT:])):
+        half = GrayscaleConverter(SCREEN_MODES[name]).convert(rgb[..., 0], rgb[..., 1], rgb[..., 2])[0]
+        expected = rows.reshape(rows.shape[0] // 2, 2, -1, 2).mean(axis=(1, 3))
+        assert half.shape == expected.shape
+        assert np.abs(half - expected).max() <= 1
+
+'''
+------------------------------------------------------------------------------
+* Function: test_invalid_screen_modes
+* --------------------
+* Description:
+*	Checks that modes larger than their crop, empty modes, and modes that
+    average too many pixels are rejected
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_invalid_screen_modes():
+    with pytest.raises(ValueError):
+        ScreenMode("large", (FRAME_RESOLUTION[0] + 1, FRAME_RESOLUTION[1]))
+    with pytest.raises(ValueError):
+        ScreenMode("empty", (0, 84))
+    with pytest.raises(ValueError):
+        ScreenMode("tiny", (8, 8))
@@ -0,0 +1,119 @@
+'''
+******************************************************************************
+ * File:        launcher_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the emulator instance planning in Launcher.py: free
+                port allocation, skipping ports already in use above a base
+                port, the single-instance path, savestate slots for instances
+                sharing a directory, and the per-instance directory copies.
+                Note that no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest launcher_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import os
+import socket
+import pytest
+from GameWrapper.wrappers.Launcher import *
+
+'''
+------------------------------------------------------------------------------
+* Function: test_allocate_ports
+* --------------------
+* Description:
+*	Checks that the operating system picks distinct free ports when no
+    base port is given
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_allocate_ports():
+    ports = allocate_ports(4)
+    assert len(set(ports)) == 4
+    for port in ports:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(('127.0.0.1', port))
+
+'''
+------------------------------------------------------------------------------
+* Function: test_allocate_ports_skips_used
+* --------------------
+* Description:
+*	Checks that ports are searched upward from the base port and that a
+    port already in use is skipped
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_allocate_ports_skips_used():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as used:
+        used.bind(('127.0.0.1', 0))
+        base_port = used.getsockname()[1]
+        ports = allocate_ports(3, base_port=base_port)
+    assert base_port not in ports
+    assert ports == sorted(set(ports)) and ports[0] > base_port
+
+'''
+------------------------------------------------------------------------------
+* Function: test_plan_single_instance
+* --------------------
+* Description:
+*	Checks that a single instance uses the emulator directory itself and
+    the first savestate slot
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_plan_single_instance(tmp_path):
+    [instance] = plan_instances(1, source_dir=str(tmp_path))
+    assert (instance.index, instance.emulator_dir, instance.save_slot) == (0, str(tmp_path), 1)
+    assert instance.wrapper_kwargs() == {"port": instance.port, "emulator_dir": str(tmp_path), "save_slot": 1}
+
+'''
+------------------------------------------------------------------------------
+* Function: test_plan_shared_dir
+* --------------------
+* Description:
+*	Checks that instances sharing a directory each get their own port and
+    savestate slot, and that more instances than slots are rejected
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_plan_shared_dir(tmp_path):
+    instances = plan_instances(SAVE_SLOTS, source_dir=str(tmp_path), shared_dir=True)
+    assert [instance.save_slot for instance in instances] == list(range(1, SAVE_SLOTS + 1))
+    assert all(instance.emulator_dir == str(tmp_path) for instance in instances)
+    assert len({instance.port for instance in instances}) == SAVE_SLOTS
+    with pytest.raises(ValueError):
+        plan_instances(SAVE_SLOTS + 1, source_dir=str(tmp_path), shared_dir=True)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_prepare_instance_dir
+* --------------------
+* Description:
+*	Checks that an instance directory copies the emulator directory without
+    the screenshots and movies, creates those empty, and is reused
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_prepare_instance_dir(tmp_path):
+    source = tmp_path / "snes9x"
+    for directory in ("Saves", *SKIPPED_DIRS):
+        (source / directory).mkdir(parents=True)
+        (source / directory / "file").write_text(directory)
+    target = prepare_instance_dir(2, str(source), str(tmp_path / "instances"))
+    assert target == os.path.join(str(tmp_path / "instances"), "2", "snes9x")
+    assert os.listdir(os.path.join(target, "Saves")) == ["file"]
+    assert all(os.listdir(os.path.join(target, directory)) == [] for directory in SKIPPED_DIRS)
+    (source / "Saves" / "new").write_text("new")
+    assert prepare_instance_dir(2, str(source), str(tmp_path / "instances")) == target
+    assert os.listdir(os.path.join(target, "Saves")) == ["file"]
@@ -0,0 +1,89 @@
+'''
+******************************************************************************
+ * File:        libretro_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the parts of LibretroSnes.py that run without a core:
+                the 5 and 6 bit color channel scaling, the buttons reported
+                to the core's input callback, and the error startGame raises
+                when the core file is missing. Note that no emulator is
+                needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest libretro_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+import pytest
+from GameWrapper.wrappers.LibretroSnes import *
+
+'''
+------------------------------------------------------------------------------
+* Function: test_expand_bits
+* --------------------
+* Description:
+*	Checks that 5 and 6 bit channels keep black and full intensity at 0 and
+    255 and scale the values between them in order
+*
+* Arguments:   none
+* Returns:     none
+'''
+@pytest.mark.parametrize("bits", [5, 6])
+def test_expand_bits(bits):
+    top = (1 << bits) - 1
+    channel = np.arange(top + 1, dtype=np.uint16)
+    expanded = expand_bits(channel, bits)
+    assert expanded.dtype == np.uint8
+    assert expanded[0] == 0 and expanded[top] == 255
+    assert np.all(np.diff(expanded.astype(np.int16)) > 0)
+    assert expanded[top // 2 + 1] == (top // 2 + 1) << (8 - bits) | (top // 2 + 1) >> (2 * bits - 8)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_input_state
+* --------------------
+* Description:
+*	Checks that sendButtons holds exactly the joypad ids of its buttons,
+    that the input callback only reports them for the joypad on port 1,
+    and that advancing releases them
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_input_state():
+    wrapper = LibretroSnes(core_path="missing_core.so")
+    wrapper.sendButtons(["r", "B", "A"])
+    held = {key for key, button_id in JOYPAD_IDS.items()
+            if wrapper.input_state(0, RETRO_DEVICE_JOYPAD, 0, button_id)}
+    assert held == {"r", "B", "A"}
+    assert wrapper.input_state(1, RETRO_DEVICE_JOYPAD, 0, JOYPAD_IDS["B"]) == 0
+    assert wrapper.input_state(0, RETRO_DEVICE_JOYPAD + 1, 0, JOYPAD_IDS["B"]) == 0
+    assert wrapper.input_state(0, RETRO_DEVICE_JOYPAD, 0, len(JOYPAD_IDS)) == 0
+
+    # Any button not pushed is released, and unknown letters are ignored
+    wrapper.sendButtons(["l", "?"])
+    assert np.flatnonzero(wrapper.held_buttons).tolist() == [JOYPAD_IDS["l"]]
+    wrapper.advance(0)
+    assert not wrapper.held_buttons.any()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_missing_core
+* --------------------
+* Description:
+*	Checks that startGame fails with an OSError naming a missing core and
+    leaves no core marked as running in the process
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_missing_core(tmp_path):
+    wrapper = LibretroSnes(core_path=str(tmp_path / "snes9x_libretro.so"))
+    with pytest.raises(OSError, match="snes9x_libretro"):
+        wrapper.startGame()
+    assert LibretroSnes.active is None and wrapper.core is None and not wrapper.is_ready
+    wrapper.close()
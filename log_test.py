@@ -0,0 +1,134 @@
+'''
+******************************************************************************
+ * File:        log_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the logging setup in Log.py: which calls a LogSampler
+                lets through, that nothing is formatted while the level is
+                disabled, and that configure_logging checks the level and
+                shares its settings with the Lua servers through the
+                environment. Note that no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest log_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import logging
+import os
+import pytest
+import GameWrapper.wrappers.Log as Log
+from GameWrapper.wrappers.Log import *
+
+'''
+------------------------------------------------------------------------------
+ * Class: Unformattable
+ * --------------------
+ * Description:
+ *	Represents a log argument that fails the test if it is ever formatted
+ '''
+class Unformattable():
+    def __str__(self):
+        raise AssertionError("A disabled message was formatted")
+
+'''
+------------------------------------------------------------------------------
+* Function: smw_logger
+* --------------------
+* Description:
+*	Pytest fixture that restores the "smw" logger, the sampling interval,
+    and the logging environment variables after a test changes them
+*
+* Arguments:   The monkeypatch fixture
+* Returns:     The "smw" logger
+'''
+@pytest.fixture
+def smw_logger(monkeypatch):
+    handlers, level, propagate = list(logger.handlers), logger.level, logger.propagate
+    monkeypatch.delenv(LOG_LEVEL_ENV, raising=False)
+    monkeypatch.delenv(LOG_EVERY_ENV, raising=False)
+    monkeypatch.setattr(Log, "log_every", Log.log_every)
+    yield logger
+    get_logger("test").setLevel(logging.NOTSET)
+    logger.handlers[:] = handlers
+    logger.setLevel(level)
+    logger.propagate = propagate
+
+'''
+------------------------------------------------------------------------------
+* Function: test_sample_every
+* --------------------
+* Description:
+*	Checks that a sampler lets calls 1, N + 1, 2N + 1, ... through, with
+    its own interval or else the module's
+*
+* Arguments:   The smw_logger fixture
+* Returns:     none
+'''
+def test_sample_every(smw_logger):
+    test_logger = get_logger("test")
+    test_logger.setLevel(logging.DEBUG)
+    sampler = LogSampler(test_logger, every=3)
+    assert [sampler.sample() for _ in range(7)] == [True, False, False, True, False, False, True]
+
+    Log.log_every = 2
+    sampler = LogSampler(test_logger)
+    assert [sampler.sample() for _ in range(5)] == [True, False, True, False, True]
+    assert LogSampler(test_logger, every=1).sample()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_disabled_level
+* --------------------
+* Description:
+*	Checks that a sampler never lets a call through, and never formats its
+    arguments, while its level is disabled, and logs once it is enabled
+*
+* Arguments:   The smw_logger fixture and the pytest log capture fixture
+* Returns:     none
+'''
+def test_disabled_level(smw_logger, caplog):
+    test_logger = get_logger("test")
+    test_logger.setLevel(logging.INFO)
+    sampler = LogSampler(test_logger, every=1)
+    for _ in range(3):
+        assert not sampler.sample()
+        sampler.log("Step %s", Unformattable())
+
+    test_logger.setLevel(logging.DEBUG)
+    smw_logger.propagate = True
+    with caplog.at_level(logging.DEBUG, logger=test_logger.name):
+        sampler.log("Step %d", 4)
+    assert [record.getMessage() for record in caplog.records] == ["Step 4"]
+
+'''
+------------------------------------------------------------------------------
+* Function: test_configure_logging
+* --------------------
+* Description:
+*	Checks that unknown levels are rejected, that the level and interval
+    are written back to the environment, and that they are read from it
+    when not given
+*
+* Arguments:   The smw_logger fixture and the monkeypatch fixture
+* Returns:     none
+'''
+def test_configure_logging(smw_logger, monkeypatch):
+    with pytest.raises(ValueError, match="Unknown log level"):
+        configure_logging("verbose")
+    assert LOG_LEVEL_ENV not in os.environ
+
+    configure_logging("debug", 5)
+    assert os.environ[LOG_LEVEL_ENV] == "DEBUG" and os.environ[LOG_EVERY_ENV] == "5"
+    assert Log.log_every == 5 and smw_logger.level == logging.DEBUG
+    assert len(smw_logger.handlers) == 1 and not smw_logger.propagate
+
+    monkeypatch.setenv(LOG_LEVEL_ENV, "off")
+    monkeypatch.setenv(LOG_EVERY_ENV, "0")
+    configure_logging()
+    assert os.environ[LOG_LEVEL_ENV] == "OFF" and os.environ[LOG_EVERY_ENV] == "1"
+    assert Log.log_every == 1 and not smw_logger.isEnabledFor(logging.ERROR)
+    assert len(smw_logger.handlers) == 1
@@ -8,7 +8,12 @@
                 as a LuaSocket server. This is required for abstraction of
                 agent control. Once the server is active, memory values
                 are sent over TCP to SB3 in Python and inputs are received
-                from SB3 over the connection.
+                from SB3 over the connection. Clients may switch the
+                connection to a length-prefixed binary protocol (see
+                GameWrapper/wrappers/Protocol.py); otherwise the original
+                line-based text commands are used. Messages are logged at
+                the level in SMW_LOG_LEVEL, and per-step messages only every
+                SMW_LOG_EVERY steps, like GameWrapper/wrappers/Log.py.
  * Usage:       This program is automatically used by the SNES9x emulator
                 and is not intended for use on its own.
  ******************************************************************************
@@ -20,27 +25,103 @@ package.path = "C:/Program Files (x86)/Lua/5.1/lua/?.lua;" .. package.path
 package.cpath = "C:/Program Files (x86)/Lua/5.1/clibs/?.dll;C:/Program Files (x86)/Lua/5.1/clibs/?/core.dll;" .. package.cpath
 
 -- Specify the TCP values to make SNES9x a server
+-- The port can be set per emulator instance through the SMW_LUA_PORT environment variable
 local socket = require("socket")
 local host = "0.0.0.0"
-local port = 12345
+local port = tonumber(os.getenv("SMW_LUA_PORT")) or 12345
 local message_index = 1
 
+-- Binary protocol constants; these must match GameWrapper/wrappers/Protocol.py
+local PROTOCOL_VERSION = 6
+local HEADER_SIZE = 8
+local OP_PRESS = 0x01
+local OP_ADVANCE = 0x02
+local OP_LOAD_STATE = 0x03
+local OP_READ_MEM = 0x04
+local OP_WAIT = 0x05
+local OP_STEP = 0x06
+local OP_FRAME = 0x07
+local OP_RING_OPEN = 0x08
+local OP_SNAPSHOT = 0x09
+local OP_RESTORE = 0x0A
+local OP_RELEASE = 0x0B
+local OP_SCHEMA = 0x0C
+local OP_READ_RANGE = 0x0D
+local OP_STEP_WATCH = 0x10
+local OP_PROFILE = 0x11
+local OP_OK = 0x80
+local OP_ERROR = 0xFF
+
+-- Step watch kinds; these must match GameWrapper/wrappers/StepWatch.py
+local WATCH_EQUAL = 0
+local WATCH_NOT_EQUAL = 1
+local WATCH_MAX = 2
+
+-- Most byte values passed to string.char at once; Lua limits the number of call arguments
+local UNPACK_CHUNK = 4096
+
+-- Set to true once the client completes the binary handshake
+local binary_mode = false
+
+-- Memory-mapped ring buffer attached by OP_RING_OPEN; see GameWrapper/wrappers/RingBuffer.py
+-- While attached, RAM values and frames are written to the ring and only the write count is sent
+local RING_HEADER_SIZE = 64
+local RING_WRITE_COUNT_OFFSET = 32
+local RING_SLOT_HEADER_SIZE = 16
+local GD_HEADER_SIZE = 11
+local ring = nil
+
+-- Bit of the OP_STEP / OP_READ_MEM flags byte that asks for the frame to be written into the ring slot
+local RING_FRAME = 0x01
+
 -- Create a new stave state and release all buttons
-local slot1 = savestate.create(1)
+-- The slot can be set per emulator instance through the SMW_SAVE_SLOT environment variable
+local slot1 = savestate.create(tonumber(os.getenv("SMW_SAVE_SLOT")) or 1)
 local held_buttons = nil
 
--- Specify which RAM addresses to capture values from the emulator
--- These are sent over the TCP connection to SB3
-local ram_addresses = {
-    0x7E00D1, -- Mario's X position in the current level (Lower byte)
-	0x7E00D2, -- Mario's X position in the current level (Upper byte)
-    0x7E00D3, -- Mario's Y position in the current level (Lower byte)
-	0x7E00D4, -- Mario's Y position in the current level (Upper byte)
-	0x7E0071, -- Mario animation state flags
-	0x7E007B, -- Marios X speed (signed)
-	0x7E007D, -- Marios Y speed (signed)
-	0x7E1493, -- end of level timer
-}
+-- Joypad table of every OP_STEP button mask, one bit per button in the order of BUTTONS
+-- (GameWrapper/button/Buttons.py); built once, so a step only indexes it
+local MASK_BUTTON_NAMES = { "A", "B", "X", "Y", "up", "down", "left", "right" }
+local mask_buttons = {}
+for mask = 0, 255 do
+    local buttons = {}
+    for bit, name in ipairs(MASK_BUTTON_NAMES) do
+        if math.floor(mask / 2 ^ (bit - 1)) % 2 == 1 then
+            buttons[name] = true
+        end
+    end
+    mask_buttons[mask] = buttons
+end
+
+-- In-memory savestates taken by OP_SNAPSHOT, keyed by the id sent back to Python
+local snapshots = {}
+local next_snapshot = 1
+
+-- RAM regions to capture values from, as {address, length} runs of consecutive bytes
+-- Python sends the RAM schema (GameWrapper/wrappers/ram_schema.json) when it connects,
+-- so nothing is captured until then
+local ram_ranges = {}
+local ram_size = 0
+
+-- Memory values checked after every frame of OP_STEP, set by OP_STEP_WATCH
+-- A stop watch ends the step early; a max watch reports the largest value seen
+local step_watches = {}
+
+-- Time spent handling each opcode, while OP_PROFILE has turned profiling on
+-- Counted from receiving the request to sending the reply, so Python can subtract it from the round trip
+local profiling = false
+local profile_counts = {}
+local profile_totals = {}
+
+-- Log levels; these match GameWrapper/wrappers/Log.py, which passes SMW_LOG_LEVEL and SMW_LOG_EVERY to the emulator
+-- Per-step messages are sampled debug messages, so the default level only logs connection and state changes
+local LOG_LEVELS = { DEBUG = 10, INFO = 20, WARNING = 30, ERROR = 40, OFF = 50 }
+local LOG_DEBUG = LOG_LEVELS.DEBUG
+local LOG_INFO = LOG_LEVELS.INFO
+local LOG_WARNING = LOG_LEVELS.WARNING
+local log_level = LOG_LEVELS[string.upper(os.getenv("SMW_LOG_LEVEL") or "INFO")] or LOG_INFO
+local log_every = math.max(tonumber(os.getenv("SMW_LOG_EVERY")) or 100, 1)
+local log_counts = {}
 
 -- This variable is used for debugging the lua script functionality only
 -- It simulates (stubs) a list of TCP messages the Lua script would hear over TCP
@@ -61,6 +142,635 @@ local messages = {
     "load_save;"
 }
 
+--[[------------------------------------------------------------------------------
+* Function: u16_bytes / u32_bytes / read_u16 / read_u32
+* --------------------
+* Description:
+*	Little endian integer packing helpers for the binary protocol. Lua 5.1 has
+    no string.pack, so the bytes are assembled by hand.
+*
+* Arguments:   The integer to pack, or the string and 1-based offset to read from
+* Returns:     The packed string, or the unpacked integer
+]]
+local function u16_bytes(n)
+    return string.char(n % 256, math.floor(n / 256) % 256)
+end
+
+local function u32_bytes(n)
+    return string.char(n % 256, math.floor(n / 256) % 256, math.floor(n / 65536) % 256, math.floor(n / 16777216) % 256)
+end
+
+local function read_u16(s, i)
+    local b0, b1 = s:byte(i, i + 1)
+    return b0 + b1 * 256
+end
+
+local function read_u32(s, i)
+    local b0, b1, b2, b3 = s:byte(i, i + 3)
+    return b0 + b1 * 256 + b2 * 65536 + b3 * 16777216
+end
+
+--[[------------------------------------------------------------------------------
+* Function: log / log_sampled
+* --------------------
+* Description:
+*	Prints a message to the Lua window if its level is enabled. The message is
+    only formatted when it is printed. log_sampled prints the first of every
+    log_every calls with the same format string.
+*
+* Arguments:   The log level, the string.format format, and its arguments
+* Returns:     none
+]]
+local function log(level, fmt, ...)
+    if level >= log_level then
+        print(string.format(fmt, ...))
+    end
+end
+
+local function log_sampled(level, fmt, ...)
+    if level < log_level then
+        return
+    end
+    local count = (log_counts[fmt] or 0) + 1
+    log_counts[fmt] = count
+    if (count - 1) % log_every == 0 then
+        print(string.format(fmt, ...))
+    end
+end
+
+--[[------------------------------------------------------------------------------
+* Function: send_message
+* --------------------
+* Description:
+*	Sends a binary protocol message: the 8 byte header followed by the payload
+*
+* Arguments:   The socket object representing the client (SB3), the reply opcode,
+               the sequence number of the request, and the payload string
+* Returns:     none
+]]
+local function send_message(client, opcode, seq, payload)
+    client:send(string.char(PROTOCOL_VERSION, opcode) .. u16_bytes(seq) .. u32_bytes(#payload) .. payload)
+end
+
+--[[------------------------------------------------------------------------------
+* Function: press_buttons
+* --------------------
+* Description:
+*	Sets the buttons to hold during the next frame advance from a string of
+    button characters (e.g. "Ar" holds A and right)
+*
+* Arguments:   The string of button characters
+* Returns:     none
+]]
+local function press_buttons(keys)
+
+    -- Reset the buttons being held
+    held_buttons = {}
+
+    -- For each command (c), set the corresponding button to hold to True
+    for c in keys:gmatch(".") do
+        if c == "A" then held_buttons.A = true
+        elseif c == "B" then held_buttons.B = true
+        elseif c == "X" then held_buttons.X = true
+        elseif c == "Y" then held_buttons.Y = true
+        elseif c == "L" then held_buttons.L = true
+        elseif c == "R" then held_buttons.R = true
+        elseif c == "u" then held_buttons.up = true
+        elseif c == "d" then held_buttons.down = true
+        elseif c == "l" then held_buttons.left = true
+        elseif c == "r" then held_buttons.right = true
+        elseif c == "S" then held_buttons.start = true
+        elseif c == "s" then held_buttons.select = true
+        end
+    end
+
+    -- Set all of the held buttons in the actual joypad interface
+    joypad.set(1, held_buttons)
+end
+
+--[[------------------------------------------------------------------------------
+* Function: press_mask
+* --------------------
+* Description:
+*	Sets the buttons to hold during the next frame advance from a button mask
+    (e.g. 0x81 holds A and right)
+*
+* Arguments:   The button mask (0 - 255)
+* Returns:     none
+]]
+local function press_mask(mask)
+    held_buttons = mask_buttons[mask]
+    joypad.set(1, held_buttons)
+end
+
+--[[------------------------------------------------------------------------------
+* Function: advance_frames
+* --------------------
+* Description:
+*	Advances n frames while holding the buttons set by press_buttons, then
+    releases them for the next step
+*
+* Arguments:   The number of frames to advance
+* Returns:     none
+]]
+local function advance_frames(n)
+
+    -- For each fram to advance by in 'n' (the number of advances)
+    -- Check which buttons are held, set the joypad to be holding those buttons
+    -- Then while holding those buttons, advance n frames
+    for i = 1, n do
+        if held_buttons then
+            joypad.set(1, held_buttons)
+        end
+        emu.frameadvance()
+    end
+
+    -- Unhold all buttons for othe next step
+    held_buttons = nil
+end
+
+--[[------------------------------------------------------------------------------
+* Function: set_step_watches
+* --------------------
+* Description:
+*	Replaces the step watches with the entries of an OP_STEP_WATCH payload of
+    (address u32, width u8, kind u8, value u16) entries
+*
+* Arguments:   The watch payload
+* Returns:     none
+]]
+local function set_step_watches(payload)
+    local watches = {}
+    for i = 1, #payload - 7, 8 do
+        table.insert(watches, {
+            address = read_u32(payload, i),
+            width = payload:byte(i + 4),
+            kind = payload:byte(i + 5),
+            value = read_u16(payload, i + 6),
+        })
+    end
+    step_watches = watches
+end
+
+--[[------------------------------------------------------------------------------
+* Function: step_frames
+* --------------------
+* Description:
+*	Advances up to n frames while holding the buttons set by press_buttons,
+    checking every step watch after each frame. The loop stops after the
+    frame on which a stop watch fires, so a death or the goal is never
+    skipped over. The buttons are released for the next step.
+*
+* Arguments:   The maximum number of frames to advance
+* Returns:     The step summary: frames run (u16), fired stop watch mask (u16),
+               and one u16 per max watch
+]]
+local function step_frames(n)
+    local frames, mask = 0, 0
+    local maxima = {}
+    for i = 1, #step_watches do
+        maxima[i] = 0
+    end
+
+    for f = 1, n do
+        if held_buttons then
+            joypad.set(1, held_buttons)
+        end
+        emu.frameadvance()
+        frames = f
+
+        -- Check every watch against this frame's memory
+        local stop = false
+        for i, watch in ipairs(step_watches) do
+            local value = memory.readbyte(watch.address)
+            if watch.width == 2 then
+                value = value + memory.readbyte(watch.address + 1) * 256
+            end
+            if watch.kind == WATCH_MAX then
+                maxima[i] = math.max(maxima[i], value)
+            elseif (watch.kind == WATCH_EQUAL and value == watch.value)
+                or (watch.kind == WATCH_NOT_EQUAL and value ~= watch.value) then
+                mask = mask + 2 ^ (i - 1)
+                stop = true
+            end
+        end
+        if stop then
+            break
+        end
+    end
+
+    -- Unhold all buttons for othe next step
+    held_buttons = nil
+
+    local summary = { u16_bytes(frames), u16_bytes(mask) }
+    for i, watch in ipairs(step_watches) do
+        if watch.kind == WATCH_MAX then
+            table.insert(summary, u16_bytes(maxima[i]))
+        end
+    end
+    return table.concat(summary)
+end
+
+--[[------------------------------------------------------------------------------
+* Function: load_save
+* --------------------
+* Description:
+*	Loads the save state in slot 1 and advances one frame so it takes effect
+*
+* Arguments:   none
+* Returns:     none
+]]
+local function load_save()
+    savestate.load(slot1)
+    emu.frameadvance()
+end
+
+--[[------------------------------------------------------------------------------
+* Function: take_snapshot / restore_snapshot / release_snapshot
+* --------------------
+* Description:
+*	Saves the current state into a new anonymous savestate, loads one (and
+    advances one frame so it takes effect, like load_save), or forgets one
+*
+* Arguments:   The snapshot id for restore_snapshot and release_snapshot
+* Returns:     The new id for take_snapshot; an error string if restore_snapshot
+               is given an unknown id
+]]
+local function take_snapshot()
+    local state = savestate.create()
+    savestate.save(state)
+    local id = next_snapshot
+    next_snapshot = next_snapshot + 1
+    snapshots[id] = state
+    return id
+end
+
+local function restore_snapshot(id)
+    local state = snapshots[id]
+    if not state then
+        return "Unknown snapshot " .. id
+    end
+    savestate.load(state)
+    emu.frameadvance()
+end
+
+local function release_snapshot(id)
+    snapshots[id] = nil
+end
+
+--[[------------------------------------------------------------------------------
+* Function: add_range
+* --------------------
+* Description:
+*	Appends a region to a range list, extending the last run instead when
+    the region starts right where it ends
+*
+* Arguments:   The range list, the region address, and its length in bytes
+* Returns:     none
+]]
+local function add_range(ranges, address, length)
+    local last = ranges[#ranges]
+    if last and last[1] + last[2] == address then
+        last[2] = last[2] + length
+    else
+        table.insert(ranges, { address, length })
+    end
+end
+
+--[[------------------------------------------------------------------------------
+* Function: table_to_bytes
+* --------------------
+* Description:
+*	Packs a table of byte values, as returned by snes9x-rr's
+    memory.readbyterange, into a raw byte string. The values are unpacked
+    in chunks so no call passes more arguments than Lua allows.
+*
+* Arguments:   The table of byte values and the number of values
+* Returns:     The raw byte string
+]]
+local function table_to_bytes(values, length)
+
+    -- The table starts at index 1, or at 0 on builds that number it from the address offset
+    local first = values[0] ~= nil and 0 or 1
+    local parts = {}
+    for i = first, first + length - 1, UNPACK_CHUNK do
+        parts[#parts + 1] = string.char(unpack(values, i, math.min(i + UNPACK_CHUNK - 1, first + length - 1)))
+    end
+    return table.concat(parts)
+end
+
+--[[------------------------------------------------------------------------------
+* Function: read_range
+* --------------------
+* Description:
+*	Reads a contiguous region of memory as a raw byte string. Uses
+    memory.readbyterange when the emulator provides it, so the whole region
+    is copied in one call instead of one memory.readbyte per address.
+    snes9x-rr returns a table of byte values, which is packed into a string.
+*
+* Arguments:   The region address and its length in bytes
+* Returns:     The raw bytes of the region
+]]
+local function read_range(address, length)
+    if memory.readbyterange then
+        local result = memory.readbyterange(address, length)
+        if type(result) == "table" then
+            return table_to_bytes(result, length)
+        end
+        return result
+    end
+    local values = {}
+    for i = 1, length do
+        values[i] = string.char(memory.readbyte(address + i - 1))
+    end
+    return table.concat(values)
+end
+
+--[[------------------------------------------------------------------------------
+* Function: set_schema / set_schema_text
+* --------------------
+* Description:
+*	Replaces the watched RAM with the fields of a schema sent by Python,
+    either as an OP_SCHEMA payload of (address u32, size u16) entries or as
+    the text protocol argument "7E00D1:2,7E0071:1,...". Fields that follow
+    each other in memory are merged into a single range read.
+*
+* Arguments:   The schema payload or text
+* Returns:     none
+]]
+local function set_schema(payload)
+    local ranges, size = {}, 0
+    for i = 1, #payload - 5, 6 do
+        add_range(ranges, read_u32(payload, i), read_u16(payload, i + 4))
+        size = size + read_u16(payload, i + 4)
+    end
+    ram_ranges, ram_size = ranges, size
+end
+
+local function set_schema_text(text)
+    local ranges, size = {}, 0
+    for address, length in text:gmatch("(%x+):(%d+)") do
+        add_range(ranges, tonumber(address, 16), tonumber(length))
+        size = size + tonumber(length)
+    end
+    ram_ranges, ram_size = ranges, size
+end
+
+--[[------------------------------------------------------------------------------
+* Function: read_ranges
+* --------------------
+* Description:
+*	Reads the regions of an OP_READ_RANGE payload of (address u32, length u16)
+    entries, or of the text protocol argument "7E14C8:12,7E009E:83"
+*
+* Arguments:   The request payload or text
+* Returns:     The raw bytes of every region back to back
+]]
+local function read_ranges(payload)
+    local parts = {}
+    for i = 1, #payload - 5, 6 do
+        table.insert(parts, read_range(read_u32(payload, i), read_u16(payload, i + 4)))
+    end
+    return table.concat(parts)
+end
+
+local function read_ranges_text(text)
+    local parts = {}
+    for address, length in text:gmatch("(%x+):(%d+)") do
+        table.insert(parts, read_range(tonumber(address, 16), tonumber(length)))
+    end
+    return table.concat(parts)
+end
+
+--[[------------------------------------------------------------------------------
+* Function: read_ram_bytes
+* --------------------
+* Description:
+*	Reads every region in ram_ranges and packs them into a string with
+    one raw byte per address, in schema order
+*
+* Arguments:   none
+* Returns:     The packed string of RAM values
+]]
+local function read_ram_bytes()
+    local parts = {}
+    for i, range in ipairs(ram_ranges) do
+        parts[i] = read_range(range[1], range[2])
+    end
+    return table.concat(parts)
+end
+
+--[[------------------------------------------------------------------------------
+* Function: frame_stamp
+* --------------------
+* Description:
+*	Packs the emulator frame counter that starts every RAM and screen reply,
+    so Python can tell which frame the values were read on
+*
+* Arguments:   none
+* Returns:     The frame counter packed as a u32 string
+]]
+local function frame_stamp()
+    return u32_bytes(emu.framecount())
+end
+
+--[[------------------------------------------------------------------------------
+* Function: align16
+* --------------------
+* Description:
+*	Rounds a byte count up to a multiple of 16, matching RingBuffer.py
+*
+* Arguments:   The byte count
+* Returns:     The aligned byte count
+]]
+local function align16(n)
+    return math.ceil(n / 16) * 16
+end
+
+--[[------------------------------------------------------------------------------
+* Function: ring_open
+* --------------------
+* Description:
+*	Opens the ring buffer file created by Python and reads its layout from
+    the file header, replacing the ring opened before, if any. Only GD
+    frames can be written from Lua.
+*
+* Arguments:   The path of the ring buffer file
+* Returns:     nil on success, otherwise an error message
+]]
+local function ring_open(path)
+    local file = io.open(path, "r+b")
+    if not file then
+        return "Cannot open ring buffer " .. path
+    end
+    local header = file:read(RING_HEADER_SIZE)
+    local frame_format = read_u32(header, 21)
+    if header:sub(1, 8) ~= "SMWRING1" or frame_format ~= 4 then
+        file:close()
+        return "Unsupported ring buffer " .. path
+    end
+    if ring then
+        ring.file:close()
+    end
+    ring = {
+        file = file,
+        slot_count = read_u32(header, 13),
+        ram_size = read_u32(header, 17),
+        frame_size = GD_HEADER_SIZE + read_u32(header, 25) * read_u32(header, 29) * 4,
+        write_count = read_u32(header, 33),
+        sequences = {},
+    }
+    ring.slot_size = RING_SLOT_HEADER_SIZE + align16(ring.ram_size) + align16(ring.frame_size)
+    return nil
+end
+
+--[[------------------------------------------------------------------------------
+* Function: ring_frame_requested
+* --------------------
+* Description:
+*	Checks the RING_FRAME bit of a request's flags byte. Requests sent
+    without the flags byte always get the frame.
+*
+* Arguments:   The request payload and the 1-based offset of its flags byte
+* Returns:     true if the frame should be written into the ring slot
+]]
+local function ring_frame_requested(payload, offset)
+    local flags = payload:byte(offset)
+    return flags == nil or math.floor(flags / RING_FRAME) % 2 == 1
+end
+
+--[[------------------------------------------------------------------------------
+* Function: ring_write
+* --------------------
+* Description:
+*	Writes the RAM values and, if requested, the current frame into the next
+    ring slot. Skipping the frame saves the screenshot when Python takes
+    no screens. The slot sequence is odd while the slot is being written.
+*
+* Arguments:   Whether to capture the frame
+* Returns:     The new write count packed as a u32 string
+]]
+local function ring_write(with_frame)
+    local slot = ring.write_count % ring.slot_count
+    local offset = RING_HEADER_SIZE + slot * ring.slot_size
+    local sequence = ring.sequences[slot] or 0
+    local frame = u32_bytes(emu.framecount())
+    local file = ring.file
+
+    -- Mark the slot as being written, then fill in the RAM values and the frame
+    file:seek("set", offset)
+    file:write(u32_bytes(sequence + 1) .. frame)
+    file:seek("set", offset + RING_SLOT_HEADER_SIZE)
+    file:write(read_ram_bytes())
+    if with_frame then
+        file:seek("set", offset + RING_SLOT_HEADER_SIZE + align16(ring.ram_size))
+        file:write(gui.gdscreenshot())
+    end
+
+    -- Mark the slot as complete and publish the new write count
+    file:seek("set", offset)
+    file:write(u32_bytes(sequence + 2) .. frame)
+    ring.sequences[slot] = sequence + 2
+    ring.write_count = ring.write_count + 1
+    file:seek("set", RING_WRITE_COUNT_OFFSET)
+    file:write(u32_bytes(ring.write_count))
+    file:flush()
+    return u32_bytes(ring.write_count)
+end
+
+--[[------------------------------------------------------------------------------
+* Function: handle_binary
+* --------------------
+* Description:
+*	Executes a single binary protocol request and sends its reply. Every
+    request is answered with exactly one OP_OK or OP_ERROR message carrying
+    the same sequence number.
+*
+* Arguments:   The socket object representing the client (SB3), the opcode,
+               the sequence number, and the payload string
+* Returns:     none
+]]
+local function handle_binary(client, opcode, seq, payload)
+    if opcode == OP_PRESS then
+        press_buttons(payload)
+        send_message(client, OP_OK, seq, "")
+    elseif opcode == OP_ADVANCE then
+        advance_frames(read_u16(payload, 1))
+        send_message(client, OP_OK, seq, "")
+    elseif opcode == OP_LOAD_STATE then
+        log(LOG_DEBUG, "Loading save state")
+        load_save()
+        send_message(client, OP_OK, seq, "")
+    elseif opcode == OP_READ_MEM or (ring and opcode == OP_FRAME) then
+        if ring then
+            send_message(client, OP_OK, seq, ring_write(opcode == OP_FRAME or ring_frame_requested(payload, 1)))
+        else
+            send_message(client, OP_OK, seq, frame_stamp() .. read_ram_bytes())
+        end
+    elseif opcode == OP_STEP then
+
+        -- Payload is the frame count (u16) followed by the button mask (u8) and the ring flags (u8)
+        -- Press, advance, and reply with the step summary and the RAM values in one round trip
+        press_mask(payload:byte(3))
+        local summary = step_frames(read_u16(payload, 1))
+        log_sampled(LOG_DEBUG, "Step: held mask 0x%02X for %d frames, frame %d", payload:byte(3), read_u16(summary, 1), emu.framecount())
+        if ring then
+            send_message(client, OP_OK, seq, summary .. ring_write(ring_frame_requested(payload, 4)))
+        else
+            send_message(client, OP_OK, seq, summary .. frame_stamp() .. read_ram_bytes())
+        end
+    elseif opcode == OP_FRAME then
+
+        -- Send the raw framebuffer as a GD truecolor image; Python decodes it directly
+        send_message(client, OP_OK, seq, frame_stamp() .. gui.gdscreenshot())
+    elseif opcode == OP_RING_OPEN then
+        local err = ring_open(payload)
+        if err then
+            send_message(client, OP_ERROR, seq, err)
+        else
+            send_message(client, OP_OK, seq, "")
+        end
+    elseif opcode == OP_SNAPSHOT then
+        send_message(client, OP_OK, seq, u32_bytes(take_snapshot()))
+    elseif opcode == OP_RESTORE then
+        local err = restore_snapshot(read_u32(payload, 1))
+        if err then
+            send_message(client, OP_ERROR, seq, err)
+        else
+            send_message(client, OP_OK, seq, "")
+        end
+    elseif opcode == OP_RELEASE then
+        release_snapshot(read_u32(payload, 1))
+        send_message(client, OP_OK, seq, "")
+    elseif opcode == OP_SCHEMA then
+        set_schema(payload)
+        log(LOG_INFO, "Watching %d RAM bytes", ram_size)
+        send_message(client, OP_OK, seq, "")
+    elseif opcode == OP_STEP_WATCH then
+        set_step_watches(payload)
+        send_message(client, OP_OK, seq, "")
+    elseif opcode == OP_READ_RANGE then
+        send_message(client, OP_OK, seq, read_ranges(payload))
+    elseif opcode == OP_WAIT then
+        socket.sleep(read_u16(payload, 1))
+        send_message(client, OP_OK, seq, "")
+    elseif opcode == OP_PROFILE then
+
+        -- Reply with the timings since the last OP_PROFILE, then start over
+        local parts = {}
+        for profiled, count in pairs(profile_counts) do
+            table.insert(parts, string.char(profiled) .. u32_bytes(count) ..
+                                u32_bytes(math.floor(profile_totals[profiled] * 1000000) % 4294967296))
+        end
+        profile_counts = {}
+        profile_totals = {}
+        profiling = payload:byte(1) ~= 0
+        send_message(client, OP_OK, seq, table.concat(parts))
+    else
+        send_message(client, OP_ERROR, seq, "Unknown opcode " .. opcode)
+    end
+end
+
 --[[------------------------------------------------------------------------------
 * Function: sendOK
 * --------------------
@@ -72,9 +782,7 @@ local messages = {
 * Returns:     none
 ]]
 function sendOK(client)
-    print("Sending okay!")
     client:send("Ok" .. "\n")
-    print("Sent okay!")
 end
 
 --[[------------------------------------------------------------------------------
@@ -93,6 +801,9 @@ function wait_for_next_adv(msg, client)
     local adv_cmd, adv_n = msg:match("^(adv);%s*(%d+)$")
     local wait_cmd, wait_n = msg:match("^(wait);%s*(%d+)$")
     local press_cmd, keys = msg:match("^(press);%s*([A-Za-z]+)$")
+    local binary_cmd, binary_version = msg:match("^(binary);%s*(%d+)$")
+    local schema_cmd, schema = msg:match("^(schema);%s*([%x:,]*)$")
+    local range_cmd, ranges = msg:match("^(read_range);%s*([%x:,]*)$")
 
     local okay = true
 
@@ -103,48 +814,38 @@ function wait_for_next_adv(msg, client)
         -- Store the number of frames to advance by
         local n = tonumber(adv_n)
 
-        -- Display the message details in the Lua window
-        print("Received " .. msg .. " - Advancing " .. n .. " frames")
-
-        -- For each fram to advance by in 'n' (the number of advances)
-        -- Check which buttons are held, set the joypad to be holding those buttons
-        -- Then while holding those buttons, advance n frames
-        for i = 1, n do
-            if held_buttons then
-                joypad.set(1, held_buttons)
-                print(held_buttons)
-            end
-            emu.frameadvance()
-        end
+        -- Log the message details in the Lua window
+        log_sampled(LOG_DEBUG, "Received \"%s\" - Advancing %d frames", msg, n)
 
-        -- Unhold all buttons for othe next step
-        held_buttons = nil
+        -- Advance n frames holding the pressed buttons
+        advance_frames(n)
 
     -- Else if the message is to wait
     -- Wait a specified amount of time (wait_n) that the emulator will not respond for
     elseif wait_cmd == "wait" then
         local seconds = tonumber(wait_n)
-        print("Received \"" .. msg .. "\" - Waiting for " .. seconds .. " seconds")
+        log(LOG_INFO, "Received \"%s\" - Waiting for %d seconds", msg, seconds)
         socket.sleep(seconds)
 
     -- Else if the message is to load the save state, load it
     elseif msg == "load_save;" then
-        print("Received \"" .. msg .. "\" - Loading save state slot 1")
-        savestate.load(slot1)
-        emu.frameadvance()
+        log(LOG_DEBUG, "Received \"%s\" - Loading save state slot 1", msg)
+        load_save()
 
     -- Else if the message is to get the memory address values specified in the addresses above
     elseif msg == "send_mem;" then
-        local parts = {}
+        local parts = { "Frame=" .. emu.framecount() }
 
         -- Place the memory values in a table to be sent back for each mem address specified
-        for _, addr in ipairs(ram_addresses) do
-            local value = memory.readbyte(addr)
-            table.insert(parts, string.format("0x%06X=%d", addr, value))
+        for _, range in ipairs(ram_ranges) do
+            local values = read_range(range[1], range[2])
+            for i = 1, range[2] do
+                table.insert(parts, string.format("0x%06X=%d", range[1] + i - 1, values:byte(i)))
+            end
         end
 
         -- Send the table of memory values back
-        print("Received \"" .. msg .. "\" - Sending memory values: " .. table.concat(parts, ", "))
+        log_sampled(LOG_DEBUG, "Received \"%s\" - Sending %d memory values", msg, #parts - 1)
         local return_msg = table.concat(parts, ",") .. "\n"
         client:send(return_msg)
         okay = false
@@ -153,44 +854,35 @@ function wait_for_next_adv(msg, client)
     -- Else if the message is to press the joypad buttons
     elseif press_cmd == "press" then
 
-        -- Reset the buttons being held
-        held_buttons = {}
-    
-        -- For each command (c), set the corresponding button to hold to True
-        for c in keys:gmatch(".") do
-            if c == "A" then held_buttons.A = true
-            elseif c == "B" then held_buttons.B = true
-            elseif c == "X" then held_buttons.X = true
-            elseif c == "Y" then held_buttons.Y = true
-            elseif c == "L" then held_buttons.L = true
-            elseif c == "R" then held_buttons.R = true
-            elseif c == "u" then held_buttons.up = true
-            elseif c == "d" then held_buttons.down = true
-            elseif c == "l" then held_buttons.left = true
-            elseif c == "r" then held_buttons.right = true
-            elseif c == "S" then held_buttons.start = true
-            elseif c == "s" then held_buttons.select = true
-            end
-        end
+        -- Set the buttons to hold in the actual joypad interface
+        press_buttons(keys)
     
-        -- Set all of the held buttons in the actual joypad interface
-        joypad.set(1, held_buttons)
-    
-        -- Print what is being held down this frame in a table
-        local held = joypad.getdown(1)
-        local line = {}
-        for button, state in pairs(held) do
-            if state then table.insert(line, button) end
-        end
-        local line = {}
-        for button, state in pairs(held_buttons) do
-            if state then table.insert(line, button) end
-        end
-        print("Received \"" .. msg .. "\" - Holding: " .. table.concat(line, ", ") .. "during next frame advance")
+        -- Log what is being held down during the next frame advance
+        log_sampled(LOG_DEBUG, "Received \"%s\" - Holding: %s during next frame advance", msg, keys)
+
+    -- Else if the message sets the RAM schema, watch the listed fields from now on
+    elseif schema_cmd == "schema" then
+        set_schema_text(schema)
+        log(LOG_INFO, "Received \"%s\" - Watching %d RAM bytes", msg, ram_size)
+
+    -- Else if the message reads RAM regions, send them back as one hex string
+    elseif range_cmd == "read_range" then
+        local values = read_ranges_text(ranges)
+        log_sampled(LOG_DEBUG, "Received \"%s\" - Sending %d RAM bytes", msg, #values)
+        client:send(values:gsub(".", function(c) return string.format("%02X", c:byte()) end) .. "\n")
+        okay = false
+
+    -- Else if the message is the binary protocol handshake
+    -- Acknowledge it and switch the connection to binary messages if the version matches
+    elseif binary_cmd == "binary" and tonumber(binary_version) == PROTOCOL_VERSION then
+        log(LOG_INFO, "Received \"%s\" - Switching to binary protocol v%d", msg, PROTOCOL_VERSION)
+        client:send("Ok binary " .. PROTOCOL_VERSION .. "\n")
+        binary_mode = true
+        okay = false
 
     -- Else the message is invalid, just ignore it
     else
-        print("Received \"" .. msg .. "\" - Invalid message; Ignoring it")
+        log(LOG_WARNING, "Received \"%s\" - Invalid message; Ignoring it", msg)
         emu.frameadvance()
     end
 
@@ -205,23 +897,49 @@ end
 local server = assert(socket.bind(host, port))
 local tcp = assert(socket.tcp())
 local ip, port = server:getsockname()
-print("Waiting for connection on " .. ip .. ":" .. port)
+log(LOG_INFO, "Waiting for connection on %s:%d", ip, port)
 
 -- Accept the connection
 local client, err = server:accept()
 ip, port = client:getsockname()
 client:settimeout(-1)
-print("Connected to  " .. ip .. ":" .. port)
+log(LOG_INFO, "Connected to %s:%d", ip, port)
 
 -- Receive messages over the TCP connection
 while true do
-    local line, err =  client:receive("*l")
 
-    -- Wait until it is ok to advance frames again
-    -- Otherwise proceed with advancing frames
-    if not err then
-        wait_for_next_adv(line, client)
+    -- In binary mode, read the fixed-size header and then exactly the payload length
+    if binary_mode then
+        local header, err = client:receive(HEADER_SIZE)
+        if not err then
+            local payload = ""
+            local length = read_u32(header, 5)
+            if length > 0 then
+                payload = client:receive(length)
+            end
+            local opcode = header:byte(2)
+            if profiling and opcode ~= OP_PROFILE then
+                local start = socket.gettime()
+                handle_binary(client, opcode, read_u16(header, 3), payload)
+                profile_counts[opcode] = (profile_counts[opcode] or 0) + 1
+                profile_totals[opcode] = (profile_totals[opcode] or 0) + socket.gettime() - start
+            else
+                handle_binary(client, opcode, read_u16(header, 3), payload)
+            end
+        else
+            emu.frameadvance()
+        end
+
+    -- Otherwise read line-based text commands
     else
-        emu.frameadvance()
+        local line, err =  client:receive("*l")
+
+        -- Wait until it is ok to advance frames again
+        -- Otherwise proceed with advancing frames
+        if not err then
+            wait_for_next_adv(line, client)
+        else
+            emu.frameadvance()
+        end
     end
 end
\ No newline at end of file
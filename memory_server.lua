@@ -4,14 +4,17 @@
  * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
  * Assignment:  Semester Project
  * Due Date:    04-23-2025
- * Description: This program initializes the current SNES9x-rr instance
-                as a LuaSocket server. This is required for abstraction of
-                agent control. Once the server is active, memory values
-                are sent over TCP to SB3 in Python and inputs are received
-                from SB3 over the connection. This version is used
-                exclusively for memory passing/
+ * Description: This program streams the watched RAM of the current SNES9x-rr
+                instance to SB3 in Python. It connects to the RamStream
+                subscriber (GameWrapper/wrappers/RamStream.py), receives the
+                RAM schema and the push interval, and then pushes a
+                frame-stamped RAM record every k frames from a per-frame
+                hook, without waiting to be asked. This version is used
+                exclusively for memory passing, e.g. to monitor an
+                evaluation run; inputs still go through lua_server.lua.
  * Usage:       This program is automatically used by the SNES9x emulator
-                and is not intended for use on its own.
+                and is not intended for use on its own. Load it in a second
+                Lua Script window after starting the RamStream subscriber.
  ******************************************************************************
  ]]
 
@@ -20,61 +23,242 @@
 package.path = "C:/Program Files (x86)/Lua/5.1/lua/?.lua;" .. package.path
 package.cpath = "C:/Program Files (x86)/Lua/5.1/clibs/?.dll;C:/Program Files (x86)/Lua/5.1/clibs/?/core.dll;" .. package.cpath
 
--- Specify the TCP values to make SNES9x a server
+-- Specify the TCP values of the subscriber to push to
+-- The port can be set per emulator instance through the SMW_PUSH_PORT environment variable
 local socket = require("socket")
 local host = "127.0.0.1"
-local port = 12345
+local port = tonumber(os.getenv("SMW_PUSH_PORT")) or 12346
 local client = assert(socket.tcp())
-client:connect(host, port)
-client:settimeout(0)
 
--- Unpack the table of memory values to check and return values on
-local unpack = table.unpack or unpack
+-- Binary protocol constants; these must match GameWrapper/wrappers/Protocol.py
+local PROTOCOL_VERSION = 6
+local HEADER_SIZE = 8
+local OP_SCHEMA = 0x0C
+local OP_SUBSCRIBE = 0x0E
+local OP_PUSH = 0x0F
+
+-- RAM regions to capture values from, as {address, length} runs of consecutive bytes
+-- These are set by the schema message sent over the TCP connection by SB3
+local ram_ranges = {}
+
+-- Push a record every push_interval frames; nil until the subscription arrives
+local push_interval = nil
+
+-- The unsent rest of the last record; new records are dropped until it is sent
+local pending = nil
+local dropped = 0
+
+-- Most byte values passed to string.char at once; Lua limits the number of call arguments
+local UNPACK_CHUNK = 4096
+
+-- Log levels; these match lua_server.lua and GameWrapper/wrappers/Log.py
+local LOG_LEVELS = { DEBUG = 10, INFO = 20, WARNING = 30, ERROR = 40, OFF = 50 }
+local LOG_DEBUG = LOG_LEVELS.DEBUG
+local LOG_INFO = LOG_LEVELS.INFO
+local log_level = LOG_LEVELS[string.upper(os.getenv("SMW_LOG_LEVEL") or "INFO")] or LOG_INFO
+local log_every = math.max(tonumber(os.getenv("SMW_LOG_EVERY")) or 100, 1)
+
+--[[------------------------------------------------------------------------------
+* Function: log
+* --------------------
+* Description:
+*	Prints a message to the Lua window if its level is enabled. The message is
+    only formatted when it is printed.
+*
+* Arguments:   The log level, the string.format format, and its arguments
+* Returns:     none
+]]
+local function log(level, fmt, ...)
+    if level >= log_level then
+        print(string.format(fmt, ...))
+    end
+end
+
+--[[------------------------------------------------------------------------------
+* Function: u16_bytes / u32_bytes / read_u16 / read_u32
+* --------------------
+* Description:
+*	Little endian integer packing helpers for the binary protocol. Lua 5.1 has
+    no string.pack, so the bytes are assembled by hand.
+*
+* Arguments:   The integer to pack, or the string and 1-based offset to read from
+* Returns:     The packed string, or the unpacked integer
+]]
+local function u16_bytes(n)
+    return string.char(n % 256, math.floor(n / 256) % 256)
+end
+
+local function u32_bytes(n)
+    return string.char(n % 256, math.floor(n / 256) % 256, math.floor(n / 65536) % 256, math.floor(n / 16777216) % 256)
+end
+
+local function read_u16(s, i)
+    local b0, b1 = s:byte(i, i + 1)
+    return b0 + b1 * 256
+end
+
+local function read_u32(s, i)
+    local b0, b1, b2, b3 = s:byte(i, i + 3)
+    return b0 + b1 * 256 + b2 * 65536 + b3 * 16777216
+end
+
+--[[------------------------------------------------------------------------------
+* Function: table_to_bytes
+* --------------------
+* Description:
+*	Packs a table of byte values, as returned by snes9x-rr's
+    memory.readbyterange, into a raw byte string. The values are unpacked
+    in chunks so no call passes more arguments than Lua allows.
+*
+* Arguments:   The table of byte values and the number of values
+* Returns:     The raw byte string
+]]
+local function table_to_bytes(values, length)
+
+    -- The table starts at index 1, or at 0 on builds that number it from the address offset
+    local first = values[0] ~= nil and 0 or 1
+    local parts = {}
+    for i = first, first + length - 1, UNPACK_CHUNK do
+        parts[#parts + 1] = string.char(unpack(values, i, math.min(i + UNPACK_CHUNK - 1, first + length - 1)))
+    end
+    return table.concat(parts)
+end
 
--- Specify which RAM addresses to capture values from the emulator
--- These are sent over the TCP connection to SB3
-local ram_addresses = {
-    0x7E00D1, -- Mario's X position in the current level (Lower byte)
-	0x7E00D2, -- Mario's X position in the current level (Upper byte)
-    0x7E00D3, -- Mario's Y position in the current level (Lower byte)
-	0x7E00D4, -- Mario's Y position in the current level (Upper byte)
-	0x7E0071, -- Mario animation state flagc
-}
+--[[------------------------------------------------------------------------------
+* Function: read_range
+* --------------------
+* Description:
+*	Reads a contiguous region of memory as a raw byte string, in one call
+    when the emulator provides memory.readbyterange. snes9x-rr returns a
+    table of byte values, which is packed into a string.
+*
+* Arguments:   The region address and its length in bytes
+* Returns:     The raw bytes of the region
+]]
+local function read_range(address, length)
+    if memory.readbyterange then
+        local result = memory.readbyterange(address, length)
+        if type(result) == "table" then
+            return table_to_bytes(result, length)
+        end
+        return result
+    end
+    local values = {}
+    for i = 1, length do
+        values[i] = string.char(memory.readbyte(address + i - 1))
+    end
+    return table.concat(values)
+end
 
 --[[------------------------------------------------------------------------------
-* Function: send_ram_values
+* Function: set_schema
 * --------------------
 * Description:
-*	Receives a message over the TCP socket from SB3. Parses the message, and
-    executes the corresponding action in the SNES9x emulator environment
+*	Replaces the watched RAM with the fields of an OP_SCHEMA payload of
+    (address u32, size u16) entries. Fields that follow each other in memory
+    are merged into a single range read.
 *
-* Arguments:   The message received, the socket object representing the client (SB3)
+* Arguments:   The schema payload
 * Returns:     none
 ]]
-local function send_ram_values()
+local function set_schema(payload)
+    local ranges = {}
+    for i = 1, #payload - 5, 6 do
+        local address, length = read_u32(payload, i), read_u16(payload, i + 4)
+        local last = ranges[#ranges]
+        if last and last[1] + last[2] == address then
+            last[2] = last[2] + length
+        else
+            table.insert(ranges, { address, length })
+        end
+    end
+    ram_ranges = ranges
+end
 
-    -- Get the current frame number; this associates the RAM values to when they happened
+--[[------------------------------------------------------------------------------
+* Function: receive_message
+* --------------------
+* Description:
+*	Receives one binary protocol message from the subscriber, blocking until
+    it is complete
+*
+* Arguments:   The socket object representing the subscriber (SB3)
+* Returns:     The opcode and payload string, or nil if the connection closed
+]]
+local function receive_message(client)
+    local header = client:receive(HEADER_SIZE)
+    if not header or header:byte(1) ~= PROTOCOL_VERSION then
+        return nil
+    end
+    local length = read_u32(header, 5)
+    local payload = ""
+    if length > 0 then
+        payload = client:receive(length)
+    end
+    return header:byte(2), payload
+end
+
+--[[------------------------------------------------------------------------------
+* Function: push_ram
+* --------------------
+* Description:
+*	Pushes the frame-stamped RAM record to the subscriber every
+    push_interval frames. The socket never blocks the emulator: a record
+    that cannot be sent whole is finished on the following frames, and
+    records produced meanwhile are dropped, so the subscriber always
+    catches up to the newest frame.
+*
+* Arguments:   none
+* Returns:     none
+]]
+local function push_ram()
     local frame = emu.framecount()
-    local parts = { "Frame=" .. frame }
-
-    -- For each RAM address specified in ram_addresses, read the value from the address
-    -- Insert each read value into a table to send over the TCP connection to SB3
-    for i = 1, #ram_addresses do
-        local addr = ram_addresses[i]
-        local value = memory.readbyte(addr)
-        table.insert(parts, string.format("0x%06X=%d", addr, value))
+    if pending then
+        local _, err, sent = client:send(pending)
+        pending = err and pending:sub((sent or 0) + 1) or nil
     end
+    if frame % push_interval ~= 0 then
+        return
+    end
+    if pending then
+        dropped = dropped + 1
+        if (dropped - 1) % log_every == 0 then
+            log(LOG_DEBUG, "Dropped %d records so far; frame %d", dropped, frame)
+        end
+        return
+    end
+
+    -- Read every region and send them as a single OP_PUSH message
+    local parts = { u32_bytes(frame) }
+    for _, range in ipairs(ram_ranges) do
+        table.insert(parts, read_range(range[1], range[2]))
+    end
+    local payload = table.concat(parts)
+    local message = string.char(PROTOCOL_VERSION, OP_PUSH) .. u16_bytes(frame % 65536) .. u32_bytes(#payload) .. payload
+    local _, err, sent = client:send(message)
+    if err then
+        pending = message:sub((sent or 0) + 1)
+    end
+end
 
-    -- Concatenate the table of RAM values
-    local message = table.concat(parts, ",") .. "\n"
-    
-    -- Wait for the client to be ready to receive the table and send when ready
-    if client:receive("*l") then
-        client:send(message)
+-- Connect to the subscriber and wait for the schema and the push interval
+assert(client:connect(host, port))
+log(LOG_INFO, "Connected to %s:%d", host, port)
+while not push_interval do
+    local opcode, payload = receive_message(client)
+    if not opcode then
+        error("Subscriber closed the connection before subscribing")
+    elseif opcode == OP_SCHEMA then
+        set_schema(payload)
+    elseif opcode == OP_SUBSCRIBE then
+        push_interval = math.max(read_u16(payload, 1), 1)
     end
-    print("Sent: " .. message:sub(1, -2))
 end
+log(LOG_INFO, "Pushing RAM every %d frames", push_interval)
+
+-- From now on sends must not block the emulator
+client:settimeout(0)
 
--- Send the RAM values by calling send_ram_values after every frame
+-- Push the RAM values by calling push_ram after every frame
 -- This line is required for SNES9x-rr Lua control and is executed after every frame render
-emu.registerafter(send_ram_values)
+emu.registerafter(push_ram)
@@ -0,0 +1,425 @@
+'''
+******************************************************************************
+ * File:        mock_lua_server.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program is a stand-in for lua_server.lua that runs
+                without SNES9x-rr. It speaks both the text protocol and the
+                binary protocol defined in GameWrapper/wrappers/Protocol.py
+                and keeps a simulated copy of the SNES work RAM, so the
+                wrapper's socket layer can be exercised on any platform.
+                Holding right moves Mario to the right so that position and
+                speed values change between steps, and the framebuffer shows
+                a block at Mario's position.
+ * Usage:       Run this program in a Python 3.12.x or higher environment
+                and connect a LuaConnection (or the SNES9x wrapper with the
+                emulator launch skipped) to the printed host and port.
+                python mock_lua_server.py [port]
+ ******************************************************************************
+ '''
+
+# Imports
+import socket
+import sys
+import threading
+import time
+import numpy as np
+from GameWrapper.wrappers.Protocol import *
+from GameWrapper.wrappers.Framebuffer import GD_HEADER, GD_TRUECOLOR_SIGNATURE, GrayscaleConverter
+from GameWrapper.wrappers.RingBuffer import FrameRingProducer, FORMAT_GD
+from GameWrapper.wrappers.StepWatch import StepTracker, decode_watches
+from GameWrapper.button.Buttons import MASK_KEYS
+
+# Define the default TCP values; these match the SNES9x wrapper
+HOST = '127.0.0.1'
+PORT = 12345
+
+# The simulated work RAM covers 0x7E0000 - 0x7FFFFF
+WRAM_BASE = 0x7E0000
+WRAM_SIZE = 0x20000
+
+# Addresses updated by the simulated game; these mirror the constants in WrapperInterface.py
+X_ADDR = 0x7E00D1
+Y_ADDR = 0x7E00D3
+X_VEL = 0x7E007B
+
+# Simulated framebuffer size; matches gui.gdscreenshot() in SNES9x-rr
+SCREEN_WIDTH = 256
+SCREEN_HEIGHT = 224
+
+'''
+------------------------------------------------------------------------------
+ * Class: MockLuaServer
+ * --------------------
+ * Description:
+ *	Represents a fake SNES9x-rr Lua server. Commands are executed against a
+    simulated RAM block instead of the emulator.
+ '''
+class MockLuaServer():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer constructor
+    * --------------------
+    * Description:
+    *	Binds the server socket and initializes the simulated RAM, the frame
+        counter, and the save state. A port of 0 binds any free port.
+    *
+    * Arguments:   The host and port to listen on
+    * Returns:     none
+    '''
+    def __init__(self, host:str = HOST, port:int = PORT):
+        self.ram = bytearray(WRAM_SIZE)
+        self.frame = 0
+        self.held_buttons = None
+        self.write_u16(Y_ADDR, 350)
+        self.saved_ram = bytes(self.ram)
+        self.snapshots:dict[int, bytes] = {}
+        self.next_snapshot = 1
+        self.ram_addresses:list[int] = []
+        self.step_watches = []
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(1)
+        self.host, self.port = self.server.getsockname()
+        self.thread = None
+        self.running = False
+        self.ring = None
+        self.profiling = False
+        self.profile:dict[int, list[int]] = {} # opcode: [count, total ns]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer readbyte / write_u16
+    * --------------------
+    * Description:
+    *	Reads a byte from, or writes a little endian 16-bit value to, the
+        simulated RAM using SNES bus addresses
+    *
+    * Arguments:   The SNES address (and value to write)
+    * Returns:     The byte read for readbyte; none for write_u16
+    '''
+    def readbyte(self, address:int) -> int:
+        return self.ram[address - WRAM_BASE]
+
+    def write_u16(self, address:int, value:int):
+        offset = address - WRAM_BASE
+        self.ram[offset] = value & 0xFF
+        self.ram[offset + 1] = (value >> 8) & 0xFF
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer frame_advance
+    * --------------------
+    * Description:
+    *	Simulates a single frame. Holding right or left moves Mario two pixels
+        and sets the signed X speed accordingly.
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def frame_advance(self):
+        held = self.held_buttons or ""
+        x_pos = self.readbyte(X_ADDR) | (self.readbyte(X_ADDR + 1) << 8)
+        x_vel = 0
+        if "r" in held:
+            x_vel = 0x20
+        elif "l" in held:
+            x_vel = -0x20
+        self.write_u16(X_ADDR, max(0, x_pos + x_vel // 16))
+        self.ram[X_VEL - WRAM_BASE] = x_vel & 0xFF
+        self.frame += 1
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer press_buttons / advance_frames / step_frames / load_save / read_ram_bytes
+    * --------------------
+    * Description:
+    *	Mirror the functions of the same names in lua_server.lua
+    *
+    * Arguments:   The button string or the number of frames, where required
+    * Returns:     The packed RAM values for read_ram_bytes; the step summary for
+                   step_frames; none otherwise
+    '''
+    def press_buttons(self, keys:str):
+        self.held_buttons = keys
+
+    def advance_frames(self, n:int):
+        for _ in range(n):
+            self.frame_advance()
+        self.held_buttons = None
+
+    def step_frames(self, n:int) -> bytes:
+        tracker = StepTracker(self.step_watches)
+        for _ in range(n):
+            self.frame_advance()
+            if tracker.update(self.readbyte):
+                break
+        self.held_buttons = None
+        return tracker.encode()
+
+    def load_save(self):
+        self.ram[:] = self.saved_ram
+        self.frame_advance()
+
+    def read_ram_bytes(self) -> bytes:
+        return bytes(self.readbyte(address) for address in self.ram_addresses)
+
+    def read_range(self, address:int, length:int) -> bytes:
+        return bytes(self.ram[address - WRAM_BASE:address - WRAM_BASE + length])
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer set_schema / set_schema_text
+    * --------------------
+    * Description:
+    *	Replaces the watched RAM with the fields of a schema sent by the
+        wrapper, one address per byte of each field
+    *
+    * Arguments:   The OP_SCHEMA payload, or the "schema;" command argument
+    * Returns:     none
+    '''
+    def set_schema(self, payload:bytes):
+        self.ram_addresses = [address + i for address, width in SCHEMA_ENTRY.iter_unpack(payload)
+                              for i in range(width)]
+
+    def set_schema_text(self, text:str):
+        fields = [field.split(":") for field in text.split(",") if field]
+        self.ram_addresses = [int(address, 16) + i for address, width in fields for i in range(int(width))]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer observation_reply
+    * --------------------
+    * Description:
+    *	Builds the reply for a RAM request. Without a ring buffer this is the
+        frame-stamped RAM bytes; with one attached the RAM values and, if
+        requested, the frame are written to the next slot and the new write
+        count is returned.
+    *
+    * Arguments:   Whether to write the frame into the ring slot
+    * Returns:     The reply payload bytes
+    '''
+    def observation_reply(self, with_frame:bool = True) -> bytes:
+        if self.ring is None:
+            return FRAME_STAMP.pack(self.frame) + self.read_ram_bytes()
+        if not with_frame:
+            return U32.pack(self.ring.write(self.read_ram_bytes(), b"", self.frame))
+        frame = self.gdscreenshot()
+        if self.ring.layout.frame_format != FORMAT_GD:
+            frame = GrayscaleConverter().convert_gd(frame).tobytes()
+        return U32.pack(self.ring.write(self.read_ram_bytes(), frame, self.frame))
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer gdscreenshot
+    * --------------------
+    * Description:
+    *	Renders a GD truecolor frame like gui.gdscreenshot(): a sky colored
+        background with a 16x16 block drawn at Mario's on-screen position
+    *
+    * Arguments:   none
+    * Returns:     The raw GD image bytes
+    '''
+    def gdscreenshot(self) -> bytes:
+        pixels = np.empty((SCREEN_HEIGHT, SCREEN_WIDTH, 4), dtype=np.uint8)
+        pixels[...] = (0, 96, 160, 248)
+        x_pos = (self.readbyte(X_ADDR) | (self.readbyte(X_ADDR + 1) << 8)) % (SCREEN_WIDTH - 16)
+        pixels[176:192, x_pos:x_pos + 16] = (0, 248, 56, 0)
+        header = GD_HEADER.pack(GD_TRUECOLOR_SIGNATURE, SCREEN_WIDTH, SCREEN_HEIGHT, 1, 0xFFFFFFFF)
+        return header + pixels.tobytes()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer handle_text
+    * --------------------
+    * Description:
+    *	Executes a text protocol command
+    *
+    * Arguments:   The received line
+    * Returns:     The reply line
+    '''
+    def handle_text(self, msg:str) -> str:
+        command, _, argument = msg.partition(";")
+        argument = argument.strip()
+        if command == "adv":
+            self.advance_frames(int(argument))
+        elif command == "press":
+            self.press_buttons(argument)
+        elif command == "load_save":
+            self.load_save()
+        elif command == "send_mem":
+            return ",".join([f"Frame={self.frame}"] +
+                            [f"0x{address:06X}={self.readbyte(address)}" for address in self.ram_addresses])
+        elif command == "schema":
+            self.set_schema_text(argument)
+        elif command == "read_range":
+            fields = [field.split(":") for field in argument.split(",") if field]
+            return b"".join(self.read_range(int(address, 16), int(length)) for address, length in fields).hex().upper()
+        elif command == "binary" and argument == str(PROTOCOL_VERSION):
+            return HANDSHAKE_ACK
+        elif command != "wait":
+            self.frame_advance()
+        return "Ok"
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer handle_binary
+    * --------------------
+    * Description:
+    *	Executes a binary protocol request
+    *
+    * Arguments:   The opcode and payload bytes
+    * Returns:     A tuple of the reply opcode and reply payload
+    '''
+    def handle_binary(self, opcode:int, payload:bytes) -> tuple[int, bytes]:
+        if opcode == OP_PRESS:
+            self.press_buttons(payload.decode())
+        elif opcode == OP_ADVANCE:
+            self.advance_frames(U16.unpack(payload)[0])
+        elif opcode == OP_LOAD_STATE:
+            self.load_save()
+        elif opcode == OP_READ_MEM:
+            return OP_OK, self.observation_reply(not payload or payload[0] & RING_FRAME != 0)
+        elif opcode == OP_STEP:
+
+            # Older clients send no ring flags and always get the frame
+            n, mask, flags = STEP_REQUEST.unpack(payload.ljust(STEP_REQUEST.size, bytes((RING_FRAME,))))
+            self.press_buttons(MASK_KEYS[mask])
+            summary = self.step_frames(n)
+            return OP_OK, summary + self.observation_reply(flags & RING_FRAME != 0)
+        elif opcode == OP_FRAME:
+            if self.ring is not None:
+                return OP_OK, self.observation_reply()
+            return OP_OK, FRAME_STAMP.pack(self.frame) + self.gdscreenshot()
+        elif opcode == OP_SNAPSHOT:
+            self.snapshots[self.next_snapshot] = bytes(self.ram)
+            self.next_snapshot += 1
+            return OP_OK, U32.pack(self.next_snapshot - 1)
+        elif opcode == OP_RESTORE:
+            state = self.snapshots.get(U32.unpack(payload)[0])
+            if state is None:
+                return OP_ERROR, f"Unknown snapshot {U32.unpack(payload)[0]}".encode()
+            self.ram[:] = state
+            self.frame_advance()
+        elif opcode == OP_RELEASE:
+            self.snapshots.pop(U32.unpack(payload)[0], None)
+        elif opcode == OP_SCHEMA:
+            self.set_schema(payload)
+        elif opcode == OP_STEP_WATCH:
+            self.step_watches = decode_watches(payload)
+        elif opcode == OP_READ_RANGE:
+            return OP_OK, b"".join(self.read_range(address, length)
+                                   for address, length in RANGE_ENTRY.iter_unpack(payload))
+        elif opcode == OP_RING_OPEN:
+            self.ring = FrameRingProducer(payload.decode())
+        elif opcode == OP_PROFILE:
+            reply = b"".join(PROFILE_ENTRY.pack(profiled, count, (total_ns // 1000) & 0xFFFFFFFF)
+                             for profiled, (count, total_ns) in self.profile.items())
+            self.profile = {}
+            self.profiling = payload[0] != 0
+            return OP_OK, reply
+        elif opcode != OP_WAIT:
+            return OP_ERROR, f"Unknown opcode {opcode}".encode()
+        return OP_OK, b""
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer serve_client
+    * --------------------
+    * Description:
+    *	Handles a single client connection until it closes. Starts in text mode
+        and switches to binary framing after the handshake, like lua_server.lua.
+    *
+    * Arguments:   The connected client socket
+    * Returns:     none
+    '''
+    def serve_client(self, client:socket.socket):
+        stream = client.makefile("rb")
+        binary = False
+        while self.running:
+            if binary:
+                header = stream.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                opcode, seq, length = decode_header(header)
+                payload = stream.read(length)
+                start = time.perf_counter_ns()
+                reply_opcode, reply = self.handle_binary(opcode, payload)
+                client.sendall(encode_message(reply_opcode, reply, seq))
+                if self.profiling and opcode != OP_PROFILE:
+                    entry = self.profile.setdefault(opcode, [0, 0])
+                    entry[0] += 1
+                    entry[1] += time.perf_counter_ns() - start
+            else:
+                line = stream.readline()
+                if not line:
+                    return
+                reply = self.handle_text(line.decode().strip())
+                client.sendall(f"{reply}\n".encode())
+                binary = reply == HANDSHAKE_ACK
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer serve_forever
+    * --------------------
+    * Description:
+    *	Accepts clients one at a time until the server is stopped
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def serve_forever(self):
+        self.running = True
+        while self.running:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return
+            with client:
+                try:
+                    self.serve_client(client)
+                except ConnectionError:
+                    pass
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: MockLuaServer start / stop
+    * --------------------
+    * Description:
+    *	Runs the server on a daemon thread, or stops it and closes the socket
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.server.close()
+
+'''
+------------------------------------------------------------------------------
+* Function: main
+* --------------------
+* Description:
+*	Runs the mock Lua server in the foreground on the given port
+*
+* Arguments:   none
+* Returns:     none
+'''
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) >= 2 else PORT
+    server = MockLuaServer(HOST, port)
+    print(f"Waiting for connection on {server.host}:{server.port}")
+    server.serve_forever()
+
+# Executes starting at main when the program is executed
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''
+******************************************************************************
+ * File:        profiler_callback.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program reports the timings of profiled SmwEnvironments
+                (see GameWrapper/wrappers/Profiler.py) to the SB3 logger, so
+                they are shown with the training statistics and written to
+                tensorboard. The timings of all environments are combined and
+                cleared after each report.
+ * Usage:       Create the environments with profile=True and pass a
+                ProfilerCallback to model.learn, e.g. in Train.py.
+ ******************************************************************************
+ '''
+
+# Imports
+from stable_baselines3.common.callbacks import BaseCallback
+from GameWrapper.wrappers.Profiler import Profiler
+
+'''
+------------------------------------------------------------------------------
+ * Class: ProfilerCallback
+ * --------------------
+ * Description:
+ *	Represents an SB3 callback that records the mean, median and 99th
+    percentile time of every profiled call, and the Lua server and network
+    means, every profile_freq steps
+ '''
+class ProfilerCallback(BaseCallback):
+    def __init__(self, profile_freq:int = 1000, verbose:int = 0):
+        super().__init__(verbose)
+        self.profile_freq = profile_freq
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: ProfilerCallback _on_step
+    * --------------------
+    * Description:
+    *	Collects and clears every environment's timings, and records them as
+        profile/<call>_<statistic>_us scalars
+    *
+    * Arguments:   none
+    * Returns:     True, so training continues
+    '''
+    def _on_step(self) -> bool:
+        if self.n_calls % self.profile_freq != 0:
+            return True
+        profiler = None
+        for env_profiler in self.training_env.env_method("profile", True):
+            if env_profiler is None:
+                continue
+            if profiler is None:
+                profiler = Profiler(tuple(env_profiler.names))
+            profiler.merge(env_profiler)
+        if profiler is None:
+            return True
+        for name, stats in profiler.summary().items():
+            for stat in ("mean_us", "p50_us", "p99_us"):
+                if stat in stats:
+                    self.logger.record(f"profile/{name}_{stat}", stats[stat])
+        return True
@@ -0,0 +1,182 @@
+'''
+******************************************************************************
+ * File:        profiler_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the hot-path profiler in Profiler.py: the log-scale
+                histogram buckets, percentile estimates, combining the
+                timings of several environments, and timing the methods of
+                one ReplayWrapper. Also checks that ProfilerCallback records
+                the combined timings of a vectorized environment. Note that
+                no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest profiler_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+from stable_baselines3.common.logger import configure
+from stable_baselines3.common.vec_env import DummyVecEnv
+from GameWrapper.wrappers.Profiler import *
+from GameWrapper.wrappers.ReplayWrapper import ReplayWrapper
+from smw_environment import SmwEnvironment
+from profiler_callback import ProfilerCallback
+
+'''
+------------------------------------------------------------------------------
+ * Class: CallbackModel
+ * --------------------
+ * Description:
+ *	Represents the parts of an SB3 model a callback uses: the training
+    environment and a logger without outputs
+ '''
+class CallbackModel():
+    def __init__(self, env):
+        self.env = env
+        self.num_timesteps = 0
+        self.logger = configure(None, [])
+
+    def get_env(self):
+        return self.env
+
+'''
+------------------------------------------------------------------------------
+* Function: test_bucket_index
+* --------------------
+* Description:
+*	Checks that short durations get a bucket each, that every duration
+    falls between its bucket's floor and the next one, and that durations
+    past the last bucket are clamped into it
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_bucket_index():
+    assert [bucket_index(ns) for ns in (-5, 0, 1, 2, 3, 4)] == [0, 0, 1, 2, 3, 4]
+    durations = np.unique(np.random.default_rng(0).integers(1, 1 << 41, 2000))
+    buckets = [bucket_index(int(ns)) for ns in durations]
+    assert buckets == sorted(buckets)
+    for ns, bucket in zip(durations, buckets):
+        assert BUCKET_FLOORS[bucket] <= ns < BUCKET_FLOORS[bucket + 1]
+    assert bucket_index(1 << 60) == HISTOGRAM_SIZE - 1
+
+'''
+------------------------------------------------------------------------------
+* Function: test_percentile
+* --------------------
+* Description:
+*	Checks the percentile estimates against NumPy on spread out durations,
+    that they never exceed the largest duration, and that a call without
+    samples reports 0
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_percentile():
+    profiler = Profiler(("step_frames", "screenshot"))
+    durations = np.random.default_rng(1).lognormal(11, 1, 5000).astype(np.int64)
+    for ns in durations:
+        profiler.add(0, int(ns))
+    for q in (50, 90, 99):
+        assert abs(profiler.percentile("step_frames", q) / np.percentile(durations, q) - 1) < 0.25
+    assert profiler.percentile("step_frames", 100) <= durations.max()
+    assert profiler.percentile("screenshot", 50) == 0.0
+    assert profiler.calls[0] == len(durations) and profiler.total_ns[0] == durations.sum()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_merge
+* --------------------
+* Description:
+*	Checks that merging adds the counts, totals, histograms, and server
+    timings of calls both profilers time, keeps the larger maximum, and
+    skips calls this profiler does not time; and that copies and resets
+    leave the original alone
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_merge():
+    first = Profiler(("step_frames", "screenshot"))
+    second = Profiler(("screenshot", "step_frames", "read_ranges"))
+    first.record("step_frames", 1000)
+    second.record("step_frames", 3000)
+    second.record("read_ranges", 500)
+    second.record("unknown", 500)
+    first.add_server({"step": (1, 800)})
+    second.add_server({"step": (2, 1600), "frame": (1, 100)})
+    first.merge(second)
+    assert first.calls.tolist() == [2, 0] and first.total_ns[0] == 4000 and first.max_ns[0] == 3000
+    assert first.histograms[0].sum() == 2
+    assert first.server == {"step": [3, 2400], "frame": [1, 100]}
+
+    copy = first.copy()
+    first.reset()
+    assert not first.calls.any() and first.server == {}
+    assert copy.calls.tolist() == [2, 0] and copy.server["step"] == [3, 2400]
+    summary = copy.summary()
+    assert summary["step_frames"]["mean_us"] == 2.0 and summary["lua/step"]["mean_us"] == 0.8
+    assert abs(summary["network/step_frames"]["mean_us"] - 1.2) < 1e-9
+
+'''
+------------------------------------------------------------------------------
+* Function: test_instrument_replay_wrapper
+* --------------------
+* Description:
+*	Times the calls of one ReplayWrapper and checks the counts and the
+    per-step times, and that other wrappers and the class are untouched
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_instrument_replay_wrapper():
+    profiler = Profiler()
+    wrapper, other = ReplayWrapper(seed=0), ReplayWrapper(seed=0)
+    profiler.instrument(wrapper, WRAPPER_CALLS)
+    assert "step_frames" in vars(wrapper) and "step_frames" not in vars(other)
+    assert ReplayWrapper.step_frames is not wrapper.step_frames
+    wrapper.startGame()
+    profiler.end_step()
+    for _ in range(5):
+        wrapper.step_frames(["r"], 4)
+        wrapper.screenshot()
+    step = profiler.end_step()
+    assert step.keys() == {"step_frames", "screenshot"} and all(ns > 0 for ns in step.values())
+    assert profiler.end_step() == {}
+    index = profiler.names.index("step_frames")
+    assert profiler.calls[index] == 5 and profiler.histograms[index].sum() == 5
+    assert profiler.summary()["screenshot"]["calls"] == 5
+    other.startGame()
+    other.step_frames(["r"], 4)
+    assert profiler.calls[index] == 5
+
+'''
+------------------------------------------------------------------------------
+* Function: test_profiler_callback
+* --------------------
+* Description:
+*	Checks that the callback combines and clears the timings of every
+    profiled environment and records them only every profile_freq steps
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_profiler_callback():
+    vec_env = DummyVecEnv([lambda seed=seed: SmwEnvironment(ReplayWrapper(seed=seed), screen_mode="half", profile=True)
+                           for seed in range(2)])
+    vec_env.reset()
+    callback = ProfilerCallback(profile_freq=3)
+    callback.init_callback(CallbackModel(vec_env))
+    for _ in range(2):
+        vec_env.step(np.ones((2, 8), dtype=np.uint8))
+        callback.on_step()
+    assert callback.logger.name_to_value == {}
+    vec_env.step(np.ones((2, 8), dtype=np.uint8))
+    callback.on_step()
+    records = callback.logger.name_to_value
+    assert {"profile/step_frames_mean_us", "profile/step_frames_p99_us", "profile/screenshot_p50_us"} <= records.keys()
+    assert all(profiler.calls.sum() == 0 for profiler in vec_env.env_method("profile"))
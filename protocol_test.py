@@ -0,0 +1,310 @@
+'''
+******************************************************************************
+ * File:        protocol_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the binary wire protocol in Protocol.py against the
+                mock Lua server: message framing, the handshake and its
+                fallback to the text protocol, error replies, and the request
+                pipeline. Note that no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest protocol_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import socket
+import pytest
+from mock_lua_server import MockLuaServer
+from GameWrapper.wrappers.Protocol import *
+
+'''
+------------------------------------------------------------------------------
+ * Class: TextOnlyServer
+ * --------------------
+ * Description:
+ *	Represents a mock Lua server from before the binary protocol, which
+    answers the handshake like any other unknown command
+ '''
+class TextOnlyServer(MockLuaServer):
+    def handle_text(self, msg:str) -> str:
+        if msg.startswith("binary"):
+            return "Ok"
+        return super().handle_text(msg)
+
+'''
+------------------------------------------------------------------------------
+* Function: connect
+* --------------------
+* Description:
+*	Starts a mock server on a free port and connects to it
+*
+* Arguments:   The mock server class and whether to request the binary protocol
+* Returns:     A tuple of the running server and the connection
+'''
+def connect(server_cls:type = MockLuaServer, binary:bool = True) -> tuple[MockLuaServer, LuaConnection]:
+    server = server_cls(port=0)
+    server.start()
+    connection = LuaConnection(5)
+    connection.connect(server.host, server.port, binary)
+    return server, connection
+
+'''
+------------------------------------------------------------------------------
+* Function: server / text_server
+* --------------------
+* Description:
+*	Pytest fixtures yielding a connected binary or text-only mock server,
+    which are closed after the test
+*
+* Arguments:   none
+* Returns:     A tuple of the server and the connection
+'''
+@pytest.fixture
+def server():
+    server, connection = connect()
+    yield server, connection
+    connection.close()
+    server.stop()
+
+@pytest.fixture
+def text_server():
+    server, connection = connect(TextOnlyServer)
+    yield server, connection
+    connection.close()
+    server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_message_round_trip
+* --------------------
+* Description:
+*	Checks that an encoded message decodes to the same opcode, sequence
+    number, and payload, and that the sequence number wraps at 16 bits
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_message_round_trip():
+    message = encode_message(OP_ADVANCE, U16.pack(7), 0x10005)
+    assert len(message) == HEADER.size + U16.size
+    assert decode_header(message[:HEADER.size]) == (OP_ADVANCE, 5, U16.size)
+    assert message[HEADER.size:] == U16.pack(7)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_version_mismatch
+* --------------------
+* Description:
+*	Checks that a header from another protocol version is rejected
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_version_mismatch():
+    header = HEADER.pack(PROTOCOL_VERSION + 1, OP_OK, 1, 0)
+    with pytest.raises(ProtocolError):
+        decode_header(header)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_parse_reply_waits_for_whole_message
+* --------------------
+* Description:
+*	Feeds a reply into the receive buffer a byte at a time and checks that
+    it is only parsed once complete
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_parse_reply_waits_for_whole_message():
+    connection = LuaConnection(5)
+    message = encode_message(OP_OK, b"abc", 3) + encode_message(OP_OK, b"", 4)
+    replies = []
+    for byte in message:
+        connection.buffer.append(byte)
+        reply = connection.parse_reply()
+        if reply is not None:
+            replies.append(reply)
+    assert replies == [(OP_OK, 3, b"abc"), (OP_OK, 4, b"")]
+    assert not connection.buffer
+    connection.socket.close()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_check_reply
+* --------------------
+* Description:
+*	Checks that error replies and unknown reply opcodes raise ProtocolError
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_check_reply():
+    assert check_reply(OP_OK, b"data") == b"data"
+    with pytest.raises(ProtocolError, match="bad state"):
+        check_reply(OP_ERROR, b"bad state")
+    with pytest.raises(ProtocolError):
+        check_reply(OP_PRESS, b"")
+
+'''
+------------------------------------------------------------------------------
+* Function: test_split_ranges
+* --------------------
+* Description:
+*	Checks that a range reply is split into one view per region and that a
+    short reply is rejected
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_split_ranges():
+    ranges = [(0x7E0000, 2), (0x7E0100, 3)]
+    assert list(RANGE_ENTRY.iter_unpack(encode_ranges(ranges))) == ranges
+    first, second = split_ranges(bytes(range(5)), ranges)
+    assert first.tolist() == [0, 1] and second.tolist() == [2, 3, 4]
+    with pytest.raises(ProtocolError):
+        split_ranges(bytes(4), ranges)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_handshake
+* --------------------
+* Description:
+*	Checks that the mock server acknowledges the handshake and that binary
+    requests are answered in order
+*
+* Arguments:   The connected mock server
+* Returns:     none
+'''
+def test_handshake(server):
+    mock, connection = server
+    assert connection.binary
+    connection.request(OP_ADVANCE, U16.pack(3))
+    assert mock.frame == 3
+    frame, _ = split_frame_stamp(connection.request(OP_READ_MEM))
+    assert frame == 3
+
+'''
+------------------------------------------------------------------------------
+* Function: test_error_reply
+* --------------------
+* Description:
+*	Checks that an unknown opcode is answered with an error that the
+    connection raises, and that the connection still works afterwards
+*
+* Arguments:   The connected mock server
+* Returns:     none
+'''
+def test_error_reply(server):
+    _, connection = server
+    with pytest.raises(ProtocolError, match="Unknown opcode"):
+        connection.request(0x55)
+    connection.request(OP_WAIT)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_text_fallback
+* --------------------
+* Description:
+*	Checks that a server which does not acknowledge the handshake is used
+    with the text protocol
+*
+* Arguments:   The connected text-only mock server
+* Returns:     none
+'''
+def test_text_fallback(text_server):
+    mock, connection = text_server
+    assert not connection.binary
+    assert connection.send_text("adv; 2") == "Ok"
+    assert mock.frame == 2
+    with pytest.raises(ProtocolError):
+        connection.start_pipeline()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_text_requested
+* --------------------
+* Description:
+*	Checks that no handshake is sent when the text protocol is requested
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_text_requested():
+    mock, connection = connect(binary=False)
+    assert not connection.binary
+    assert connection.send_text("adv; 1") == "Ok"
+    assert mock.frame == 1
+    connection.close()
+    mock.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_pipelined_futures
+* --------------------
+* Description:
+*	Sends more requests than may be in flight at once and checks that every
+    future resolves to the reply of its own request
+*
+* Arguments:   The connected mock server
+* Returns:     none
+'''
+def test_pipelined_futures(server):
+    mock, connection = server
+    connection.start_pipeline(max_in_flight=2)
+    futures = []
+    for _ in range(10):
+        futures.append(connection.request_async(OP_ADVANCE, U16.pack(1)))
+        futures.append(connection.request_async(OP_READ_MEM))
+    frames = [split_frame_stamp(future.result(5))[0] for future in futures[1::2]]
+    assert frames == list(range(1, 11))
+    assert all(future.result(5) == b"" for future in futures[::2])
+    assert not connection.pending and mock.frame == 10
+
+    # Blocking requests go through the pipeline too
+    assert split_frame_stamp(connection.request(OP_READ_MEM))[0] == 10
+
+'''
+------------------------------------------------------------------------------
+* Function: test_pipelined_error_reply
+* --------------------
+* Description:
+*	Checks that an error reply fails only its own future
+*
+* Arguments:   The connected mock server
+* Returns:     none
+'''
+def test_pipelined_error_reply(server):
+    _, connection = server
+    connection.start_pipeline()
+    bad = connection.request_async(0x55)
+    good = connection.request_async(OP_WAIT)
+    with pytest.raises(ProtocolError, match="Unknown opcode"):
+        bad.result(5)
+    assert good.result(5) == b""
+
+'''
+------------------------------------------------------------------------------
+* Function: test_pipeline_stops_with_connection
+* --------------------
+* Description:
+*	Closes the server side of the connection and checks that the reader
+    stops and later requests raise instead of waiting forever
+*
+* Arguments:   The connected mock server
+* Returns:     none
+'''
+def test_pipeline_stops_with_connection(server):
+    mock, connection = server
+    connection.start_pipeline()
+    connection.request(OP_WAIT)
+    mock.stop()
+    connection.socket.shutdown(socket.SHUT_RD)
+    connection.reader.join(5)
+    assert not connection.pipeline_alive()
+    with pytest.raises(ConnectionError):
+        connection.request_async(OP_WAIT)
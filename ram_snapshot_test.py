@@ -0,0 +1,283 @@
+'''
+******************************************************************************
+ * File:        ram_snapshot_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the array-backed RAM snapshot in RamSnapshot.py: the
+                address to offset layout, single and vectorized reads of
+                signed and unsigned values, and that snapshots cannot be
+                changed. Also checks the RAM schema in RamSchema.py, that
+                the mock Lua server packs the record it describes, and bulk
+                reads of RAM regions. Note that no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest ram_snapshot_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import json
+import numpy as np
+import pytest
+from mock_lua_server import MockLuaServer
+from GameWrapper.wrappers.RamSnapshot import RamLayout, RamSnapshot
+from GameWrapper.wrappers.RamSchema import RamSchema, RamField, RAM_SCHEMA, TILE_MAP_SCHEMA
+from GameWrapper.wrappers.SNES9x import SNES9x
+
+# Watched addresses, deliberately out of address order
+ADDRESSES = (0x7E0014, 0x7E0010, 0x7E0011, 0x7E0020, 0x7E0021, 0x7E0030)
+VALUES = bytes([0x7F, 0x34, 0x12, 0xFE, 0xFF, 0x80])
+
+'''
+------------------------------------------------------------------------------
+* Function: test_layout_offsets
+* --------------------
+* Description:
+*	Checks that addresses resolve to their position in the layout and that
+    unwatched addresses raise KeyError
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_layout_offsets():
+    layout = RamLayout(ADDRESSES)
+    assert layout.size == len(ADDRESSES)
+    assert [layout.offset(address) for address in ADDRESSES] == list(range(len(ADDRESSES)))
+    with pytest.raises(KeyError):
+        layout.offset(0x7E0012)
+    indices = layout.indices((0x7E0010, 0x7E0020), 1)
+    assert indices.tolist() == [2, 4]
+    assert layout.indices((0x7E0010, 0x7E0020), 1) is indices
+
+'''
+------------------------------------------------------------------------------
+* Function: test_scalar_reads
+* --------------------
+* Description:
+*	Checks 8 and 16-bit reads, signed and unsigned, little endian
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_scalar_reads():
+    ram = RamSnapshot(RamLayout(ADDRESSES), VALUES, frame=7)
+    assert ram.frame == 7
+    assert ram.u8(0x7E0014) == 0x7F and ram.s8(0x7E0014) == 0x7F
+    assert ram.u8(0x7E0030) == 0x80 and ram.s8(0x7E0030) == -128
+    assert ram.u16(0x7E0010) == 0x1234 and ram.s16(0x7E0010) == 0x1234
+    assert ram.u16(0x7E0020) == 0xFFFE and ram.s16(0x7E0020) == -2
+    assert ram.u16(0x7E0010).dtype == np.uint16 and ram.s8(0x7E0030).dtype == np.int8
+    with pytest.raises(KeyError):
+        ram.u16(0x7E0014)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_vector_reads
+* --------------------
+* Description:
+*	Checks that the vectorized gathers match the scalar reads
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_vector_reads():
+    ram = RamSnapshot(RamLayout(ADDRESSES), VALUES)
+    assert ram.u8s(ADDRESSES).tolist() == list(VALUES)
+    assert ram.s8s((0x7E0014, 0x7E0030)).tolist() == [0x7F, -128]
+    assert ram.u16s((0x7E0010, 0x7E0020)).tolist() == [0x1234, 0xFFFE]
+    assert ram.s16s((0x7E0010, 0x7E0020)).tolist() == [0x1234, -2]
+
+'''
+------------------------------------------------------------------------------
+* Function: test_snapshot_is_immutable
+* --------------------
+* Description:
+*	Checks that a snapshot copies its values, cannot be written, starts as
+    zeros without values, and rejects values of the wrong length
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_snapshot_is_immutable():
+    layout = RamLayout(ADDRESSES)
+    values = bytearray(VALUES)
+    ram = RamSnapshot(layout, values)
+    values[0] = 0
+    assert ram.u8(0x7E0014) == 0x7F
+    with pytest.raises(ValueError):
+        ram.data[0] = 1
+    assert not RamSnapshot(layout).data.any()
+    with pytest.raises(ValueError):
+        RamSnapshot(layout, VALUES[:-1])
+
+'''
+------------------------------------------------------------------------------
+* Function: test_schema_record
+* --------------------
+* Description:
+*	Loads a schema from JSON and checks the packed dtype, the byte layout,
+    and that a record reads its fields by name with their signedness
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_schema_record(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps([
+        {"name": "x_pos", "address": "0x7E00D1", "width": 2},
+        {"name": "x_speed", "address": 0x7E007B, "signed": True},
+        {"name": "slots", "address": "0x7E14C8", "length": 3},
+    ]))
+    schema = RamSchema.load(str(path))
+    assert schema.size == 6 and schema["x_speed"].signed
+    assert schema.byte_addresses == (0x7E00D1, 0x7E00D2, 0x7E007B, 0x7E14C8, 0x7E14C9, 0x7E14CA)
+    assert schema.text() == "7E00D1:2,7E007B:1,7E14C8:3"
+    ram = RamSnapshot(schema.layout, bytes([0x34, 0x12, 0xF0, 1, 2, 3]))
+    assert ram.record["x_pos"] == 0x1234 and ram.record["x_speed"] == -16
+    assert ram.record["slots"].tolist() == [1, 2, 3]
+    assert ram.u16(0x7E00D1) == 0x1234
+    assert schema.decode(ram.data.tobytes())["x_speed"] == -16
+
+'''
+------------------------------------------------------------------------------
+* Function: test_schema_rejects_bad_fields
+* --------------------
+* Description:
+*	Checks that unsupported widths, empty tables, and repeated names are
+    rejected
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_schema_rejects_bad_fields():
+    with pytest.raises(ValueError):
+        RamField("wide", 0x7E0000, width=3)
+    with pytest.raises(ValueError):
+        RamField("empty", 0x7E0000, length=0)
+    with pytest.raises(ValueError):
+        RamSchema([RamField("a", 0x7E0000), RamField("a", 0x7E0001)])
+
+'''
+------------------------------------------------------------------------------
+* Function: test_schema_sent_on_connect
+* --------------------
+* Description:
+*	Checks that the server watches exactly the schema's bytes once the
+    wrapper connects, with either protocol, and that both read the same
+    record
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_schema_sent_on_connect():
+    records = []
+    for binary_protocol in (True, False):
+        server = MockLuaServer(port=0)
+        server.start()
+        wrapper = SNES9x(port=server.port, binary_protocol=binary_protocol)
+        wrapper.connect_lua_socket()
+        assert tuple(server.ram_addresses) == RAM_SCHEMA.byte_addresses
+        wrapper.step_frames(["r"], 3)
+        records.append(wrapper.ram.data.tobytes())
+        assert wrapper.ram.record["x_pos"] == 6 and wrapper.ram.record["y_pos"] == 350
+        wrapper.connection.close()
+        server.stop()
+    assert records[0] == records[1]
+
+'''
+------------------------------------------------------------------------------
+* Function: test_schema_extend
+* --------------------
+* Description:
+*	Checks that extending a schema appends only the fields it does not
+    watch yet, after its own fields, and that the global schema leaves out
+    the tile-map fields
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_schema_extend():
+    schema = RAM_SCHEMA.extend(TILE_MAP_SCHEMA)
+    assert [field.name for field in schema.fields] == [field.name for field in RAM_SCHEMA.fields + TILE_MAP_SCHEMA.fields]
+    assert schema.byte_addresses[:RAM_SCHEMA.size] == RAM_SCHEMA.byte_addresses
+    assert schema.extend(TILE_MAP_SCHEMA) is schema and schema.extend(RAM_SCHEMA) is schema
+    assert "level" not in RAM_SCHEMA.by_name and "sprite_status" not in RAM_SCHEMA.by_name
+
+'''
+------------------------------------------------------------------------------
+* Function: test_schema_changed_after_connect
+* --------------------
+* Description:
+*	Checks that a schema set after the wrapper connects is sent to the
+    server, with either protocol and through a new shared ring, and that
+    the next record holds its fields
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_schema_changed_after_connect(tmp_path):
+    schema = RAM_SCHEMA.extend(TILE_MAP_SCHEMA)
+    for binary_protocol, shared_ring in ((True, None), (False, None), (True, str(tmp_path / "ring.bin"))):
+        server = MockLuaServer(port=0)
+        server.start()
+        wrapper = SNES9x(port=server.port, binary_protocol=binary_protocol, shared_ring=shared_ring)
+        wrapper.connect_lua_socket()
+        wrapper.is_ready = True
+        server.ram[schema["level"].address - 0x7E0000] = 7
+        wrapper.set_ram_schema(schema)
+        assert tuple(server.ram_addresses) == schema.byte_addresses
+        if shared_ring is not None:
+            assert wrapper.ring.layout.ram_size == schema.size
+        wrapper.step_frames(["r"], 3)
+        assert wrapper.ram.record["level"] == 7 and wrapper.ram.record["x_pos"] == 6
+        wrapper.close()
+        server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_snapshot_range
+* --------------------
+* Description:
+*	Checks that a contiguous block of a snapshot is read as a view and that
+    a block stored out of address order is rejected
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_snapshot_range():
+    ram = RamSnapshot(RamLayout(ADDRESSES), VALUES)
+    block = ram.range(0x7E0010, 2)
+    assert block.tolist() == [0x34, 0x12] and block.base is not None
+    with pytest.raises(KeyError):
+        ram.range(0x7E0014, 2)
+    with pytest.raises(KeyError):
+        ram.range(0x7E0020, 3)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_read_ranges
+* --------------------
+* Description:
+*	Reads RAM regions outside the schema from the mock Lua server with
+    either protocol and checks them against its simulated RAM
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_read_ranges():
+    ranges = [(0x7E1000, 5), (0x7E0100, 300), (0x7FFFF0, 16)]
+    for binary_protocol in (True, False):
+        server = MockLuaServer(port=0)
+        server.start()
+        server.ram[:] = np.random.default_rng(0).integers(0, 256, len(server.ram), dtype=np.uint8).tobytes()
+        wrapper = SNES9x(port=server.port, binary_protocol=binary_protocol)
+        wrapper.connect_lua_socket()
+        regions = wrapper.read_ranges(ranges)
+        assert [len(region) for region in regions] == [5, 300, 16]
+        for region, (address, length) in zip(regions, ranges):
+            assert region.tobytes() == server.read_range(address, length)
+        assert wrapper.read_range(0x7E1000, 5).tobytes() == regions[0].tobytes()
+        wrapper.connection.close()
+        server.stop()
@@ -0,0 +1,88 @@
+'''
+******************************************************************************
+ * File:        ram_stream_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the RAM push stream in RamStream.py against a socket
+                standing in for memory_server.lua: the schema and subscribe
+                handshake, the latest record, the pushes counted as skipped
+                across a gap in the frame stamps, waiting for the first
+                record, and that stopping ends the receive thread. Note that
+                no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest ram_stream_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import socket
+import time
+import pytest
+from GameWrapper.wrappers.Protocol import *
+from GameWrapper.wrappers.RamSchema import RAM_SCHEMA
+from GameWrapper.wrappers.RamStream import RamStream
+
+# Push interval in frames, and the frames pushed; two pushes are missing between 14 and 20
+INTERVAL = 2
+FRAMES = (10, 12, 14, 20)
+
+'''
+------------------------------------------------------------------------------
+* Function: read_message
+* --------------------
+* Description:
+*	Reads one framed message sent by the stream
+*
+* Arguments:   The socket file to read from
+* Returns:     A tuple of the opcode and the payload
+'''
+def read_message(reader) -> tuple[int, bytes]:
+    opcode, _, length = decode_header(reader.read(HEADER.size))
+    return opcode, reader.read(length)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_push_stream
+* --------------------
+* Description:
+*	Connects like memory_server.lua, checks the handshake, pushes frame
+    stamped records with a gap, and checks the latest record and the
+    skipped count. Waiting times out before the first record and returns
+    at once after it.
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_push_stream():
+    stream = RamStream(interval=INTERVAL, port=0)
+    stream.start()
+    try:
+        start = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            stream.wait(0.1)
+        assert time.perf_counter() - start >= 0.1
+
+        emulator = socket.create_connection((stream.host, stream.port))
+        reader = emulator.makefile("rb")
+        assert read_message(reader) == (OP_SCHEMA, RAM_SCHEMA.encode())
+        assert read_message(reader) == (OP_SUBSCRIBE, U16.pack(INTERVAL))
+
+        records = [bytes((frame + i) & 0xFF for i in range(RAM_SCHEMA.size)) for frame in FRAMES]
+        emulator.sendall(b"".join(encode_message(OP_PUSH, FRAME_STAMP.pack(frame) + values)
+                                  for frame, values in zip(FRAMES, records)))
+        stream.wait(1)
+        deadline = time.monotonic() + 1
+        while stream.received < len(FRAMES) and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert stream.received == len(FRAMES)
+        assert stream.latest.frame == FRAMES[-1] and stream.latest.data.tobytes() == records[-1]
+        assert stream.latest.record["x_pos"] == int.from_bytes(records[-1][:2], "little")
+        assert stream.skipped == 2
+    finally:
+        stream.stop()
+    assert not stream.thread.is_alive()
+    reader.close()
+    emulator.close()
@@ -0,0 +1,171 @@
+'''
+******************************************************************************
+ * File:        replay_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the emulator-free backend in ReplayWrapper.py: that
+                the random dynamics are the same for the same seed and
+                actions, that a recorded trace replays step for step, that
+                trace files always end in .npy, and that the step watches
+                end a simulated step early. Note that no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest replay_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+from GameWrapper.wrappers.ReplayWrapper import *
+from smw_environment import SmwEnvironment, STEP_WATCHES
+
+# Number of steps each test runs
+STEPS = 40
+
+'''
+------------------------------------------------------------------------------
+* Function: make_actions
+* --------------------
+* Description:
+*	Draws a seeded list of Box actions, mostly running right
+*
+* Arguments:   The number of actions
+* Returns:     The list of actions
+'''
+def make_actions(count:int) -> list[np.ndarray]:
+    rng = np.random.default_rng(3)
+    actions = rng.integers(0, 2, (count, len(BUTTONS)), dtype=np.uint8)
+    actions[:, BUTTONS.index("r")] = 1
+    actions[:, BUTTONS.index("l")] = 0
+    return list(actions)
+
+'''
+------------------------------------------------------------------------------
+* Function: run_episode
+* --------------------
+* Description:
+*	Steps an environment over random dynamics through the given actions
+*
+* Arguments:   The random seed and the actions
+* Returns:     A tuple of the rewards and the stacked observations
+'''
+def run_episode(seed:int, actions:list[np.ndarray]) -> tuple[list[float], dict[str, np.ndarray]]:
+    env = SmwEnvironment(ReplayWrapper(seed=seed), screen_mode="half", tile_map=True)
+    observations = [env.reset(seed=seed)[0]]
+    rewards = []
+    for action in actions:
+        obs, reward, terminated, truncated, _ = env.step(action)
+        observations.append({key: np.copy(value) for key, value in obs.items()})
+        rewards.append(float(reward))
+        if terminated or truncated:
+            break
+    return rewards, {key: np.stack([obs[key] for obs in observations]) for key in observations[0]}
+
+'''
+------------------------------------------------------------------------------
+* Function: test_seeded_determinism
+* --------------------
+* Description:
+*	Checks that the same seed and actions give the same rewards and
+    observations, and that another seed gives different ones
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_seeded_determinism():
+    actions = make_actions(STEPS)
+    rewards, observations = run_episode(7, actions)
+    same_rewards, same_observations = run_episode(7, actions)
+    assert rewards == same_rewards and len(rewards) > 1
+    assert observations.keys() == same_observations.keys()
+    for key in observations:
+        assert np.array_equal(observations[key], same_observations[key])
+    other_rewards, _ = run_episode(8, actions)
+    assert other_rewards != rewards
+
+'''
+------------------------------------------------------------------------------
+* Function: test_trace_round_trip
+* --------------------
+* Description:
+*	Records a trace of the random dynamics with screens and checks that
+    replaying the same buttons matches every step, RAM and screen, without
+    divergent steps, and that other buttons are counted as divergent
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_trace_round_trip(tmp_path):
+    path = str(tmp_path / "trace.npy")
+    actions = [["r", "B"] if step % 5 == 0 else ["r"] for step in range(STEPS)]
+    source = ReplayWrapper(seed=1)
+    source.startGame()
+    record_trace(source, path, actions, screens=True)
+    trace = np.load(path)
+    assert len(trace) == STEPS + 1 and trace["buttons"][1] == encode_buttons(["r", "B"])
+
+    replay = ReplayWrapper(path)
+    replay.set_screen_mode(SCREEN_MODES["full"])
+    replay.startGame()
+    for step, key_list in enumerate(actions, 1):
+        replay.step_frames(key_list, 4)
+        assert np.array_equal(replay.ram_snapshot().data, trace["ram"][step])
+        assert np.array_equal(replay.screenshot()[0], trace["screen"][step])
+    assert replay.divergent_steps == 0
+    replay.step_frames(["l"], 4)
+    assert replay.divergent_steps == 1
+
+'''
+------------------------------------------------------------------------------
+* Function: test_trace_path
+* --------------------
+* Description:
+*	Checks that a trace path without .npy is written to the .npy file
+    np.load reads, whether or not the trace is cut down on close
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_trace_path(tmp_path):
+    wrapper = ReplayWrapper(seed=2)
+    wrapper.startGame()
+    for capacity in (2, 5):
+        writer = TraceWriter(str(tmp_path / f"trace{capacity}"), capacity)
+        assert writer.path == str(tmp_path / f"trace{capacity}.npy")
+        for _ in range(2):
+            wrapper.step_frames(["r"], 4)
+            writer.append(["r"], wrapper.ram_snapshot())
+        writer.close()
+        assert len(np.load(writer.path)) == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["trace2.npy", "trace5.npy"]
+
+'''
+------------------------------------------------------------------------------
+* Function: test_step_watch_stops_early
+* --------------------
+* Description:
+*	Checks that a simulated step ends on the frame Mario reaches the goal,
+    with the watch that fired and the farthest X position reported
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_step_watch_stops_early():
+    wrapper = ReplayWrapper(seed=4)
+    wrapper.set_step_watches(STEP_WATCHES)
+    wrapper.startGame()
+    wrapper.write_field("x_pos", GOAL_X - 6)
+    wrapper.step_frames(["r"], 30)
+    result = wrapper.step_result
+    assert result.fired == {"beat"} and result.frames < 30
+    assert result.maxima["progress"] == wrapper.ram.record["x_pos"] >= GOAL_X
+    assert wrapper.ram.record["end_level_timer"] == END_LEVEL_TIME
+
+    # Without the watches the step runs every frame
+    wrapper.set_step_watches([])
+    wrapper.loadState("state")
+    wrapper.write_field("x_pos", GOAL_X - 6)
+    wrapper.step_frames(["r"], 30)
+    assert wrapper.step_result.frames == 30 and wrapper.step_result.fired == set()
@@ -0,0 +1,166 @@
+'''
+******************************************************************************
+ * File:        reward_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks that the vectorized reward in smw_reward.py gives the
+                same results as the original per-environment formula of
+                SmwEnvironment, which is kept here as the reference. Random
+                steps and edge cases (Mario on the goal, the extreme speeds,
+                the countdown at its limit) are computed both ways and must
+                match exactly. Note that this is used for debugging the
+                reward only.
+ * Usage:       Run this program in a Python 3.12.x or higher environment,
+                or collect it with pytest.
+                python reward_test.py [number_of_steps]
+ ******************************************************************************
+ '''
+
+# Import the vectorized reward
+import sys
+import numpy as np
+from smw_reward import *
+
+# The goal used by SmwEnvironment
+END_GOAL = (718, 350)
+
+'''
+------------------------------------------------------------------------------
+* Function: reference_step
+* --------------------
+* Description:
+*	Computes one step with the original per-environment formula of
+    SmwEnvironment.finish_step, on NumPy scalars like those read from the
+    RAM record
+*
+* Arguments:   One STEP_DTYPE row and the goal
+* Returns:     The reward, punishment, made progress, times-up, done, and
+               term reason, and the farthest progress and countdown after
+               the step
+'''
+def reference_step(step:np.void, end_goal:tuple[int, int]):
+    mario_pos = step["x_pos"], step["y_pos"]
+    mario_vel = step["x_speed"] * np.float32(1 / 16), -step["y_speed"] * np.float32(1 / 16)
+    progress = step["progress"]
+    farthest_progress = int(step["farthest_progress"])
+    progress_countdown = float(step["progress_countdown"])
+    frames = int(step["frames"])
+    beat_level = bool(step["beat"])
+    mario_dead = bool(step["dead"])
+
+    made_progress = progress > farthest_progress
+    if made_progress:
+        farthest_progress = progress + 30
+        progress_countdown = 0
+    else:
+        progress_countdown += (1 / 60) * (frames + 1)
+    timesup = progress_countdown >= PROGRESS_COUNTDOWN_DEFAULT
+
+    punishment = 0
+    diffInPos = np.subtract(mario_pos, end_goal)
+    diffInVel = np.multiply(mario_vel, (1, 1))
+    distAway  = np.sqrt(diffInPos.dot(diffInPos))
+    closingVel = - (diffInPos.dot(diffInVel)) / distAway
+    reward = (1.8 * closingVel + 1.1 * closingVel ** 2)
+    reward += 30 * beat_level
+    punishment += 30 * timesup
+
+    term_reason = "None"
+    if beat_level:
+        term_reason = "Beat"
+    elif timesup:
+        term_reason = "TimeUp"
+    elif mario_dead:
+        term_reason = "Died"
+    done = bool(mario_dead or beat_level or timesup)
+    return reward, punishment, made_progress, timesup, done, term_reason, farthest_progress, progress_countdown
+
+'''
+------------------------------------------------------------------------------
+* Function: random_steps
+* --------------------
+* Description:
+*	Builds random steps, with the edge cases in the first rows
+*
+* Arguments:   The number of steps and the random generator
+* Returns:     A STEP_DTYPE array
+'''
+def random_steps(n:int, rng:np.random.Generator) -> np.ndarray:
+    steps = np.zeros(n, dtype=STEP_DTYPE)
+    steps["x_pos"] = rng.integers(0, 0x1400, n)
+    steps["y_pos"] = rng.integers(0, 0x200, n)
+    steps["x_speed"] = rng.integers(-128, 128, n)
+    steps["y_speed"] = rng.integers(-128, 128, n)
+    steps["progress"] = steps["x_pos"] + rng.integers(0, 8, n) * (rng.random(n) < 0.5)
+    steps["frames"] = rng.integers(1, 9, n)
+    steps["beat"] = rng.random(n) < 0.05
+    steps["dead"] = rng.random(n) < 0.05
+    steps["farthest_progress"] = steps["progress"].astype(np.int32) + rng.integers(-40, 40, n)
+    steps["progress_countdown"] = rng.random(n) * PROGRESS_COUNTDOWN_DEFAULT * 1.1
+
+    # Mario on the goal, extreme speeds, and a countdown exactly reaching the limit
+    steps[0]["x_pos"], steps[0]["y_pos"] = END_GOAL
+    steps[1]["x_speed"], steps[1]["y_speed"] = -128, -128
+    steps[2]["x_speed"], steps[2]["y_speed"] = 127, 127
+    steps[3]["farthest_progress"], steps[3]["frames"] = steps[3]["progress"] + 30, 4
+    steps[3]["progress_countdown"] = PROGRESS_COUNTDOWN_DEFAULT - (1 / 60) * 5
+    steps[4]["beat"] = steps[4]["dead"] = True
+    return steps
+
+'''
+------------------------------------------------------------------------------
+* Function: first_mismatch
+* --------------------
+* Description:
+*	Computes the steps both ways and finds the first step that differs
+*
+* Arguments:   A STEP_DTYPE array
+* Returns:     A message describing the first mismatch, or None if all match
+'''
+def first_mismatch(steps:np.ndarray) -> str | None:
+    # Mario on the goal divides by zero and -128 overflows an int8 speed, in both formulas
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        outcome = compute_rewards(steps, END_GOAL)
+        for i in range(len(steps)):
+            expected = reference_step(steps[i], END_GOAL)
+            actual = outcome[i]
+            got = (actual["reward"], actual["punishment"], actual["made_progress"], actual["timesup"], actual["done"],
+                   TERM_REASONS[actual["term"]], actual["farthest_progress"], actual["progress_countdown"])
+            if not all(a == e or (isinstance(e, float) and np.isnan(a) and np.isnan(e)) for a, e in zip(got, expected)):
+                return f"Mismatch at step {i}: {steps[i]}\n  expected {expected}\n  got      {got}"
+    return None
+
+'''
+------------------------------------------------------------------------------
+* Function: test_compute_rewards_matches_scalar
+* --------------------
+* Description:
+*	Checks a seeded batch of steps, edge cases included, against the
+    per-environment formula
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_compute_rewards_matches_scalar():
+    mismatch = first_mismatch(random_steps(5000, np.random.default_rng(0)))
+    assert mismatch is None, mismatch
+
+'''
+------------------------------------------------------------------------------
+* Function: main
+* --------------------
+* Description:
+*	Computes random steps both ways and reports the first mismatch
+*
+* Arguments:   none
+* Returns:     none
+'''
+if "__main__" in __name__:
+    n = int(sys.argv[1]) if len(sys.argv) >= 2 else 100000
+    mismatch = first_mismatch(random_steps(n, np.random.default_rng(0)))
+    if mismatch is not None:
+        print(mismatch)
+        sys.exit(1)
+    print(f"{n} steps match the per-environment reward")
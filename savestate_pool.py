@@ -0,0 +1,162 @@
+'''
+******************************************************************************
+ * File:        savestate_pool.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program keeps a bounded pool of in-memory savestates
+                captured at progress checkpoints during training. Episodes
+                can start from a pooled checkpoint instead of the beginning
+                of the level, picked with a weight that grows with the
+                number of times the agent failed after that checkpoint, so
+                fewer frames are spent replaying terrain that is already
+                mastered. The least recently used checkpoint is evicted when
+                the pool is full.
+ * Usage:       This program is automatically used by the SmwEnvironment
+                class and is not intended for use on its own.
+ ******************************************************************************
+ '''
+
+# Imports
+from collections import OrderedDict
+import numpy as np
+from GameWrapper.wrappers.WrapperInterface import WrapperInterface
+
+# Default pool settings: number of states kept, pixels between checkpoints, and the
+# probability that an episode starts from a pooled checkpoint instead of the level start
+POOL_CAPACITY = 16
+CHECKPOINT_SPACING = 64
+POOL_START_PROBABILITY = 0.5
+
+'''
+------------------------------------------------------------------------------
+ * Class: PoolEntry
+ * --------------------
+ * Description:
+ *	Represents one pooled checkpoint: its snapshot, Mario's X position when it
+    was captured, and the number of episodes that failed after it
+ '''
+class PoolEntry():
+    def __init__(self, state:bytes, progress:int):
+        self.state = state
+        self.progress = progress
+        self.failures = 0
+
+'''
+------------------------------------------------------------------------------
+ * Class: SavestatePool
+ * --------------------
+ * Description:
+ *	Represents the LRU pool of checkpoint savestates for one game wrapper.
+    Checkpoints are keyed by progress bucket (X position // spacing), so each
+    section of the level holds at most one state.
+ '''
+class SavestatePool():
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SavestatePool constructor
+    * --------------------
+    * Description:
+    *	Stores the pool settings and creates the empty pool
+    *
+    * Arguments:   The game wrapper, the pool capacity, the checkpoint spacing
+                   in pixels, the probability of starting from the pool, and
+                   an optional random seed
+    * Returns:     none
+    '''
+    def __init__(self, wrapper:WrapperInterface,
+                 capacity:int = POOL_CAPACITY,
+                 spacing:int = CHECKPOINT_SPACING,
+                 start_probability:float = POOL_START_PROBABILITY,
+                 seed:int | None = None):
+        self.wrapper = wrapper
+        self.capacity = capacity
+        self.spacing = spacing
+        self.start_probability = start_probability
+        self.rng = np.random.default_rng(seed)
+        self.entries:OrderedDict[int, PoolEntry] = OrderedDict()
+        self.enabled = True
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SavestatePool capture
+    * --------------------
+    * Description:
+    *	Snapshots the current state if Mario has reached a section that has no
+        checkpoint in the pool yet, evicting the least recently used
+        checkpoint when the pool is full. The pool disables itself if the
+        wrapper cannot take snapshots.
+    *
+    * Arguments:   Mario's current X position
+    * Returns:     none
+    '''
+    def capture(self, progress:int):
+        bucket = int(progress) // self.spacing
+        if not self.enabled or bucket == 0 or bucket in self.entries:
+            return
+        try:
+            state = self.wrapper.snapshot()
+        except NotImplementedError:
+            self.enabled = False
+            return
+        self.entries[bucket] = PoolEntry(state, int(progress))
+        if len(self.entries) > self.capacity:
+            _, evicted = self.entries.popitem(last=False)
+            self.wrapper.release(evicted.state)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SavestatePool record_failure
+    * --------------------
+    * Description:
+    *	Counts a failed episode against the last checkpoint at or before the
+        position where it failed, and marks that checkpoint as recently used
+    *
+    * Arguments:   Mario's X position when the episode failed
+    * Returns:     none
+    '''
+    def record_failure(self, progress:int):
+        buckets = [bucket for bucket in self.entries if bucket <= int(progress) // self.spacing]
+        if not buckets:
+            return
+        bucket = max(buckets)
+        self.entries[bucket].failures += 1
+        self.entries.move_to_end(bucket)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SavestatePool sample
+    * --------------------
+    * Description:
+    *	Picks the start point for the next episode. With probability
+        1 - start_probability (or when the pool is empty) the level start is
+        used; otherwise a checkpoint is drawn with weight failures + 1.
+    *
+    * Arguments:   none
+    * Returns:     The chosen PoolEntry, or None for the level start
+    '''
+    def sample(self) -> PoolEntry | None:
+        if not self.entries or self.rng.random() >= self.start_probability:
+            return None
+        buckets = list(self.entries)
+        weights = np.array([self.entries[bucket].failures + 1 for bucket in buckets], dtype=np.float64)
+        bucket = buckets[self.rng.choice(len(buckets), p=weights / weights.sum())]
+        self.entries.move_to_end(bucket)
+        return self.entries[bucket]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SavestatePool clear
+    * --------------------
+    * Description:
+    *	Releases every pooled snapshot and empties the pool
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def clear(self):
+        for entry in self.entries.values():
+            self.wrapper.release(entry.state)
+        self.entries.clear()
@@ -0,0 +1,216 @@
+'''
+******************************************************************************
+ * File:        savestate_pool_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the savestate pool in savestate_pool.py: one checkpoint
+                per progress bucket, least recently used eviction, failure
+                counting, and the failure-weighted choice of start points.
+                Episodes started from a checkpoint are checked against the
+                mock Lua server, so no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest savestate_pool_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+from mock_lua_server import MockLuaServer
+from savestate_pool import SavestatePool
+from smw_environment import SmwEnvironment
+from smw_reward import PROGRESS_MARGIN
+from GameWrapper.wrappers.WrapperInterface import WrapperInterface
+from GameWrapper.wrappers.SNES9x import SNES9x
+from GameWrapper.button.Buttons import BUTTONS
+
+'''
+------------------------------------------------------------------------------
+ * Class: CountingWrapper
+ * --------------------
+ * Description:
+ *	Represents a game wrapper whose snapshots are numbered tokens, recording
+    which tokens were released
+ '''
+class CountingWrapper(WrapperInterface):
+    def __init__(self):
+        super().__init__()
+        self.snapshots = 0
+        self.released = []
+
+    def snapshot(self) -> bytes:
+        self.snapshots += 1
+        return bytes([self.snapshots])
+
+    def release(self, state:bytes):
+        self.released.append(state[0])
+
+'''
+------------------------------------------------------------------------------
+* Function: test_capture_one_per_bucket
+* --------------------
+* Description:
+*	Checks that a checkpoint is captured once per progress bucket, and never
+    in the first bucket, which is the level start
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_capture_one_per_bucket():
+    wrapper = CountingWrapper()
+    pool = SavestatePool(wrapper, spacing=64)
+    for progress in (10, 63, 64, 100, 127, 128, 300):
+        pool.capture(progress)
+    assert list(pool.entries) == [1, 2, 4]
+    assert [entry.progress for entry in pool.entries.values()] == [64, 128, 300]
+    assert wrapper.snapshots == 3
+
+'''
+------------------------------------------------------------------------------
+* Function: test_evicts_least_recently_used
+* --------------------
+* Description:
+*	Checks that the checkpoint used least recently, not the oldest one, is
+    evicted and released when the pool is full
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_evicts_least_recently_used():
+    wrapper = CountingWrapper()
+    pool = SavestatePool(wrapper, capacity=3, spacing=64)
+    for progress in (64, 128, 192):
+        pool.capture(progress)
+    pool.record_failure(70)
+    pool.capture(256)
+    assert list(pool.entries) == [3, 1, 4]
+    assert wrapper.released == [2]
+    pool.clear()
+    assert not pool.entries and sorted(wrapper.released) == [1, 2, 3, 4]
+
+'''
+------------------------------------------------------------------------------
+* Function: test_record_failure
+* --------------------
+* Description:
+*	Checks that a failure counts against the last checkpoint at or before
+    it, and that failures before every checkpoint are ignored
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_record_failure():
+    pool = SavestatePool(CountingWrapper(), spacing=64)
+    pool.capture(64)
+    pool.capture(192)
+    pool.record_failure(50)
+    pool.record_failure(150)
+    pool.record_failure(200)
+    pool.record_failure(1000)
+    assert {bucket: entry.failures for bucket, entry in pool.entries.items()} == {1: 1, 3: 2}
+
+'''
+------------------------------------------------------------------------------
+* Function: test_sample_weighting
+* --------------------
+* Description:
+*	Checks that checkpoints are drawn in proportion to failures + 1 and
+    that the level start is chosen with probability 1 - start_probability
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_sample_weighting():
+    pool = SavestatePool(CountingWrapper(), spacing=64, start_probability=0.5, seed=0)
+    assert pool.sample() is None
+    pool.capture(64)
+    pool.capture(128)
+    for _ in range(3):
+        pool.record_failure(128)
+    draws = [pool.sample() for _ in range(4000)]
+    starts = sum(entry is None for entry in draws)
+    hard = sum(entry is not None and entry.progress == 128 for entry in draws)
+    assert abs(starts / len(draws) - 0.5) < 0.05
+    assert abs(hard / (len(draws) - starts) - 0.8) < 0.05
+
+'''
+------------------------------------------------------------------------------
+* Function: test_disabled_without_snapshots
+* --------------------
+* Description:
+*	Checks that the pool turns itself off for wrappers without snapshots
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_disabled_without_snapshots():
+    pool = SavestatePool(WrapperInterface())
+    pool.capture(500)
+    assert not pool.enabled and not pool.entries
+
+'''
+------------------------------------------------------------------------------
+* Function: test_reset_from_checkpoint
+* --------------------
+* Description:
+*	Runs right until checkpoints are captured, then checks that an episode
+    started from one begins at its position with its progress already
+    counted
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_reset_from_checkpoint():
+    server = MockLuaServer(port=0)
+    server.start()
+    wrapper = SNES9x(port=server.port)
+    wrapper.connect_lua_socket()
+    wrapper.is_ready = True
+    pool = SavestatePool(wrapper, spacing=32, start_probability=1.0, seed=0)
+    env = SmwEnvironment(wrapper, savestate_pool=pool, screen_mode=None)
+    env.reset()
+    right = np.eye(len(BUTTONS), dtype=np.uint8)[BUTTONS.index("r")]
+    for _ in range(10):
+        env.step(right)
+    assert pool.entries
+    progress = {entry.progress for entry in pool.entries.values()}
+    for _ in range(5):
+        env.reset()
+        x_pos = int(env.get_mario_pos()[0])
+        assert x_pos in progress
+        assert env.farthest_progress == x_pos + PROGRESS_MARGIN
+    wrapper.connection.close()
+    server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_pool_from_settings
+* --------------------
+* Description:
+*	Checks that an environment builds its pool on its own wrapper from True
+    or a dictionary of settings, as passed through a VecEnv's env_kwargs,
+    and that the pool then captures checkpoints while stepping
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_pool_from_settings():
+    server = MockLuaServer(port=0)
+    server.start()
+    wrapper = SNES9x(port=server.port)
+    wrapper.connect_lua_socket()
+    wrapper.is_ready = True
+    assert SmwEnvironment(wrapper, savestate_pool=True, screen_mode=None).savestate_pool.wrapper is wrapper
+    assert SmwEnvironment(wrapper, savestate_pool=False, screen_mode=None).savestate_pool is None
+    env = SmwEnvironment(wrapper, savestate_pool={"spacing": 32, "capacity": 4}, screen_mode=None)
+    pool = env.savestate_pool
+    assert (pool.wrapper, pool.spacing, pool.capacity) == (wrapper, 32, 4)
+    env.reset()
+    right = np.eye(len(BUTTONS), dtype=np.uint8)[BUTTONS.index("r")]
+    for _ in range(10):
+        env.step(right)
+    assert pool.entries
+    wrapper.connection.close()
+    server.stop()
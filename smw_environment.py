@@ -24,11 +24,54 @@ from gymnasium import spaces
 from gymnasium.core import ObsType, ActType
 from pandas.core.interchange.from_dataframe import buffer_to_ndarray
 from GameWrapper.wrappers.WrapperInterface import *
-from GameWrapper.button.Buttons import BUTTONS, DIR_COMBOS
+from GameWrapper.button.Buttons import BUTTONS, DIR_COMBOS, DISCRETE_ACTIONS, MASK_KEYS
+from GameWrapper.wrappers.StepWatch import StepWatch, WATCH_EQUAL, WATCH_NOT_EQUAL, WATCH_MAX
+from GameWrapper.wrappers.Framebuffer import FrameStack
+from GameWrapper.wrappers.ScreenMode import SCREEN_MODES
+from GameWrapper.wrappers.TileMap import TileMap, OUT_OF_LEVEL, SPRITE_COLUMNS, SPRITE_SLOTS
+from GameWrapper.wrappers.RamSchema import TILE_MAP_SCHEMA
+from GameWrapper.wrappers.Log import get_logger, LogSampler
+from GameWrapper.wrappers.Profiler import Profiler, WRAPPER_CALLS, ENV_CALLS
+from savestate_pool import SavestatePool
+from smw_reward import compute_rewards, STEP_DTYPE, TERM_REASONS, PROGRESS_COUNTDOWN_DEFAULT, PROGRESS_MARGIN
+
+# Memory values the emulator checks after every skipped frame, so a death or the goal
+# in the middle of a step ends it on that frame; Mario's farthest X position is kept too
+STEP_WATCHES = [
+    StepWatch("dead", ANIM_TRIGGER_STATE, WATCH_EQUAL, PLAYER_DEAD_VAL),
+    StepWatch("beat", END_LVL_TIMER, WATCH_NOT_EQUAL, 0),
+    StepWatch("progress", X_ADDR, WATCH_MAX, width=2),
+]
+
+# Size of the tile-map observation window around Mario, in blocks (height, width)
+TILE_WINDOW = (14, 16)
+
+# Action spaces: "box" holds the buttons whose value is at least 0.5, "multi_binary" holds
+# the buttons set to 1, and "discrete" picks one of the button masks in DISCRETE_ACTIONS
+ACTION_MODES = ("box", "multi_binary", "discrete")
+DISCRETE_MASKS = np.array(DISCRETE_ACTIONS, dtype=np.uint8)
+
+# Episode summaries are logged at info level; step details are sampled debug messages
+logger = get_logger("env")
 
-# Set the progrss timer constant (in seconds)
-# This is used to timeout the current episode if progress cannot be made
-PROGRESS_COUNTDOWN_DEFAULT = 2.75
+'''
+------------------------------------------------------------------------------
+* Function: actions_to_masks
+* --------------------
+* Description:
+*	Converts actions into button masks, one bit per button in BUTTONS order.
+    A Box or MultiBinary action is packed into its mask with packbits, and a
+    Discrete action indexes DISCRETE_MASKS, so a batch of actions is
+    converted in one call. Values past the buttons are ignored.
+*
+* Arguments:   One action, or an array of actions in the last axis, and the action mode
+* Returns:     The button mask (uint8), or an array of them
+'''
+def actions_to_masks(actions:np.ndarray, action_mode:str) -> np.ndarray:
+    if action_mode == "discrete":
+        return DISCRETE_MASKS[actions]
+    pressed = actions >= 0.5 if action_mode == "box" else actions != 0
+    return np.packbits(pressed, axis=-1, bitorder="little")[..., 0]
 
 '''
 ------------------------------------------------------------------------------
@@ -48,22 +91,98 @@ class SmwEnvironment(gym.Env):
     *	Initializes the game wrapper interface, the game resolution, the relative
         position of Mario to the goal post, the goal position, the timeout counter,
         the actions that SB3 is allowed to take in the agent, and the reward.
+        An optional savestate pool lets episodes start from progress checkpoints.
+        It is given as True or a dictionary of SavestatePool settings and is
+        built on this environment's own wrapper, so it can be passed through
+        the env_kwargs of a vectorized environment.
+        The step watches are handed to the wrapper so it can end a step early.
+        The frame counters track observations whose screen and RAM come from
+        different frames (torn) and steps that skipped or repeated frames.
+        The screen observation stacks the last n_stack captures, each
+        optionally max pooled with the capture before it, at the crop and
+        resolution of the screen mode. Without a screen mode no screenshot is
+        taken. The tile map adds the Layer 1 tiles around Mario ("tiles") and
+        the sprite table ("sprites") to the observation and adds the RAM
+        fields it reads (TILE_MAP_SCHEMA) to the wrapper's schema. With
+        profiling on, the wrapper's hot-path calls and the observation and
+        reward are timed (see Profiler.py) and each step's times are added
+        to info as "profile_ns"; with it off nothing is timed. The action
+        mode selects the action space (see ACTION_MODES).
     *
-    * Arguments:   A WrapperInterface object; number of frames to skip per advance
+    * Arguments:   A WrapperInterface object; number of frames to skip per advance;
+                   the savestate pool (a SavestatePool, True, a dictionary of
+                   its settings, or None); the number of stacked screens,
+                   whether to max pool the last two captures, the name of the
+                   screen mode (see SCREEN_MODES) or None, whether to add
+                   the tile-map observation, whether to profile, and the
+                   action mode
     * Returns:     none
     '''
-    def __init__(self, wrapper:WrapperInterface, frame_skip:int=4):
+    def __init__(self, wrapper:WrapperInterface, frame_skip:int=4,
+                 savestate_pool:SavestatePool | bool | dict[str, Any] | None = None,
+                 n_stack:int = 1, max_pool:bool = False, screen_mode:str | None = "full", tile_map:bool = False,
+                 profile:bool = False, action_mode:str = "box"):
         self.game_wrapper = wrapper
-        self.observation_space = spaces.Dict({
-            "rel_x": spaces.Box(0, 255, (1,), np.uint8),
-            "screen" : spaces.Box(0, 255, (1, *GAME_RESOLUTION), np.uint8),
-        })
-        self.action_space = spaces.Box(0, 1, (len(BUTTONS),), np.uint8)
+        self.screen_mode = SCREEN_MODES[screen_mode] if screen_mode is not None else None
+        observation_spaces = {"rel_x": spaces.Box(0, 255, (1,), np.uint8)}
+        self.game_wrapper.set_screen_mode(self.screen_mode)
+        if self.screen_mode is not None:
+            observation_spaces["screen"] = spaces.Box(0, 255, (n_stack, *self.screen_mode.size), np.uint8)
+        if tile_map:
+
+            # Only environments with the tile map watch the level number and sprite tables
+            ram_schema = self.game_wrapper.ram_schema.extend(TILE_MAP_SCHEMA)
+            if ram_schema is not self.game_wrapper.ram_schema:
+                self.game_wrapper.set_ram_schema(ram_schema)
+            observation_spaces["tiles"] = spaces.Box(0, OUT_OF_LEVEL, TILE_WINDOW, np.uint16)
+            observation_spaces["sprites"] = spaces.Box(-0x8000, 0x7FFF, (SPRITE_SLOTS, SPRITE_COLUMNS), np.int16)
+        self.observation_space = spaces.Dict(observation_spaces)
+
+        # A single unpooled screen is passed through as captured
+        stacked = self.screen_mode is not None and (n_stack > 1 or max_pool)
+        self.frame_stack = FrameStack(n_stack, max_pool, self.screen_mode.size) if stacked else None
+        self.tile_map = TileMap(wrapper, TILE_WINDOW) if tile_map else None
+        if action_mode not in ACTION_MODES:
+            raise ValueError(f"Unknown action mode {action_mode}; expected one of {', '.join(ACTION_MODES)}")
+        self.action_mode = action_mode
+        if action_mode == "discrete":
+            self.action_space = spaces.Discrete(len(DISCRETE_ACTIONS))
+        elif action_mode == "multi_binary":
+            self.action_space = spaces.MultiBinary(len(BUTTONS))
+        else:
+            self.action_space = spaces.Box(0, 1, (len(BUTTONS),), np.uint8)
         self.frame_skip = frame_skip
         self.end_goal = (718, 350)
         self.farthest_progress = 0
         self.progress_countdown = 0 # Time since progress
+        self.step_buf = np.zeros(1, dtype=STEP_DTYPE) # Reward inputs of the current step
         self.last_reward = 0
+        self.start_state = None # In-memory snapshot of the starting save state
+        self.use_snapshots = True
+
+        # A pool given by its settings is built on this environment's wrapper
+        if savestate_pool is True:
+            savestate_pool = SavestatePool(wrapper)
+        elif isinstance(savestate_pool, dict):
+            savestate_pool = SavestatePool(wrapper, **savestate_pool)
+        self.savestate_pool = savestate_pool if isinstance(savestate_pool, SavestatePool) else None
+        self.game_wrapper.set_step_watches(STEP_WATCHES)
+        self.last_frame = None # Emulator frame of the previous step's RAM snapshot
+        self.torn_frames = 0
+        self.dropped_frames = 0
+        self.duplicated_frames = 0
+        self.action = None # Last action, for the step log
+        self.episode_steps = 0
+        self.episode_reward = 0.0
+        self.step_log = LogSampler(logger)
+
+        # Time the hot-path calls by replacing them on this environment and its wrapper
+        self.profiler = None
+        self.server_profiling = False
+        if profile:
+            self.profiler = Profiler()
+            self.profiler.instrument(self.game_wrapper, WRAPPER_CALLS)
+            self.profiler.instrument(self, ENV_CALLS)
 
     '''
     ------------------------------------------------------------------------------
@@ -73,12 +192,14 @@ class SmwEnvironment(gym.Env):
     *	Gets the observation that will be sent to the SB3 reinforcement learning
         agent. Returns values necessary for determining the next set of inputs
         to improve game performance on. A screenshot of the game window and the
-        normalized distance between
+        normalized distance between. With frame stacking the screenshot is
+        captured straight into the frame stack and the screen is the stack.
+        The tile map is read from the emulator after the screen.
     *
-    * Arguments:   none
+    * Arguments:   An optional screen that was already captured for this step
     * Returns:     none
     '''
-    def _get_obs(self):
+    def _get_obs(self, screen:np.ndarray | None = None):
 
         # Get Mario's absolute position
         xpos = self.get_mario_pos()[0]
@@ -91,11 +212,35 @@ class SmwEnvironment(gym.Env):
            rel_pos = 0
         
         # Generate a dictionary of the current screenshot and Mario's relative goal position
-        retDict = {"screen" : self.game_wrapper.screenshot(), "rel_x" : rel_pos}
+        retDict = {"rel_x" : rel_pos}
+        if self.screen_mode is not None:
+            if screen is None:
+                screen = self.game_wrapper.screenshot(self.capture_buffer())
+            if self.frame_stack is not None:
+                screen = self.frame_stack.push(screen)
+            retDict["screen"] = screen
+
+        # Add the tiles and sprites around Mario
+        if self.tile_map is not None:
+            retDict["tiles"], retDict["sprites"] = self.tile_map.update(self.game_wrapper.ram_snapshot())
 
         # Return the dictionary to be used by SB3
         return retDict
 
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwEnvironment capture_buffer
+    * --------------------
+    * Description:
+    *	Returns the array the next screenshot should be written into so that it
+        lands in the frame stack without a copy
+    *
+    * Arguments:   none
+    * Returns:     A (1, height, width) uint8 array, or None without frame stacking
+    '''
+    def capture_buffer(self) -> np.ndarray | None:
+        return self.frame_stack.next_slot() if self.frame_stack is not None else None
+
     '''
     ------------------------------------------------------------------------------
     * Function: SmwEnvironment step
@@ -114,86 +259,176 @@ class SmwEnvironment(gym.Env):
     '''
     def step(self, action: ActType) -> tuple[ObsType, SupportsFloat, bool, bool, dict[str, Any]]:
 
-        # Display the current action to be taken this step
-        print(action)
-
-        # Enumerate the buttons in the action and determine if they are pressed (>0.5)
-        buttons_to_send = [button for idx,
-                           button in enumerate(BUTTONS) if action[idx] >= 0.5 and button != "D"]
-
         # Send the buttons to be pressed by the joypad in the emulator
-        # Advance emulatoro frames holding those buttons
-        self.game_wrapper.sendButtons(buttons_to_send)
-        self.game_wrapper.advance(self.frame_skip)
-
-        # Get the table of memory values specified in memory_server.lua
-        self.game_wrapper.populate_mem()
+        # Advance emulator frames holding those buttons and get the table of memory values
+        # Wrappers that support it do all three in a single round trip
+        self.action = action
+        self.game_wrapper.step_frames(self.action_to_buttons(action), self.frame_skip)
 
         # Get Mario's position relative to the goal post
-        obs = self._get_obs()
-        print(obs["rel_x"])
-
-        # Get Mario's velocity and position
-        mario_vel = self.get_mario_speed()
-        mario_pos = self.get_mario_pos()
-
-        # Determine if Mario reached the goal this step and the level timer is not expired
-        beat_level = self.game_wrapper.readu8(END_LVL_TIMER) != 0
+        result = self.finish_step(self._get_obs())
+        if self.profiler is not None:
+            result[4]["profile_ns"] = self.profiler.end_step()
+        return result
 
-        # Determine if Mario has made progress this step by checking if the current position
-        # is farther than the previous best position.
-        # Add 30 pixels to the position to prevent false flagging of Mario being stuck
-        if mario_pos[0] > self.farthest_progress:
-            self.farthest_progress = mario_pos[0] + 30
-            self.progress_countdown = 0
-
-        # Otherwise Mario has not made progress, increment countdown timer by the number advanced frames
-        # When the timer reaches the timout for progress, stop the episode
-        else:
-            self.progress_countdown += (1 / 60) * (self.frame_skip + 1)
-
-        # Display how much time is remaining to make progress
-        print(self.progress_countdown)
-
-        # Set the times-up flag if no progres was made in time
-        timesup = self.progress_countdown >= PROGRESS_COUNTDOWN_DEFAULT
-
-        # Determine if Mario dies and set the corresponding flag
-        mario_dead = self.game_wrapper.readu8(ANIM_TRIGGER_STATE) == PLAYER_DEAD_VAL
-        if mario_dead:
-            print("Mario died!")
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwEnvironment action_to_buttons
+    * --------------------
+    * Description:
+    *	Converts an action into the buttons to hold this step, by looking its
+        button mask up in the table of button strings
+    *
+    * Arguments:    An action of the action space (ActType)
+    * Returns:      The string of button characters to press (e.g. "Ar")
+    '''
+    def action_to_buttons(self, action: ActType) -> str:
+        return MASK_KEYS[actions_to_masks(np.asarray(action), self.action_mode)]
 
-        # Calculate the reward
-        reward = 0
-        punishment = 0
-        diffInPos = np.subtract(mario_pos, self.end_goal)
-        diffInVel = np.multiply(mario_vel, (1, 1))
-        distAway  = np.sqrt(diffInPos.dot(diffInPos))
-        closingVel = - (diffInPos.dot(diffInVel)) / distAway
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwEnvironment finish_step
+    * --------------------
+    * Description:
+    *	Computes the reward and termination flags once the emulator has been
+        stepped and the memory values refreshed. Split out of step so that a
+        batched vector environment can step many emulators at once and then
+        finish each environment's step. The reward itself is computed by
+        compute_rewards (smw_reward.py) on a one-row array, the same function
+        the batched vector environment calls on all its environments at once.
+    *
+    * Arguments:    The observation for this step
+    * Returns:      The same tuple as step
+    '''
+    def finish_step(self, obs: ObsType) -> tuple[ObsType, SupportsFloat, bool, bool, dict[str, Any]]:
+        ram = self.read_step(self.step_buf[0])
+        outcome = compute_rewards(self.step_buf, self.end_goal)
+        return self.complete_step(obs, ram, self.step_buf[0], outcome[0])
 
-        reward = (1.8 * closingVel + 1.1 * closingVel ** 2)
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwEnvironment read_step
+    * --------------------
+    * Description:
+    *	Fills one row of reward inputs (STEP_DTYPE) from this step's RAM
+        snapshot, the wrapper's step result, and the progress state, and
+        checks the step's frame stamps
+    *
+    * Arguments:    The row to fill
+    * Returns:      This step's RAM snapshot
+    '''
+    def read_step(self, step:np.void) -> RamSnapshot:
+
+        # Get Mario's velocity and position from this step's RAM snapshot
+        # The schema fields are read by name from the decoded record
+        ram = self.game_wrapper.ram_snapshot()
+        record = ram.record
+
+        # Wrappers that check the step watches every frame report what happened during the skip,
+        # and may have stopped before frame_skip frames; otherwise only the last frame is known
+        result = self.game_wrapper.step_result
+        frames = result.frames if result is not None else self.frame_skip
+        fired = result.fired if result is not None else set()
+        self.check_frames(ram, frames)
+
+        step["x_pos"], step["y_pos"] = record["x_pos"], record["y_pos"]
+        step["x_speed"], step["y_speed"] = record["x_speed"], record["y_speed"]
+        step["progress"] = max(record["x_pos"], result.maxima.get("progress", 0)) if result is not None else record["x_pos"]
+        step["frames"] = frames
+
+        # Mario reached the goal if the level timer started, and died if the death animation started
+        step["beat"] = record["end_level_timer"] != 0 or "beat" in fired
+        step["dead"] = record["anim_state"] == PLAYER_DEAD_VAL or "dead" in fired
+        step["farthest_progress"] = self.farthest_progress
+        step["progress_countdown"] = self.progress_countdown
+        return ram
 
-        # Apply a bonus or punishment: +30 for beating the level, -30 for not progressing
-        reward += 30 * beat_level
-        #punishment += 200 * mario_dead
-        punishment += 30 * timesup
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwEnvironment complete_step
+    * --------------------
+    * Description:
+    *	Applies a computed step: keeps the new progress state, updates the
+        savestate pool and the episode statistics, and logs the step
+    *
+    * Arguments:    The observation, the RAM snapshot, and the step's
+                    STEP_DTYPE and OUTCOME_DTYPE rows
+    * Returns:      The same tuple as step
+    '''
+    def complete_step(self, obs: ObsType, ram:RamSnapshot, step:np.void,
+                      outcome:np.void) -> tuple[ObsType, SupportsFloat, bool, bool, dict[str, Any]]:
+        self.farthest_progress = int(outcome["farthest_progress"])
+        self.progress_countdown = float(outcome["progress_countdown"])
+        mario_dead = bool(step["dead"])
+        timesup = bool(outcome["timesup"])
+
+        # Capture progress checkpoints for the savestate pool and count failures against them
+        if self.savestate_pool is not None:
+            if mario_dead or timesup:
+                self.savestate_pool.record_failure(step["x_pos"])
+            elif outcome["made_progress"] and not step["beat"]:
+                self.savestate_pool.capture(step["x_pos"])
 
         # Match the set flags to the appropriate dictionary term to indicate to SB3 why the episode ended
-        term_reason = "None"
-        if beat_level:
-            term_reason = "Beat"
-        elif timesup:
-            term_reason = "TimeUp"
-        elif mario_dead:
-            term_reason = "Died"
+        reward = outcome["reward"]
+        punishment = outcome["punishment"]
+        term_reason = TERM_REASONS[outcome["term"]]
 
         # Store the reward for the previous episode
         self.last_reward = reward
+        self.episode_steps += 1
+        self.episode_reward += float(reward - punishment)
+        done = bool(outcome["done"])
+
+        # Log every Nth step, and a summary of the episode when it ends
+        if self.step_log.sample():
+            logger.debug("Step %d: action %s, Mario at (%d, %d), rel_x %d, countdown %.2f, reward %.3f, punishment %d",
+                         self.episode_steps, self.action, step["x_pos"], step["y_pos"], obs["rel_x"],
+                         self.progress_countdown, reward, punishment)
+        if done:
+            logger.info("Episode ended (%s) after %d steps: reward %.2f, farthest X %d",
+                        term_reason, self.episode_steps, self.episode_reward, step["progress"])
+
+        # Return the screenshot and position, the reward, flags, and the term reason
+        info = {"term_reason" : term_reason,
+                "frame" : ram.frame,
+                "torn_frames" : self.torn_frames,
+                "dropped_frames" : self.dropped_frames,
+                "duplicated_frames" : self.duplicated_frames}
+        return obs, reward - punishment, done, False, info
 
-        # Display and return the position and reward values, flags, and return the screenshot
-        print(f"Mario is at ({mario_pos[0]}, {mario_pos[1]})")
-        print(f"Reward: {reward}\nPunishment: {punishment}")
-        return obs, reward - punishment, mario_dead or beat_level or timesup, False, {"term_reason" : term_reason}
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwEnvironment check_frames
+    * --------------------
+    * Description:
+    *	Checks the frame stamps of this step's observation. The screen must come
+        from the same frame as the RAM, and the RAM must be exactly as many
+        frames newer than the previous step's as the step advanced. Mismatches are counted rather
+        than raised, so the pipelined and async paths can be measured.
+        Wrappers that do not know the frame (None) are not checked.
+    *
+    * Arguments:    This step's RAM snapshot and the number of frames the step advanced
+    * Returns:      none
+    '''
+    def check_frames(self, ram:RamSnapshot, frames:int):
+        if ram.frame is None:
+            return
+
+        # The screen and the RAM must be read on the same frame
+        screen_frame = self.game_wrapper.screen_frame
+        if screen_frame is not None and screen_frame != ram.frame:
+            self.torn_frames += 1
+            logger.debug("Torn observation: screen from frame %d, RAM from frame %d", screen_frame, ram.frame)
+
+        # Fewer frames than the step advanced means a stale (duplicated) observation
+        if self.last_frame is not None:
+            advanced = ram.frame - self.last_frame
+            if advanced <= 0:
+                self.duplicated_frames += 1
+            elif advanced > frames:
+                self.dropped_frames += advanced - frames
+        self.last_frame = ram.frame
 
     '''
     ------------------------------------------------------------------------------
@@ -202,17 +437,17 @@ class SmwEnvironment(gym.Env):
     * Description:
     *	Obtains and returns Mario's current velocity from the in-game memory values.
     *
-    * Arguments:    none
+    * Arguments:    An optional RAM snapshot; the wrapper's latest snapshot by default
     * Returns:      A tuple of the x and y velocities. Note that due to the way
                     SNES games are rendered, moving upward is actually a negative
                     speed value, meaning that jump movement is negative. Positive
                     velocity is therefore found by negating the upward negative
                     movement.
     '''
-    def get_mario_speed(self) -> tuple[np.float32, np.float32]:
-        x_vel = np.int8(self.game_wrapper.readu8(X_VEL)) * np.float32(1 / 16)
-        y_vel = -np.int8(self.game_wrapper.readu8(Y_VEL)) * np.float32(1 / 16)
-        return x_vel, y_vel
+    def get_mario_speed(self, ram:RamSnapshot | None = None) -> tuple[np.float32, np.float32]:
+        ram = ram or self.game_wrapper.ram_snapshot()
+        record = ram.record
+        return record["x_speed"] * np.float32(1 / 16), -record["y_speed"] * np.float32(1 / 16)
 
     '''
     ------------------------------------------------------------------------------
@@ -221,11 +456,48 @@ class SmwEnvironment(gym.Env):
     * Description:
     *	Obtains and returns Mario's current position from the in-game memory values.
     *
-    * Arguments:    none
+    * Arguments:    An optional RAM snapshot; the wrapper's latest snapshot by default
     * Returns:      A tuple of the x and y positions
     '''
-    def get_mario_pos(self) -> tuple[np.uint16, np.uint16]:
-        return self.game_wrapper.readu16(X_ADDR), self.game_wrapper.readu16(Y_ADDR)
+    def get_mario_pos(self, ram:RamSnapshot | None = None) -> tuple[np.uint16, np.uint16]:
+        ram = ram or self.game_wrapper.ram_snapshot()
+        record = ram.record
+        return record["x_pos"], record["y_pos"]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwEnvironment profile
+    * --------------------
+    * Description:
+    *	Collects the emulator server's timings into the profiler and returns
+        a copy of the timings, optionally clearing them so the next call
+        covers only the calls made after this one
+    *
+    * Arguments:    Whether to clear the timings
+    * Returns:      A copy of the Profiler, or None if profiling is off
+    '''
+    def profile(self, reset:bool = False) -> Profiler | None:
+        if self.profiler is None:
+            return None
+        if self.server_profiling:
+            self.profiler.add_server(self.game_wrapper.server_profile(True))
+        profiler = self.profiler.copy()
+        if reset:
+            self.profiler.reset()
+        return profiler
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwEnvironment close
+    * --------------------
+    * Description:
+    *	Closes the game wrapper, which stops the emulator it started
+    *
+    * Arguments:    none
+    * Returns:      none
+    '''
+    def close(self):
+        self.game_wrapper.close()
 
     '''
     ------------------------------------------------------------------------------
@@ -248,13 +520,41 @@ class SmwEnvironment(gym.Env):
         if not self.game_wrapper.is_ready:
             self.game_wrapper.startGame()
 
-        # Load the save state
-        self.game_wrapper.loadState("state")
+        # Have the emulator server time its own work once it is connected
+        if self.profiler is not None and not self.server_profiling:
+            self.game_wrapper.server_profile(True)
+            self.server_profiling = True
+
+        # Start from a pooled checkpoint if the savestate pool picks one
+        # Otherwise load the save state from disk the first time, then restore it from an in-memory snapshot
+        # Wrappers without snapshot support keep loading the save state every episode
+        checkpoint = self.savestate_pool.sample() if self.savestate_pool is not None else None
+        if checkpoint is not None:
+            self.game_wrapper.restore(checkpoint.state)
+        elif self.start_state is not None:
+            self.game_wrapper.restore(self.start_state)
+        else:
+            self.game_wrapper.loadState("state")
+            if self.use_snapshots:
+                try:
+                    self.start_state = self.game_wrapper.snapshot()
+                except NotImplementedError:
+                    self.use_snapshots = False
+
+        # Read the restored state's RAM so the first observation is not built from the previous episode
+        self.game_wrapper.populate_mem()
 
         # Reset progress and reward values
-        self.farthest_progress = 0
+        # Loading a state moves the frame counter, so the next step starts a new frame sequence
+        self.last_frame = None
+        if self.frame_stack is not None:
+            self.frame_stack.reset()
+        # A checkpoint already starts partway through the level, so only progress past it is rewarded
+        self.farthest_progress = checkpoint.progress + PROGRESS_MARGIN if checkpoint is not None else 0
         self.progress_countdown = 0
         self.last_reward = 0
+        self.episode_steps = 0
+        self.episode_reward = 0.0
 
         # Return the initial observation from _get_obs including screenshot and position
         return self._get_obs(), {}
@@ -0,0 +1,183 @@
+'''
+******************************************************************************
+ * File:        smw_environment_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks SmwEnvironment against the mock Lua server: the frame
+                stamps of observations and the counts of torn, dropped, and
+                duplicated frames, and the observation shape of each screen
+                mode. The mock server is subclassed to misbehave
+                where a test needs it, so no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest smw_environment_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+import pytest
+from mock_lua_server import MockLuaServer
+from smw_environment import SmwEnvironment
+from GameWrapper.wrappers.SNES9x import SNES9x
+from GameWrapper.wrappers.Protocol import OP_FRAME, OP_STEP
+from GameWrapper.button.Buttons import BUTTONS
+from GameWrapper.wrappers.ScreenMode import SCREEN_MODES
+
+# Action holding right
+RIGHT = np.eye(len(BUTTONS), dtype=np.uint8)[BUTTONS.index("r")]
+
+'''
+------------------------------------------------------------------------------
+ * Class: TearingServer
+ * --------------------
+ * Description:
+ *	Represents a mock Lua server that lets the game run one frame between
+    the step reply and the screen capture
+ '''
+class TearingServer(MockLuaServer):
+    def handle_binary(self, opcode:int, payload:bytes) -> tuple[int, bytes]:
+        if opcode == OP_FRAME:
+            self.frame_advance()
+        return super().handle_binary(opcode, payload)
+
+'''
+------------------------------------------------------------------------------
+ * Class: SkippingServer
+ * --------------------
+ * Description:
+ *	Represents a mock Lua server that runs extra frames after every step
+    and then replays its last step reply once, like an emulator that drops
+    frames and then sends a stale observation
+ '''
+class SkippingServer(MockLuaServer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.steps = 0
+        self.last_reply = None
+
+    def handle_binary(self, opcode:int, payload:bytes) -> tuple[int, bytes]:
+        if opcode != OP_STEP:
+            return super().handle_binary(opcode, payload)
+        self.steps += 1
+        if self.steps == 3:
+            return self.last_reply
+        self.last_reply = super().handle_binary(opcode, payload)
+        for _ in range(2):
+            self.frame_advance()
+        return self.last_reply
+
+'''
+------------------------------------------------------------------------------
+* Function: make_env
+* --------------------
+* Description:
+*	Starts a mock server and builds an environment connected to it
+*
+* Arguments:   The mock server class and any extra SmwEnvironment arguments
+* Returns:     A tuple of the running server and the reset environment
+'''
+def make_env(server_cls:type = MockLuaServer, **env_kwargs) -> tuple[MockLuaServer, SmwEnvironment]:
+    server = server_cls(port=0)
+    server.start()
+    wrapper = SNES9x(port=server.port)
+    wrapper.connect_lua_socket()
+    wrapper.is_ready = True
+    env = SmwEnvironment(wrapper, **env_kwargs)
+    env.reset()
+    return server, env
+
+'''
+------------------------------------------------------------------------------
+* Function: close
+* --------------------
+* Description:
+*	Closes the environment's connection and stops its mock server
+*
+* Arguments:   The server and the environment
+* Returns:     none
+'''
+def close(server:MockLuaServer, env:SmwEnvironment):
+    env.game_wrapper.connection.close()
+    server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_frame_stamps
+* --------------------
+* Description:
+*	Checks that each step reports the emulator frame of its observation and
+    that a well-behaved emulator has no torn, dropped, or duplicated frames
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_frame_stamps():
+    server, env = make_env(frame_skip=4)
+    for _ in range(5):
+        info = env.step(RIGHT)[4]
+        assert info["frame"] == server.frame
+        assert env.game_wrapper.screen_frame == server.frame
+    assert (info["torn_frames"], info["dropped_frames"], info["duplicated_frames"]) == (0, 0, 0)
+    close(server, env)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_torn_frames
+* --------------------
+* Description:
+*	Checks that a screen captured on a later frame than the RAM values is
+    counted as torn on every step
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_torn_frames():
+    server, env = make_env(TearingServer)
+    for _ in range(3):
+        info = env.step(RIGHT)[4]
+    assert info["torn_frames"] == 3
+    close(server, env)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_dropped_and_duplicated_frames
+* --------------------
+* Description:
+*	Checks that frames run beyond the step are counted as dropped and that
+    an observation that did not advance is counted as duplicated
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_dropped_and_duplicated_frames():
+    server, env = make_env(SkippingServer, screen_mode=None)
+    for _ in range(4):
+        info = env.step(RIGHT)[4]
+
+    # Steps 2 and 4 each follow two extra frames; step 3 replays the reply of step 2
+    assert info["duplicated_frames"] == 1
+    assert info["dropped_frames"] == 2 * 2
+    close(server, env)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_screen_mode_observations
+* --------------------
+* Description:
+*	Checks that stacked screens have the screen mode's size and match
+    the observation space, with Mario's block visible in every mode
+*
+* Arguments:   The screen mode name
+* Returns:     none
+'''
+@pytest.mark.parametrize("name", list(SCREEN_MODES))
+def test_screen_mode_observations(name:str):
+    server, env = make_env(screen_mode=name, n_stack=2)
+    obs = env.step(RIGHT)[0]
+    assert obs["screen"].shape == (2, *SCREEN_MODES[name].size)
+    assert env.observation_space["screen"].contains(obs["screen"])
+    assert np.ptp(obs["screen"][-1]) > 0
+    close(server, env)
@@ -0,0 +1,442 @@
+'''
+******************************************************************************
+ * File:        smw_vec_env.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: This program builds Stable Baselines 3 (SB3) vectorized
+                environments of SmwEnvironment. Each environment drives its
+                own SNES9x-rr instance with its own TCP port, emulator
+                directory, and savestate slot, so training throughput scales
+                with the number of cores instead of being pinned to a single
+                emulator. SmwBatchedVecEnv steps every emulator from a single
+                process: the step request is sent to all Lua servers at once
+                and the replies are collected with one selectors poll loop.
+                make_replay_vec_env builds the same environments on
+                ReplayWrapper, without any emulator, for benchmarking.
+ * Usage:       This program is automatically used by the Train.py program
+                and is not intended for use on its own.
+ ******************************************************************************
+ '''
+
+# Imports
+import selectors
+from copy import deepcopy
+from time import perf_counter_ns
+from typing import Any, Callable, Sequence
+import numpy as np
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecEnv
+from stable_baselines3.common.vec_env.base_vec_env import VecEnvObs, VecEnvStepReturn
+from smw_environment import SmwEnvironment, actions_to_masks
+from smw_reward import compute_rewards, STEP_DTYPE
+from GameWrapper.wrappers.RamSnapshot import RamSnapshot
+from GameWrapper.wrappers.Launcher import EmulatorInstance, plan_instances
+from GameWrapper.wrappers.Protocol import OP_FRAME, OP_STEP, STEP_REQUEST, ProtocolError, check_reply, split_frame_stamp
+
+# Seconds to wait for any Lua server to reply before giving up on a batched step
+STEP_TIMEOUT = 100
+
+'''
+------------------------------------------------------------------------------
+* Function: make_smw_env
+* --------------------
+* Description:
+*	Creates the constructor for one environment. The SNES9x wrapper is
+    imported and built inside the returned function so that it is created in
+    the worker process that owns the emulator.
+*
+* Arguments:   The emulator instance, the number of frames to skip per step,
+               any extra SmwEnvironment arguments (e.g. n_stack), and any
+               extra SNES9x constructor arguments
+* Returns:     A function that builds the SmwEnvironment
+'''
+def make_smw_env(instance:EmulatorInstance, frame_skip:int = 4, env_kwargs:dict[str, Any] | None = None,
+                 **wrapper_kwargs) -> Callable[[], SmwEnvironment]:
+    def init() -> SmwEnvironment:
+        from GameWrapper.wrappers.SNES9x import SNES9x
+        return SmwEnvironment(SNES9x(**instance.wrapper_kwargs(), **wrapper_kwargs), frame_skip=frame_skip,
+                              **(env_kwargs or {}))
+    return init
+
+'''
+------------------------------------------------------------------------------
+* Function: make_smw_vec_env
+* --------------------
+* Description:
+*	Plans n emulator instances (ports, directories, savestate slots) and
+    builds a vectorized environment with one SmwEnvironment per instance.
+    SubprocVecEnv runs every environment in its own process.
+*
+* Arguments:   The number of environments, the number of frames to skip per
+               step, an optional base port, whether instances share one
+               emulator directory, the SB3 VecEnv class, any extra
+               SmwEnvironment arguments, and any extra SNES9x constructor
+               arguments
+* Returns:     The vectorized environment
+'''
+def make_smw_vec_env(n_envs:int,
+                     frame_skip:int = 4,
+                     base_port:int | None = None,
+                     shared_dir:bool = False,
+                     vec_env_cls:type[VecEnv] = SubprocVecEnv,
+                     env_kwargs:dict[str, Any] | None = None,
+                     **wrapper_kwargs) -> VecEnv:
+    instances = plan_instances(n_envs, base_port=base_port, shared_dir=shared_dir)
+    return vec_env_cls([make_smw_env(instance, frame_skip, env_kwargs, **wrapper_kwargs) for instance in instances])
+
+'''
+------------------------------------------------------------------------------
+ * Class: SmwBatchedVecEnv
+ * --------------------
+ * Description:
+ *	Represents a vectorized environment that steps N SmwEnvironments from one
+    process. Each step sends OP_STEP (and OP_FRAME when the frame is not in a
+    shared ring) to every Lua server before waiting on any of them, then polls
+    all sockets with selectors until every reply has arrived. Frames are
+    decoded straight into preallocated (N, 1, height, width) and (N, 1)
+    arrays, or into each environment's frame stack when it stacks screens.
+    Every environment must use the SNES9x wrapper with the binary protocol
+    and without its own pipeline thread. The requests bypass the wrapper's
+    step_frames and screenshot, so for profiled environments the time from
+    sending the step to applying its reply is recorded as step_frames, and
+    the time from there to decoding the frame as screenshot.
+ '''
+class SmwBatchedVecEnv(VecEnv):
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv constructor
+    * --------------------
+    * Description:
+    *	Builds the environments and allocates the batch observation, reward,
+        and done arrays. The emulators are started by the first reset.
+    *
+    * Arguments:   A list of functions that each build a SmwEnvironment
+    * Returns:     none
+    '''
+    def __init__(self, env_fns:list[Callable[[], SmwEnvironment]]):
+        self.envs = [fn() for fn in env_fns]
+        env = self.envs[0]
+        super().__init__(len(self.envs), env.observation_space, env.action_space)
+        self.buf_obs = {key: np.zeros((self.num_envs, *space.shape), dtype=space.dtype)
+                        for key, space in self.observation_space.spaces.items()}
+        self.buf_rews = np.zeros((self.num_envs,), dtype=np.float32)
+        self.buf_dones = np.zeros((self.num_envs,), dtype=bool)
+        self.buf_infos:list[dict[str, Any]] = [{} for _ in range(self.num_envs)]
+        self.buf_steps = np.zeros((self.num_envs,), dtype=STEP_DTYPE)
+        self.step_obs:list[dict[str, Any] | None] = [None] * self.num_envs
+        self.step_rams:list[RamSnapshot | None] = [None] * self.num_envs
+        self.actions = None
+        self.selector = None
+        self.expected:list[list[tuple[int, int]]] = [[] for _ in range(self.num_envs)]
+        self.sent_ns = [0] * self.num_envs # When each environment's step was sent, or its step reply applied
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv register_connections
+    * --------------------
+    * Description:
+    *	Registers every Lua server socket with the selector once the emulators
+        are connected, and checks that each connection can be batched
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def register_connections(self):
+        self.selector = selectors.DefaultSelector()
+        for idx, env in enumerate(self.envs):
+            connection = env.game_wrapper.connection
+            if not connection.binary or connection.pipelined:
+                raise ProtocolError("Batched stepping requires the binary protocol without a pipeline")
+            self.selector.register(connection.socket, selectors.EVENT_READ, idx)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv save_obs
+    * --------------------
+    * Description:
+    *	Copies an environment's observation into its row of the batch arrays
+    *
+    * Arguments:   The environment index and its observation dictionary
+    * Returns:     none
+    '''
+    def save_obs(self, env_idx:int, obs:dict[str, Any]):
+        for key, buffer in self.buf_obs.items():
+            buffer[env_idx] = obs[key]
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv screen_buffer
+    * --------------------
+    * Description:
+    *	Returns the array an environment's next frame is decoded into: the next
+        slot of its frame stack, or its row of the batch screen array
+    *
+    * Arguments:   The environment index
+    * Returns:     A (1, height, width) uint8 array
+    '''
+    def screen_buffer(self, env_idx:int) -> np.ndarray:
+        out = self.envs[env_idx].capture_buffer()
+        return self.buf_obs["screen"][env_idx] if out is None else out
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv obs_from_buf
+    * --------------------
+    * Description:
+    *	Returns a copy of the batch observation so the caller may keep it
+        across steps
+    *
+    * Arguments:   none
+    * Returns:     The batch observation dictionary
+    '''
+    def obs_from_buf(self) -> VecEnvObs:
+        return {key: buffer.copy() for key, buffer in self.buf_obs.items()}
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv reset
+    * --------------------
+    * Description:
+    *	Resets every environment (starting the emulators on the first call)
+        and returns the batch observation
+    *
+    * Arguments:   none
+    * Returns:     The batch observation dictionary
+    '''
+    def reset(self) -> VecEnvObs:
+        for env_idx, env in enumerate(self.envs):
+            maybe_options = {"options": self._options[env_idx]} if self._options[env_idx] else {}
+            obs, self.reset_infos[env_idx] = env.reset(seed=self._seeds[env_idx], **maybe_options)
+            self.save_obs(env_idx, obs)
+        if self.selector is None:
+            self.register_connections()
+        self._reset_seeds()
+        self._reset_options()
+        return self.obs_from_buf()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv step_async
+    * --------------------
+    * Description:
+    *	Sends the step request for every environment without waiting for any
+        reply. Environments with a screen but without a shared ring also get
+        a frame request queued right behind the step. Each request is
+        remembered as its (sequence number, opcode).
+    *
+    * Arguments:   The actions, one per environment
+    * Returns:     none
+    '''
+    def step_async(self, actions:np.ndarray):
+        self.actions = actions
+
+        # Every environment's button mask at once; the environments share the action space
+        masks = actions_to_masks(np.asarray(actions), self.envs[0].action_mode)
+        for env_idx, env in enumerate(self.envs):
+            wrapper = env.game_wrapper
+            env.action = actions[env_idx]
+            wrapper.ring_frame = None
+            request = STEP_REQUEST.pack(env.frame_skip, masks[env_idx], wrapper.ring_flags())
+            self.sent_ns[env_idx] = perf_counter_ns()
+            self.expected[env_idx] = [(wrapper.connection.send_request(OP_STEP, request), OP_STEP)]
+            if wrapper.ring is None and env.screen_mode is not None:
+                self.expected[env_idx].append((wrapper.connection.send_request(OP_FRAME), OP_FRAME))
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv handle_reply
+    * --------------------
+    * Description:
+    *	Applies one reply to its environment: the step reply refreshes the
+        RAM values and the frame reply is decoded into the batch screen row.
+        Both are timed into the environment's profiler, if it has one.
+    *
+    * Arguments:   The environment index, reply opcode, sequence number, and payload
+    * Returns:     none
+    '''
+    def handle_reply(self, env_idx:int, reply_opcode:int, reply_seq:int, reply:bytes):
+        expected = self.expected[env_idx]
+        if not expected or reply_seq != expected[0][0]:
+            raise ProtocolError(f"Reply for sequence {reply_seq} received while waiting on {expected}")
+        env = self.envs[env_idx]
+        wrapper = env.game_wrapper
+        reply = check_reply(reply_opcode, reply)
+        if expected[0][1] == OP_STEP:
+            wrapper.update_step(reply)
+            call = "step_frames"
+        else:
+            wrapper.screen_frame, reply = split_frame_stamp(reply)
+            wrapper.grayscale.convert_gd(reply, out=self.screen_buffer(env_idx))
+            call = "screenshot"
+        if env.profiler is not None:
+            now = perf_counter_ns()
+            env.profiler.record(call, now - self.sent_ns[env_idx])
+            self.sent_ns[env_idx] = now
+        expected.pop(0)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv wait_replies
+    * --------------------
+    * Description:
+    *	Polls every Lua server socket until all outstanding replies have been
+        received and applied
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def wait_replies(self):
+        remaining = set()
+        for env_idx, env in enumerate(self.envs):
+            connection = env.game_wrapper.connection
+            while self.expected[env_idx] and (message := connection.parse_reply()) is not None:
+                self.handle_reply(env_idx, *message)
+            if self.expected[env_idx]:
+                remaining.add(env_idx)
+        while remaining:
+            events = self.selector.select(STEP_TIMEOUT)
+            if not events:
+                raise TimeoutError("Timed out waiting for the Lua servers")
+            for key, _ in events:
+                env_idx = key.data
+                connection = self.envs[env_idx].game_wrapper.connection
+                connection.read_available()
+                while self.expected[env_idx] and (message := connection.parse_reply()) is not None:
+                    self.handle_reply(env_idx, *message)
+                if not self.expected[env_idx]:
+                    remaining.discard(env_idx)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv step_wait
+    * --------------------
+    * Description:
+    *	Waits for every emulator, then finishes each environment's step from
+        its refreshed RAM values. The rewards of all environments are
+        computed together by compute_rewards. Environments whose episode
+        ended are reset and their final observation is kept in the info
+        dictionary.
+    *
+    * Arguments:   none
+    * Returns:     The batch observation, rewards, dones, and infos
+    '''
+    def step_wait(self) -> VecEnvStepReturn:
+        self.wait_replies()
+        for env_idx, env in enumerate(self.envs):
+            wrapper = env.game_wrapper
+            screen = self.screen_buffer(env_idx) if wrapper.ring is None and env.screen_mode is not None else None
+            self.step_obs[env_idx] = env._get_obs(screen)
+            self.step_rams[env_idx] = env.read_step(self.buf_steps[env_idx])
+
+        # Every environment's reward in one pass; the environments share the goal
+        outcomes = compute_rewards(self.buf_steps, self.envs[0].end_goal)
+        for env_idx, env in enumerate(self.envs):
+            obs, self.buf_rews[env_idx], terminated, truncated, self.buf_infos[env_idx] = env.complete_step(
+                self.step_obs[env_idx], self.step_rams[env_idx], self.buf_steps[env_idx], outcomes[env_idx])
+            if env.profiler is not None:
+                self.buf_infos[env_idx]["profile_ns"] = env.profiler.end_step()
+            self.buf_dones[env_idx] = terminated or truncated
+            self.buf_infos[env_idx]["TimeLimit.truncated"] = truncated and not terminated
+            if self.buf_dones[env_idx]:
+                self.buf_infos[env_idx]["terminal_observation"] = {key: np.array(value) for key, value in obs.items()}
+                obs, self.reset_infos[env_idx] = env.reset()
+            self.save_obs(env_idx, obs)
+        return self.obs_from_buf(), np.copy(self.buf_rews), np.copy(self.buf_dones), deepcopy(self.buf_infos)
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv close
+    * --------------------
+    * Description:
+    *	Closes the selector and every environment, which stops their emulators
+    *
+    * Arguments:   none
+    * Returns:     none
+    '''
+    def close(self):
+        if self.selector is not None:
+            self.selector.close()
+        for env in self.envs:
+            env.close()
+
+    '''
+    ------------------------------------------------------------------------------
+    * Function: SmwBatchedVecEnv get_attr / set_attr / env_method / env_is_wrapped
+    * --------------------
+    * Description:
+    *	VecEnv accessors for the wrapped environments, as in SB3's DummyVecEnv
+    *
+    * Arguments:   The attribute or method name, its value or arguments, and
+                   the environment indices
+    * Returns:     A list with one result per selected environment
+    '''
+    def get_attr(self, attr_name:str, indices=None) -> list[Any]:
+        return [getattr(env, attr_name) for env in self.get_target_envs(indices)]
+
+    def set_attr(self, attr_name:str, value:Any, indices=None) -> None:
+        for env in self.get_target_envs(indices):
+            setattr(env, attr_name, value)
+
+    def env_method(self, method_name:str, *method_args, indices=None, **method_kwargs) -> list[Any]:
+        return [getattr(env, method_name)(*method_args, **method_kwargs) for env in self.get_target_envs(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> list[bool]:
+        return [False for _ in self.get_target_envs(indices)]
+
+    def get_target_envs(self, indices) -> Sequence[SmwEnvironment]:
+        return [self.envs[i] for i in self._get_indices(indices)]
+
+'''
+------------------------------------------------------------------------------
+* Function: make_smw_batched_vec_env
+* --------------------
+* Description:
+*	Plans n emulator instances and builds a SmwBatchedVecEnv that steps all
+    of them from this process
+*
+* Arguments:   The number of environments, the number of frames to skip per
+               step, an optional base port, whether instances share one
+               emulator directory, any extra SmwEnvironment arguments, and
+               any extra SNES9x constructor arguments
+* Returns:     The batched vectorized environment
+'''
+def make_smw_batched_vec_env(n_envs:int,
+                             frame_skip:int = 4,
+                             base_port:int | None = None,
+                             shared_dir:bool = False,
+                             env_kwargs:dict[str, Any] | None = None,
+                             **wrapper_kwargs) -> SmwBatchedVecEnv:
+    return make_smw_vec_env(n_envs, frame_skip, base_port, shared_dir, SmwBatchedVecEnv, env_kwargs, **wrapper_kwargs)
+
+'''
+------------------------------------------------------------------------------
+* Function: make_replay_vec_env
+* --------------------
+* Description:
+*	Builds a vectorized environment of SmwEnvironments on ReplayWrapper
+    backends, so vector environment overhead can be measured without
+    SNES9x. Every environment replays the same trace, or runs the random
+    dynamics with its own seed.
+*
+* Arguments:   The number of environments, the trace path or None for random
+               dynamics, the number of frames to skip per step, the SB3
+               VecEnv class, any extra SmwEnvironment arguments, and any
+               extra ReplayWrapper constructor arguments (e.g. latency)
+* Returns:     The vectorized environment
+'''
+def make_replay_vec_env(n_envs:int,
+                        trace_path:str | None = None,
+                        frame_skip:int = 4,
+                        vec_env_cls:type[VecEnv] = SubprocVecEnv,
+                        env_kwargs:dict[str, Any] | None = None,
+                        seed:int = 0,
+                        **wrapper_kwargs) -> VecEnv:
+    def make_env(env_idx:int) -> Callable[[], SmwEnvironment]:
+        def init() -> SmwEnvironment:
+            from GameWrapper.wrappers.ReplayWrapper import ReplayWrapper
+            return SmwEnvironment(ReplayWrapper(trace_path, seed=seed + env_idx, **wrapper_kwargs),
+                                  frame_skip=frame_skip, **(env_kwargs or {}))
+        return init
+    return vec_env_cls([make_env(env_idx) for env_idx in range(n_envs)])
@@ -0,0 +1,346 @@
+'''
+******************************************************************************
+ * File:        snes9x_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the SNES9x game wrapper against the mock Lua server in
+                place of the emulator: the combined step request, with the
+                text protocol as the reference, pipelined steps, screen
+                capture over the socket or through the shared ring buffer,
+                frames written to the ring only while screens are taken,
+                in-memory snapshots, and stopping the emulator on close.
+                Note that the emulator launch is skipped, so no emulator is
+                needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest snes9x_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import subprocess
+import sys
+import numpy as np
+import pytest
+from mock_lua_server import MockLuaServer
+from GameWrapper.wrappers.SNES9x import SNES9x
+from GameWrapper.wrappers.RingBuffer import FrameRing, FrameRingProducer, SLOT_HEADER
+from GameWrapper.wrappers.WrapperInterface import X_ADDR, X_VEL
+from GameWrapper.wrappers.Protocol import ProtocolError
+from GameWrapper.wrappers.ScreenMode import SCREEN_MODES
+from GameWrapper.button.Buttons import BUTTONS
+from smw_environment import SmwEnvironment
+
+'''
+------------------------------------------------------------------------------
+* Function: connect
+* --------------------
+* Description:
+*	Starts a mock server on a free port and connects a wrapper to it
+*
+* Arguments:   The keyword arguments of the SNES9x constructor
+* Returns:     A tuple of the running server and the connected wrapper
+'''
+def connect(**kwargs) -> tuple[MockLuaServer, SNES9x]:
+    server = MockLuaServer(port=0)
+    server.start()
+    wrapper = SNES9x(port=server.port, **kwargs)
+    wrapper.connect_lua_socket()
+    wrapper.is_ready = True
+    return server, wrapper
+
+'''
+------------------------------------------------------------------------------
+* Function: emulator
+* --------------------
+* Description:
+*	Pytest fixture yielding a wrapper connected to a mock server over the
+    binary protocol, closed after the test
+*
+* Arguments:   none
+* Returns:     A tuple of the server and the wrapper
+'''
+@pytest.fixture
+def emulator():
+    server, wrapper = connect()
+    yield server, wrapper
+    wrapper.connection.close()
+    server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_step_frames
+* --------------------
+* Description:
+*	Checks that one combined step holds the buttons for every frame and
+    returns the memory values read after the last one
+*
+* Arguments:   The connected wrapper
+* Returns:     none
+'''
+def test_step_frames(emulator):
+    server, wrapper = emulator
+    wrapper.step_frames(["r"], 8)
+    assert server.frame == 8
+    assert wrapper.ram.frame == 8
+    assert wrapper.readu16(X_ADDR) == 16
+    assert wrapper.ram.s8(X_VEL) == 0x20
+
+    # The buttons are released after the step
+    wrapper.advance(1)
+    wrapper.populate_mem()
+    assert wrapper.readu16(X_ADDR) == 16
+
+'''
+------------------------------------------------------------------------------
+* Function: test_step_matches_text_protocol
+* --------------------
+* Description:
+*	Checks that the combined step leaves the game in the same state as the
+    separate press, advance, and memory commands of the text protocol
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_step_matches_text_protocol():
+    results = []
+    for binary_protocol in (True, False):
+        server, wrapper = connect(binary_protocol=binary_protocol)
+        assert wrapper.connection.binary == binary_protocol
+        for keys, n in ((["r"], 4), (["l", "B"], 3), ([], 2), (["r", "A"], 5)):
+            wrapper.step_frames(keys, n)
+        results.append((server.frame, wrapper.ram.data.tobytes()))
+        wrapper.connection.close()
+        server.stop()
+    assert results[0] == results[1]
+
+'''
+------------------------------------------------------------------------------
+* Function: test_pipelined_steps
+* --------------------
+* Description:
+*	Queues steps on the pipeline and checks that each reply updates the
+    memory values in order before its future resolves
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_pipelined_steps():
+    server, wrapper = connect(pipeline=True)
+    assert wrapper.connection.pipelined
+    positions = []
+    update_step = wrapper.update_step
+    def record_step(reply:bytes):
+        update_step(reply)
+        positions.append(int(wrapper.readu16(X_ADDR)))
+    wrapper.update_step = record_step
+    futures = [wrapper.step_frames_async(["r"], 2) for _ in range(6)]
+    wrapper.populate_mem_async().result(5)
+    assert all(future.done() for future in futures)
+    assert positions == [4, 8, 12, 16, 20, 24]
+    assert wrapper.ram.frame == 12
+    wrapper.connection.close()
+    server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_socket_screenshot
+* --------------------
+* Description:
+*	Checks that the framebuffer sent by the Lua server is converted to the
+    grayscale screen with Mario's block where the mock server drew it, and
+    stamped with the frame it was captured on
+*
+* Arguments:   The connected wrapper
+* Returns:     none
+'''
+def test_socket_screenshot(emulator):
+    server, wrapper = emulator
+    wrapper.step_frames(["r"], 10)
+    screen = wrapper.screenshot()
+    assert screen.shape == (1, 224, 256) and screen.dtype == np.uint8
+    assert wrapper.screen_frame == server.frame == 10
+    block = screen[0, 176:192, 20:36]
+    assert (block == block[0, 0]).all()
+    assert block[0, 0] != screen[0, 0, 0]
+    assert (screen[0, :176] == screen[0, 0, 0]).all()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_ring_matches_socket
+* --------------------
+* Description:
+*	Runs the same steps with the RAM values and frames passed through the
+    shared ring buffer and over the socket, and checks that both give the
+    same memory values, screens, and frame stamps
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_ring_matches_socket(tmp_path):
+    results = []
+    for shared_ring in (str(tmp_path / "ring.bin"), None):
+        server, wrapper = connect(shared_ring=shared_ring)
+        assert (wrapper.ring is not None) == (shared_ring is not None)
+        for keys, n in ((["r"], 6), ([], 1), (["r"], 3)):
+            wrapper.step_frames(keys, n)
+            screen = wrapper.screenshot().copy()
+            results.append((wrapper.ram.data.tobytes(), wrapper.ram.frame, wrapper.screen_frame, screen.tobytes()))
+        wrapper.connection.close()
+        server.stop()
+    assert results[:3] == results[3:]
+
+'''
+------------------------------------------------------------------------------
+* Function: test_ring_frames_on_request
+* --------------------
+* Description:
+*	Checks that steps and memory reads through the shared ring only have
+    the server capture the frame while screenshots are taken, and that a
+    screenshot after a step without a frame asks for one
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_ring_frames_on_request(tmp_path):
+    server, wrapper = connect(shared_ring=str(tmp_path / "ring.bin"))
+    captures = []
+    gdscreenshot = server.gdscreenshot
+    server.gdscreenshot = lambda: captures.append(server.frame) or gdscreenshot()
+
+    wrapper.set_screen_mode(None)
+    wrapper.step_frames(["r"], 4)
+    wrapper.populate_mem()
+    assert captures == [] and wrapper.ring_frame is None and wrapper.ram.frame == server.frame
+
+    wrapper.set_screen_mode(SCREEN_MODES["full"])
+    screen = wrapper.screenshot().copy()
+    assert captures == [server.frame] and wrapper.screen_frame == server.frame
+    wrapper.step_frames(["r"], 4)
+    assert captures[-1] == server.frame and wrapper.ring_frame is not None
+    assert not np.array_equal(wrapper.screenshot(), screen) and len(captures) == 2
+    wrapper.close()
+    server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_ring_torn_slot
+* --------------------
+* Description:
+*	Checks that a slot whose sequence number is odd, i.e. still being
+    written, is rejected
+*
+* Arguments:   The pytest temporary directory
+* Returns:     none
+'''
+def test_ring_torn_slot(tmp_path):
+    ring = FrameRing(str(tmp_path / "ring.bin"), slot_count=2, ram_size=4)
+    producer = FrameRingProducer(ring.path)
+    count = producer.write(b"\x01\x02\x03\x04", bytes(ring.layout.frame_size), 42)
+    ram, _, frame = ring.slot(count)
+    assert ram.tolist() == [1, 2, 3, 4] and frame == 42
+    header, _, _ = ring.layout.slot_offset(0)
+    SLOT_HEADER.pack_into(producer.map, header, 3, 43)
+    with pytest.raises(RuntimeError):
+        ring.slot(count)
+    producer.close()
+    ring.close()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_snapshot_restore
+* --------------------
+* Description:
+*	Checks that restoring a snapshot brings back the memory values it was
+    taken with, any number of times, and that a released or foreign token
+    cannot be restored
+*
+* Arguments:   The connected wrapper
+* Returns:     none
+'''
+def test_snapshot_restore(emulator):
+    server, wrapper = emulator
+    wrapper.step_frames(["r"], 5)
+    state = wrapper.snapshot()
+    for _ in range(2):
+        wrapper.step_frames(["r"], 7)
+        assert wrapper.readu16(X_ADDR) > 10
+        wrapper.restore(state)
+        wrapper.populate_mem()
+        assert wrapper.readu16(X_ADDR) == 10
+    wrapper.release(state)
+    with pytest.raises(ProtocolError, match="Unknown snapshot"):
+        wrapper.restore(state)
+    with pytest.raises(ValueError):
+        wrapper.restore(b"not a token")
+
+'''
+------------------------------------------------------------------------------
+* Function: test_text_protocol_snapshots
+* --------------------
+* Description:
+*	Checks that the text protocol reports snapshots as unsupported without
+    sending a binary request, and stays usable afterwards
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_text_protocol_snapshots():
+    server, wrapper = connect(binary_protocol=False)
+    with pytest.raises(NotImplementedError):
+        wrapper.snapshot()
+    with pytest.raises(NotImplementedError):
+        wrapper.restore(b"S9XS\x00\x00\x00\x00")
+    wrapper.step_frames(["r"], 5)
+    assert wrapper.readu16(X_ADDR) == 10
+    wrapper.close()
+    server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_reset_restores_snapshot
+* --------------------
+* Description:
+*	Checks that the environment loads the save state once and restores the
+    episodes after it from its in-memory snapshot
+*
+* Arguments:   The connected wrapper
+* Returns:     none
+'''
+def test_reset_restores_snapshot(emulator):
+    server, wrapper = emulator
+    loads = []
+    load_save = server.load_save
+    server.load_save = lambda: (loads.append(server.frame), load_save())
+    env = SmwEnvironment(wrapper, screen_mode=None)
+    first, _ = env.reset()
+    for _ in range(3):
+        env.step(np.eye(len(BUTTONS), dtype=np.uint8)[BUTTONS.index("r")])
+        obs, _ = env.reset()
+        assert obs["rel_x"] == first["rel_x"]
+    assert len(loads) == 1 and env.start_state is not None
+
+'''
+------------------------------------------------------------------------------
+* Function: test_close_stops_emulator
+* --------------------
+* Description:
+*	Checks that closing the environment closes the Lua connection and stops
+    the emulator process, with a sleeping Python process standing in for it
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_close_stops_emulator():
+    server, wrapper = connect()
+    wrapper.process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    process = wrapper.process
+    env = SmwEnvironment(wrapper, screen_mode=None)
+    env.reset()
+    env.close()
+    assert process.poll() is not None and wrapper.process is None
+    assert wrapper.connection.socket.fileno() == -1 and not wrapper.is_ready
+    env.close()
+    server.stop()
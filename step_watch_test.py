@@ -0,0 +1,172 @@
+'''
+******************************************************************************
+ * File:        step_watch_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the step watches in StepWatch.py: their wire encoding,
+                the step summary in front of an OP_STEP reply, and that the
+                mock Lua server stops a step on the frame a stop watch fires,
+                which ends the SmwEnvironment episode even with a large frame
+                skip. Note that no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest step_watch_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+import pytest
+from mock_lua_server import MockLuaServer
+from GameWrapper.wrappers.StepWatch import *
+from GameWrapper.wrappers.Protocol import MAX_STEP_WATCHES
+from GameWrapper.wrappers.SNES9x import SNES9x
+from GameWrapper.wrappers.WrapperInterface import X_ADDR
+from GameWrapper.button.Buttons import BUTTONS
+from smw_environment import SmwEnvironment
+
+# Watches on a simulated byte RAM: stop when 0x10 is 5 or 0x11 leaves 0, and track the maximum of 0x12
+WATCHES = [
+    StepWatch("five", 0x10, WATCH_EQUAL, 5),
+    StepWatch("moved", 0x11, WATCH_NOT_EQUAL, 0),
+    StepWatch("peak", 0x12, WATCH_MAX, width=2),
+]
+
+'''
+------------------------------------------------------------------------------
+ * Class: DyingServer
+ * --------------------
+ * Description:
+ *	Represents a mock Lua server in which Mario dies on a given frame
+ '''
+class DyingServer(MockLuaServer):
+    def __init__(self, death_frame:int, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.death_frame = death_frame
+
+    def frame_advance(self):
+        super().frame_advance()
+        if self.frame == self.death_frame:
+            self.ram[0x71] = 9
+
+'''
+------------------------------------------------------------------------------
+* Function: test_watch_round_trip
+* --------------------
+* Description:
+*	Checks that decoded watches match the encoded ones, named by index
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_watch_round_trip():
+    decoded = decode_watches(encode_watches(WATCHES))
+    assert [watch.name for watch in decoded] == ["0", "1", "2"]
+    assert [(watch.address, watch.kind, watch.value, watch.width) for watch in decoded] == \
+           [(watch.address, watch.kind, watch.value, watch.width) for watch in WATCHES]
+
+'''
+------------------------------------------------------------------------------
+* Function: test_watch_limits
+* --------------------
+* Description:
+*	Checks that too many watches and unsupported widths are rejected
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_watch_limits():
+    with pytest.raises(ValueError):
+        encode_watches(WATCHES * MAX_STEP_WATCHES)
+    with pytest.raises(ValueError):
+        StepWatch("wide", 0x10, WATCH_MAX, width=4)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_tracker_summary
+* --------------------
+* Description:
+*	Runs the tracker over a few frames and checks that the encoded summary
+    decodes to the same result, with the rest of the reply after it
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_tracker_summary():
+    memory = bytearray(0x20)
+    tracker = StepTracker(WATCHES)
+    stopped = []
+    for frame in range(1, 8):
+        memory[0x10] = frame
+        memory[0x12:0x14] = (0x300 - 0x40 * frame).to_bytes(2, "little")
+        stopped.append(tracker.update(memory.__getitem__))
+        if stopped[-1]:
+            break
+    assert stopped == [False] * 4 + [True]
+    expected = tracker.result()
+    assert (expected.frames, expected.fired, expected.maxima) == (5, {"five"}, {"peak": 0x2C0})
+    result, rest = decode_step_summary(tracker.encode() + b"record", WATCHES)
+    assert (result.frames, result.fired, result.maxima) == (expected.frames, expected.fired, expected.maxima)
+    assert bytes(rest) == b"record"
+    with pytest.raises(ProtocolError):
+        decode_step_summary(tracker.encode()[:-1], WATCHES)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_step_stops_on_death
+* --------------------
+* Description:
+*	Checks that the emulator stops a step on the frame Mario dies and
+    reports the death, and that the maximum X position is kept for the frames
+    it ran
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_step_stops_on_death():
+    server = DyingServer(7, port=0)
+    server.start()
+    wrapper = SNES9x(port=server.port)
+    wrapper.connect_lua_socket()
+    wrapper.set_step_watches([StepWatch("dead", 0x7E0071, WATCH_EQUAL, 9),
+                              StepWatch("progress", X_ADDR, WATCH_MAX, width=2)])
+    wrapper.step_frames(["r"], 4)
+    assert (wrapper.step_result.frames, wrapper.step_result.fired) == (4, set())
+    wrapper.step_frames(["r"], 20)
+    result = wrapper.step_result
+    assert (result.frames, result.fired, result.maxima) == (3, {"dead"}, {"progress": 14})
+    assert server.frame == wrapper.ram.frame == 7
+    wrapper.connection.close()
+    server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_death_ends_skipped_step
+* --------------------
+* Description:
+*	Checks that a death in the middle of a long frame skip, which has ended
+    by the last frame of the skip in the mock server, still ends the episode
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_death_ends_skipped_step():
+    class RevivingServer(DyingServer):
+        def frame_advance(self):
+            super().frame_advance()
+            if self.frame == self.death_frame + 1:
+                self.ram[0x71] = 0
+    server = RevivingServer(7, port=0)
+    server.start()
+    wrapper = SNES9x(port=server.port)
+    wrapper.connect_lua_socket()
+    wrapper.is_ready = True
+    env = SmwEnvironment(wrapper, frame_skip=20, screen_mode=None)
+    env.reset()
+    _, _, terminated, _, info = env.step(np.eye(len(BUTTONS), dtype=np.uint8)[BUTTONS.index("r")])
+    assert terminated and info["term_reason"] == "Died"
+    assert info["frame"] == 7
+    wrapper.connection.close()
+    server.stop()
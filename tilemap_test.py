@@ -0,0 +1,214 @@
+'''
+******************************************************************************
+ * File:        tilemap_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks the tile-map observation in TileMap.py on a simulated
+                RAM: the window of tiles around Mario, blocks outside the
+                level, the per-level cache and the screens read into it,
+                and the sprite offsets from Mario. Also checks that only
+                environments with the tile map watch its RAM fields.
+                Note that no emulator is needed.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest tilemap_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import numpy as np
+from GameWrapper.wrappers.TileMap import *
+from GameWrapper.wrappers.RamSchema import RAM_SCHEMA, TILE_MAP_SCHEMA
+from GameWrapper.wrappers.ReplayWrapper import ReplayWrapper
+from smw_environment import SmwEnvironment
+
+# Start of the simulated RAM, which covers both WRAM banks
+WRAM_BASE = 0x7E0000
+
+# The schema of an environment with the tile map
+SCHEMA = RAM_SCHEMA.extend(TILE_MAP_SCHEMA)
+
+'''
+------------------------------------------------------------------------------
+ * Class: RamWrapper
+ * --------------------
+ * Description:
+ *	Represents a game wrapper over a simulated RAM, recording the ranges
+    read through it
+ '''
+class RamWrapper():
+    def __init__(self):
+        self.ram = bytearray(0x20000)
+        self.reads = []
+
+    def write(self, address:int, value:int, width:int = 1):
+        self.ram[address - WRAM_BASE:address - WRAM_BASE + width] = value.to_bytes(width, "little")
+
+    def read_ranges(self, ranges:list[tuple[int, int]]) -> list[np.ndarray]:
+        self.reads.append(list(ranges))
+        return [np.frombuffer(self.ram, np.uint8, length, address - WRAM_BASE) for address, length in ranges]
+
+    def snapshot(self) -> RamSnapshot:
+        return RamSnapshot(SCHEMA.layout, bytes(self.ram[address - WRAM_BASE] for address in SCHEMA.byte_addresses))
+
+'''
+------------------------------------------------------------------------------
+* Function: tile_number
+* --------------------
+* Description:
+*	Gives every block of the test level its own tile number
+*
+* Arguments:   The row and column of the block in the level
+* Returns:     The block's tile number
+'''
+def tile_number(row:int, column:int) -> int:
+    return row * 0x200 + column + 1
+
+'''
+------------------------------------------------------------------------------
+* Function: make_level
+* --------------------
+* Description:
+*	Builds a wrapper whose Map16 tables hold the test level, with Mario at
+    the given position
+*
+* Arguments:   Mario's X and Y position in pixels
+* Returns:     The RamWrapper
+'''
+def make_level(x_pos:int, y_pos:int) -> RamWrapper:
+    wrapper = RamWrapper()
+    for row in range(SCREEN_ROWS):
+        for column in range(LEVEL_SCREENS * SCREEN_COLUMNS):
+            set_tile(wrapper, row, column, tile_number(row, column))
+    wrapper.write(SCHEMA["x_pos"].address, x_pos, 2)
+    wrapper.write(SCHEMA["y_pos"].address, y_pos, 2)
+    return wrapper
+
+'''
+------------------------------------------------------------------------------
+* Function: set_tile
+* --------------------
+* Description:
+*	Writes one block of the level into the Map16 tables
+*
+* Arguments:   The wrapper, the block's row and column, and its tile number
+* Returns:     none
+'''
+def set_tile(wrapper:RamWrapper, row:int, column:int, tile:int):
+    index = column // SCREEN_COLUMNS * SCREEN_SIZE + row * SCREEN_COLUMNS + column % SCREEN_COLUMNS
+    wrapper.write(MAP16_LOW + index, tile & 0xFF)
+    wrapper.write(MAP16_HIGH + index, tile >> 8)
+
+'''
+------------------------------------------------------------------------------
+* Function: test_window_around_mario
+* --------------------
+* Description:
+*	Checks that the window is centered on Mario's block and that only the
+    two screens under it are read, in one round trip
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_window_around_mario():
+    wrapper = make_level(44 * BLOCK_SIZE + 5, 10 * BLOCK_SIZE)
+    tile_map = TileMap(wrapper)
+    grid, _ = tile_map.update(wrapper.snapshot())
+    rows, columns = np.ogrid[11 - 7:11 + 7, 44 - 8:44 + 8]
+    assert grid.shape == (14, 16) and np.array_equal(grid, tile_number(rows, columns))
+    assert wrapper.reads == [[(MAP16_LOW + 2 * SCREEN_SIZE, SCREEN_SIZE), (MAP16_HIGH + 2 * SCREEN_SIZE, SCREEN_SIZE),
+                              (MAP16_LOW + 3 * SCREEN_SIZE, SCREEN_SIZE), (MAP16_HIGH + 3 * SCREEN_SIZE, SCREEN_SIZE)]]
+    assert tile_map.changed == 2 * SCREEN_SIZE
+
+'''
+------------------------------------------------------------------------------
+* Function: test_window_outside_level
+* --------------------
+* Description:
+*	Checks that the parts of the window left of and above the level read
+    as OUT_OF_LEVEL
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_window_outside_level():
+    wrapper = make_level(2 * BLOCK_SIZE, 0)
+    grid, _ = TileMap(wrapper).update(wrapper.snapshot())
+    assert (grid[:6] == OUT_OF_LEVEL).all() and (grid[:, :6] == OUT_OF_LEVEL).all()
+    rows, columns = np.ogrid[0:8, 0:10]
+    assert np.array_equal(grid[6:, 6:], tile_number(rows, columns))
+
+'''
+------------------------------------------------------------------------------
+* Function: test_level_cache
+* --------------------
+* Description:
+*	Checks that cached screens are not read again, that only a screen the
+    window enters is read, and that a new level drops the cache
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_level_cache():
+    wrapper = make_level(40 * BLOCK_SIZE, 10 * BLOCK_SIZE)
+    tile_map = TileMap(wrapper)
+    tile_map.update(wrapper.snapshot())
+    wrapper.reads.clear()
+    set_tile(wrapper, 11, 40, 0x25)
+    grid, _ = tile_map.update(wrapper.snapshot())
+    assert wrapper.reads == [] and tile_map.changed == 0 and grid[7, 8] == tile_number(11, 40)
+
+    wrapper.write(SCHEMA["x_pos"].address, 44 * BLOCK_SIZE, 2)
+    tile_map.update(wrapper.snapshot())
+    assert wrapper.reads == [[(MAP16_LOW + 3 * SCREEN_SIZE, SCREEN_SIZE), (MAP16_HIGH + 3 * SCREEN_SIZE, SCREEN_SIZE)]]
+    assert tile_map.changed == SCREEN_SIZE
+
+    wrapper.write(SCHEMA["level"].address, 2)
+    grid, _ = tile_map.update(wrapper.snapshot())
+    assert tile_map.level == 2 and tile_map.changed == 2 * SCREEN_SIZE and grid[7, 4] == 0x25
+    assert np.flatnonzero(tile_map.loaded).tolist() == [2, 3]
+    assert (tile_map.tiles[:, :2 * SCREEN_COLUMNS] == OUT_OF_LEVEL).all()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_sprite_offsets
+* --------------------
+* Description:
+*	Checks that active sprites are reported relative to Mario, across the
+    high byte of their position, and that empty slots are zero
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_sprite_offsets():
+    wrapper = make_level(0x1F0, 0x150)
+    for slot, (status, number, x_pos, y_pos) in enumerate([(8, 0x0D, 0x204, 0x140), (0, 0x21, 0x100, 0x100), (9, 0x80, 0x1E0, 0x170)]):
+        for name, value in (("sprite_status", status), ("sprite_number", number),
+                            ("sprite_x_low", x_pos & 0xFF), ("sprite_x_high", x_pos >> 8),
+                            ("sprite_y_low", y_pos & 0xFF), ("sprite_y_high", y_pos >> 8)):
+            wrapper.write(SCHEMA[name].address + slot, value)
+    _, sprites = TileMap(wrapper).update(wrapper.snapshot())
+    assert sprites.shape == (SPRITE_SLOTS, SPRITE_COLUMNS) and sprites.dtype == np.int16
+    assert sprites[:3].tolist() == [[8, 0x0D, 0x14, -0x10], [0, 0, 0, 0], [9, 0x80, -0x10, 0x20]]
+    assert not sprites[3:].any()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_environment_schema
+* --------------------
+* Description:
+*	Checks that only an environment with the tile map adds the tile-map
+    fields to its wrapper's schema, and that its observation holds the map
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_environment_schema():
+    assert SmwEnvironment(ReplayWrapper(seed=0), screen_mode=None).game_wrapper.ram_schema is RAM_SCHEMA
+    env = SmwEnvironment(ReplayWrapper(seed=0), screen_mode=None, tile_map=True)
+    assert env.game_wrapper.ram_schema.byte_addresses == SCHEMA.byte_addresses
+    obs, _ = env.reset()
+    obs, *_ = env.step(env.action_space.sample())
+    assert obs["tiles"].shape == (14, 16) and obs["sprites"].shape == (SPRITE_SLOTS, SPRITE_COLUMNS)
@@ -0,0 +1,178 @@
+'''
+******************************************************************************
+ * File:        vec_env_test.py
+ * Author:      Brennan Romero, Luke Delzer
+ * Class:       Introduction to AI (CS3820), Spring 2025, Dr. Armin Moin
+ * Assignment:  Semester Project
+ * Due Date:    04-23-2025
+ * Description: Checks that SmwBatchedVecEnv, which steps every emulator from
+                one poll loop and computes the rewards together, gives the
+                same observations, rewards, dones, and term reasons as SB3's
+                DummyVecEnv stepping each SmwEnvironment on its own. Each
+                environment runs against its own mock Lua server, so no
+                emulator is needed. Closing the VecEnv must stop every
+                emulator process.
+ * Usage:       Run this program with pytest in a Python 3.12.x or higher
+                environment.
+                python -m pytest vec_env_test.py
+ ******************************************************************************
+ '''
+
+# Imports
+import subprocess
+import sys
+import numpy as np
+import pytest
+from stable_baselines3.common.vec_env import DummyVecEnv
+from mock_lua_server import MockLuaServer
+from smw_environment import SmwEnvironment
+from smw_vec_env import SmwBatchedVecEnv
+from GameWrapper.wrappers.SNES9x import SNES9x
+from GameWrapper.button.Buttons import BUTTONS, DISCRETE_ACTIONS
+
+# Number of environments and steps compared
+N_ENVS = 3
+N_STEPS = 60
+
+'''
+------------------------------------------------------------------------------
+* Function: make_env
+* --------------------
+* Description:
+*	Builds an environment function whose wrapper connects to the given mock
+    server instead of launching the emulator
+*
+* Arguments:   The mock server and any extra SmwEnvironment arguments
+* Returns:     A function that builds the SmwEnvironment
+'''
+def make_env(server:MockLuaServer, **env_kwargs):
+    def init() -> SmwEnvironment:
+        wrapper = SNES9x(port=server.port)
+        def start():
+            wrapper.connect_lua_socket()
+            wrapper.is_ready = True
+        wrapper.startGame = start
+        return SmwEnvironment(wrapper, frame_skip=4, **env_kwargs)
+    return init
+
+'''
+------------------------------------------------------------------------------
+* Function: run
+* --------------------
+* Description:
+*	Steps a vectorized environment over fresh mock servers and records
+    every step
+*
+* Arguments:   The VecEnv class, the actions of every step, and any extra
+               SmwEnvironment arguments
+* Returns:     A list of the (observations, rewards, dones, term reasons,
+               terminal observations) of every step, the reset first
+'''
+def run(vec_env_cls:type, actions:np.ndarray, **env_kwargs) -> list:
+    servers = [MockLuaServer(port=0) for _ in range(N_ENVS)]
+    for server in servers:
+        server.start()
+    vec_env = vec_env_cls([make_env(server, **env_kwargs) for server in servers])
+    steps = [(vec_env.reset(), None, None, None, [None] * N_ENVS)]
+    for step_actions in actions:
+        obs, rewards, dones, infos = vec_env.step(step_actions)
+        terminal = [info.get("terminal_observation") for info in infos]
+        steps.append((obs, rewards, dones, [info["term_reason"] for info in infos], terminal))
+    for env in vec_env.envs:
+        env.game_wrapper.connection.close()
+    for server in servers:
+        server.stop()
+    return steps
+
+'''
+------------------------------------------------------------------------------
+* Function: test_batched_matches_dummy
+* --------------------
+* Description:
+*	Steps both vectorized environments with the same random actions, which
+    hold left often enough that some episodes time out and are reset, and
+    checks that every step matches, including the terminal observations
+    kept past each reset
+*
+* Arguments:   The SmwEnvironment action mode
+* Returns:     none
+'''
+@pytest.mark.parametrize("action_mode", ["box", "discrete"])
+def test_batched_matches_dummy(action_mode:str):
+    rng = np.random.default_rng(0)
+    if action_mode == "discrete":
+        actions = rng.integers(0, len(DISCRETE_ACTIONS), (N_STEPS, N_ENVS))
+    else:
+        actions = (rng.random((N_STEPS, N_ENVS, len(BUTTONS))) < 0.4).astype(np.uint8)
+    batched = run(SmwBatchedVecEnv, actions, action_mode=action_mode)
+    dummy = run(DummyVecEnv, actions, action_mode=action_mode)
+    assert any(dones.any() for _, _, dones, _, _ in batched[1:])
+    for (obs, rewards, dones, reasons, terminal), (ref_obs, ref_rewards, ref_dones, ref_reasons, ref_terminal) \
+            in zip(batched, dummy):
+        assert obs.keys() == ref_obs.keys()
+        for key in obs:
+            assert np.array_equal(obs[key], ref_obs[key])
+        assert np.array_equal(rewards, ref_rewards)
+        assert np.array_equal(dones, ref_dones)
+        assert reasons == ref_reasons
+        for env_obs, ref_env_obs in zip(terminal, ref_terminal):
+            assert (env_obs is None) == (ref_env_obs is None)
+            if env_obs is not None:
+                for key in env_obs:
+                    assert np.array_equal(env_obs[key], ref_env_obs[key])
+
+'''
+------------------------------------------------------------------------------
+* Function: test_close_stops_emulators
+* --------------------
+* Description:
+*	Checks that closing the batched VecEnv stops every environment's
+    emulator process, with sleeping Python processes standing in for them
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_close_stops_emulators():
+    servers = [MockLuaServer(port=0) for _ in range(N_ENVS)]
+    for server in servers:
+        server.start()
+    vec_env = SmwBatchedVecEnv([make_env(server, screen_mode=None) for server in servers])
+    vec_env.reset()
+    processes = []
+    for env in vec_env.envs:
+        env.game_wrapper.process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+        processes.append(env.game_wrapper.process)
+    vec_env.close()
+    assert all(process.poll() is not None for process in processes)
+    assert all(env.game_wrapper.connection.socket.fileno() == -1 for env in vec_env.envs)
+    for server in servers:
+        server.stop()
+
+'''
+------------------------------------------------------------------------------
+* Function: test_batched_profile
+* --------------------
+* Description:
+*	Checks that the batched VecEnv times each profiled environment's step
+    and frame replies, so the step, screenshot, and network times are
+    reported even though the wrapper's own methods are not called
+*
+* Arguments:   none
+* Returns:     none
+'''
+def test_batched_profile():
+    servers = [MockLuaServer(port=0) for _ in range(N_ENVS)]
+    for server in servers:
+        server.start()
+    vec_env = SmwBatchedVecEnv([make_env(server, profile=True) for server in servers])
+    vec_env.reset()
+    for _ in range(5):
+        vec_env.step(np.ones((N_ENVS, len(BUTTONS)), dtype=np.uint8))
+    for profiler in vec_env.env_method("profile", True):
+        summary = profiler.summary()
+        # The reset's screenshot goes through the wrapper's own timed method
+        assert summary["step_frames"]["calls"] == 5 and summary["screenshot"]["calls"] == 6
+        assert {"lua/step", "lua/frame", "network/step_frames", "network/screenshot"} <= summary.keys()
+    vec_env.close()
+    for server in servers:
+        server.stop()